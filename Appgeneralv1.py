@@ -8,6 +8,16 @@ from pathlib import Path
 import requests
 import json
 
+from yunta import formato, gondola, pricing, reportes
+from yunta.busqueda import IndiceProductos
+from yunta.consultas import movimientos_stock, ventas_filtradas
+from yunta.cubo import agregar_movimientos
+from yunta.particiones import (
+    DIRECTORIO_PARTICIONES, MANIFIESTO, archivos_particionados, sql_vista_particionada,
+)
+from yunta.presupuesto import calcular_presupuesto
+from yunta.rotacion import VENTANA_DIAS_DEFAULT, rotacion_por_codigo
+
 # ============================================================================
 # CONFIGURACIÓN INICIAL
 # ============================================================================
@@ -18,6 +28,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+URL_DATOS = "https://raw.githubusercontent.com/gerrojo82/YUNTA-DATOS/main"
+
 # ============================================================================
 # DUCKDB REMOTO DIRECTO - CARGA RÁPIDA SIN CONSUMIR MEMORIA AL INICIO
 # ============================================================================
@@ -30,20 +42,28 @@ def get_duckdb_conn():
         con.execute("INSTALL httpfs;")
         con.execute("LOAD httpfs;")
         
-        # Vista principal: une las 3 partes automáticamente
-        con.execute("""
-            CREATE VIEW movimientos AS
-            SELECT * FROM read_parquet([
-                'https://raw.githubusercontent.com/gerrojo82/YUNTA-DATOS/main/MOVIMIENTOS_PARTE_1.parquet',
-                'https://raw.githubusercontent.com/gerrojo82/YUNTA-DATOS/main/MOVIMIENTOS_PARTE_2.parquet',
-                'https://raw.githubusercontent.com/gerrojo82/YUNTA-DATOS/main/MOVIMIENTOS_PARTE_3.parquet'
-            ])
-        """)
+        # Vista principal: dataset particionado por anio/mes/Tienda (generado con
+        # dividir_parquet.py). Si todavía no está publicado, se unen las 3 partes.
+        url_particiones = f"{URL_DATOS}/{DIRECTORIO_PARTICIONES}"
+        respuesta = requests.get(f"{url_particiones}/{MANIFIESTO}", timeout=30)
+        if respuesta.ok:
+            con.execute(sql_vista_particionada(
+                archivos_particionados(respuesta.json(), url_particiones)
+            ))
+        else:
+            con.execute(f"""
+                CREATE VIEW movimientos AS
+                SELECT * FROM read_parquet([
+                    '{URL_DATOS}/MOVIMIENTOS_PARTE_1.parquet',
+                    '{URL_DATOS}/MOVIMIENTOS_PARTE_2.parquet',
+                    '{URL_DATOS}/MOVIMIENTOS_PARTE_3.parquet'
+                ])
+            """)
         
         # Vista para consolidado/seguimiento (archivo separado)
-        con.execute("""
+        con.execute(f"""
             CREATE VIEW consolidado AS
-            SELECT * FROM read_parquet('https://raw.githubusercontent.com/gerrojo82/YUNTA-DATOS/main/CONSOLIDADO_COMPLETO.parquet')
+            SELECT * FROM read_parquet('{URL_DATOS}/CONSOLIDADO_COMPLETO.parquet')
         """)
         
         st.success("Conexión a datos remotos establecida")
@@ -372,12 +392,9 @@ SCHEMA_COLS = get_schema_cols()
 def has_col(col: str) -> bool:
     return col in SCHEMA_COLS
 
-def sql_in_list_str(values):
-    safe = []
-    for v in values:
-        v = str(v)
-        safe.append("'" + v.replace("'", "''") + "'")
-    return ",".join(safe) if safe else "''"
+def particionado():
+    """True si la vista tiene las particiones anio/mes (los filtros no leen otros meses)"""
+    return has_col("anio") and has_col("mes")
 
 @st.cache_data(ttl=3600)
 def get_metadata():
@@ -407,50 +424,28 @@ def obtener_lista_productos():
 
 df_productos_lista = obtener_lista_productos()
 
+# Índice de búsqueda "Código o Descripción" sobre todos los productos con
+# movimientos (también los que solo se recibieron): resuelve cada búsqueda a
+# un conjunto de Codigos
+@st.cache_resource(ttl=3600)
+def get_indice_productos():
+    catalogo = con.execute("""
+        SELECT DISTINCT CAST(Codigo AS VARCHAR), CAST(Descripcion AS VARCHAR)
+        FROM movimientos
+    """).fetchall()
+    return IndiceProductos([c for c, _ in catalogo], [d for _, d in catalogo])
+
+indice_productos = get_indice_productos()
+
 @st.cache_data(ttl=3600)
 def get_ventas_filtradas(fecha_desde_str, fecha_hasta_str, tiendas_tuple):
-    tiendas_sel = list(tiendas_tuple)
-    tiendas_sql = sql_in_list_str(tiendas_sel)
-    sql = f"""
-        SELECT
-            Fecha, Tienda, CAST(Codigo AS VARCHAR) AS Codigo, Descripcion,
-            Tipo_Movimiento, Cantidad, Costo, Precio_Venta, Proveedor,
-            Precio_Venta AS Venta_Total,
-            (Cantidad * Costo) AS Costo_Total,
-            (Precio_Venta - (Cantidad * Costo)) AS Margen,
-            CASE WHEN Precio_Venta IS NULL OR Precio_Venta = 0 THEN 0
-                 ELSE ((Precio_Venta - (Cantidad * Costo)) / Precio_Venta) * 100 END AS Margen_Pct
-        FROM movimientos
-        WHERE Tipo_Movimiento = 'Venta'
-          AND Fecha >= '{fecha_desde_str}' AND Fecha <= '{fecha_hasta_str}'
-          AND Tienda IN ({tiendas_sql})
-    """
-    df = con.execute(sql).df()
-    df["Fecha"] = pd.to_datetime(df["Fecha"])
-    return df
+    return ventas_filtradas(con, fecha_desde_str, fecha_hasta_str, tiendas_tuple, particionado=particionado())
 
 @st.cache_data(ttl=3600)
 def get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple):
-    tiendas_sel = list(tiendas_tuple)
-    tiendas_sql = sql_in_list_str(tiendas_sel)
-    cols = ["Fecha", "Tienda", "CAST(Codigo AS VARCHAR) AS Codigo", "Descripcion", "Tipo_Movimiento", "Cantidad", "Costo", "Proveedor"]
-    if has_col("Tienda_Origen"):
-        cols.append("Tienda_Origen")
-    if has_col("Tienda_Destino"):
-        cols.append("Tienda_Destino")
-    if has_col("Numero_Documento"):
-        cols.append("Numero_Documento")
-    cols_sql = ", ".join(cols)
-    sql = f"""
-        SELECT {cols_sql}, (Cantidad * Costo) AS Costo_Total
-        FROM movimientos
-        WHERE Fecha >= '{fecha_desde_str}' AND Fecha <= '{fecha_hasta_str}'
-          AND Tienda IN ({tiendas_sql})
-          AND Tipo_Movimiento IN ('Transferencia_Entrada','Transferencia_Salida','Recepción')
-    """
-    df = con.execute(sql).df()
-    df["Fecha"] = pd.to_datetime(df["Fecha"])
-    return df
+    """Recepciones y transferencias (con Tienda_Origen/Destino y documento si existen)"""
+    return movimientos_stock(con, fecha_desde_str, fecha_hasta_str, tiendas_tuple, SCHEMA_COLS,
+                             particionado=particionado())
 # ============================================================================
 # SIDEBAR
 # ============================================================================
@@ -598,7 +593,7 @@ if pagina == "🔄 Recepciones y Transferencias":
 
     df_base = df_todos_filtrado[
         df_todos_filtrado["Tipo_Movimiento"] == tipo_movimiento
-    ].copy()
+    ]
 
     if df_base.empty:
         st.warning(f"⚠️ No hay registros de {tipo_movimiento}")
@@ -698,10 +693,7 @@ if pagina == "🔄 Recepciones y Transferencias":
             key="filtro_producto"
         )
         if buscar_prod:
-            df_base = df_base[
-                df_base["Codigo"].astype(str).str.contains(buscar_prod, case=False, na=False) |
-                df_base["Descripcion"].astype(str).str.contains(buscar_prod, case=False, na=False)
-            ]
+            df_base = indice_productos.filtrar(df_base, buscar_prod)
 
     if df_base.empty:
         st.warning("⚠️ No hay registros con los filtros seleccionados")
@@ -974,8 +966,8 @@ elif pagina == "📅 Calendario Ventas":
         df_todos_filtrado = get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
 
     # Aplicar filtros locales a ambos datasets
-    df_ventas_filtro = df_filtrado.copy()
-    df_recep_filtro = df_todos_filtrado.copy()
+    df_ventas_filtro = df_filtrado.copy(deep=False)
+    df_recep_filtro = df_todos_filtrado.copy(deep=False)
 
     df_ventas_filtro['Fecha'] = pd.to_datetime(df_ventas_filtro['Fecha'])
     df_recep_filtro['Fecha'] = pd.to_datetime(df_recep_filtro['Fecha'])
@@ -1007,15 +999,8 @@ elif pagina == "📅 Calendario Ventas":
 
     # Filtro búsqueda SKU
     if busqueda_sku:
-        busqueda_lower = busqueda_sku.lower()
-        df_ventas_filtro = df_ventas_filtro[
-            df_ventas_filtro['Descripcion'].str.lower().str.contains(busqueda_lower, na=False) |
-            df_ventas_filtro['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-        ]
-        df_recep_filtro = df_recep_filtro[
-            df_recep_filtro['Descripcion'].str.lower().str.contains(busqueda_lower, na=False) |
-            df_recep_filtro['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-        ]
+        df_ventas_filtro = indice_productos.filtrar(df_ventas_filtro, busqueda_sku)
+        df_recep_filtro = indice_productos.filtrar(df_recep_filtro, busqueda_sku)
 
     if df_ventas_filtro.empty and df_recep_filtro.empty:
         st.warning("No hay movimientos con los filtros actuales")
@@ -1048,7 +1033,7 @@ elif pagina == "📅 Calendario Ventas":
         df_ventas_dia = df_ventas_sku.groupby('Fecha')['Cantidad'].sum().reset_index()
         df_ventas_dia['Evento'] = 'Venta'
         df_ventas_dia['Cantidad'] = df_ventas_dia['Cantidad'].astype(int)
-        df_ventas_dia['Detalle'] = df_ventas_dia['Cantidad'].apply(lambda x: f"{x} uds vendidas")
+        df_ventas_dia['Detalle'] = df_ventas_dia['Cantidad'].astype(str) + " uds vendidas"
 
     # Eventos recepciones
     df_recep_dia = pd.DataFrame()
@@ -1056,7 +1041,7 @@ elif pagina == "📅 Calendario Ventas":
         df_recep_dia = df_recep_sku.groupby('Fecha')['Cantidad'].sum().reset_index()
         df_recep_dia['Evento'] = 'Recepción'
         df_recep_dia['Cantidad'] = df_recep_dia['Cantidad'].astype(int)
-        df_recep_dia['Detalle'] = df_recep_dia['Cantidad'].apply(lambda x: f"{x} uds recibidas")
+        df_recep_dia['Detalle'] = df_recep_dia['Cantidad'].astype(str) + " uds recibidas"
 
     # Concatenar eventos
     df_eventos = pd.concat([df_ventas_dia, df_recep_dia], ignore_index=True)
@@ -1252,14 +1237,13 @@ elif pagina == "💰 Presupuestos":
             # ================================================================
             # PASO 1: FILTRAR DATOS HISTÓRICOS (MULTI-TIENDA OPTIMIZADO)
             # ================================================================
-            import numpy as np
             from datetime import datetime, timedelta
             
             status_text.text("📊 Filtrando datos históricos...")
             progress_bar.progress(10)
             
             # Filtrar por tiendas seleccionadas
-            df_hist = df_filtrado[df_filtrado['Tienda'].isin(tiendas_seleccionadas)].copy()
+            df_hist = df_filtrado[df_filtrado['Tienda'].isin(tiendas_seleccionadas)]
             
             # Filtrar por proveedor si se seleccionó
             if proveedor_presupuesto != "Todos":
@@ -1267,11 +1251,7 @@ elif pagina == "💰 Presupuestos":
             
             # Filtrar por búsqueda si hay texto
             if busqueda_presupuesto:
-                mask = (
-                    df_hist['Codigo'].astype(str).str.contains(busqueda_presupuesto, case=False, na=False) |
-                    df_hist['Descripcion'].astype(str).str.contains(busqueda_presupuesto, case=False, na=False)
-                )
-                df_hist = df_hist[mask]
+                df_hist = indice_productos.filtrar(df_hist, busqueda_presupuesto)
             
             if df_hist.empty:
                 progress_bar.empty()
@@ -1282,268 +1262,37 @@ elif pagina == "💰 Presupuestos":
             progress_bar.progress(20)
             
             # ================================================================
-            # PASO 2: PRE-CALCULAR DATOS (OPTIMIZACIÓN CLAVE)
+            # PASO 2: ROTACIÓN POST-RECEPCIÓN
             # ================================================================
-            status_text.text("🔢 Pre-calculando métricas...")
-            
-            # Convertir fecha a periodo una sola vez (no en cada loop)
-            df_hist['Mes'] = pd.to_datetime(df_hist['Fecha']).dt.to_period('M')
-            
-            # Agrupar por producto UNA SOLA VEZ
-            productos_unicos = df_hist.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
-                'Venta_Total': 'sum',
-                'Costo_Total': 'sum',
-                'Margen': 'sum',
-                'Cantidad': lambda x: abs(x).sum(),
-                'Fecha': 'max'
-            }).reset_index()
-            
-            productos_unicos['Margen_Pct'] = (
-                productos_unicos['Margen'] / productos_unicos['Venta_Total'] * 100
-            ).fillna(0)
-            
-            # Calcular costo unitario y precio venta UNA SOLA VEZ
-            productos_unicos['Costo_Unitario'] = (
-                productos_unicos['Costo_Total'] / productos_unicos['Cantidad']
-            ).replace([np.inf, -np.inf], 0).fillna(0)
-            
-            productos_unicos['Precio_Venta_Unitario'] = (
-                productos_unicos['Venta_Total'] / productos_unicos['Cantidad']
-            ).replace([np.inf, -np.inf], 0).fillna(0)
-            
-            # Pre-calcular ventas por producto y mes (OPTIMIZACIÓN CLAVE)
-            ventas_por_prod_mes = df_hist.groupby(['Codigo', 'Mes'], observed=True).agg({
-                'Venta_Total': 'sum',
-                'Cantidad': lambda x: abs(x).sum()
-            }).reset_index()
-            
-            # Pre-calcular recepciones si existen (MULTI-TIENDA OPTIMIZADO)
-            recepciones_dict = {}
+            rotacion_presupuesto = None
             if df_todos_filtrado is not None:
                 status_text.text("📦 Pre-calculando recepciones...")
                 recepciones_data = df_todos_filtrado[
                     (df_todos_filtrado['Tipo_Movimiento'] == 'Recepción') &
                     (df_todos_filtrado['Tienda'].isin(tiendas_seleccionadas))
-                ].copy()
-                
-                # Agrupar recepciones por producto
-                for codigo in recepciones_data['Codigo'].unique():
-                    recepciones_dict[codigo] = recepciones_data[recepciones_data['Codigo'] == codigo][['Fecha', 'Cantidad']].to_dict('records')
+                ]
+                rotacion_presupuesto = rotacion_por_codigo(recepciones_data, df_hist, dias=VENTANA_DIAS_DEFAULT)
             
             progress_bar.progress(40)
             
             # ================================================================
-            # PASO 3: CALCULAR MÉTRICAS POR PRODUCTO (OPTIMIZADO)
+            # PASO 3: CALCULAR MÉTRICAS POR PRODUCTO (VECTORIZADO)
             # ================================================================
             status_text.text("💡 Calculando presupuesto por producto...")
             
-            resultados = []
-            total_productos = len(productos_unicos)
-            
-            for idx, prod in productos_unicos.iterrows():
-                # Actualizar progreso cada 10 productos
-                if idx % 10 == 0:
-                    progreso_actual = 40 + int((idx / total_productos) * 50)
-                    progress_bar.progress(progreso_actual)
-                    status_text.text(f"💡 Procesando producto {idx + 1} de {total_productos}...")
-                
-                codigo = prod['Codigo']
-                
-                # Obtener ventas mensuales pre-calculadas (RÁPIDO)
-                ventas_por_mes = ventas_por_prod_mes[ventas_por_prod_mes['Codigo'] == codigo].copy()
-                
-                if len(ventas_por_mes) == 0:
-                    continue
-                
-                # Ordenar por mes
-                ventas_por_mes = ventas_por_mes.sort_values('Mes')
-                
-                # 1. PROMEDIO ÚLTIMOS 3 MESES (UNIDADES)
-                ultimos_3_meses = ventas_por_mes.tail(3)
-                promedio_3m_unidades = ultimos_3_meses['Cantidad'].mean() if len(ultimos_3_meses) > 0 else 0
-                
-                # 2. TENDENCIA (regresión lineal)
-                if len(ventas_por_mes) >= 3:
-                    x = np.arange(len(ventas_por_mes))
-                    y = ventas_por_mes['Cantidad'].values
-                    try:
-                        coef = np.polyfit(x, y, 1)
-                        tendencia_slope = coef[0]
-                        tendencia_unidades = coef[1] + coef[0] * len(ventas_por_mes)
-                        tendencia_unidades = max(0, tendencia_unidades)
-                        
-                        # Clasificar tendencia
-                        if tendencia_slope > 0.05 * promedio_3m_unidades:
-                            tendencia_icono = "↗"
-                            factor_tendencia = 1.05
-                        elif tendencia_slope < -0.05 * promedio_3m_unidades:
-                            tendencia_icono = "↘"
-                            factor_tendencia = 0.95
-                        else:
-                            tendencia_icono = "→"
-                            factor_tendencia = 1.0
-                    except:
-                        tendencia_unidades = promedio_3m_unidades
-                        tendencia_icono = "→"
-                        factor_tendencia = 1.0
-                else:
-                    tendencia_unidades = promedio_3m_unidades
-                    tendencia_icono = "→"
-                    factor_tendencia = 1.0
-                
-                # 3. COEFICIENTE DE VARIACIÓN (estabilidad)
-                cv = ventas_por_mes['Cantidad'].std() / ventas_por_mes['Cantidad'].mean() if ventas_por_mes['Cantidad'].mean() > 0 else 0
-                
-                # 4. ROTACIÓN POST-RECEPCIÓN (OPTIMIZADO)
-                rotacion_promedio = 0.5  # Default
-                
-                if codigo in recepciones_dict:
-                    recepciones_prod = recepciones_dict[codigo]
-                    rotaciones = []
-                    
-                    # Crear un lookup rápido de ventas por fecha
-                    ventas_producto = df_hist[df_hist['Codigo'] == codigo][['Fecha', 'Cantidad']].copy()
-                    
-                    for recep in recepciones_prod:
-                        fecha_recep = recep['Fecha']
-                        fecha_7d = fecha_recep + timedelta(days=7)
-                        
-                        # Filtrar ventas 7 días (OPTIMIZADO)
-                        ventas_7d = ventas_producto[
-                            (ventas_producto['Fecha'] >= fecha_recep) &
-                            (ventas_producto['Fecha'] <= fecha_7d)
-                        ]['Cantidad'].abs().sum()
-                        
-                        cantidad_recep = abs(recep['Cantidad'])
-                        if cantidad_recep > 0:
-                            rotaciones.append(ventas_7d / cantidad_recep)
-                    
-                    if len(rotaciones) > 0:
-                        rotacion_promedio = np.mean(rotaciones)
-                
-                # 5. ÚLTIMA VENTA
-                ultima_venta = prod['Fecha']
-                dias_sin_venta = (datetime.now() - ultima_venta).days if pd.notna(ultima_venta) else 999
-                
-                # ============================================================
-                # CÁLCULO DE UNIDADES A COMPRAR
-                # ============================================================
-                
-                # Componentes
-                comp_promedio = promedio_3m_unidades
-                comp_tendencia = tendencia_unidades
-                comp_rotacion = promedio_3m_unidades * (rotacion_promedio / 0.65)
-                
-                # Unidades sugeridas (ponderado)
-                unidades_sugeridas = (
-                    peso_promedio * comp_promedio +
-                    peso_tendencia * comp_tendencia +
-                    peso_rotacion * comp_rotacion
-                )
-                
-                # Ajuste por tendencia
-                unidades_sugeridas *= factor_tendencia
-                
-                # Ajuste por estabilidad
-                if cv > 0.7:
-                    unidades_sugeridas *= 0.9
-                
-                # Ajuste por rotación
-                if rotacion_promedio > 0.8:
-                    unidades_sugeridas *= 1.1
-                elif rotacion_promedio < 0.3:
-                    unidades_sugeridas *= 0.8
-                
-                # Ajuste por conservadurismo
-                unidades_finales = unidades_sugeridas * factor_conservadurismo
-                unidades_finales = max(0, round(unidades_finales))
-                
-                # ============================================================
-                # CÁLCULO DE PESOS
-                # ============================================================
-                
-                costo_unitario = prod['Costo_Unitario']
-                precio_venta_unitario = prod['Precio_Venta_Unitario']
-                
-                # A COMPRAR
-                pesos_a_comprar = unidades_finales * costo_unitario
-                
-                # A VENDER
-                pesos_a_vender = unidades_finales * precio_venta_unitario
-                
-                # MARGEN
-                margen_unitario = precio_venta_unitario - costo_unitario
-                margen_total = pesos_a_vender - pesos_a_comprar
-                margen_pct_proyectado = (margen_total / pesos_a_vender * 100) if pesos_a_vender > 0 else 0
-                
-                # ============================================================
-                # CÁLCULO DEL SCORE
-                # ============================================================
-                
-                venta_total = prod['Venta_Total']
-                margen_pct = prod['Margen_Pct']
-                
-                max_venta = productos_unicos['Venta_Total'].max()
-                score_venta = min(venta_total / max_venta, 1) if max_venta > 0 else 0
-                score_margen = min(margen_pct / 40, 1) if margen_pct > 0 else 0
-                score_rotacion = min(rotacion_promedio, 1)
-                score_estabilidad = max(0, 1 - min(cv, 1))
-                
-                score = (
-                    40 * score_venta +
-                    30 * score_margen +
-                    20 * score_rotacion +
-                    10 * score_estabilidad
-                )
-                
-                # Clasificación
-                if score > 75:
-                    categoria = "⭐"
-                    accion = "Aumentar +10%"
-                elif score > 50:
-                    categoria = "✅"
-                    accion = "Mantener"
-                elif score > 25:
-                    categoria = "⚠️"
-                    accion = "Revisar"
-                else:
-                    categoria = "❌"
-                    if dias_sin_venta > 60:
-                        accion = "Descontinuar"
-                    else:
-                        accion = "Evaluar descarte"
-                
-                # Guardar resultado
-                resultados.append({
-                    'Categoria': categoria,
-                    'Codigo': codigo,
-                    'Descripcion': prod['Descripcion'],
-                    'Proveedor': prod['Proveedor'],
-                    'Prom_3M_Unidades': promedio_3m_unidades,
-                    'Tendencia': tendencia_icono,
-                    'Rotacion': rotacion_promedio,
-                    'Margen_Pct': margen_pct,
-                    'Costo_Unitario': costo_unitario,
-                    'Precio_Venta_Unitario': precio_venta_unitario,
-                    'Score': score,
-                    'Unidades_A_Comprar': unidades_finales,
-                    'Pesos_A_Comprar': pesos_a_comprar,
-                    'Unidades_A_Vender': unidades_finales,
-                    'Pesos_A_Vender': pesos_a_vender,
-                    'Margen_Unitario': margen_unitario,
-                    'Margen_Total': margen_total,
-                    'Margen_Pct_Proyectado': margen_pct_proyectado,
-                    'Accion': accion,
-                    'Dias_Sin_Venta': dias_sin_venta,
-                    'CV': cv
-                })
+            df_presupuesto = calcular_presupuesto(
+                df_hist,
+                peso_promedio=peso_promedio,
+                peso_tendencia=peso_tendencia,
+                peso_rotacion=peso_rotacion,
+                factor_conservadurismo=factor_conservadurismo,
+                rotacion=rotacion_presupuesto,
+                ahora=datetime.now()
+            )
             
             progress_bar.progress(90)
             status_text.text("✅ Finalizando...")
             
-            # Crear DataFrame de resultados
-            df_presupuesto = pd.DataFrame(resultados)
-            
             if df_presupuesto.empty:
                 progress_bar.empty()
                 status_text.empty()
@@ -1785,11 +1534,7 @@ elif pagina == "💰 Presupuestos":
             if proveedor_presupuesto != "Todos":
                 df_actual_mes = df_actual_mes[df_actual_mes['Proveedor'] == proveedor_presupuesto]
             if busqueda_presupuesto:
-                mask = (
-                    df_actual_mes['Codigo'].astype(str).str.contains(busqueda_presupuesto, case=False, na=False) |
-                    df_actual_mes['Descripcion'].astype(str).str.contains(busqueda_presupuesto, case=False, na=False)
-                )
-                df_actual_mes = df_actual_mes[mask]
+                df_actual_mes = indice_productos.filtrar(df_actual_mes, busqueda_presupuesto)
 
             if df_actual_mes.empty:
                 st.warning("⚠️ No hay ventas reales para el mes seleccionado con estos filtros")
@@ -2288,7 +2033,7 @@ elif pagina == "🛒 Optimizador Góndola":
         if df_todos_filtrado is None:
             df_todos_filtrado = get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
 
-        df_base = df_filtrado.copy()
+        df_base = df_filtrado.copy(deep=False)
 
         if tienda_gondola != "Todas":
             df_base = df_base[df_base['Tienda'] == tienda_gondola]
@@ -2297,180 +2042,38 @@ elif pagina == "🛒 Optimizador Góndola":
             df_base = df_base[df_base['Proveedor'] == proveedor_gondola]
 
         if busqueda_gondola:
-            busqueda_lower = busqueda_gondola.lower()
-            df_base = df_base[
-                df_base['Descripcion'].astype(str).str.lower().str.contains(busqueda_lower, na=False) |
-                df_base['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-            ]
+            df_base = indice_productos.filtrar(df_base, busqueda_gondola)
 
         if df_base.empty:
             st.warning("⚠️ No se encontraron productos")
             st.stop()
 
         # Abastecimiento
-        df_abastecimiento = df_todos_filtrado[
-            df_todos_filtrado['Tipo_Movimiento'].isin(['Recepción', 'Transferencia_Entrada'])
-        ].copy()
-
-        if tienda_gondola != "Todas":
-            df_abastecimiento = df_abastecimiento[
-                (df_abastecimiento['Tienda'] == tienda_gondola) |
-                (df_abastecimiento['Tienda_Destino'] == tienda_gondola)
-            ]
-
-        if proveedor_gondola != "Todos":
-            df_abastecimiento = df_abastecimiento[df_abastecimiento['Proveedor'] == proveedor_gondola]
+        df_abastecimiento = gondola.abastecimiento(
+            df_todos_filtrado,
+            tienda=tienda_gondola if tienda_gondola != "Todas" else None,
+            proveedor=proveedor_gondola if proveedor_gondola != "Todos" else None
+        )
 
         if busqueda_gondola:
-            df_abastecimiento = df_abastecimiento[
-                df_abastecimiento['Descripcion'].astype(str).str.lower().str.contains(busqueda_lower, na=False) |
-                df_abastecimiento['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-            ]
+            df_abastecimiento = indice_productos.filtrar(df_abastecimiento, busqueda_gondola)
 
     # ========================================================================
     # SECCIÓN 3: CALCULAR MÉTRICAS
     # ========================================================================
     
-    # Agrupar ventas
-    df_productos = df_base.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
-        'Venta_Total': 'sum',
-        'Costo_Total': 'sum',
-        'Margen': 'sum',
-        'Cantidad': lambda x: abs(x).sum(),
-        'Fecha': ['min', 'max', 'count']
-    }).reset_index()
-
-    df_productos.columns = [
-        'Codigo', 'Descripcion', 'Proveedor',
-        'Ventas', 'Costo', 'Margen', 'Unidades_Vendidas',
-        'Primera_Venta', 'Ultima_Venta', 'Transacciones'
-    ]
-
-    # Métricas derivadas
-    df_productos['Margen_Pct'] = (df_productos['Margen'] / df_productos['Ventas'] * 100).fillna(0)
-    df_productos['Dias_Sin_Venta'] = (datetime.now() - pd.to_datetime(df_productos['Ultima_Venta'])).dt.days
-
-    # Abastecimiento por producto
-    if not df_abastecimiento.empty:
-        abast_por_prod = df_abastecimiento.groupby('Codigo', observed=True).agg({
-            'Fecha': 'max',
-            'Cantidad': lambda x: abs(x).sum()
-        }).reset_index()
-        abast_por_prod.columns = ['Codigo', 'Ultima_Recepcion', 'Unidades_Recibidas']
-
-        df_productos = df_productos.merge(abast_por_prod, on='Codigo', how='left')
-        df_productos['Dias_Sin_Recepcion'] = (datetime.now() - pd.to_datetime(df_productos['Ultima_Recepcion'])).dt.days.fillna(999)
-        df_productos['Unidades_Recibidas'] = df_productos['Unidades_Recibidas'].fillna(0)
-    else:
-        df_productos['Ultima_Recepcion'] = None
-        df_productos['Unidades_Recibidas'] = 0
-        df_productos['Dias_Sin_Recepcion'] = 999
-
-    # Rotación = Vendido / Recibido
-    df_productos['Rotacion'] = (
-        df_productos['Unidades_Vendidas'] / df_productos['Unidades_Recibidas'].replace(0, 1)
-    ).fillna(0)
-
-    # Participación en ventas
-    total_ventas = df_productos['Ventas'].sum()
-    df_productos['Participacion_Pct'] = (df_productos['Ventas'] / total_ventas * 100).fillna(0)
-
-    # Ranking por ventas
-    df_productos['Ranking_Ventas'] = df_productos['Ventas'].rank(ascending=False, method='min')
-    total_productos = len(df_productos)
+    # Agrupar ventas y métricas por producto
+    df_productos = gondola.metricas_gondola(
+        agregar_movimientos(df_base, ['Codigo', 'Descripcion', 'Proveedor'], fechas=True),
+        df_abastecimiento,
+        ahora=datetime.now()
+    )
 
     # ========================================================================
     # SECCIÓN 4: CLASIFICAR PARA GÓNDOLA (NUEVA LÓGICA)
     # ========================================================================
-    
-    rotacion_promedio = df_productos['Rotacion'].mean()
-    margen_promedio = df_productos['Margen_Pct'].mean()
-    top_20_pct = total_productos * 0.2
-
-    def clasificar_gondola(row):
-        """Clasifica el producto para decisión de góndola"""
-        
-        dias_sin_venta = row['Dias_Sin_Venta'] if pd.notna(row['Dias_Sin_Venta']) else 999
-        dias_sin_recep = row['Dias_Sin_Recepcion'] if pd.notna(row['Dias_Sin_Recepcion']) else 999
-        unidades_vendidas = row['Unidades_Vendidas'] if pd.notna(row['Unidades_Vendidas']) else 0
-        unidades_recibidas = row['Unidades_Recibidas'] if pd.notna(row['Unidades_Recibidas']) else 0
-        rotacion = row['Rotacion'] if pd.notna(row['Rotacion']) else 0
-        ranking = row['Ranking_Ventas']
-        margen = row['Margen_Pct']
-        ventas = row['Ventas']
-        participacion = row['Participacion_Pct']
-        
-        # =================================================================
-        # REGLA 1: PROTEGER productos con buenas ventas o buen margen
-        # =================================================================
-        es_buen_vendedor = ventas > 50000  # Más de $50K en ventas
-        es_rentable = margen >= 25  # Margen >= 25%
-        es_top_20 = ranking <= (total_productos * 0.2)  # Top 20%
-        
-        # =================================================================
-        # ⭐ DESTACAR: Top 5 + buen margen
-        # =================================================================
-        if ranking <= 5 and margen >= margen_promedio:
-            return ('⭐ DESTACAR', 'Top 5 ventas + buen margen', '#10b981', 4)
-        
-        # =================================================================
-        # ⬆️ AMPLIAR: Top 20% o muy buenas ventas o muy buen margen
-        # =================================================================
-        if es_top_20 and margen > 0:
-            return ('⬆️ AMPLIAR', 'Top 20% en ventas', '#22d3ee', 3)
-        
-        if ventas > 100000 and margen > 0:
-            return ('⬆️ AMPLIAR', 'Ventas altas', '#22d3ee', 3)
-        
-        if margen >= 30 and ventas > 30000:
-            return ('⬆️ AMPLIAR', 'Margen excelente', '#22d3ee', 3)
-        
-        # =================================================================
-        # ✅ MANTENER: Buen vendedor o rentable (PROTEGIDOS)
-        # =================================================================
-        if es_buen_vendedor or es_rentable:
-            return ('✅ MANTENER', 'Buen rendimiento', '#6b7280', 2)
-        
-        # =================================================================
-        # ❌ SACAR: Solo productos realmente muertos
-        # =================================================================
-        # Recibió mucho stock pero casi no vendió nada
-        if unidades_recibidas > 30 and unidades_vendidas < 5 and dias_sin_recep < 60:
-            return ('❌ SACAR', 'Recibió stock pero no vende', '#ef4444', 0)
-        
-        # Sin ventas hace mucho y vendió muy poco en total
-        if dias_sin_venta > 45 and unidades_vendidas < 10 and ventas < 10000:
-            return ('❌ SACAR', f'Sin ventas hace {int(dias_sin_venta)} días', '#ef4444', 0)
-        
-        # Ventas mínimas y margen negativo
-        if ventas < 5000 and margen < 0:
-            return ('❌ SACAR', 'Ventas mínimas + margen negativo', '#ef4444', 0)
-        
-        # =================================================================
-        # ⬇️ REDUCIR: Solo productos con ventas bajas Y rotación baja
-        # =================================================================
-        if ventas < 20000 and rotacion < (rotacion_promedio * 0.3):
-            return ('⬇️ REDUCIR', 'Ventas bajas + rotación baja', '#f97316', 1)
-        
-        if ventas < 15000 and margen < 10 and unidades_vendidas < 30:
-            return ('⬇️ REDUCIR', 'Bajo rendimiento general', '#f97316', 1)
-        
-        # =================================================================
-        # ✅ MANTENER: Todo lo demás
-        # =================================================================
-        return ('✅ MANTENER', 'Rendimiento normal', '#6b7280', 2)
-
-    # Aplicar clasificación
-    clasificaciones = df_productos.apply(clasificar_gondola, axis=1)
-    df_productos['Accion'] = [c[0] for c in clasificaciones]
-    df_productos['Motivo'] = [c[1] for c in clasificaciones]
-    df_productos['Color'] = [c[2] for c in clasificaciones]
-    df_productos['Frentes_Sugeridos'] = [c[3] for c in clasificaciones]
-
-    # Ordenar por acción y ventas
-    orden_accion = {'⭐ DESTACAR': 0, '⬆️ AMPLIAR': 1, '✅ MANTENER': 2, '⬇️ REDUCIR': 3, '❌ SACAR': 4}
-    df_productos['Orden'] = df_productos['Accion'].map(orden_accion)
-    df_productos = df_productos.sort_values(['Orden', 'Ventas'], ascending=[True, False])
+    # Ordenado por acción y ventas
+    df_productos = gondola.clasificar_productos(df_productos)
 
     # ========================================================================
     # SECCIÓN 5: RESUMEN EJECUTIVO
@@ -2620,9 +2223,9 @@ elif pagina == "🛒 Optimizador Góndola":
     df_mostrar = df_productos[df_productos['Accion'].isin(filtro_accion)].copy()
 
     # Formatear
-    df_mostrar['Ventas_Fmt'] = df_mostrar['Ventas'].apply(format_currency)
-    df_mostrar['Margen_Fmt'] = df_mostrar['Margen_Pct'].apply(lambda x: f"{x:.1f}%")
-    df_mostrar['Rotacion_Fmt'] = df_mostrar['Rotacion'].apply(lambda x: f"{x:.2f}x")
+    df_mostrar['Ventas_Fmt'] = formato.moneda(df_mostrar['Ventas'])
+    df_mostrar['Margen_Fmt'] = formato.porcentaje(df_mostrar['Margen_Pct'])
+    df_mostrar['Rotacion_Fmt'] = formato.numero_texto(df_mostrar['Rotacion'], decimales=2, sufijo='x')
     df_mostrar['Vendidas'] = df_mostrar['Unidades_Vendidas'].fillna(0).astype(int)
     df_mostrar['Recibidas'] = df_mostrar['Unidades_Recibidas'].fillna(0).astype(int)
 
@@ -2749,9 +2352,7 @@ elif pagina == "📈 Ventas 360":
         )
         opciones_prod = df_productos_lista.copy()
         if buscar_producto:
-            opciones_prod = opciones_prod[
-                opciones_prod['display'].str.contains(buscar_producto, case=False, na=False)
-            ]
+            opciones_prod = indice_productos.filtrar(opciones_prod, buscar_producto)
         productos_sel = st.multiselect(
             "Producto(s)",
             options=opciones_prod['display'].tolist(),
@@ -2793,7 +2394,7 @@ elif pagina == "📈 Ventas 360":
             key="fecha_360_hasta"
         )
 
-    df_ventas = df_filtrado.copy()
+    df_ventas = df_filtrado.copy(deep=False)
 
     if tienda_ventas:
         df_ventas = df_ventas[df_ventas['Tienda'].isin(tienda_ventas)]
@@ -3501,7 +3102,7 @@ elif pagina == "💰 Simulador Pricing":
         st.stop()
     
     # Aplicar filtros
-    df_pricing_base = df_filtrado.copy()
+    df_pricing_base = df_filtrado.copy(deep=False)
     
     # Filtro de tienda
     if tienda_pricing:
@@ -3513,10 +3114,7 @@ elif pagina == "💰 Simulador Pricing":
     
     # Filtro de búsqueda de producto
     if buscar_producto_pricing:
-        df_pricing_base = df_pricing_base[
-            df_pricing_base['Codigo'].astype(str).str.contains(buscar_producto_pricing, case=False, na=False) |
-            df_pricing_base['Descripcion'].astype(str).str.contains(buscar_producto_pricing, case=False, na=False)
-        ]
+        df_pricing_base = indice_productos.filtrar(df_pricing_base, buscar_producto_pricing)
     
     if df_pricing_base.empty:
         st.warning("⚠️ No hay datos con los filtros seleccionados")
@@ -3534,49 +3132,12 @@ elif pagina == "💰 Simulador Pricing":
     if filtros_aplicados:
         st.info(f"Filtros activos: {' | '.join(filtros_aplicados)} → **{len(df_pricing_base):,} registros**")
     
-    # Calcular precio unitario desde el total y la cantidad
-    if 'Precio_Venta' in df_pricing_base.columns and 'Cantidad' in df_pricing_base.columns:
-        cantidad_abs = df_pricing_base['Cantidad'].abs().replace(0, pd.NA)
-        df_pricing_base['Precio_Unitario'] = (df_pricing_base['Precio_Venta'] / cantidad_abs)
-    else:
-        df_pricing_base['Precio_Unitario'] = pd.NA
-
-    # Agrupar por producto para análisis
-    df_productos_precio = df_pricing_base.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
-        'Cantidad': lambda x: abs(x).sum(),
-        'Costo': 'mean',
-        'Precio_Unitario': 'mean',
-        'Venta_Total': 'sum',
-        'Costo_Total': 'sum',
-        'Margen': 'sum'
-    }).reset_index()
-    
-    df_productos_precio.columns = [
-        'Codigo', 'Descripcion', 'Proveedor',
-        'Unidades_Vendidas', 'Costo_Promedio', 'Precio_Actual',
-        'Venta_Total', 'Costo_Total', 'Margen_Total'
-    ]
-    
-    # Calcular métricas - Margen sobre COSTO (markup)
-    costo_safe = df_productos_precio['Costo_Promedio'].replace(0, pd.NA)
-    df_productos_precio['Margen_Pct'] = (
-        (df_productos_precio['Precio_Actual'] - df_productos_precio['Costo_Promedio']) / 
-        costo_safe * 100
-    ).fillna(0)
-    
-    df_productos_precio['Margen_Unitario'] = (
-        df_productos_precio['Precio_Actual'] - df_productos_precio['Costo_Promedio']
+    # Agrupar por producto para análisis (Precio_Unitario = promedio por venta
+    # de Precio_Venta / |Cantidad|); ordenado por ventas
+    df_productos_precio = pricing.metricas_precios(
+        agregar_movimientos(df_pricing_base, ['Codigo', 'Descripcion', 'Proveedor'])
     )
     
-    # Calcular rotación (participación en ventas)
-    total_unidades = df_productos_precio['Unidades_Vendidas'].sum()
-    df_productos_precio['Rotacion_Pct'] = (
-        df_productos_precio['Unidades_Vendidas'] / total_unidades * 100
-    ).fillna(0)
-    
-    # Ordenar por ventas
-    df_productos_precio = df_productos_precio.sort_values('Venta_Total', ascending=False)
-    
     # ========================================================================
     # SECCIÓN 1: ALERTAS DE MARGEN NEGATIVO 🚨
     # ========================================================================
@@ -3660,10 +3221,9 @@ elif pagina == "💰 Simulador Pricing":
     st.markdown("## 📊 Rentabilidad Actual")
     
     # Métricas globales
-    venta_total_global = df_productos_precio['Venta_Total'].sum()
-    costo_total_global = df_productos_precio['Costo_Total'].sum()
-    margen_total_global = df_productos_precio['Margen_Total'].sum()
-    margen_pct_global = (margen_total_global / costo_total_global * 100) if costo_total_global > 0 else 0
+    venta_total_global, costo_total_global, margen_total_global, margen_pct_global = (
+        pricing.rentabilidad(df_productos_precio)
+    )
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -3721,6 +3281,13 @@ elif pagina == "💰 Simulador Pricing":
             key="margen_objetivo_slider"
         )
         
+        resolver_objetivo = st.checkbox(
+            "🎯 Calcular el aumento exacto para el objetivo",
+            value=False,
+            key="resolver_margen_objetivo",
+            help="Busca la diferencia con la que el nuevo margen llega al objetivo según la estrategia y los productos protegidos"
+        )
+        
         diferencia_margen = margen_objetivo - margen_pct_global
         
         st.markdown(f"""
@@ -3755,12 +3322,7 @@ elif pagina == "💰 Simulador Pricing":
     st.info("Estos productos NO se modificarán porque son de referencia para los clientes")
     
     # Detectar automáticamente productos ancla (top ventas de categorías sensibles)
-    palabras_ancla = ['leche', 'pan ', 'coca', 'pepsi', 'yerba', 'azucar', 'aceite', 'harina', 'arroz', 'fideos']
-    
-    # Sugerir productos ancla
-    df_sugeridos_ancla = df_productos_precio[
-        df_productos_precio['Descripcion'].str.lower().str.contains('|'.join(palabras_ancla), na=False)
-    ].head(20)
+    df_sugeridos_ancla = pricing.sugerir_anclas(df_productos_precio)
     
     # Selector de productos protegidos
     productos_protegidos = st.multiselect(
@@ -3779,95 +3341,31 @@ elif pagina == "💰 Simulador Pricing":
     # ========================================================================
     st.markdown("## 📋 Simulación de Nuevos Precios")
     
-    # Crear copia para simulación
-    df_simulacion = df_productos_precio.copy()
-    
-    # Marcar protegidos
-    df_simulacion['Protegido'] = df_simulacion['Descripcion'].isin(productos_protegidos)
-    
-    # Calcular aumento necesario por producto según estrategia
-    def calcular_aumento(row, estrategia, diferencia_margen):
-        """Calcula el % de aumento para cada producto"""
-        
-        # Evitar división por cero
-        if row['Precio_Actual'] <= 0 or pd.isna(row['Precio_Actual']):
-            return 0
-        
-        if row['Costo_Promedio'] <= 0 or pd.isna(row['Costo_Promedio']):
-            return 0
-        
-        if row['Protegido']:
-            return 0  # No tocar protegidos
-        
-        if row['Margen_Pct'] < 0:
-            # Margen negativo: llevar a 15% mínimo sobre costo
-            precio_minimo = row['Costo_Promedio'] * 1.15
-            if row['Precio_Actual'] > 0:
-                aumento = ((precio_minimo / row['Precio_Actual']) - 1) * 100
-                return max(aumento, 0)
-            else:
-                return 0
-        
-        if "Inteligente" in estrategia:
-            # Más aumento a productos con bajo margen y alta rotación
-            factor_margen = max(0, (30 - row['Margen_Pct']) / 30)  # Más bajo el margen, más aumento
-            factor_rotacion = min(row['Rotacion_Pct'] / 1, 1)  # Alta rotación aguanta más
-            
-            # Calcular aumento base
-            aumento_base = diferencia_margen * 1.5  # Factor para compensar protegidos
-            
-            # Ajustar según factores
-            aumento = aumento_base * (0.5 + factor_margen * 0.5) * (0.8 + factor_rotacion * 0.4)
-            
-            # Limitar: mínimo 0.5%, máximo 10%
-            return max(0.5, min(10, aumento))
-        
-        elif "Uniforme" in estrategia:
-            # Mismo % a todos (ajustado por protegidos)
-            productos_no_protegidos = len(df_simulacion[~df_simulacion['Protegido']])
-            factor_ajuste = len(df_simulacion) / productos_no_protegidos if productos_no_protegidos > 0 else 1
-            return diferencia_margen * factor_ajuste
-        
+    # Diferencia exacta para el objetivo (según estrategia y protegidos)
+    if resolver_objetivo:
+        diferencia_resuelta = pricing.resolver_diferencia_margen(
+            df_productos_precio, estrategia, margen_objetivo, productos_protegidos, costo_total_global
+        )
+        if diferencia_resuelta is None:
+            st.warning(f"⚠️ La estrategia elegida no llega a un margen de {margen_objetivo}%: se simula con la diferencia de +{diferencia_margen:.1f}%")
         else:
-            return diferencia_margen
-    
-    # Aplicar cálculo
-    df_simulacion['Aumento_Pct'] = df_simulacion.apply(
-        lambda row: calcular_aumento(row, estrategia, diferencia_margen), 
-        axis=1
-    )
-    
-    # Calcular nuevos precios
-    df_simulacion['Precio_Nuevo'] = df_simulacion['Precio_Actual'] * (1 + df_simulacion['Aumento_Pct'] / 100)
-    
-    # Calcular nuevo margen sobre COSTO
-    costo_sim_safe = df_simulacion['Costo_Promedio'].replace(0, pd.NA)
-    df_simulacion['Margen_Nuevo_Pct'] = (
-        (df_simulacion['Precio_Nuevo'] - df_simulacion['Costo_Promedio']) / 
-        costo_sim_safe * 100
-    ).fillna(0)
+            diferencia_margen = diferencia_resuelta
+            st.info(f"🎯 Diferencia para llegar a {margen_objetivo}%: +{diferencia_margen:.2f}%")
     
-    # Calcular impacto en ganancia
-    df_simulacion['Margen_Nuevo_Total'] = (
-        (df_simulacion['Precio_Nuevo'] - df_simulacion['Costo_Promedio']) * 
-        df_simulacion['Unidades_Vendidas']
+    # Aumento por producto según estrategia (los protegidos no se tocan),
+    # nuevos precios e impacto en ganancia; ordenado por impacto
+    df_simulacion = pricing.simular_precios(
+        df_productos_precio, estrategia, diferencia_margen, productos_protegidos
     )
     
-    df_simulacion['Impacto_Ganancia'] = df_simulacion['Margen_Nuevo_Total'] - df_simulacion['Margen_Total']
-    
-    # Ordenar por impacto
-    df_simulacion = df_simulacion.sort_values('Impacto_Ganancia', ascending=False)
-    
     # ========================================================================
     # MOSTRAR RESULTADOS
     # ========================================================================
     
     # Métricas de la simulación
-    margen_nuevo_total = df_simulacion['Margen_Nuevo_Total'].sum()
-    margen_nuevo_pct = (margen_nuevo_total / costo_total_global * 100) if costo_total_global > 0 else 0
-    ganancia_adicional_real = margen_nuevo_total - margen_total_global
-    productos_afectados = len(df_simulacion[df_simulacion['Aumento_Pct'] > 0])
-    aumento_promedio = df_simulacion[df_simulacion['Aumento_Pct'] > 0]['Aumento_Pct'].mean()
+    margen_nuevo_total, margen_nuevo_pct, ganancia_adicional_real, productos_afectados, aumento_promedio = (
+        pricing.resumen_simulacion(df_simulacion, costo_total_global, margen_total_global)
+    )
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -3942,12 +3440,14 @@ elif pagina == "💰 Simulador Pricing":
         )
         
         # Formatear datos para mostrar limpio (precio unitario)
-        df_display['Precio_Actual'] = df_display['Precio_Actual'].apply(format_currency)
-        df_display['Precio_Nuevo'] = df_display['Precio_Nuevo'].apply(format_currency)
-        df_display['Aumento_Pct'] = df_display['Aumento_Pct'].apply(lambda x: f"+{x:.1f}%" if x > 0 else "-")
-        df_display['Margen_Pct'] = df_display['Margen_Pct'].apply(lambda x: f"{x:.1f}%")
-        df_display['Margen_Nuevo_Pct'] = df_display['Margen_Nuevo_Pct'].apply(lambda x: f"{x:.1f}%")
-        df_display['Impacto_Ganancia'] = df_display['Impacto_Ganancia'].apply(lambda x: f"${x:,.0f}")
+        df_display['Precio_Actual'] = formato.moneda(df_display['Precio_Actual'])
+        df_display['Precio_Nuevo'] = formato.moneda(df_display['Precio_Nuevo'])
+        sin_aumento = ~(df_display['Aumento_Pct'] > 0)
+        df_display['Aumento_Pct'] = formato.numero_texto(df_display['Aumento_Pct'], decimales=1, prefijo='+', sufijo='%')
+        df_display.loc[sin_aumento, 'Aumento_Pct'] = "-"
+        df_display['Margen_Pct'] = formato.porcentaje(df_display['Margen_Pct'])
+        df_display['Margen_Nuevo_Pct'] = formato.porcentaje(df_display['Margen_Nuevo_Pct'])
+        df_display['Impacto_Ganancia'] = formato.numero_texto(df_display['Impacto_Ganancia'], sep_miles=',', prefijo='$')
         
         st.dataframe(
             df_display[[
@@ -4182,7 +3682,7 @@ elif pagina == "📋 Reportes Personalizados":
     with col1:
         tipo_reporte = st.radio(
             "Fuente de datos",
-            options=["Solo Ventas", "Todos los Movimientos"],
+            options=reportes.TIPOS_REPORTE,
             help="Solo Ventas = df_filtrado | Todos = Ventas + Recepciones + Transferencias + Ajustes",
             key="tipo_reporte"
         )
@@ -4213,41 +3713,8 @@ elif pagina == "📋 Reportes Personalizados":
     # ========================================================================
     st.markdown("### 2️⃣ Selecciona las Columnas")
 
-    # Columnas base (comunes)
-    columnas_base = {
-        'Fecha': 'Fecha',
-        'Tienda': 'Tienda',
-        'Codigo': 'Código',
-        'Descripcion': 'Descripción',
-        'Proveedor': 'Proveedor',
-        'Cantidad': 'Cantidad'
-    }
-    
-    # Columnas adicionales según tipo
-    if tipo_reporte == "Solo Ventas":
-        columnas_disponibles = {
-            **columnas_base,
-            'Venta_Total': 'Ventas $',
-            'Costo_Total': 'Costo $',
-            'Margen': 'Margen $',
-            'Margen_Pct': 'Margen %',
-            'Precio_Venta': 'Precio Venta Unit.'
-        }
-        columnas_default = ['Fecha', 'Tienda', 'Codigo', 'Descripcion', 'Venta_Total', 'Margen']
-    else:
-        columnas_disponibles = {
-            **columnas_base,
-            'Tipo_Movimiento': 'Tipo de Movimiento',
-            'Tienda_Origen': 'Tienda Origen',
-            'Tienda_Destino': 'Tienda Destino',
-            'Venta_Total': 'Ventas $',
-            'Costo_Total': 'Costo $',
-            'Costo': 'Costo Unitario',
-            'Margen': 'Margen $',
-            'Numero_Documento': 'Nro. Documento',
-            'Precio_Venta': 'Precio Venta Unit.'
-        }
-        columnas_default = ['Fecha', 'Tipo_Movimiento', 'Tienda', 'Codigo', 'Descripcion', 'Cantidad']
+    # Columnas disponibles ({columna: nombre amigable}) y por defecto según tipo
+    columnas_disponibles, columnas_default = reportes.columnas_reporte(tipo_reporte)
 
     columnas_seleccionadas = st.multiselect(
         "Columnas a incluir en el reporte",
@@ -4310,7 +3777,7 @@ elif pagina == "📋 Reportes Personalizados":
         col1, col2 = st.columns(2)
         
         # Columnas que NO se pueden agrupar (son métricas)
-        columnas_metricas = ['Cantidad', 'Venta_Total', 'Costo_Total', 'Margen', 'Margen_Pct', 'Precio_Venta', 'Costo']
+        columnas_metricas = reportes.COLUMNAS_METRICAS
         
         with col1:
             columnas_agrupar = st.multiselect(
@@ -4343,62 +3810,30 @@ elif pagina == "📋 Reportes Personalizados":
             # PASO 1: SELECCIONAR FUENTE DE DATOS
             # ================================================================
             if tipo_reporte == "Solo Ventas":
-                df_reporte = df_filtrado.copy()
+                df_reporte = df_filtrado.copy(deep=False)
             else:
                 # Filtrar por tipos de movimiento seleccionados
-                df_reporte = df_todos_filtrado[df_todos_filtrado['Tipo_Movimiento'].isin(tipos_seleccionados)].copy()
+                df_reporte = df_todos_filtrado[df_todos_filtrado['Tipo_Movimiento'].isin(tipos_seleccionados)]
             
             # ================================================================
-            # PASO 2: APLICAR FILTROS
+            # PASO 2-4: FILTROS, AGRUPACIÓN Y COLUMNAS FINALES
             # ================================================================
-            
-            # Filtro de proveedores
-            if len(proveedores_reporte) > 0:
-                df_reporte = df_reporte[df_reporte['Proveedor'].isin(proveedores_reporte)]
-            
-            # Filtro de tiendas
-            if len(tiendas_reporte) > 0:
-                df_reporte = df_reporte[df_reporte['Tienda'].isin(tiendas_reporte)]
-            
-            # Filtro de búsqueda
-            if busqueda_reporte:
-                busqueda_lower = busqueda_reporte.lower()
-                mask = (
-                    df_reporte['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False) |
-                    df_reporte['Descripcion'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-                )
-                df_reporte = df_reporte[mask]
-            
-            if df_reporte.empty:
+            df_reporte_final = reportes.construir_reporte(
+                df_reporte,
+                columnas_seleccionadas,
+                columnas_disponibles,
+                proveedores=proveedores_reporte,
+                tiendas=tiendas_reporte,
+                busqueda=busqueda_reporte,
+                indice=indice_productos,
+                agrupar_por=columnas_agrupar if agrupar_datos else None,
+                sumar=columnas_sumar if agrupar_datos else None
+            )
+
+            if len(df_reporte_final) == 0:
                 st.warning("⚠️ No hay datos que cumplan con los filtros seleccionados")
                 st.stop()
             
-            # ================================================================
-            # PASO 3: AGRUPACIÓN (SI ESTÁ ACTIVADA)
-            # ================================================================
-            if agrupar_datos and len(columnas_agrupar) > 0 and len(columnas_sumar) > 0:
-                # Crear diccionario de agregación
-                agg_dict = {}
-                for col in columnas_sumar:
-                    if col in df_reporte.columns:
-                        agg_dict[col] = 'sum'
-                
-                if agg_dict:
-                    df_reporte = df_reporte.groupby(columnas_agrupar, observed=True).agg(agg_dict).reset_index()
-                    
-                    # Recalcular Margen % si está seleccionado
-                    if 'Margen_Pct' in columnas_seleccionadas and 'Venta_Total' in df_reporte.columns and 'Margen' in df_reporte.columns:
-                        df_reporte['Margen_Pct'] = (df_reporte['Margen'] / df_reporte['Venta_Total'] * 100).fillna(0)
-
-            # ================================================================
-            # PASO 4: SELECCIONAR COLUMNAS FINALES
-            # ================================================================
-            columnas_finales = [c for c in columnas_seleccionadas if c in df_reporte.columns]
-            df_reporte_final = df_reporte[columnas_finales].copy()
-            
-            # Renombrar columnas a nombres amigables
-            df_reporte_final.columns = [columnas_disponibles.get(c, c) for c in df_reporte_final.columns]
-            
             # ================================================================
             # MOSTRAR RESULTADOS
             # ================================================================
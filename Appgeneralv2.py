@@ -2,10 +2,23 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import datetime, timedelta
-from io import BytesIO
-import duckdb
+import os
+import uuid
 from pathlib import Path
 
+from yunta import formato, gondola, pricing, reportes, ventas360
+from yunta.base import ARCHIVO_BASE, base_actual, huella_contenido
+from yunta.busqueda import IndiceProductos
+from yunta.cache import CacheResultados
+from yunta.consultas import agregar_cubo, movimientos_stock, ventas_diarias, ventas_filtradas
+from yunta.cubo import agregar_ventas
+from yunta.exportar import excel_diferido
+from yunta.ingesta import DIRECTORIO_DELTAS, archivos_delta, conectar_movimientos, version_deltas
+from yunta.perfil import PERFIL as perfil
+from yunta.presupuesto import calcular_presupuesto
+from yunta.rotacion import VENTANA_DIAS_DEFAULT, rotacion_por_codigo
+from yunta.sentencias import tipos_categoricos
+
 # ============================================================================
 # CONFIGURACIÓN
 # ============================================================================
@@ -16,6 +29,39 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# ============================================================================
+# PERFIL DE TIEMPOS
+# ============================================================================
+# Cada rerun es una corrida con tramos medidos (ver yunta.perfil). Las
+# últimas corridas se ven en el panel de administración del sidebar; los
+# tramos solo se guardan en disco si se define YUNTA_PERFIL_ARCHIVO (.jsonl o
+# .sqlite), porque el archivo crece con cada rerun de cada sesión.
+perfil.configurar(
+    max_corridas=int(os.environ.get("YUNTA_PERFIL_CORRIDAS", "50")),
+    archivo=os.environ.get("YUNTA_PERFIL_ARCHIVO") or None,
+)
+if "perfil_sesion" not in st.session_state:
+    st.session_state.perfil_sesion = uuid.uuid4().hex[:12]
+perfil.iniciar_corrida(
+    sesion=st.session_state.perfil_sesion,
+    usuario=(st.session_state.get("user_data") or {}).get("usuario"),
+)
+perfil.seccion("Inicio y login")
+
+# Gráficos y tablas editables como tramos propios (armado del payload)
+plotly_chart = perfil.medido("Gráfico Plotly")(st.plotly_chart)
+data_editor = perfil.medido("Tabla editable")(st.data_editor)
+
+# Cálculos de yunta que corren en cada rerun
+agregar_ventas = perfil.medido(agregar_ventas)
+calcular_presupuesto = perfil.medido(calcular_presupuesto)
+rotacion_por_codigo = perfil.medido(rotacion_por_codigo)
+metricas_gondola = perfil.medido(gondola.metricas_gondola)
+clasificar_productos = perfil.medido(gondola.clasificar_productos)
+simular_precios = perfil.medido(pricing.simular_precios)
+resolver_diferencia_margen = perfil.medido(pricing.resolver_diferencia_margen)
+construir_reporte = perfil.medido(reportes.construir_reporte)
+
 if "dark_mode" not in st.session_state:
     st.session_state.dark_mode = True
 
@@ -271,22 +317,6 @@ usuario_actual = st.session_state.user_data
 tiendas_usuario = usuario_actual["tiendas"]
 pantallas_usuario = usuario_actual["pantallas"]
 
-# ============================================================================
-# MODO OSCURO/CLARO GLOBAL - Toggle en el SIDEBAR superior (siempre visible)
-# ============================================================================
-if "dark_mode" not in st.session_state:
-    st.session_state.dark_mode = True  # Empieza en oscuro
-
-# Toggle en el sidebar (arriba de todo)
-with st.sidebar:
-    st.markdown("### 🎨 Modo")
-    is_dark = st.toggle("🌙 Oscuro / ☀️ Claro", value=st.session_state.dark_mode, key="global_dark_mode_toggle")
-
-# Si cambió → recargar la app completa
-if is_dark != st.session_state.dark_mode:
-    st.session_state.dark_mode = is_dark
-    st.rerun()
-
 # ==========================================================================
 # CSS GLOBAL
 # ==========================================================================
@@ -409,36 +439,21 @@ def format_percent(value):
 # EXPORTAR A EXCEL
 # ==========================================================================
 def to_excel(df):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        wb = writer.book
-        if 'Reporte' not in wb.sheetnames:
-            wb.create_sheet('Reporte')
-        ws = wb['Reporte']
-        ws.sheet_state = 'visible'
-
-        if df is None or getattr(df, 'empty', False):
-            ws.append(["Sin datos"])
-        else:
-            max_rows = 1048576
-            total_rows = len(df)
-            if total_rows <= max_rows:
-                df.to_excel(writer, index=False, sheet_name='Reporte')
-            else:
-                chunks = (total_rows // max_rows) + 1
-                for i in range(chunks):
-                    start = i * max_rows
-                    end = min((i + 1) * max_rows, total_rows)
-                    sheet_name = f"Reporte_{i+1}"
-                    df.iloc[start:end].to_excel(writer, index=False, sheet_name=sheet_name)
-    output.seek(0)
-    return output
+    # Devuelve la función que arma el .xlsx (streaming, openpyxl write_only)
+    # recién cuando se hace clic en st.download_button; df puede ser también
+    # una función que devuelve el DataFrame
+    return excel_diferido(df)
 
 # ==========================================================================
 # DUCKDB
 # ==========================================================================
 BASE_DIR = Path(__file__).resolve().parent
-PARQUET_PATH = str(BASE_DIR / "MOVIMIENTOS_STOCK_PowerBI.parquet")
+perfil.seccion("Conexión y metadatos")
+
+# Carpeta del parquet, la base y los deltas (YUNTA_DATOS_DIR, por defecto la
+# del script; los benchmarks la apuntan a datos sintéticos)
+DATOS_DIR = Path(os.environ.get("YUNTA_DATOS_DIR", BASE_DIR))
+PARQUET_PATH = str(DATOS_DIR / "MOVIMIENTOS_STOCK_PowerBI.parquet")
 
 # Validación de archivo parquet (LFS / existencia)
 parquet_file = Path(PARQUET_PATH)
@@ -449,46 +464,99 @@ if parquet_file.stat().st_size < 1024:
     st.error("❌ El archivo parquet parece ser un puntero LFS (no descargado). Revisa LFS en Streamlit Cloud.")
     st.stop()
 
+# Base persistente opcional (python construir_base.py): si está al día con el
+# parquet se abre en solo lectura y ya trae el cubo diario
+DUCKDB_PATH = DATOS_DIR / ARCHIVO_BASE
+
+# Días nuevos como deltas chicos (python ingerir_deltas.py los pasa a la base)
+DELTAS_DIR = DATOS_DIR / DIRECTORIO_DELTAS
+
+# Versión del parquet: si el archivo cambia se crea otra conexión y se
+# vuelve a materializar el cubo diario
+PARQUET_VERSION = f"{parquet_file.stat().st_mtime_ns}-{parquet_file.stat().st_size}"
+
+# Versión de los datos: parquet + base (cada ingesta publica una versión
+# nueva del archivo) + deltas
+BASE_ACTUAL = base_actual(DUCKDB_PATH)
+DATOS_VERSION = "-".join([
+    PARQUET_VERSION,
+    f"{BASE_ACTUAL.name}:{BASE_ACTUAL.stat().st_mtime_ns if BASE_ACTUAL.exists() else 0}",
+    version_deltas(archivos_delta(DELTAS_DIR)),
+])
+
+@perfil.medido
+@st.cache_resource(max_entries=1)
+def get_con(datos_version):
+    """Conexión DuckDB y lista de ingestas (id, fecha_desde, fecha_hasta) que incluye"""
+    # Sin base al día: los deltas posteriores al parquet se suman a la vista
+    return conectar_movimientos(PARQUET_PATH, DUCKDB_PATH, DELTAS_DIR)
+
+con, ingestas_datos = get_con(DATOS_VERSION)
+
+# Cache de resultados compartida por todas las sesiones: LRU con límite de
+# memoria y, si se define YUNTA_CACHE_DIR, copia en disco que sobrevive a
+# reinicios. Las entradas dependen del contenido del parquet, no del tiempo.
+@st.cache_resource
+def get_cache_resultados():
+    directorio = os.environ.get("YUNTA_CACHE_DIR")
+    max_mb = int(os.environ.get("YUNTA_CACHE_MB", "512"))
+    return CacheResultados(max_bytes=max_mb * 1024 * 1024, directorio=directorio)
+
+@perfil.medido
 @st.cache_resource
-def get_con():
-    con = duckdb.connect(database=":memory:")
-    con.execute(f"CREATE VIEW movimientos AS SELECT * FROM read_parquet('{PARQUET_PATH}')")
-    return con
+def get_huella_datos(parquet_version):
+    return huella_contenido(PARQUET_PATH, DUCKDB_PATH)
 
-con = get_con()
+cache = get_cache_resultados()
+cache.fijar_huella(get_huella_datos(PARQUET_VERSION))
+# Las ingestas nuevas invalidan solo los resultados de fechas superpuestas
+cache.registrar_ingestas(ingestas_datos)
 
-@st.cache_data(ttl=3600)
-def get_schema_cols():
+@perfil.medido
+@st.cache_data
+def get_schema_cols(datos_version):
     df = con.execute("DESCRIBE SELECT * FROM movimientos").df()
     return df["column_name"].tolist()
 
-SCHEMA_COLS = get_schema_cols()
+SCHEMA_COLS = get_schema_cols(DATOS_VERSION)
 
 def has_col(col: str) -> bool:
     return col in SCHEMA_COLS
 
-def sql_in_list_str(values):
-    safe = []
-    for v in values:
-        v = str(v)
-        safe.append("'" + v.replace("'", "''") + "'")
-    return ",".join(safe) if safe else "''"
-
-@st.cache_data(ttl=3600)
-def get_metadata():
+@perfil.medido
+@st.cache_data
+def get_metadata(datos_version):
     fecha_min = con.execute("SELECT MIN(Fecha) AS fmin FROM movimientos").fetchone()[0]
     fecha_max = con.execute("SELECT MAX(Fecha) AS fmax FROM movimientos").fetchone()[0]
     if isinstance(fecha_min, str):
         fecha_min = datetime.fromisoformat(fecha_min)
     if isinstance(fecha_max, str):
         fecha_max = datetime.fromisoformat(fecha_max)
-    tiendas = con.execute("SELECT DISTINCT Tienda FROM movimientos ORDER BY Tienda").df()["Tienda"].tolist()
-    proveedores = con.execute("SELECT DISTINCT Proveedor FROM movimientos ORDER BY Proveedor").df()["Proveedor"].tolist()
+    # CAST: en la base persistente son ENUM (el orden sería el del ENUM)
+    tiendas = con.execute("SELECT DISTINCT CAST(Tienda AS VARCHAR) AS Tienda FROM movimientos ORDER BY Tienda").df()["Tienda"].tolist()
+    proveedores = con.execute("SELECT DISTINCT CAST(Proveedor AS VARCHAR) AS Proveedor FROM movimientos ORDER BY Proveedor").df()["Proveedor"].tolist()
     return fecha_min, fecha_max, tiendas, proveedores
 
-fecha_min, fecha_max, todas_tiendas, todas_proveedores = get_metadata()
+fecha_min, fecha_max, todas_tiendas, todas_proveedores = get_metadata(DATOS_VERSION)
+
+# Tipos categóricos compartidos (un solo diccionario por proceso para todas
+# las sesiones): Tienda y Proveedor salen de get_metadata
+@perfil.medido
+@st.cache_resource(max_entries=1)
+def get_categorias(datos_version):
+    valores = {"Tienda": todas_tiendas, "Proveedor": todas_proveedores}
+    for columna in ("Codigo", "Descripcion", "Tipo_Movimiento"):
+        valores[columna] = [
+            v for (v,) in con.execute(f"SELECT DISTINCT CAST({columna} AS VARCHAR) FROM movimientos").fetchall()
+        ]
+    return tipos_categoricos(valores)
+
+CATEGORIAS = get_categorias(DATOS_VERSION)
+# Los resultados leídos del disco vuelven con estos mismos dtypes
+cache.fijar_categorias(CATEGORIAS)
 
-@st.cache_data(ttl=3600)
+@perfil.medido
+@cache.cacheado
 def obtener_lista_productos():
     df = con.execute("""
         SELECT DISTINCT Codigo, Descripcion
@@ -502,77 +570,53 @@ def obtener_lista_productos():
 
 df_productos_lista = obtener_lista_productos()
 
-@st.cache_data(ttl=3600)
-def get_ventas_filtradas(fecha_desde_str, fecha_hasta_str, tiendas_tuple):
-    tiendas_sel = list(tiendas_tuple)
-    tiendas_sql = sql_in_list_str(tiendas_sel)
-    sql = f"""
-        SELECT
-            Fecha,
-            Tienda,
-            CAST(Codigo AS VARCHAR) AS Codigo,
-            Descripcion,
-            Tipo_Movimiento,
-            Cantidad,
-            Costo,
-            Precio_Venta,
-            Proveedor,
-            Precio_Venta AS Venta_Total,
-            (Cantidad * Costo) AS Costo_Total,
-            (Precio_Venta - (Cantidad * Costo)) AS Margen,
-            CASE
-                WHEN Precio_Venta IS NULL OR Precio_Venta = 0 THEN 0
-                ELSE ((Precio_Venta - (Cantidad * Costo)) / Precio_Venta) * 100
-            END AS Margen_Pct
+# Índice de búsqueda "Código o Descripción" sobre todos los productos con
+# movimientos (también los que solo se recibieron): se arma una vez por
+# versión de datos y resuelve cada búsqueda a un conjunto de Codigos
+@perfil.medido
+@st.cache_resource(max_entries=1)
+def get_indice_productos(datos_version):
+    catalogo = con.execute("""
+        SELECT DISTINCT CAST(Codigo AS VARCHAR), CAST(Descripcion AS VARCHAR)
         FROM movimientos
-        WHERE Tipo_Movimiento = 'Venta'
-          AND Fecha >= '{fecha_desde_str}' AND Fecha <= '{fecha_hasta_str}'
-          AND Tienda IN ({tiendas_sql})
-    """
-    df = con.execute(sql).df()
-    df["Fecha"] = pd.to_datetime(df["Fecha"])
-    return df
+    """).fetchall()
+    return IndiceProductos([c for c, _ in catalogo], [d for _, d in catalogo])
 
-@st.cache_data(ttl=3600)
-def get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple):
-    tiendas_sel = list(tiendas_tuple)
-    tiendas_sql = sql_in_list_str(tiendas_sel)
-    cols = [
-        "Fecha",
-        "Tienda",
-        "CAST(Codigo AS VARCHAR) AS Codigo",
-        "Descripcion",
-        "Tipo_Movimiento",
-        "Cantidad",
-        "Costo",
-        "Proveedor"
-    ]
+indice_productos = get_indice_productos(DATOS_VERSION)
 
-    if has_col("Tienda_Origen"):
-        cols.append("Tienda_Origen")
-    if has_col("Tienda_Destino"):
-        cols.append("Tienda_Destino")
+@perfil.medido
+@cache.cacheado
+def get_ventas_filtradas(fecha_desde_str, fecha_hasta_str, tiendas_tuple):
+    return ventas_filtradas(con, fecha_desde_str, fecha_hasta_str, tiendas_tuple, CATEGORIAS)
+
+@perfil.medido
+@cache.cacheado
+def get_ventas_diarias(fecha_desde_str, fecha_hasta_str, tiendas_tuple):
+    """Filas del cubo diario (ventas_diarias) para el período y tiendas"""
+    return ventas_diarias(con, fecha_desde_str, fecha_hasta_str, tiendas_tuple, CATEGORIAS)
+
+@perfil.medido
+@cache.cacheado
+def get_agregado_ventas(agrupacion, fecha_desde_str, fecha_hasta_str, tiendas_tuple,
+                        proveedores_tuple=None, codigos_tuple=None, orden=None, limite=None):
+    """Agregado del cubo calculado en DuckDB (ver yunta.consultas.AGRUPACIONES)"""
+    return agregar_cubo(
+        con, agrupacion, fecha_desde_str, fecha_hasta_str,
+        tiendas=tiendas_tuple, proveedores=proveedores_tuple, codigos=codigos_tuple,
+        orden=orden, limite=limite
+    )
 
-    if has_col("Numero_Documento"):
-        cols.append("Numero_Documento")
-    cols_sql = ",\n ".join(cols)
-    sql = f"""
-        SELECT
-            {cols_sql},
-            (Cantidad * Costo) AS Costo_Total
-        FROM movimientos
-        WHERE Fecha >= '{fecha_desde_str}' AND Fecha <= '{fecha_hasta_str}'
-          AND Tienda IN ({tiendas_sql})
-          AND Tipo_Movimiento IN ('Transferencia_Entrada','Transferencia_Salida','Recepción')
-    """
-    df = con.execute(sql).df()
-    df["Fecha"] = pd.to_datetime(df["Fecha"])
-    return df
+@perfil.medido
+@cache.cacheado
+def get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple):
+    """Recepciones y transferencias (con Tienda_Origen/Destino y documento si existen)"""
+    return movimientos_stock(con, fecha_desde_str, fecha_hasta_str, tiendas_tuple, SCHEMA_COLS, CATEGORIAS)
 
 
 # ============================================================================
 # SIDEBAR
 # ============================================================================
+perfil.seccion("Sidebar y filtros")
 with st.sidebar:
     # Info del usuario logueado
     st.markdown(f"""
@@ -674,24 +718,90 @@ else:
 
 st.sidebar.caption(f"Tiendas activas: {len(tiendas_sel)} / {len(todas_tiendas)}")
 
+# Panel de tiempos: solo para usuarios con acceso a todas las pantallas
+if "TODAS" in pantallas_usuario:
+    with st.sidebar.expander("⏱️ Perfil de tiempos"):
+        df_corridas = perfil.corridas(excluir=perfil.corrida_actual())
+        if df_corridas.empty:
+            st.caption("Todavía no hay corridas registradas")
+        else:
+            st.dataframe(
+                df_corridas[['inicio', 'usuario', 'etiqueta', 'segundos', 'tramos']],
+                hide_index=True,
+                column_config={
+                    'inicio': st.column_config.DatetimeColumn("Hora", format="HH:mm:ss"),
+                    'usuario': "Usuario",
+                    'etiqueta': "Página",
+                    'segundos': st.column_config.NumberColumn("Total (s)", format="%.3f"),
+                    'tramos': "Tramos",
+                }
+            )
+            nombres_corridas = {
+                fila.corrida: f"{fila.inicio:%H:%M:%S} · {fila.etiqueta or '-'}"
+                for fila in df_corridas.itertuples()
+            }
+            corrida_sel = st.selectbox(
+                "Corrida",
+                options=list(nombres_corridas),
+                format_func=nombres_corridas.get,
+                key="perfil_corrida"
+            )
+            df_tramos = perfil.tramos(corrida_sel)
+            df_tramos['tramo'] = [
+                "· " * int(nivel) + nombre for nivel, nombre in zip(df_tramos['nivel'], df_tramos['tramo'])
+            ]
+            df_tramos['MB'] = df_tramos['bytes'] / 1024**2
+            st.dataframe(
+                df_tramos[['tramo', 'segundos', 'filas_entrada', 'filas_salida', 'MB']],
+                hide_index=True,
+                column_config={
+                    'tramo': "Tramo",
+                    'segundos': st.column_config.NumberColumn("Segundos", format="%.3f"),
+                    'filas_entrada': st.column_config.NumberColumn("Filas entrada", format="%d"),
+                    'filas_salida': st.column_config.NumberColumn("Filas salida", format="%d"),
+                    'MB': st.column_config.NumberColumn("MB", format="%.2f"),
+                }
+            )
+
 # ==========================================================================
 # FILTROS APLICADOS
 # ==========================================================================
+perfil.seccion("Datos filtrados")
 fecha_desde_str = pd.to_datetime(fecha_desde).strftime("%Y-%m-%d")
 fecha_hasta_str = pd.to_datetime(fecha_hasta).strftime("%Y-%m-%d")
 tiendas_tuple = tuple(tiendas_sel)
 
 with st.spinner("Cargando datos filtrados..."):
-    df_filtrado = get_ventas_filtradas(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
+    df_filtrado = None
+    df_diario = None
     df_todos_filtrado = None
 
+    # Góndola, Pricing y Presupuestos leen del cubo diario; Ventas 360 consulta
+    # agregados directo en DuckDB; Calendario y Reportes necesitan las filas de venta
+    if pagina in ["📅 Calendario Ventas", "📋 Reportes Personalizados"]:
+        df_filtrado = get_ventas_filtradas(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
+    elif pagina != "📈 Ventas 360":
+        df_diario = get_ventas_diarias(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
+
     if pagina in ["🔄 Recepciones y Transferencias", "📋 Reportes Personalizados"]:
         df_todos_filtrado = get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
 
-if df_filtrado.empty and pagina != "🔄 Recepciones y Transferencias":
+if df_filtrado is not None:
+    registros_ventas = len(df_filtrado)
+elif df_diario is not None:
+    registros_ventas = int(df_diario['Transacciones'].sum())
+else:
+    registros_ventas = int(
+        get_agregado_ventas('total', fecha_desde_str, fecha_hasta_str, tiendas_tuple)['Transacciones'].iloc[0]
+    )
+
+if registros_ventas == 0 and pagina != "🔄 Recepciones y Transferencias":
     st.warning("No hay datos de ventas para el filtro seleccionado")
     st.stop()
 
+perfil.etiquetar(pagina)
+perfil.seccion(f"Página {pagina}")
+
 # ============================================================================
 # RECEPCIONES Y TRANSFERENCIAS (CON TABLAS EDITABLES)
 # ============================================================================
@@ -717,7 +827,7 @@ if pagina == "🔄 Recepciones y Transferencias":
 
     df_base = df_todos_filtrado[
         df_todos_filtrado["Tipo_Movimiento"] == tipo_movimiento
-    ].copy()
+    ]
 
     if df_base.empty:
         st.warning(f"⚠️ No hay registros de {tipo_movimiento}")
@@ -817,10 +927,7 @@ if pagina == "🔄 Recepciones y Transferencias":
             key="filtro_producto"
         )
         if buscar_prod:
-            df_base = df_base[
-                df_base["Codigo"].astype(str).str.contains(buscar_prod, case=False, na=False) |
-                df_base["Descripcion"].astype(str).str.contains(buscar_prod, case=False, na=False)
-            ]
+            df_base = indice_productos.filtrar(df_base, buscar_prod)
 
     if df_base.empty:
         st.warning("⚠️ No hay registros con los filtros seleccionados")
@@ -875,7 +982,7 @@ if pagina == "🔄 Recepciones y Transferencias":
     st.markdown("### 📄 Tabla 1: Resumen por Documento (Editable)")
     
     if has_col("Numero_Documento"):
-        df_tabla1 = df_base.groupby(['Fecha', 'Numero_Documento', 'Tipo_Movimiento', 'Proveedor', 'Tienda', 'Tienda_Origen', 'Tienda_Destino']).agg({
+        df_tabla1 = df_base.groupby(['Fecha', 'Numero_Documento', 'Tipo_Movimiento', 'Proveedor', 'Tienda', 'Tienda_Origen', 'Tienda_Destino'], observed=True).agg({
             'Costo_Total': 'sum'
         }).reset_index()
         
@@ -885,7 +992,7 @@ if pagina == "🔄 Recepciones y Transferencias":
         df_tabla1_display['Fecha'] = pd.to_datetime(df_tabla1_display['Fecha']).dt.strftime('%d/%m/%Y')
         
         # TABLA EDITABLE
-        edited_tabla1 = st.data_editor(
+        edited_tabla1 = data_editor(
             df_tabla1_display.head(100), 
             use_container_width=True, 
             height=400,
@@ -926,7 +1033,7 @@ if pagina == "🔄 Recepciones y Transferencias":
     df_tabla2_display['Fecha'] = pd.to_datetime(df_tabla2_display['Fecha']).dt.strftime('%d/%m/%Y')
     df_tabla2_display['Cantidad'] = df_tabla2_display['Cantidad'].abs()
     
-    edited_tabla2 = st.data_editor(
+    edited_tabla2 = data_editor(
     df_tabla2_display,
     use_container_width=True,
     height=400,
@@ -974,7 +1081,7 @@ if pagina == "🔄 Recepciones y Transferencias":
         
         df_tabla3 = df_tabla3.sort_values('Costo_Total', ascending=False)
         
-        edited_tabla3 = st.data_editor(
+        edited_tabla3 = data_editor(
             df_tabla3,
             use_container_width=True,
             height=300,
@@ -1093,8 +1200,8 @@ elif pagina == "📅 Calendario Ventas":
         df_todos_filtrado = get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
 
     # Aplicar filtros locales a ambos datasets
-    df_ventas_filtro = df_filtrado.copy()
-    df_recep_filtro = df_todos_filtrado.copy()
+    df_ventas_filtro = df_filtrado.copy(deep=False)
+    df_recep_filtro = df_todos_filtrado.copy(deep=False)
 
     df_ventas_filtro['Fecha'] = pd.to_datetime(df_ventas_filtro['Fecha'])
     df_recep_filtro['Fecha'] = pd.to_datetime(df_recep_filtro['Fecha'])
@@ -1126,15 +1233,8 @@ elif pagina == "📅 Calendario Ventas":
 
     # Filtro búsqueda SKU
     if busqueda_sku:
-        busqueda_lower = busqueda_sku.lower()
-        df_ventas_filtro = df_ventas_filtro[
-            df_ventas_filtro['Descripcion'].str.lower().str.contains(busqueda_lower, na=False) |
-            df_ventas_filtro['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-        ]
-        df_recep_filtro = df_recep_filtro[
-            df_recep_filtro['Descripcion'].str.lower().str.contains(busqueda_lower, na=False) |
-            df_recep_filtro['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-        ]
+        df_ventas_filtro = indice_productos.filtrar(df_ventas_filtro, busqueda_sku)
+        df_recep_filtro = indice_productos.filtrar(df_recep_filtro, busqueda_sku)
 
     if df_ventas_filtro.empty and df_recep_filtro.empty:
         st.warning("No hay movimientos con los filtros actuales")
@@ -1167,7 +1267,7 @@ elif pagina == "📅 Calendario Ventas":
         df_ventas_dia = df_ventas_sku.groupby('Fecha')['Cantidad'].sum().reset_index()
         df_ventas_dia['Evento'] = 'Venta'
         df_ventas_dia['Cantidad'] = df_ventas_dia['Cantidad'].astype(int)
-        df_ventas_dia['Detalle'] = df_ventas_dia['Cantidad'].apply(lambda x: f"{x} uds vendidas")
+        df_ventas_dia['Detalle'] = df_ventas_dia['Cantidad'].astype(str) + " uds vendidas"
 
     # Eventos recepciones
     df_recep_dia = pd.DataFrame()
@@ -1175,7 +1275,7 @@ elif pagina == "📅 Calendario Ventas":
         df_recep_dia = df_recep_sku.groupby('Fecha')['Cantidad'].sum().reset_index()
         df_recep_dia['Evento'] = 'Recepción'
         df_recep_dia['Cantidad'] = df_recep_dia['Cantidad'].astype(int)
-        df_recep_dia['Detalle'] = df_recep_dia['Cantidad'].apply(lambda x: f"{x} uds recibidas")
+        df_recep_dia['Detalle'] = df_recep_dia['Cantidad'].astype(str) + " uds recibidas"
 
     # Concatenar eventos
     df_eventos = pd.concat([df_ventas_dia, df_recep_dia], ignore_index=True)
@@ -1209,16 +1309,8 @@ elif pagina == "📅 Calendario Ventas":
 
     # Exportar a Excel
     from datetime import datetime
-    import io
-
-    @st.cache_data
-    def to_excel(df):
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Calendario')
-        return output.getvalue()
 
-    excel_data = to_excel(df_tabla)
+    excel_data = excel_diferido(df_tabla, hoja='Calendario')
 
     st.download_button(
         label="📥 Exportar tabla a Excel",
@@ -1349,6 +1441,17 @@ elif pagina == "💰 Presupuestos":
         total_peso = peso_promedio + peso_tendencia + peso_rotacion
         if abs(total_peso - 1.0) > 0.01:
             st.warning(f"⚠️ La suma de ponderaciones debe ser 100%. Actual: {total_peso*100:.0f}%")
+        
+        st.markdown("**📦 Rotación post-recepción:**")
+        ventana_rotacion = st.number_input(
+            "Ventana de ventas tras recepción (días)",
+            min_value=1,
+            max_value=60,
+            value=VENTANA_DIAS_DEFAULT,
+            step=1,
+            help="Unidades vendidas entre la recepción y N días después, sobre lo recibido",
+            key="ventana_rotacion"
+        )
     
     st.markdown("---")
     
@@ -1371,14 +1474,13 @@ elif pagina == "💰 Presupuestos":
             # ================================================================
             # PASO 1: FILTRAR DATOS HISTÓRICOS (MULTI-TIENDA OPTIMIZADO)
             # ================================================================
-            import numpy as np
             from datetime import datetime, timedelta
             
             status_text.text("📊 Filtrando datos históricos...")
             progress_bar.progress(10)
             
             # Filtrar por tiendas seleccionadas
-            df_hist = df_filtrado[df_filtrado['Tienda'].isin(tiendas_seleccionadas)].copy()
+            df_hist = df_diario[df_diario['Tienda'].isin(tiendas_seleccionadas)]
             
             # Filtrar por proveedor si se seleccionó
             if proveedor_presupuesto != "Todos":
@@ -1386,11 +1488,7 @@ elif pagina == "💰 Presupuestos":
             
             # Filtrar por búsqueda si hay texto
             if busqueda_presupuesto:
-                mask = (
-                    df_hist['Codigo'].astype(str).str.contains(busqueda_presupuesto, case=False, na=False) |
-                    df_hist['Descripcion'].astype(str).str.contains(busqueda_presupuesto, case=False, na=False)
-                )
-                df_hist = df_hist[mask]
+                df_hist = indice_productos.filtrar(df_hist, busqueda_presupuesto)
             
             if df_hist.empty:
                 progress_bar.empty()
@@ -1401,268 +1499,38 @@ elif pagina == "💰 Presupuestos":
             progress_bar.progress(20)
             
             # ================================================================
-            # PASO 2: PRE-CALCULAR DATOS (OPTIMIZACIÓN CLAVE)
+            # PASO 2: ROTACIÓN POST-RECEPCIÓN
             # ================================================================
-            status_text.text("🔢 Pre-calculando métricas...")
-            
-            # Convertir fecha a periodo una sola vez (no en cada loop)
-            df_hist['Mes'] = pd.to_datetime(df_hist['Fecha']).dt.to_period('M')
-            
-            # Agrupar por producto UNA SOLA VEZ
-            productos_unicos = df_hist.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
-                'Venta_Total': 'sum',
-                'Costo_Total': 'sum',
-                'Margen': 'sum',
-                'Cantidad': lambda x: abs(x).sum(),
-                'Fecha': 'max'
-            }).reset_index()
-            
-            productos_unicos['Margen_Pct'] = (
-                productos_unicos['Margen'] / productos_unicos['Venta_Total'] * 100
-            ).fillna(0)
-            
-            # Calcular costo unitario y precio venta UNA SOLA VEZ
-            productos_unicos['Costo_Unitario'] = (
-                productos_unicos['Costo_Total'] / productos_unicos['Cantidad']
-            ).replace([np.inf, -np.inf], 0).fillna(0)
-            
-            productos_unicos['Precio_Venta_Unitario'] = (
-                productos_unicos['Venta_Total'] / productos_unicos['Cantidad']
-            ).replace([np.inf, -np.inf], 0).fillna(0)
-            
-            # Pre-calcular ventas por producto y mes (OPTIMIZACIÓN CLAVE)
-            ventas_por_prod_mes = df_hist.groupby(['Codigo', 'Mes'], observed=True).agg({
-                'Venta_Total': 'sum',
-                'Cantidad': lambda x: abs(x).sum()
-            }).reset_index()
+            status_text.text("📦 Pre-calculando recepciones...")
+            if df_todos_filtrado is None:
+                df_todos_filtrado = get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
             
-            # Pre-calcular recepciones si existen (MULTI-TIENDA OPTIMIZADO)
-            recepciones_dict = {}
-            if df_todos_filtrado is not None:
-                status_text.text("📦 Pre-calculando recepciones...")
-                recepciones_data = df_todos_filtrado[
-                    (df_todos_filtrado['Tipo_Movimiento'] == 'Recepción') &
-                    (df_todos_filtrado['Tienda'].isin(tiendas_seleccionadas))
-                ].copy()
-                
-                # Agrupar recepciones por producto
-                for codigo in recepciones_data['Codigo'].unique():
-                    recepciones_dict[codigo] = recepciones_data[recepciones_data['Codigo'] == codigo][['Fecha', 'Cantidad']].to_dict('records')
+            recepciones_data = df_todos_filtrado[
+                (df_todos_filtrado['Tipo_Movimiento'] == 'Recepción') &
+                (df_todos_filtrado['Tienda'].isin(tiendas_seleccionadas))
+            ]
+            rotacion_presupuesto = rotacion_por_codigo(recepciones_data, df_hist, dias=ventana_rotacion)
             
             progress_bar.progress(40)
             
             # ================================================================
-            # PASO 3: CALCULAR MÉTRICAS POR PRODUCTO (OPTIMIZADO)
+            # PASO 3: CALCULAR MÉTRICAS POR PRODUCTO (VECTORIZADO)
             # ================================================================
             status_text.text("💡 Calculando presupuesto por producto...")
             
-            resultados = []
-            total_productos = len(productos_unicos)
-            
-            for idx, prod in productos_unicos.iterrows():
-                # Actualizar progreso cada 10 productos
-                if idx % 10 == 0:
-                    progreso_actual = 40 + int((idx / total_productos) * 50)
-                    progress_bar.progress(progreso_actual)
-                    status_text.text(f"💡 Procesando producto {idx + 1} de {total_productos}...")
-                
-                codigo = prod['Codigo']
-                
-                # Obtener ventas mensuales pre-calculadas (RÁPIDO)
-                ventas_por_mes = ventas_por_prod_mes[ventas_por_prod_mes['Codigo'] == codigo].copy()
-                
-                if len(ventas_por_mes) == 0:
-                    continue
-                
-                # Ordenar por mes
-                ventas_por_mes = ventas_por_mes.sort_values('Mes')
-                
-                # 1. PROMEDIO ÚLTIMOS 3 MESES (UNIDADES)
-                ultimos_3_meses = ventas_por_mes.tail(3)
-                promedio_3m_unidades = ultimos_3_meses['Cantidad'].mean() if len(ultimos_3_meses) > 0 else 0
-                
-                # 2. TENDENCIA (regresión lineal)
-                if len(ventas_por_mes) >= 3:
-                    x = np.arange(len(ventas_por_mes))
-                    y = ventas_por_mes['Cantidad'].values
-                    try:
-                        coef = np.polyfit(x, y, 1)
-                        tendencia_slope = coef[0]
-                        tendencia_unidades = coef[1] + coef[0] * len(ventas_por_mes)
-                        tendencia_unidades = max(0, tendencia_unidades)
-                        
-                        # Clasificar tendencia
-                        if tendencia_slope > 0.05 * promedio_3m_unidades:
-                            tendencia_icono = "↗"
-                            factor_tendencia = 1.05
-                        elif tendencia_slope < -0.05 * promedio_3m_unidades:
-                            tendencia_icono = "↘"
-                            factor_tendencia = 0.95
-                        else:
-                            tendencia_icono = "→"
-                            factor_tendencia = 1.0
-                    except:
-                        tendencia_unidades = promedio_3m_unidades
-                        tendencia_icono = "→"
-                        factor_tendencia = 1.0
-                else:
-                    tendencia_unidades = promedio_3m_unidades
-                    tendencia_icono = "→"
-                    factor_tendencia = 1.0
-                
-                # 3. COEFICIENTE DE VARIACIÓN (estabilidad)
-                cv = ventas_por_mes['Cantidad'].std() / ventas_por_mes['Cantidad'].mean() if ventas_por_mes['Cantidad'].mean() > 0 else 0
-                
-                # 4. ROTACIÓN POST-RECEPCIÓN (OPTIMIZADO)
-                rotacion_promedio = 0.5  # Default
-                
-                if codigo in recepciones_dict:
-                    recepciones_prod = recepciones_dict[codigo]
-                    rotaciones = []
-                    
-                    # Crear un lookup rápido de ventas por fecha
-                    ventas_producto = df_hist[df_hist['Codigo'] == codigo][['Fecha', 'Cantidad']].copy()
-                    
-                    for recep in recepciones_prod:
-                        fecha_recep = recep['Fecha']
-                        fecha_7d = fecha_recep + timedelta(days=7)
-                        
-                        # Filtrar ventas 7 días (OPTIMIZADO)
-                        ventas_7d = ventas_producto[
-                            (ventas_producto['Fecha'] >= fecha_recep) &
-                            (ventas_producto['Fecha'] <= fecha_7d)
-                        ]['Cantidad'].abs().sum()
-                        
-                        cantidad_recep = abs(recep['Cantidad'])
-                        if cantidad_recep > 0:
-                            rotaciones.append(ventas_7d / cantidad_recep)
-                    
-                    if len(rotaciones) > 0:
-                        rotacion_promedio = np.mean(rotaciones)
-                
-                # 5. ÚLTIMA VENTA
-                ultima_venta = prod['Fecha']
-                dias_sin_venta = (datetime.now() - ultima_venta).days if pd.notna(ultima_venta) else 999
-                
-                # ============================================================
-                # CÁLCULO DE UNIDADES A COMPRAR
-                # ============================================================
-                
-                # Componentes
-                comp_promedio = promedio_3m_unidades
-                comp_tendencia = tendencia_unidades
-                comp_rotacion = promedio_3m_unidades * (rotacion_promedio / 0.65)
-                
-                # Unidades sugeridas (ponderado)
-                unidades_sugeridas = (
-                    peso_promedio * comp_promedio +
-                    peso_tendencia * comp_tendencia +
-                    peso_rotacion * comp_rotacion
-                )
-                
-                # Ajuste por tendencia
-                unidades_sugeridas *= factor_tendencia
-                
-                # Ajuste por estabilidad
-                if cv > 0.7:
-                    unidades_sugeridas *= 0.9
-                
-                # Ajuste por rotación
-                if rotacion_promedio > 0.8:
-                    unidades_sugeridas *= 1.1
-                elif rotacion_promedio < 0.3:
-                    unidades_sugeridas *= 0.8
-                
-                # Ajuste por conservadurismo
-                unidades_finales = unidades_sugeridas * factor_conservadurismo
-                unidades_finales = max(0, round(unidades_finales))
-                
-                # ============================================================
-                # CÁLCULO DE PESOS
-                # ============================================================
-                
-                costo_unitario = prod['Costo_Unitario']
-                precio_venta_unitario = prod['Precio_Venta_Unitario']
-                
-                # A COMPRAR
-                pesos_a_comprar = unidades_finales * costo_unitario
-                
-                # A VENDER
-                pesos_a_vender = unidades_finales * precio_venta_unitario
-                
-                # MARGEN
-                margen_unitario = precio_venta_unitario - costo_unitario
-                margen_total = pesos_a_vender - pesos_a_comprar
-                margen_pct_proyectado = (margen_total / pesos_a_vender * 100) if pesos_a_vender > 0 else 0
-                
-                # ============================================================
-                # CÁLCULO DEL SCORE
-                # ============================================================
-                
-                venta_total = prod['Venta_Total']
-                margen_pct = prod['Margen_Pct']
-                
-                max_venta = productos_unicos['Venta_Total'].max()
-                score_venta = min(venta_total / max_venta, 1) if max_venta > 0 else 0
-                score_margen = min(margen_pct / 40, 1) if margen_pct > 0 else 0
-                score_rotacion = min(rotacion_promedio, 1)
-                score_estabilidad = max(0, 1 - min(cv, 1))
-                
-                score = (
-                    40 * score_venta +
-                    30 * score_margen +
-                    20 * score_rotacion +
-                    10 * score_estabilidad
-                )
-                
-                # Clasificación
-                if score > 75:
-                    categoria = "⭐"
-                    accion = "Aumentar +10%"
-                elif score > 50:
-                    categoria = "✅"
-                    accion = "Mantener"
-                elif score > 25:
-                    categoria = "⚠️"
-                    accion = "Revisar"
-                else:
-                    categoria = "❌"
-                    if dias_sin_venta > 60:
-                        accion = "Descontinuar"
-                    else:
-                        accion = "Evaluar descarte"
-                
-                # Guardar resultado
-                resultados.append({
-                    'Categoria': categoria,
-                    'Codigo': codigo,
-                    'Descripcion': prod['Descripcion'],
-                    'Proveedor': prod['Proveedor'],
-                    'Prom_3M_Unidades': promedio_3m_unidades,
-                    'Tendencia': tendencia_icono,
-                    'Rotacion': rotacion_promedio,
-                    'Margen_Pct': margen_pct,
-                    'Costo_Unitario': costo_unitario,
-                    'Precio_Venta_Unitario': precio_venta_unitario,
-                    'Score': score,
-                    'Unidades_A_Comprar': unidades_finales,
-                    'Pesos_A_Comprar': pesos_a_comprar,
-                    'Unidades_A_Vender': unidades_finales,
-                    'Pesos_A_Vender': pesos_a_vender,
-                    'Margen_Unitario': margen_unitario,
-                    'Margen_Total': margen_total,
-                    'Margen_Pct_Proyectado': margen_pct_proyectado,
-                    'Accion': accion,
-                    'Dias_Sin_Venta': dias_sin_venta,
-                    'CV': cv
-                })
+            df_presupuesto = calcular_presupuesto(
+                df_hist,
+                peso_promedio=peso_promedio,
+                peso_tendencia=peso_tendencia,
+                peso_rotacion=peso_rotacion,
+                factor_conservadurismo=factor_conservadurismo,
+                rotacion=rotacion_presupuesto,
+                ahora=datetime.now()
+            )
             
             progress_bar.progress(90)
             status_text.text("✅ Finalizando...")
             
-            # Crear DataFrame de resultados
-            df_presupuesto = pd.DataFrame(resultados)
-            
             if df_presupuesto.empty:
                 progress_bar.empty()
                 status_text.empty()
@@ -1791,7 +1659,7 @@ elif pagina == "💰 Presupuestos":
             df_display['Rotacion'] = df_display['Rotacion'] * 100
             
             # Crear tabla editable
-            edited_presupuesto = st.data_editor(
+            edited_presupuesto = data_editor(
                 df_display,
                 use_container_width=True,
                 height=500,
@@ -1899,16 +1767,12 @@ elif pagina == "💰 Presupuestos":
             inicio_str = inicio_mes.strftime("%Y-%m-%d")
             fin_str = fin_mes.strftime("%Y-%m-%d")
 
-            df_actual_mes = get_ventas_filtradas(inicio_str, fin_str, tuple(tiendas_seleccionadas))
+            df_actual_mes = get_ventas_diarias(inicio_str, fin_str, tuple(tiendas_seleccionadas))
 
             if proveedor_presupuesto != "Todos":
                 df_actual_mes = df_actual_mes[df_actual_mes['Proveedor'] == proveedor_presupuesto]
             if busqueda_presupuesto:
-                mask = (
-                    df_actual_mes['Codigo'].astype(str).str.contains(busqueda_presupuesto, case=False, na=False) |
-                    df_actual_mes['Descripcion'].astype(str).str.contains(busqueda_presupuesto, case=False, na=False)
-                )
-                df_actual_mes = df_actual_mes[mask]
+                df_actual_mes = indice_productos.filtrar(df_actual_mes, busqueda_presupuesto)
 
             if df_actual_mes.empty:
                 st.warning("⚠️ No hay ventas reales para el mes seleccionado con estos filtros")
@@ -1983,7 +1847,7 @@ elif pagina == "💰 Presupuestos":
                     labels={'value': '$', 'variable': 'Tipo'}
                 )
                 fig_comp.update_layout(height=420, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-                st.plotly_chart(fig_comp, use_container_width=True)
+                plotly_chart(fig_comp, use_container_width=True)
 
                 excel_comp = to_excel(df_comp)
                 st.download_button(
@@ -2159,7 +2023,7 @@ elif pagina == "💰 Presupuestos":
         showlegend=False
     )
 
-    st.plotly_chart(fig_cat, use_container_width=True)
+    plotly_chart(fig_cat, use_container_width=True)
 
     # ------------------------------------------------
     # TAB 2 - MATRIZ DE DECISIÓN
@@ -2223,7 +2087,7 @@ elif pagina == "💰 Presupuestos":
                 "(pérdida proyectada). El tamaño del punto usa valor absoluto."
             )
 
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        plotly_chart(fig_scatter, use_container_width=True)
 
         st.info(
             "💡 **Zona superior derecha** = Alta rotación + Alto margen "
@@ -2325,7 +2189,7 @@ elif pagina == "💰 Presupuestos":
 
         proveedor_resumen = (
             df_presupuesto
-            .groupby('Proveedor', as_index=False)
+            .groupby('Proveedor', as_index=False, observed=True)
             .agg(
                 Productos=('Codigo', 'count'),
                 Venta_Estimada=('Pesos_A_Vender', 'sum'),
@@ -2350,7 +2214,7 @@ elif pagina == "💰 Presupuestos":
             paper_bgcolor='rgba(0,0,0,0)'
         )
 
-        st.plotly_chart(fig_prov, use_container_width=True)
+        plotly_chart(fig_prov, use_container_width=True)
 
 
 # ============================================================================
@@ -2407,7 +2271,7 @@ elif pagina == "🛒 Optimizador Góndola":
         if df_todos_filtrado is None:
             df_todos_filtrado = get_todos_filtrados(fecha_desde_str, fecha_hasta_str, tiendas_tuple)
 
-        df_base = df_filtrado.copy()
+        df_base = df_diario.copy(deep=False)
 
         if tienda_gondola != "Todas":
             df_base = df_base[df_base['Tienda'] == tienda_gondola]
@@ -2416,180 +2280,40 @@ elif pagina == "🛒 Optimizador Góndola":
             df_base = df_base[df_base['Proveedor'] == proveedor_gondola]
 
         if busqueda_gondola:
-            busqueda_lower = busqueda_gondola.lower()
-            df_base = df_base[
-                df_base['Descripcion'].astype(str).str.lower().str.contains(busqueda_lower, na=False) |
-                df_base['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-            ]
+            df_base = indice_productos.filtrar(df_base, busqueda_gondola)
 
         if df_base.empty:
             st.warning("⚠️ No se encontraron productos")
             st.stop()
 
         # Abastecimiento
-        df_abastecimiento = df_todos_filtrado[
-            df_todos_filtrado['Tipo_Movimiento'].isin(['Recepción', 'Transferencia_Entrada'])
-        ].copy()
-
-        if tienda_gondola != "Todas":
-            df_abastecimiento = df_abastecimiento[
-                (df_abastecimiento['Tienda'] == tienda_gondola) |
-                (df_abastecimiento['Tienda_Destino'] == tienda_gondola)
-            ]
-
-        if proveedor_gondola != "Todos":
-            df_abastecimiento = df_abastecimiento[df_abastecimiento['Proveedor'] == proveedor_gondola]
+        df_abastecimiento = gondola.abastecimiento(
+            df_todos_filtrado,
+            tienda=tienda_gondola if tienda_gondola != "Todas" else None,
+            proveedor=proveedor_gondola if proveedor_gondola != "Todos" else None
+        )
 
         if busqueda_gondola:
-            df_abastecimiento = df_abastecimiento[
-                df_abastecimiento['Descripcion'].astype(str).str.lower().str.contains(busqueda_lower, na=False) |
-                df_abastecimiento['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-            ]
+            df_abastecimiento = indice_productos.filtrar(df_abastecimiento, busqueda_gondola)
 
     # ========================================================================
     # SECCIÓN 3: CALCULAR MÉTRICAS
     # ========================================================================
     
-    # Agrupar ventas
-    df_productos = df_base.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
-        'Venta_Total': 'sum',
-        'Costo_Total': 'sum',
-        'Margen': 'sum',
-        'Cantidad': lambda x: abs(x).sum(),
-        'Fecha': ['min', 'max', 'count']
-    }).reset_index()
-
-    df_productos.columns = [
-        'Codigo', 'Descripcion', 'Proveedor',
-        'Ventas', 'Costo', 'Margen', 'Unidades_Vendidas',
-        'Primera_Venta', 'Ultima_Venta', 'Transacciones'
-    ]
-
-    # Métricas derivadas
-    df_productos['Margen_Pct'] = (df_productos['Margen'] / df_productos['Ventas'] * 100).fillna(0)
-    df_productos['Dias_Sin_Venta'] = (datetime.now() - pd.to_datetime(df_productos['Ultima_Venta'])).dt.days
-
-    # Abastecimiento por producto
-    if not df_abastecimiento.empty:
-        abast_por_prod = df_abastecimiento.groupby('Codigo', observed=True).agg({
-            'Fecha': 'max',
-            'Cantidad': lambda x: abs(x).sum()
-        }).reset_index()
-        abast_por_prod.columns = ['Codigo', 'Ultima_Recepcion', 'Unidades_Recibidas']
-
-        df_productos = df_productos.merge(abast_por_prod, on='Codigo', how='left')
-        df_productos['Dias_Sin_Recepcion'] = (datetime.now() - pd.to_datetime(df_productos['Ultima_Recepcion'])).dt.days.fillna(999)
-        df_productos['Unidades_Recibidas'] = df_productos['Unidades_Recibidas'].fillna(0)
-    else:
-        df_productos['Ultima_Recepcion'] = None
-        df_productos['Unidades_Recibidas'] = 0
-        df_productos['Dias_Sin_Recepcion'] = 999
-
-    # Rotación = Vendido / Recibido
-    df_productos['Rotacion'] = (
-        df_productos['Unidades_Vendidas'] / df_productos['Unidades_Recibidas'].replace(0, 1)
-    ).fillna(0)
-
-    # Participación en ventas
-    total_ventas = df_productos['Ventas'].sum()
-    df_productos['Participacion_Pct'] = (df_productos['Ventas'] / total_ventas * 100).fillna(0)
-
-    # Ranking por ventas
-    df_productos['Ranking_Ventas'] = df_productos['Ventas'].rank(ascending=False, method='min')
-    total_productos = len(df_productos)
+    # Agrupar ventas (desde el cubo diario) y métricas por producto
+    df_productos = metricas_gondola(
+        agregar_ventas(df_base, ['Codigo', 'Descripcion', 'Proveedor'], fechas=True),
+        df_abastecimiento,
+        ventas=df_base,
+        dias=VENTANA_DIAS_DEFAULT,
+        ahora=datetime.now()
+    )
 
     # ========================================================================
     # SECCIÓN 4: CLASIFICAR PARA GÓNDOLA (NUEVA LÓGICA)
     # ========================================================================
-    
-    rotacion_promedio = df_productos['Rotacion'].mean()
-    margen_promedio = df_productos['Margen_Pct'].mean()
-    top_20_pct = total_productos * 0.2
-
-    def clasificar_gondola(row):
-        """Clasifica el producto para decisión de góndola"""
-        
-        dias_sin_venta = row['Dias_Sin_Venta'] if pd.notna(row['Dias_Sin_Venta']) else 999
-        dias_sin_recep = row['Dias_Sin_Recepcion'] if pd.notna(row['Dias_Sin_Recepcion']) else 999
-        unidades_vendidas = row['Unidades_Vendidas'] if pd.notna(row['Unidades_Vendidas']) else 0
-        unidades_recibidas = row['Unidades_Recibidas'] if pd.notna(row['Unidades_Recibidas']) else 0
-        rotacion = row['Rotacion'] if pd.notna(row['Rotacion']) else 0
-        ranking = row['Ranking_Ventas']
-        margen = row['Margen_Pct']
-        ventas = row['Ventas']
-        participacion = row['Participacion_Pct']
-        
-        # =================================================================
-        # REGLA 1: PROTEGER productos con buenas ventas o buen margen
-        # =================================================================
-        es_buen_vendedor = ventas > 50000  # Más de $50K en ventas
-        es_rentable = margen >= 25  # Margen >= 25%
-        es_top_20 = ranking <= (total_productos * 0.2)  # Top 20%
-        
-        # =================================================================
-        # ⭐ DESTACAR: Top 5 + buen margen
-        # =================================================================
-        if ranking <= 5 and margen >= margen_promedio:
-            return ('⭐ DESTACAR', 'Top 5 ventas + buen margen', '#10b981', 4)
-        
-        # =================================================================
-        # ⬆️ AMPLIAR: Top 20% o muy buenas ventas o muy buen margen
-        # =================================================================
-        if es_top_20 and margen > 0:
-            return ('⬆️ AMPLIAR', 'Top 20% en ventas', '#22d3ee', 3)
-        
-        if ventas > 100000 and margen > 0:
-            return ('⬆️ AMPLIAR', 'Ventas altas', '#22d3ee', 3)
-        
-        if margen >= 30 and ventas > 30000:
-            return ('⬆️ AMPLIAR', 'Margen excelente', '#22d3ee', 3)
-        
-        # =================================================================
-        # ✅ MANTENER: Buen vendedor o rentable (PROTEGIDOS)
-        # =================================================================
-        if es_buen_vendedor or es_rentable:
-            return ('✅ MANTENER', 'Buen rendimiento', '#6b7280', 2)
-        
-        # =================================================================
-        # ❌ SACAR: Solo productos realmente muertos
-        # =================================================================
-        # Recibió mucho stock pero casi no vendió nada
-        if unidades_recibidas > 30 and unidades_vendidas < 5 and dias_sin_recep < 60:
-            return ('❌ SACAR', 'Recibió stock pero no vende', '#ef4444', 0)
-        
-        # Sin ventas hace mucho y vendió muy poco en total
-        if dias_sin_venta > 45 and unidades_vendidas < 10 and ventas < 10000:
-            return ('❌ SACAR', f'Sin ventas hace {int(dias_sin_venta)} días', '#ef4444', 0)
-        
-        # Ventas mínimas y margen negativo
-        if ventas < 5000 and margen < 0:
-            return ('❌ SACAR', 'Ventas mínimas + margen negativo', '#ef4444', 0)
-        
-        # =================================================================
-        # ⬇️ REDUCIR: Solo productos con ventas bajas Y rotación baja
-        # =================================================================
-        if ventas < 20000 and rotacion < (rotacion_promedio * 0.3):
-            return ('⬇️ REDUCIR', 'Ventas bajas + rotación baja', '#f97316', 1)
-        
-        if ventas < 15000 and margen < 10 and unidades_vendidas < 30:
-            return ('⬇️ REDUCIR', 'Bajo rendimiento general', '#f97316', 1)
-        
-        # =================================================================
-        # ✅ MANTENER: Todo lo demás
-        # =================================================================
-        return ('✅ MANTENER', 'Rendimiento normal', '#6b7280', 2)
-
-    # Aplicar clasificación
-    clasificaciones = df_productos.apply(clasificar_gondola, axis=1)
-    df_productos['Accion'] = [c[0] for c in clasificaciones]
-    df_productos['Motivo'] = [c[1] for c in clasificaciones]
-    df_productos['Color'] = [c[2] for c in clasificaciones]
-    df_productos['Frentes_Sugeridos'] = [c[3] for c in clasificaciones]
-
-    # Ordenar por acción y ventas
-    orden_accion = {'⭐ DESTACAR': 0, '⬆️ AMPLIAR': 1, '✅ MANTENER': 2, '⬇️ REDUCIR': 3, '❌ SACAR': 4}
-    df_productos['Orden'] = df_productos['Accion'].map(orden_accion)
-    df_productos = df_productos.sort_values(['Orden', 'Ventas'], ascending=[True, False])
+    # Ordenado por acción y ventas
+    df_productos = clasificar_productos(df_productos)
 
     # ========================================================================
     # SECCIÓN 5: RESUMEN EJECUTIVO
@@ -2739,21 +2463,23 @@ elif pagina == "🛒 Optimizador Góndola":
     df_mostrar = df_productos[df_productos['Accion'].isin(filtro_accion)].copy()
 
     # Formatear
-    df_mostrar['Ventas_Fmt'] = df_mostrar['Ventas'].apply(format_currency)
-    df_mostrar['Margen_Fmt'] = df_mostrar['Margen_Pct'].apply(lambda x: f"{x:.1f}%")
-    df_mostrar['Rotacion_Fmt'] = df_mostrar['Rotacion'].apply(lambda x: f"{x:.2f}x")
+    df_mostrar['Ventas_Fmt'] = formato.moneda(df_mostrar['Ventas'])
+    df_mostrar['Margen_Fmt'] = formato.porcentaje(df_mostrar['Margen_Pct'])
+    df_mostrar['Rotacion_Fmt'] = formato.numero_texto(df_mostrar['Rotacion'], decimales=2, sufijo='x')
+    df_mostrar['Rotacion_Post_Fmt'] = formato.porcentaje(df_mostrar['Rotacion_Post_Recepcion'] * 100, decimales=0)
     df_mostrar['Vendidas'] = df_mostrar['Unidades_Vendidas'].fillna(0).astype(int)
     df_mostrar['Recibidas'] = df_mostrar['Unidades_Recibidas'].fillna(0).astype(int)
 
     st.dataframe(
         df_mostrar[[
             'Accion', 'Codigo', 'Descripcion', 
-            'Ventas_Fmt', 'Margen_Fmt', 'Vendidas', 'Recibidas', 'Rotacion_Fmt', 'Motivo'
+            'Ventas_Fmt', 'Margen_Fmt', 'Vendidas', 'Recibidas', 'Rotacion_Fmt', 'Rotacion_Post_Fmt', 'Motivo'
         ]].rename(columns={
             'Accion': 'Acción',
             'Ventas_Fmt': 'Ventas',
             'Margen_Fmt': 'Margen',
-            'Rotacion_Fmt': 'Rotación'
+            'Rotacion_Fmt': 'Rotación',
+            'Rotacion_Post_Fmt': f'Rot. {VENTANA_DIAS_DEFAULT}d'
         }),
         use_container_width=True,
         height=400,
@@ -2772,7 +2498,7 @@ elif pagina == "🛒 Optimizador Góndola":
         df_export_completo = df_productos[[
             'Accion', 'Codigo', 'Descripcion', 'Proveedor',
             'Ventas', 'Margen_Pct', 'Unidades_Vendidas', 'Unidades_Recibidas',
-            'Rotacion', 'Dias_Sin_Venta', 'Dias_Sin_Recepcion', 'Motivo', 'Frentes_Sugeridos'
+            'Rotacion', 'Rotacion_Post_Recepcion', 'Dias_Sin_Venta', 'Dias_Sin_Recepcion', 'Motivo', 'Frentes_Sugeridos'
         ]].copy()
 
         excel_completo = to_excel(df_export_completo)
@@ -2832,16 +2558,14 @@ elif pagina == "📈 Ventas 360":
     st.markdown('<p class="subtitle">Vista ejecutiva y accionable de ventas, margen y rentabilidad</p>', unsafe_allow_html=True)
     st.markdown("---")
 
-    if df_filtrado is None or df_filtrado.empty:
-        st.warning("⚠️ No hay datos de ventas para analizar")
-        st.stop()
-
     # Filtros locales
     st.markdown("### 🔍 Filtros de Ventas")
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        tiendas_disponibles = sorted(df_filtrado['Tienda'].dropna().unique().tolist())
+        tiendas_disponibles = get_agregado_ventas(
+            'tienda', fecha_desde_str, fecha_hasta_str, tiendas_tuple
+        )['Tienda'].tolist()
         tienda_ventas = st.multiselect(
             "🏪 Tienda(s)",
             options=tiendas_disponibles,
@@ -2851,7 +2575,9 @@ elif pagina == "📈 Ventas 360":
         )
 
     with col2:
-        proveedores_disponibles = sorted(df_filtrado['Proveedor'].dropna().unique().tolist())
+        proveedores_disponibles = get_agregado_ventas(
+            'proveedor', fecha_desde_str, fecha_hasta_str, tiendas_tuple
+        )['Proveedor'].tolist()
         proveedor_ventas = st.multiselect(
             "🏭 Proveedor(es)",
             options=proveedores_disponibles,
@@ -2868,9 +2594,7 @@ elif pagina == "📈 Ventas 360":
         )
         opciones_prod = df_productos_lista.copy()
         if buscar_producto:
-            opciones_prod = opciones_prod[
-                opciones_prod['display'].str.contains(buscar_producto, case=False, na=False)
-            ]
+            opciones_prod = indice_productos.filtrar(opciones_prod, buscar_producto)
         productos_sel = st.multiselect(
             "Producto(s)",
             options=opciones_prod['display'].tolist(),
@@ -2889,8 +2613,9 @@ elif pagina == "📈 Ventas 360":
         )
 
     # Filtro de fechas local (dentro de Ventas 360)
-    fecha_min_ventas = pd.to_datetime(df_filtrado['Fecha']).min().date()
-    fecha_max_ventas = pd.to_datetime(df_filtrado['Fecha']).max().date()
+    resumen_global = get_agregado_ventas('total', fecha_desde_str, fecha_hasta_str, tiendas_tuple).iloc[0]
+    fecha_min_ventas = pd.to_datetime(resumen_global['Primera_Venta']).date()
+    fecha_max_ventas = pd.to_datetime(resumen_global['Ultima_Venta']).date()
 
     col_f1, col_f2 = st.columns(2)
     with col_f1:
@@ -2912,27 +2637,24 @@ elif pagina == "📈 Ventas 360":
             key="fecha_360_hasta"
         )
 
-    df_ventas = df_filtrado.copy()
+    # Filtros de Ventas 360 en el orden de get_agregado_ventas:
+    # (desde, hasta, tiendas, proveedores, codigos); None = sin filtro
+    codigos_sel = [p.split(" - ")[0] for p in productos_sel]
+    fecha_360_desde_str = fecha_360_desde.strftime("%Y-%m-%d")
+    fecha_360_hasta_str = fecha_360_hasta.strftime("%Y-%m-%d")
+    tiendas_360 = tuple(tienda_ventas) if tienda_ventas else tiendas_tuple
+    proveedores_360 = tuple(proveedor_ventas) if proveedor_ventas else None
+    codigos_360 = tuple(codigos_sel) if codigos_sel else None
+    filtros_360 = (fecha_360_desde_str, fecha_360_hasta_str, tiendas_360, proveedores_360, codigos_360)
 
-    if tienda_ventas:
-        df_ventas = df_ventas[df_ventas['Tienda'].isin(tienda_ventas)]
-    if proveedor_ventas:
-        df_ventas = df_ventas[df_ventas['Proveedor'].isin(proveedor_ventas)]
-    if productos_sel:
-        codigos_sel = [p.split(" - ")[0] for p in productos_sel]
-        df_ventas = df_ventas[df_ventas['Codigo'].isin(codigos_sel)]
-    df_ventas = df_ventas[(df_ventas['Fecha'].dt.date >= fecha_360_desde) & (df_ventas['Fecha'].dt.date <= fecha_360_hasta)]
+    resumen_360 = get_agregado_ventas('total', *filtros_360).iloc[0]
 
-    if df_ventas.empty:
+    if resumen_360['Transacciones'] == 0:
         st.warning("⚠️ No hay datos con los filtros seleccionados")
         st.stop()
 
     # KPIs
-    venta_total = df_ventas['Venta_Total'].sum()
-    costo_total = df_ventas['Costo_Total'].sum()
-    margen_total = df_ventas['Margen'].sum()
-    margen_pct = (margen_total / costo_total * 100) if costo_total > 0 else 0
-    unidades = df_ventas['Cantidad'].abs().sum()
+    venta_total, costo_total, margen_total, margen_pct, unidades = ventas360.kpis(resumen_360)
 
     col1, col2, col3, col4, col5 = st.columns(5)
 
@@ -2979,7 +2701,7 @@ elif pagina == "📈 Ventas 360":
 
     st.markdown("---")
 
-    # Tabs principales
+    # Tabs principales: solo se calcula la pestaña abierta
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "📊 Resumen",
         "🚨 Alertas",
@@ -2987,313 +2709,236 @@ elif pagina == "📈 Ventas 360":
         "🏪 Tiendas",
         "🏭 Proveedores",
         "📥 Exportar"
-    ])
+    ], key="tabs_ventas_360", on_change="rerun")
 
     with tab1:
-        st.markdown("### Evolución y distribución")
-
-        df_dia = df_ventas.copy()
-        df_dia['Fecha'] = pd.to_datetime(df_dia['Fecha'])
-        df_dia = df_dia.groupby(df_dia['Fecha'].dt.date, observed=True).agg({
-            'Venta_Total': 'sum',
-            'Margen': 'sum',
-            'Costo_Total': 'sum'
-        }).reset_index()
-        df_dia['Margen_Pct'] = (df_dia['Margen'] / df_dia['Costo_Total'] * 100).replace([pd.NA, pd.NaT], 0).fillna(0)
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            fig_ventas = px.line(
-                df_dia,
-                x='Fecha',
-                y='Venta_Total',
-                title='Ventas diarias',
-                labels={'Venta_Total': 'Ventas $', 'Fecha': ''}
-            )
-            fig_ventas.update_layout(height=350, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig_ventas, use_container_width=True)
-
-        with col2:
-            fig_margen = px.line(
-                df_dia,
-                x='Fecha',
-                y='Margen_Pct',
-                title='Margen % diario',
-                labels={'Margen_Pct': 'Margen %', 'Fecha': ''}
-            )
-            fig_margen.update_layout(height=350, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig_margen, use_container_width=True)
+        if tab1.open:
+            st.markdown("### Evolución y distribución")
 
-        st.markdown("---")
+            df_dia = ventas360.evolucion_diaria(get_agregado_ventas('fecha', *filtros_360))
 
-        col1, col2 = st.columns(2)
+            col1, col2 = st.columns(2)
 
-        with col1:
-            df_tienda = df_ventas.groupby('Tienda', observed=True)['Venta_Total'].sum().reset_index().sort_values('Venta_Total', ascending=False).head(top_n)
-            fig_tienda = px.bar(
-                df_tienda,
-                x='Venta_Total',
-                y='Tienda',
-                orientation='h',
-                title=f'Top {top_n} Tiendas por Ventas',
-                labels={'Venta_Total': 'Ventas $', 'Tienda': ''}
-            )
-            fig_tienda.update_layout(height=450, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig_tienda, use_container_width=True)
+            with col1:
+                fig_ventas = px.line(
+                    df_dia,
+                    x='Fecha',
+                    y='Venta_Total',
+                    title='Ventas diarias',
+                    labels={'Venta_Total': 'Ventas $', 'Fecha': ''}
+                )
+                fig_ventas.update_layout(height=350, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                plotly_chart(fig_ventas, use_container_width=True)
 
-        with col2:
-            df_prov = df_ventas.groupby('Proveedor', observed=True)['Venta_Total'].sum().reset_index().sort_values('Venta_Total', ascending=False).head(top_n)
-            fig_prov = px.bar(
-                df_prov,
-                x='Venta_Total',
-                y='Proveedor',
-                orientation='h',
-                title=f'Top {top_n} Proveedores por Ventas',
-                labels={'Venta_Total': 'Ventas $', 'Proveedor': ''}
-            )
-            fig_prov.update_layout(height=450, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig_prov, use_container_width=True)
+            with col2:
+                fig_margen = px.line(
+                    df_dia,
+                    x='Fecha',
+                    y='Margen_Pct',
+                    title='Margen % diario',
+                    labels={'Margen_Pct': 'Margen %', 'Fecha': ''}
+                )
+                fig_margen.update_layout(height=350, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                plotly_chart(fig_margen, use_container_width=True)
 
-        st.markdown("---")
-        st.markdown("### Comparación mes a mes (YoY)")
+            st.markdown("---")
 
-        df_mes = df_ventas.copy()
-        df_mes['Fecha'] = pd.to_datetime(df_mes['Fecha'])
-        df_mes['Año'] = df_mes['Fecha'].dt.year
-        df_mes['Mes'] = df_mes['Fecha'].dt.month
+            col1, col2 = st.columns(2)
 
-        df_mes = df_mes.groupby(['Año', 'Mes'], observed=True).agg({
-            'Venta_Total': 'sum',
-            'Margen': 'sum',
-            'Costo_Total': 'sum'
-        }).reset_index()
-        df_mes['Margen_Pct'] = (
-            df_mes['Margen'] / df_mes['Costo_Total'].replace(0, pd.NA) * 100
-        ).fillna(0)
-
-        metric_opt = st.selectbox(
-            "Métrica",
-            options=["Ventas $", "Margen $", "Margen %"],
-            key="metric_yoy_ventas_360"
-        )
+            with col1:
+                df_tienda = get_agregado_ventas(
+                    'tienda', *filtros_360, orden='Venta_Total', limite=top_n
+                )[['Tienda', 'Venta_Total']]
+                fig_tienda = px.bar(
+                    df_tienda,
+                    x='Venta_Total',
+                    y='Tienda',
+                    orientation='h',
+                    title=f'Top {top_n} Tiendas por Ventas',
+                    labels={'Venta_Total': 'Ventas $', 'Tienda': ''}
+                )
+                fig_tienda.update_layout(height=450, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                plotly_chart(fig_tienda, use_container_width=True)
 
-        metric_map = {
-            "Ventas $": "Venta_Total",
-            "Margen $": "Margen",
-            "Margen %": "Margen_Pct",
-        }
-        metric_col = metric_map[metric_opt]
+            with col2:
+                df_prov = get_agregado_ventas(
+                    'proveedor', *filtros_360, orden='Venta_Total', limite=top_n
+                )[['Proveedor', 'Venta_Total']]
+                fig_prov = px.bar(
+                    df_prov,
+                    x='Venta_Total',
+                    y='Proveedor',
+                    orientation='h',
+                    title=f'Top {top_n} Proveedores por Ventas',
+                    labels={'Venta_Total': 'Ventas $', 'Proveedor': ''}
+                )
+                fig_prov.update_layout(height=450, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                plotly_chart(fig_prov, use_container_width=True)
 
-        years = sorted(df_mes['Año'].unique().tolist())
-        year_sel = st.selectbox(
-            "Año",
-            options=years,
-            index=len(years) - 1 if years else 0,
-            key="year_yoy_ventas_360"
-        )
+            st.markdown("---")
+            st.markdown("### Comparación mes a mes (YoY)")
 
-        fig_yoy = px.line(
-            df_mes,
-            x='Mes',
-            y=metric_col,
-            color='Año',
-            markers=True,
-            title=f"{metric_opt} por mes (comparación anual)",
-            labels={'Mes': 'Mes', metric_col: metric_opt, 'Año': 'Año'}
-        )
-        fig_yoy.update_layout(height=380, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-        fig_yoy.update_xaxes(tickmode='array', tickvals=list(range(1, 13)))
-        st.plotly_chart(fig_yoy, use_container_width=True)
-
-        if year_sel and (year_sel - 1) in years:
-            df_piv = df_mes[df_mes['Año'].isin([year_sel, year_sel - 1])].pivot_table(
-                index='Mes',
-                columns='Año',
-                values=metric_col,
-                aggfunc='sum'
-            ).reset_index()
-            df_piv['Var_%'] = (
-                (df_piv[year_sel] - df_piv[year_sel - 1]) / df_piv[year_sel - 1].replace(0, pd.NA) * 100
-            ).fillna(0)
+            df_mes = ventas360.margen_sobre_costo(
+                get_agregado_ventas('mes', *filtros_360), ['Año', 'Mes', 'Venta_Total', 'Margen', 'Costo_Total']
+            )
 
-            st.dataframe(
-                df_piv,
-                use_container_width=True,
-                height=300,
-                column_config={
-                    'Mes': st.column_config.NumberColumn(format="%d"),
-                    year_sel: st.column_config.NumberColumn(format="$%.0f" if metric_col != 'Margen_Pct' else "%.1f%%"),
-                    year_sel - 1: st.column_config.NumberColumn(format="$%.0f" if metric_col != 'Margen_Pct' else "%.1f%%"),
-                    'Var_%': st.column_config.NumberColumn(format="%.1f%%"),
-                }
+            metric_opt = st.selectbox(
+                "Métrica",
+                options=["Ventas $", "Margen $", "Margen %"],
+                key="metric_yoy_ventas_360"
             )
 
-            excel_yoy = to_excel(df_piv)
-            st.download_button(
-                label="📥 Exportar comparación YoY",
-                data=excel_yoy,
-                file_name=f"comparacion_yoy_{year_sel}_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
+            metric_map = {
+                "Ventas $": "Venta_Total",
+                "Margen $": "Margen",
+                "Margen %": "Margen_Pct",
+            }
+            metric_col = metric_map[metric_opt]
+
+            years = sorted(df_mes['Año'].unique().tolist())
+            year_sel = st.selectbox(
+                "Año",
+                options=years,
+                index=len(years) - 1 if years else 0,
+                key="year_yoy_ventas_360"
             )
 
-    with tab2:
-        st.markdown("### Pareto de pérdidas (margen negativo)")
+            fig_yoy = px.line(
+                df_mes,
+                x='Mes',
+                y=metric_col,
+                color='Año',
+                markers=True,
+                title=f"{metric_opt} por mes (comparación anual)",
+                labels={'Mes': 'Mes', metric_col: metric_opt, 'Año': 'Año'}
+            )
+            fig_yoy.update_layout(height=380, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+            fig_yoy.update_xaxes(tickmode='array', tickvals=list(range(1, 13)))
+            plotly_chart(fig_yoy, use_container_width=True)
 
-        df_productos = df_ventas.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
-            'Cantidad': lambda x: abs(x).sum(),
-            'Costo': 'mean',
-            'Precio_Venta': 'mean',
-            'Venta_Total': 'sum',
-            'Costo_Total': 'sum',
-            'Margen': 'sum'
-        }).reset_index()
+            if year_sel and (year_sel - 1) in years:
+                df_piv = ventas360.comparacion_interanual(df_mes, metric_col, year_sel)
 
-        df_productos['Margen_Pct'] = (
-            (df_productos['Precio_Venta'] - df_productos['Costo']) /
-            df_productos['Costo'].replace(0, pd.NA) * 100
-        ).fillna(0)
+                st.dataframe(
+                    df_piv,
+                    use_container_width=True,
+                    height=300,
+                    column_config={
+                        'Mes': st.column_config.NumberColumn(format="%d"),
+                        year_sel: st.column_config.NumberColumn(format="$%.0f" if metric_col != 'Margen_Pct' else "%.1f%%"),
+                        year_sel - 1: st.column_config.NumberColumn(format="$%.0f" if metric_col != 'Margen_Pct' else "%.1f%%"),
+                        'Var_%': st.column_config.NumberColumn(format="%.1f%%"),
+                    }
+                )
 
-        df_neg = df_productos[df_productos['Margen_Pct'] < 0].copy()
-        df_neg = df_neg.sort_values('Margen', ascending=True)
+                excel_yoy = to_excel(df_piv)
+                st.download_button(
+                    label="📥 Exportar comparación YoY",
+                    data=excel_yoy,
+                    file_name=f"comparacion_yoy_{year_sel}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
 
-        if df_neg.empty:
-            st.success("✅ No hay productos con margen negativo")
-        else:
-            df_neg['Perdida'] = df_neg['Margen'].abs()
-            df_neg['Perdida_Acum'] = df_neg['Perdida'].cumsum()
-            total_perdida = df_neg['Perdida'].sum()
-            df_neg['Perdida_Acum_Pct'] = (df_neg['Perdida_Acum'] / total_perdida * 100).fillna(0)
-
-            fig_pareto = px.bar(
-                df_neg.head(top_n),
-                x='Descripcion',
-                y='Perdida',
-                title=f'Pareto de pérdidas (Top {top_n})',
-                labels={'Perdida': 'Pérdida $', 'Descripcion': ''}
-            )
-            fig_pareto.update_layout(height=450, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig_pareto, use_container_width=True)
+    with tab2:
+        if tab2.open:
+            st.markdown("### Pareto de pérdidas (margen negativo)")
 
-            df_neg_display = df_neg[[
-                'Codigo', 'Descripcion', 'Proveedor', 'Costo', 'Precio_Venta', 'Margen_Pct', 'Cantidad', 'Margen'
-            ]].head(200).copy()
+            df_neg = ventas360.pareto_perdidas(get_agregado_ventas('producto', *filtros_360))
 
-            df_neg_display.rename(columns={
-                'Costo': 'Costo_Unitario',
-                'Precio_Venta': 'Precio_Unitario',
-                'Cantidad': 'Unidades',
-                'Margen': 'Perdida_Total'
-            }, inplace=True)
+            if df_neg.empty:
+                st.success("✅ No hay productos con margen negativo")
+            else:
+                fig_pareto = px.bar(
+                    df_neg.head(top_n),
+                    x='Descripcion',
+                    y='Perdida',
+                    title=f'Pareto de pérdidas (Top {top_n})',
+                    labels={'Perdida': 'Pérdida $', 'Descripcion': ''}
+                )
+                fig_pareto.update_layout(height=450, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                plotly_chart(fig_pareto, use_container_width=True)
+
+                df_neg_display = df_neg[[
+                    'Codigo', 'Descripcion', 'Proveedor', 'Costo', 'Precio_Venta', 'Margen_Pct', 'Cantidad', 'Margen'
+                ]].head(200).copy()
+
+                df_neg_display.rename(columns={
+                    'Costo': 'Costo_Unitario',
+                    'Precio_Venta': 'Precio_Unitario',
+                    'Cantidad': 'Unidades',
+                    'Margen': 'Perdida_Total'
+                }, inplace=True)
 
-            st.dataframe(
-                df_neg_display,
-                use_container_width=True,
-                height=400
-            )
+                st.dataframe(
+                    df_neg_display,
+                    use_container_width=True,
+                    height=400
+                )
 
-            excel_neg = to_excel(df_neg_display)
-            st.download_button(
-                label="📥 Exportar Margen Negativo",
-                data=excel_neg,
-                file_name=f"margen_negativo_ventas_360_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
+                excel_neg = to_excel(df_neg_display)
+                st.download_button(
+                    label="📥 Exportar Margen Negativo",
+                    data=excel_neg,
+                    file_name=f"margen_negativo_ventas_360_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
 
     with tab3:
-        st.markdown("### Productos")
+        if tab3.open:
+            st.markdown("### Productos")
 
-        df_prod = df_ventas.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
-            'Cantidad': lambda x: abs(x).sum(),
-            'Costo_Total': 'sum',
-            'Costo': 'mean',
-            'Venta_Total': 'sum',
-            'Margen': 'sum'
-        }).reset_index()
+            df_prod = ventas360.ranking_productos(get_agregado_ventas('producto', *filtros_360))
 
-        df_prod['Unidades'] = df_prod['Cantidad']
-        unidades_totales = df_prod['Unidades'].sum()
-        df_prod['Rotacion_Pct'] = (df_prod['Unidades'] / unidades_totales * 100).fillna(0)
-        df_prod['Precio_Unitario'] = (
-            df_prod['Venta_Total'] / df_prod['Unidades'].replace(0, pd.NA)
-        ).fillna(0)
-        df_prod['Margen_Pct'] = (
-            df_prod['Margen'] / df_prod['Costo_Total'].replace(0, pd.NA) * 100
-        ).fillna(0)
-
-        tab_top, tab_margen, tab_bottom, tab_neg, tab_scatter = st.tabs([
-            "🏆 Top Ventas", "📈 Top Margen", "🔻 Bottom Margen", "🚨 Margen Negativo", "🧪 Dispersión"
-        ])
-
-        with tab_top:
-            df_top = df_prod.sort_values('Venta_Total', ascending=False).head(200)
-            st.dataframe(
-                df_top[[
-                    'Codigo', 'Descripcion', 'Proveedor', 'Unidades', 'Rotacion_Pct',
-                    'Costo', 'Precio_Unitario', 'Venta_Total', 'Margen', 'Margen_Pct'
-                ]],
-                use_container_width=True,
-                height=500,
-                column_config={
-                    'Unidades': st.column_config.NumberColumn(format="%.0f"),
-                    'Rotacion_Pct': st.column_config.NumberColumn(format="%.1f%%"),
-                    'Costo': st.column_config.NumberColumn(format="$%.2f"),
-                    'Precio_Unitario': st.column_config.NumberColumn(format="$%.2f"),
-                    'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
-                    'Margen': st.column_config.NumberColumn(format="$%.0f"),
-                    'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
-                }
-            )
+            tab_top, tab_margen, tab_bottom, tab_neg, tab_scatter = st.tabs([
+                "🏆 Top Ventas", "📈 Top Margen", "🔻 Bottom Margen", "🚨 Margen Negativo", "🧪 Dispersión"
+            ])
 
-        with tab_margen:
-            df_top_margen = df_prod.sort_values('Margen_Pct', ascending=False).head(200)
-            st.dataframe(
-                df_top_margen[[
-                    'Codigo', 'Descripcion', 'Proveedor', 'Unidades', 'Rotacion_Pct',
-                    'Costo', 'Precio_Unitario', 'Venta_Total', 'Margen', 'Margen_Pct'
-                ]],
-                use_container_width=True,
-                height=500,
-                column_config={
-                    'Unidades': st.column_config.NumberColumn(format="%.0f"),
-                    'Rotacion_Pct': st.column_config.NumberColumn(format="%.1f%%"),
-                    'Costo': st.column_config.NumberColumn(format="$%.2f"),
-                    'Precio_Unitario': st.column_config.NumberColumn(format="$%.2f"),
-                    'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
-                    'Margen': st.column_config.NumberColumn(format="$%.0f"),
-                    'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
-                }
-            )
+            with tab_top:
+                df_top = df_prod.sort_values('Venta_Total', ascending=False).head(200)
+                st.dataframe(
+                    df_top[[
+                        'Codigo', 'Descripcion', 'Proveedor', 'Unidades', 'Rotacion_Pct',
+                        'Costo', 'Precio_Unitario', 'Venta_Total', 'Margen', 'Margen_Pct'
+                    ]],
+                    use_container_width=True,
+                    height=500,
+                    column_config={
+                        'Unidades': st.column_config.NumberColumn(format="%.0f"),
+                        'Rotacion_Pct': st.column_config.NumberColumn(format="%.1f%%"),
+                        'Costo': st.column_config.NumberColumn(format="$%.2f"),
+                        'Precio_Unitario': st.column_config.NumberColumn(format="$%.2f"),
+                        'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
+                        'Margen': st.column_config.NumberColumn(format="$%.0f"),
+                        'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
+                    }
+                )
 
-        with tab_bottom:
-            df_bottom = df_prod.sort_values('Margen_Pct', ascending=True).head(200)
-            st.dataframe(
-                df_bottom[[
-                    'Codigo', 'Descripcion', 'Proveedor', 'Unidades', 'Rotacion_Pct',
-                    'Costo', 'Precio_Unitario', 'Venta_Total', 'Margen', 'Margen_Pct'
-                ]],
-                use_container_width=True,
-                height=500,
-                column_config={
-                    'Unidades': st.column_config.NumberColumn(format="%.0f"),
-                    'Rotacion_Pct': st.column_config.NumberColumn(format="%.1f%%"),
-                    'Costo': st.column_config.NumberColumn(format="$%.2f"),
-                    'Precio_Unitario': st.column_config.NumberColumn(format="$%.2f"),
-                    'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
-                    'Margen': st.column_config.NumberColumn(format="$%.0f"),
-                    'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
-                }
-            )
+            with tab_margen:
+                df_top_margen = df_prod.sort_values('Margen_Pct', ascending=False).head(200)
+                st.dataframe(
+                    df_top_margen[[
+                        'Codigo', 'Descripcion', 'Proveedor', 'Unidades', 'Rotacion_Pct',
+                        'Costo', 'Precio_Unitario', 'Venta_Total', 'Margen', 'Margen_Pct'
+                    ]],
+                    use_container_width=True,
+                    height=500,
+                    column_config={
+                        'Unidades': st.column_config.NumberColumn(format="%.0f"),
+                        'Rotacion_Pct': st.column_config.NumberColumn(format="%.1f%%"),
+                        'Costo': st.column_config.NumberColumn(format="$%.2f"),
+                        'Precio_Unitario': st.column_config.NumberColumn(format="$%.2f"),
+                        'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
+                        'Margen': st.column_config.NumberColumn(format="$%.0f"),
+                        'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
+                    }
+                )
 
-        with tab_neg:
-            df_neg_prod = df_prod[df_prod['Margen_Pct'] < 0].sort_values('Margen_Pct').head(200)
-            if df_neg_prod.empty:
-                st.success("✅ No hay productos con margen negativo")
-            else:
+            with tab_bottom:
+                df_bottom = df_prod.sort_values('Margen_Pct', ascending=True).head(200)
                 st.dataframe(
-                    df_neg_prod[[
+                    df_bottom[[
                         'Codigo', 'Descripcion', 'Proveedor', 'Unidades', 'Rotacion_Pct',
                         'Costo', 'Precio_Unitario', 'Venta_Total', 'Margen', 'Margen_Pct'
                     ]],
@@ -3310,259 +2955,268 @@ elif pagina == "📈 Ventas 360":
                     }
                 )
 
-        with tab_scatter:
-            st.markdown("#### Precio vs Margen % (tamaño = unidades)")
-            fig_scatter = px.scatter(
-                df_prod,
-                x='Precio_Unitario',
-                y='Margen_Pct',
-                size='Unidades',
-                color='Proveedor',
-                hover_data=['Codigo', 'Descripcion', 'Venta_Total', 'Margen'],
-                title='Dispersión Precio vs Margen %'
-            )
-            fig_scatter.update_layout(height=500, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig_scatter, use_container_width=True)
+            with tab_neg:
+                df_neg_prod = df_prod[df_prod['Margen_Pct'] < 0].sort_values('Margen_Pct').head(200)
+                if df_neg_prod.empty:
+                    st.success("✅ No hay productos con margen negativo")
+                else:
+                    st.dataframe(
+                        df_neg_prod[[
+                            'Codigo', 'Descripcion', 'Proveedor', 'Unidades', 'Rotacion_Pct',
+                            'Costo', 'Precio_Unitario', 'Venta_Total', 'Margen', 'Margen_Pct'
+                        ]],
+                        use_container_width=True,
+                        height=500,
+                        column_config={
+                            'Unidades': st.column_config.NumberColumn(format="%.0f"),
+                            'Rotacion_Pct': st.column_config.NumberColumn(format="%.1f%%"),
+                            'Costo': st.column_config.NumberColumn(format="$%.2f"),
+                            'Precio_Unitario': st.column_config.NumberColumn(format="$%.2f"),
+                            'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
+                            'Margen': st.column_config.NumberColumn(format="$%.0f"),
+                            'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
+                        }
+                    )
 
-        st.markdown("---")
-        st.markdown("### Ventas por tienda de un producto/proveedor")
+            with tab_scatter:
+                st.markdown("#### Precio vs Margen % (tamaño = unidades)")
+                fig_scatter = px.scatter(
+                    df_prod,
+                    x='Precio_Unitario',
+                    y='Margen_Pct',
+                    size='Unidades',
+                    color='Proveedor',
+                    hover_data=['Codigo', 'Descripcion', 'Venta_Total', 'Margen'],
+                    title='Dispersión Precio vs Margen %'
+                )
+                fig_scatter.update_layout(height=500, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                plotly_chart(fig_scatter, use_container_width=True)
 
-        col_f1, col_f2 = st.columns(2)
+            st.markdown("---")
+            st.markdown("### Ventas por tienda de un producto/proveedor")
 
-        with col_f1:
-            proveedor_foco = st.selectbox(
-                "Proveedor",
-                options=["Todos"] + sorted(df_ventas['Proveedor'].dropna().unique().tolist()),
-                key="proveedor_foco_360"
-            )
+            col_f1, col_f2 = st.columns(2)
 
-        df_opciones = df_ventas.copy()
-        if proveedor_foco != "Todos":
-            df_opciones = df_opciones[df_opciones['Proveedor'] == proveedor_foco]
+            with col_f1:
+                proveedor_foco = st.selectbox(
+                    "Proveedor",
+                    options=["Todos"] + sorted(df_prod['Proveedor'].dropna().unique().tolist()),
+                    key="proveedor_foco_360"
+                )
 
-        df_opciones = df_opciones[['Codigo', 'Descripcion']].dropna().drop_duplicates()
-        df_opciones['display'] = df_opciones['Codigo'].astype(str) + " - " + df_opciones['Descripcion'].astype(str)
+            df_opciones = df_prod.copy()
+            if proveedor_foco != "Todos":
+                df_opciones = df_opciones[df_opciones['Proveedor'] == proveedor_foco]
 
-        with col_f2:
-            producto_foco = st.selectbox(
-                "Producto",
-                options=df_opciones['display'].tolist(),
-                key="producto_foco_360"
-            )
+            df_opciones = df_opciones[['Codigo', 'Descripcion']].dropna().drop_duplicates()
+            df_opciones['display'] = df_opciones['Codigo'].astype(str) + " - " + df_opciones['Descripcion'].astype(str)
 
-        if producto_foco:
-            codigo_sel = producto_foco.split(" - ")[0]
-            df_focus = df_ventas[df_ventas['Codigo'].astype(str) == str(codigo_sel)].copy()
-            if proveedor_foco != "Todos":
-                df_focus = df_focus[df_focus['Proveedor'] == proveedor_foco]
-
-            df_focus_tienda = df_focus.groupby('Tienda', observed=True).agg({
-                'Venta_Total': 'sum',
-                'Cantidad': lambda x: abs(x).sum(),
-                'Margen': 'sum'
-            }).reset_index().sort_values('Venta_Total', ascending=False)
-
-            fig_focus = px.bar(
-                df_focus_tienda,
-                x='Venta_Total',
-                y='Tienda',
-                orientation='h',
-                title='Ventas por tienda',
-                labels={'Venta_Total': 'Ventas $', 'Tienda': ''}
-            )
-            fig_focus.update_layout(height=420, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig_focus, use_container_width=True)
+            with col_f2:
+                producto_foco = st.selectbox(
+                    "Producto",
+                    options=df_opciones['display'].tolist(),
+                    key="producto_foco_360"
+                )
 
-            st.dataframe(
-                df_focus_tienda,
-                use_container_width=True,
-                height=350,
-                column_config={
-                    'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
-                    'Cantidad': st.column_config.NumberColumn(format="%.0f"),
-                    'Margen': st.column_config.NumberColumn(format="$%.0f"),
-                }
-            )
+            if producto_foco:
+                codigo_sel = producto_foco.split(" - ")[0]
+                df_focus_tienda = get_agregado_ventas(
+                    'tienda', fecha_360_desde_str, fecha_360_hasta_str, tiendas_360,
+                    (proveedor_foco,) if proveedor_foco != "Todos" else proveedores_360,
+                    (str(codigo_sel),),
+                    orden='Venta_Total'
+                )[['Tienda', 'Venta_Total', 'Cantidad', 'Margen']]
+
+                fig_focus = px.bar(
+                    df_focus_tienda,
+                    x='Venta_Total',
+                    y='Tienda',
+                    orientation='h',
+                    title='Ventas por tienda',
+                    labels={'Venta_Total': 'Ventas $', 'Tienda': ''}
+                )
+                fig_focus.update_layout(height=420, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+                plotly_chart(fig_focus, use_container_width=True)
+
+                st.dataframe(
+                    df_focus_tienda,
+                    use_container_width=True,
+                    height=350,
+                    column_config={
+                        'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
+                        'Cantidad': st.column_config.NumberColumn(format="%.0f"),
+                        'Margen': st.column_config.NumberColumn(format="$%.0f"),
+                    }
+                )
+
+                excel_focus = to_excel(df_focus_tienda)
+                st.download_button(
+                    label="📥 Exportar ventas por tienda",
+                    data=excel_focus,
+                    file_name=f"ventas_tienda_{codigo_sel}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
 
-            excel_focus = to_excel(df_focus_tienda)
+            excel_prod = to_excel(df_prod)
             st.download_button(
-                label="📥 Exportar ventas por tienda",
-                data=excel_focus,
-                file_name=f"ventas_tienda_{codigo_sel}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                label="📥 Exportar Productos (Detalle)",
+                data=excel_prod,
+                file_name=f"ranking_productos_ventas_360_{datetime.now().strftime('%Y%m%d')}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
             )
 
-        excel_prod = to_excel(df_prod)
-        st.download_button(
-            label="📥 Exportar Productos (Detalle)",
-            data=excel_prod,
-            file_name=f"ranking_productos_ventas_360_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
-        )
-
     with tab4:
-        st.markdown("### Tiendas")
-
-        df_tiendas_det = df_ventas.groupby('Tienda', observed=True).agg({
-            'Venta_Total': 'sum',
-            'Costo_Total': 'sum',
-            'Margen': 'sum',
-            'Cantidad': lambda x: abs(x).sum()
-        }).reset_index()
-        df_tiendas_det['Margen_Pct'] = (
-            df_tiendas_det['Margen'] / df_tiendas_det['Costo_Total'].replace(0, pd.NA) * 100
-        ).fillna(0)
-
-        df_tiendas_det = df_tiendas_det.sort_values('Venta_Total', ascending=False)
-
-        st.dataframe(
-            df_tiendas_det,
-            use_container_width=True,
-            height=420,
-            column_config={
-                'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
-                'Costo_Total': st.column_config.NumberColumn(format="$%.0f"),
-                'Margen': st.column_config.NumberColumn(format="$%.0f"),
-                'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
-                'Cantidad': st.column_config.NumberColumn(format="%.0f"),
-            }
-        )
-
-        st.markdown("---")
-        st.markdown("#### Top productos por tienda")
-        tienda_sel = st.selectbox(
-            "Seleccionar tienda",
-            options=df_tiendas_det['Tienda'].tolist(),
-            index=0 if not df_tiendas_det.empty else None,
-            key="tienda_top_productos_360"
-        )
+        if tab4.open:
+            st.markdown("### Tiendas")
 
-        if tienda_sel:
-            df_top_tienda = df_ventas[df_ventas['Tienda'] == tienda_sel].groupby(
-                ['Codigo', 'Descripcion', 'Proveedor'], observed=True
-            ).agg({
-                'Venta_Total': 'sum',
-                'Cantidad': lambda x: abs(x).sum(),
-                'Margen': 'sum'
-            }).reset_index().sort_values('Venta_Total', ascending=False).head(top_n)
+            df_tiendas_det = ventas360.detalle(get_agregado_ventas('tienda', *filtros_360), 'Tienda')
 
             st.dataframe(
-                df_top_tienda,
+                df_tiendas_det,
                 use_container_width=True,
-                height=350,
+                height=420,
                 column_config={
                     'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
-                    'Cantidad': st.column_config.NumberColumn(format="%.0f"),
+                    'Costo_Total': st.column_config.NumberColumn(format="$%.0f"),
                     'Margen': st.column_config.NumberColumn(format="$%.0f"),
+                    'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
+                    'Cantidad': st.column_config.NumberColumn(format="%.0f"),
                 }
             )
 
-            excel_tienda = to_excel(df_top_tienda)
-            st.download_button(
-                label="📥 Exportar Top productos (Tienda)",
-                data=excel_tienda,
-                file_name=f"top_productos_tienda_{tienda_sel}_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
+            st.markdown("---")
+            st.markdown("#### Top productos por tienda")
+            tienda_sel = st.selectbox(
+                "Seleccionar tienda",
+                options=df_tiendas_det['Tienda'].tolist(),
+                index=0 if not df_tiendas_det.empty else None,
+                key="tienda_top_productos_360"
             )
 
-        excel_tiendas = to_excel(df_tiendas_det)
-        st.download_button(
-            label="📥 Exportar detalle por tienda",
-            data=excel_tiendas,
-            file_name=f"detalle_tiendas_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
-        )
-
-    with tab5:
-        st.markdown("### Proveedores")
+            if tienda_sel:
+                df_top_tienda = get_agregado_ventas(
+                    'producto', fecha_360_desde_str, fecha_360_hasta_str, (tienda_sel,),
+                    proveedores_360, codigos_360,
+                    orden='Venta_Total', limite=top_n
+                )[['Codigo', 'Descripcion', 'Proveedor', 'Venta_Total', 'Cantidad', 'Margen']]
 
-        df_prov_det = df_ventas.groupby('Proveedor', observed=True).agg({
-            'Venta_Total': 'sum',
-            'Costo_Total': 'sum',
-            'Margen': 'sum',
-            'Cantidad': lambda x: abs(x).sum()
-        }).reset_index()
-        df_prov_det['Margen_Pct'] = (
-            df_prov_det['Margen'] / df_prov_det['Costo_Total'].replace(0, pd.NA) * 100
-        ).fillna(0)
+                st.dataframe(
+                    df_top_tienda,
+                    use_container_width=True,
+                    height=350,
+                    column_config={
+                        'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
+                        'Cantidad': st.column_config.NumberColumn(format="%.0f"),
+                        'Margen': st.column_config.NumberColumn(format="$%.0f"),
+                    }
+                )
 
-        df_prov_det = df_prov_det.sort_values('Venta_Total', ascending=False)
+                excel_tienda = to_excel(df_top_tienda)
+                st.download_button(
+                    label="📥 Exportar Top productos (Tienda)",
+                    data=excel_tienda,
+                    file_name=f"top_productos_tienda_{tienda_sel}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
 
-        st.dataframe(
-            df_prov_det.head(200),
-            use_container_width=True,
-            height=420,
-            column_config={
-                'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
-                'Costo_Total': st.column_config.NumberColumn(format="$%.0f"),
-                'Margen': st.column_config.NumberColumn(format="$%.0f"),
-                'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
-                'Cantidad': st.column_config.NumberColumn(format="%.0f"),
-            }
-        )
+            excel_tiendas = to_excel(df_tiendas_det)
+            st.download_button(
+                label="📥 Exportar detalle por tienda",
+                data=excel_tiendas,
+                file_name=f"detalle_tiendas_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
 
-        st.markdown("---")
-        st.markdown("#### Top productos por proveedor")
-        proveedor_sel = st.selectbox(
-            "Seleccionar proveedor",
-            options=df_prov_det['Proveedor'].tolist(),
-            index=0 if not df_prov_det.empty else None,
-            key="proveedor_top_productos_360"
-        )
+    with tab5:
+        if tab5.open:
+            st.markdown("### Proveedores")
 
-        if proveedor_sel:
-            df_top_prov = df_ventas[df_ventas['Proveedor'] == proveedor_sel].groupby(
-                ['Codigo', 'Descripcion', 'Tienda'], observed=True
-            ).agg({
-                'Venta_Total': 'sum',
-                'Cantidad': lambda x: abs(x).sum(),
-                'Margen': 'sum'
-            }).reset_index().sort_values('Venta_Total', ascending=False).head(top_n)
+            df_prov_det = ventas360.detalle(get_agregado_ventas('proveedor', *filtros_360), 'Proveedor')
 
             st.dataframe(
-                df_top_prov,
+                df_prov_det.head(200),
                 use_container_width=True,
-                height=350,
+                height=420,
                 column_config={
                     'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
-                    'Cantidad': st.column_config.NumberColumn(format="%.0f"),
+                    'Costo_Total': st.column_config.NumberColumn(format="$%.0f"),
                     'Margen': st.column_config.NumberColumn(format="$%.0f"),
+                    'Margen_Pct': st.column_config.NumberColumn(format="%.1f%%"),
+                    'Cantidad': st.column_config.NumberColumn(format="%.0f"),
                 }
             )
 
-            excel_prov = to_excel(df_top_prov)
+            st.markdown("---")
+            st.markdown("#### Top productos por proveedor")
+            proveedor_sel = st.selectbox(
+                "Seleccionar proveedor",
+                options=df_prov_det['Proveedor'].tolist(),
+                index=0 if not df_prov_det.empty else None,
+                key="proveedor_top_productos_360"
+            )
+
+            if proveedor_sel:
+                df_top_prov = get_agregado_ventas(
+                    'producto_tienda', fecha_360_desde_str, fecha_360_hasta_str, tiendas_360,
+                    (proveedor_sel,), codigos_360,
+                    orden='Venta_Total', limite=top_n
+                )[['Codigo', 'Descripcion', 'Tienda', 'Venta_Total', 'Cantidad', 'Margen']]
+
+                st.dataframe(
+                    df_top_prov,
+                    use_container_width=True,
+                    height=350,
+                    column_config={
+                        'Venta_Total': st.column_config.NumberColumn(format="$%.0f"),
+                        'Cantidad': st.column_config.NumberColumn(format="%.0f"),
+                        'Margen': st.column_config.NumberColumn(format="$%.0f"),
+                    }
+                )
+
+                excel_prov = to_excel(df_top_prov)
+                st.download_button(
+                    label="📥 Exportar Top productos (Proveedor)",
+                    data=excel_prov,
+                    file_name=f"top_productos_proveedor_{proveedor_sel}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+
+            excel_proveedores = to_excel(df_prov_det)
             st.download_button(
-                label="📥 Exportar Top productos (Proveedor)",
-                data=excel_prov,
-                file_name=f"top_productos_proveedor_{proveedor_sel}_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                label="📥 Exportar detalle por proveedor",
+                data=excel_proveedores,
+                file_name=f"detalle_proveedores_{datetime.now().strftime('%Y%m%d')}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
             )
 
-        excel_proveedores = to_excel(df_prov_det)
-        st.download_button(
-            label="📥 Exportar detalle por proveedor",
-            data=excel_proveedores,
-            file_name=f"detalle_proveedores_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
-        )
-
     with tab6:
-        st.markdown("### Exportaciones rápidas")
-
-        excel_ventas = to_excel(df_ventas)
-        st.download_button(
-            label="📥 Exportar Ventas Filtradas",
-            data=excel_ventas,
-            file_name=f"ventas_filtradas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
-        )
+        if tab6.open:
+            st.markdown("### Exportaciones rápidas")
+
+            # La exportación es por movimiento: las filas de venta con los mismos
+            # filtros se leen recién al hacer clic
+            def df_ventas_export():
+                df = get_ventas_filtradas(fecha_360_desde_str, fecha_360_hasta_str, tiendas_360)
+                if proveedor_ventas:
+                    df = df[df['Proveedor'].isin(proveedor_ventas)]
+                if codigos_sel:
+                    df = df[df['Codigo'].isin(codigos_sel)]
+                return df
+
+            excel_ventas = to_excel(df_ventas_export)
+            st.download_button(
+                label="📥 Exportar Ventas Filtradas",
+                data=excel_ventas,
+                file_name=f"ventas_filtradas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
+            )
 
     st.markdown("---")
 
@@ -3580,7 +3234,7 @@ elif pagina == "💰 Simulador Pricing":
     
     with col1:
         # Filtro de Tienda
-        tiendas_disponibles = sorted(df_filtrado['Tienda'].dropna().unique().tolist()) if df_filtrado is not None else []
+        tiendas_disponibles = sorted(df_diario['Tienda'].dropna().unique().tolist()) if df_diario is not None else []
         tienda_pricing = st.multiselect(
             "🏪 Tienda(s)",
             options=tiendas_disponibles,
@@ -3591,7 +3245,7 @@ elif pagina == "💰 Simulador Pricing":
     
     with col2:
         # Filtro de Proveedor
-        proveedores_disponibles = sorted(df_filtrado['Proveedor'].dropna().unique().tolist()) if df_filtrado is not None else []
+        proveedores_disponibles = sorted(df_diario['Proveedor'].dropna().unique().tolist()) if df_diario is not None else []
         proveedor_pricing = st.multiselect(
             "🏭 Proveedor(es)",
             options=proveedores_disponibles,
@@ -3614,13 +3268,13 @@ elif pagina == "💰 Simulador Pricing":
     # CARGAR Y PREPARAR DATOS
     # ========================================================================
     
-    # Usar df_filtrado que ya tiene las ventas
-    if df_filtrado is None or df_filtrado.empty:
+    # Usar el cubo diario que ya tiene las ventas
+    if df_diario is None or df_diario.empty:
         st.warning("⚠️ No hay datos de ventas para analizar")
         st.stop()
     
     # Aplicar filtros
-    df_pricing_base = df_filtrado.copy()
+    df_pricing_base = df_diario.copy(deep=False)
     
     # Filtro de tienda
     if tienda_pricing:
@@ -3632,10 +3286,7 @@ elif pagina == "💰 Simulador Pricing":
     
     # Filtro de búsqueda de producto
     if buscar_producto_pricing:
-        df_pricing_base = df_pricing_base[
-            df_pricing_base['Codigo'].astype(str).str.contains(buscar_producto_pricing, case=False, na=False) |
-            df_pricing_base['Descripcion'].astype(str).str.contains(buscar_producto_pricing, case=False, na=False)
-        ]
+        df_pricing_base = indice_productos.filtrar(df_pricing_base, buscar_producto_pricing)
     
     if df_pricing_base.empty:
         st.warning("⚠️ No hay datos con los filtros seleccionados")
@@ -3651,51 +3302,14 @@ elif pagina == "💰 Simulador Pricing":
         filtros_aplicados.append(f"🔍 '{buscar_producto_pricing}'")
     
     if filtros_aplicados:
-        st.info(f"Filtros activos: {' | '.join(filtros_aplicados)} → **{len(df_pricing_base):,} registros**")
-    
-    # Calcular precio unitario desde el total y la cantidad
-    if 'Precio_Venta' in df_pricing_base.columns and 'Cantidad' in df_pricing_base.columns:
-        cantidad_abs = df_pricing_base['Cantidad'].abs().replace(0, pd.NA)
-        df_pricing_base['Precio_Unitario'] = (df_pricing_base['Precio_Venta'] / cantidad_abs)
-    else:
-        df_pricing_base['Precio_Unitario'] = pd.NA
-
-    # Agrupar por producto para análisis
-    df_productos_precio = df_pricing_base.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
-        'Cantidad': lambda x: abs(x).sum(),
-        'Costo': 'mean',
-        'Precio_Unitario': 'mean',
-        'Venta_Total': 'sum',
-        'Costo_Total': 'sum',
-        'Margen': 'sum'
-    }).reset_index()
+        st.info(f"Filtros activos: {' | '.join(filtros_aplicados)} → **{int(df_pricing_base['Transacciones'].sum()):,} registros**")
     
-    df_productos_precio.columns = [
-        'Codigo', 'Descripcion', 'Proveedor',
-        'Unidades_Vendidas', 'Costo_Promedio', 'Precio_Actual',
-        'Venta_Total', 'Costo_Total', 'Margen_Total'
-    ]
-    
-    # Calcular métricas - Margen sobre COSTO (markup)
-    costo_safe = df_productos_precio['Costo_Promedio'].replace(0, pd.NA)
-    df_productos_precio['Margen_Pct'] = (
-        (df_productos_precio['Precio_Actual'] - df_productos_precio['Costo_Promedio']) / 
-        costo_safe * 100
-    ).fillna(0)
-    
-    df_productos_precio['Margen_Unitario'] = (
-        df_productos_precio['Precio_Actual'] - df_productos_precio['Costo_Promedio']
+    # Agrupar por producto para análisis (Precio_Unitario = promedio por venta
+    # de Precio_Venta / |Cantidad|, reconstruido desde el cubo); ordenado por ventas
+    df_productos_precio = pricing.metricas_precios(
+        agregar_ventas(df_pricing_base, ['Codigo', 'Descripcion', 'Proveedor'])
     )
     
-    # Calcular rotación (participación en ventas)
-    total_unidades = df_productos_precio['Unidades_Vendidas'].sum()
-    df_productos_precio['Rotacion_Pct'] = (
-        df_productos_precio['Unidades_Vendidas'] / total_unidades * 100
-    ).fillna(0)
-    
-    # Ordenar por ventas
-    df_productos_precio = df_productos_precio.sort_values('Venta_Total', ascending=False)
-    
     # ========================================================================
     # SECCIÓN 1: ALERTAS DE MARGEN NEGATIVO 🚨
     # ========================================================================
@@ -3752,7 +3366,7 @@ elif pagina == "💰 Simulador Pricing":
                     'Margen_Total': '${:,.2f}',
                     'Aumento_Necesario': '+{:.1f}%',
                     'Unidades_Vendidas': '{:,.0f}'
-                }).applymap(
+                }).map(
                     lambda x: 'background-color: #fee2e2' if isinstance(x, (int, float)) and x < 0 else '',
                     subset=['Margen_Pct', 'Margen_Total']
                 ),
@@ -3779,10 +3393,9 @@ elif pagina == "💰 Simulador Pricing":
     st.markdown("## 📊 Rentabilidad Actual")
     
     # Métricas globales
-    venta_total_global = df_productos_precio['Venta_Total'].sum()
-    costo_total_global = df_productos_precio['Costo_Total'].sum()
-    margen_total_global = df_productos_precio['Margen_Total'].sum()
-    margen_pct_global = (margen_total_global / costo_total_global * 100) if costo_total_global > 0 else 0
+    venta_total_global, costo_total_global, margen_total_global, margen_pct_global = (
+        pricing.rentabilidad(df_productos_precio)
+    )
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -3840,6 +3453,13 @@ elif pagina == "💰 Simulador Pricing":
             key="margen_objetivo_slider"
         )
         
+        resolver_objetivo = st.checkbox(
+            "🎯 Calcular el aumento exacto para el objetivo",
+            value=False,
+            key="resolver_margen_objetivo",
+            help="Busca la diferencia con la que el nuevo margen llega al objetivo según la estrategia y los productos protegidos"
+        )
+        
         diferencia_margen = margen_objetivo - margen_pct_global
         
         st.markdown(f"""
@@ -3874,12 +3494,7 @@ elif pagina == "💰 Simulador Pricing":
     st.info("Estos productos NO se modificarán porque son de referencia para los clientes")
     
     # Detectar automáticamente productos ancla (top ventas de categorías sensibles)
-    palabras_ancla = ['leche', 'pan ', 'coca', 'pepsi', 'yerba', 'azucar', 'aceite', 'harina', 'arroz', 'fideos']
-    
-    # Sugerir productos ancla
-    df_sugeridos_ancla = df_productos_precio[
-        df_productos_precio['Descripcion'].str.lower().str.contains('|'.join(palabras_ancla), na=False)
-    ].head(20)
+    df_sugeridos_ancla = pricing.sugerir_anclas(df_productos_precio)
     
     # Selector de productos protegidos
     productos_protegidos = st.multiselect(
@@ -3898,95 +3513,31 @@ elif pagina == "💰 Simulador Pricing":
     # ========================================================================
     st.markdown("## 📋 Simulación de Nuevos Precios")
     
-    # Crear copia para simulación
-    df_simulacion = df_productos_precio.copy()
-    
-    # Marcar protegidos
-    df_simulacion['Protegido'] = df_simulacion['Descripcion'].isin(productos_protegidos)
-    
-    # Calcular aumento necesario por producto según estrategia
-    def calcular_aumento(row, estrategia, diferencia_margen):
-        """Calcula el % de aumento para cada producto"""
-        
-        # Evitar división por cero
-        if row['Precio_Actual'] <= 0 or pd.isna(row['Precio_Actual']):
-            return 0
-        
-        if row['Costo_Promedio'] <= 0 or pd.isna(row['Costo_Promedio']):
-            return 0
-        
-        if row['Protegido']:
-            return 0  # No tocar protegidos
-        
-        if row['Margen_Pct'] < 0:
-            # Margen negativo: llevar a 15% mínimo sobre costo
-            precio_minimo = row['Costo_Promedio'] * 1.15
-            if row['Precio_Actual'] > 0:
-                aumento = ((precio_minimo / row['Precio_Actual']) - 1) * 100
-                return max(aumento, 0)
-            else:
-                return 0
-        
-        if "Inteligente" in estrategia:
-            # Más aumento a productos con bajo margen y alta rotación
-            factor_margen = max(0, (30 - row['Margen_Pct']) / 30)  # Más bajo el margen, más aumento
-            factor_rotacion = min(row['Rotacion_Pct'] / 1, 1)  # Alta rotación aguanta más
-            
-            # Calcular aumento base
-            aumento_base = diferencia_margen * 1.5  # Factor para compensar protegidos
-            
-            # Ajustar según factores
-            aumento = aumento_base * (0.5 + factor_margen * 0.5) * (0.8 + factor_rotacion * 0.4)
-            
-            # Limitar: mínimo 0.5%, máximo 10%
-            return max(0.5, min(10, aumento))
-        
-        elif "Uniforme" in estrategia:
-            # Mismo % a todos (ajustado por protegidos)
-            productos_no_protegidos = len(df_simulacion[~df_simulacion['Protegido']])
-            factor_ajuste = len(df_simulacion) / productos_no_protegidos if productos_no_protegidos > 0 else 1
-            return diferencia_margen * factor_ajuste
-        
+    # Diferencia exacta para el objetivo (según estrategia y protegidos)
+    if resolver_objetivo:
+        diferencia_resuelta = resolver_diferencia_margen(
+            df_productos_precio, estrategia, margen_objetivo, productos_protegidos, costo_total_global
+        )
+        if diferencia_resuelta is None:
+            st.warning(f"⚠️ La estrategia elegida no llega a un margen de {margen_objetivo}%: se simula con la diferencia de +{diferencia_margen:.1f}%")
         else:
-            return diferencia_margen
-    
-    # Aplicar cálculo
-    df_simulacion['Aumento_Pct'] = df_simulacion.apply(
-        lambda row: calcular_aumento(row, estrategia, diferencia_margen), 
-        axis=1
-    )
-    
-    # Calcular nuevos precios
-    df_simulacion['Precio_Nuevo'] = df_simulacion['Precio_Actual'] * (1 + df_simulacion['Aumento_Pct'] / 100)
+            diferencia_margen = diferencia_resuelta
+            st.info(f"🎯 Diferencia para llegar a {margen_objetivo}%: +{diferencia_margen:.2f}%")
     
-    # Calcular nuevo margen sobre COSTO
-    costo_sim_safe = df_simulacion['Costo_Promedio'].replace(0, pd.NA)
-    df_simulacion['Margen_Nuevo_Pct'] = (
-        (df_simulacion['Precio_Nuevo'] - df_simulacion['Costo_Promedio']) / 
-        costo_sim_safe * 100
-    ).fillna(0)
-    
-    # Calcular impacto en ganancia
-    df_simulacion['Margen_Nuevo_Total'] = (
-        (df_simulacion['Precio_Nuevo'] - df_simulacion['Costo_Promedio']) * 
-        df_simulacion['Unidades_Vendidas']
+    # Aumento por producto según estrategia (los protegidos no se tocan),
+    # nuevos precios e impacto en ganancia; ordenado por impacto
+    df_simulacion = simular_precios(
+        df_productos_precio, estrategia, diferencia_margen, productos_protegidos
     )
     
-    df_simulacion['Impacto_Ganancia'] = df_simulacion['Margen_Nuevo_Total'] - df_simulacion['Margen_Total']
-    
-    # Ordenar por impacto
-    df_simulacion = df_simulacion.sort_values('Impacto_Ganancia', ascending=False)
-    
     # ========================================================================
     # MOSTRAR RESULTADOS
     # ========================================================================
     
     # Métricas de la simulación
-    margen_nuevo_total = df_simulacion['Margen_Nuevo_Total'].sum()
-    margen_nuevo_pct = (margen_nuevo_total / costo_total_global * 100) if costo_total_global > 0 else 0
-    ganancia_adicional_real = margen_nuevo_total - margen_total_global
-    productos_afectados = len(df_simulacion[df_simulacion['Aumento_Pct'] > 0])
-    aumento_promedio = df_simulacion[df_simulacion['Aumento_Pct'] > 0]['Aumento_Pct'].mean()
+    margen_nuevo_total, margen_nuevo_pct, ganancia_adicional_real, productos_afectados, aumento_promedio = (
+        pricing.resumen_simulacion(df_simulacion, costo_total_global, margen_total_global)
+    )
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -4061,12 +3612,14 @@ elif pagina == "💰 Simulador Pricing":
         )
         
         # Formatear datos para mostrar limpio (precio unitario)
-        df_display['Precio_Actual'] = df_display['Precio_Actual'].apply(format_currency)
-        df_display['Precio_Nuevo'] = df_display['Precio_Nuevo'].apply(format_currency)
-        df_display['Aumento_Pct'] = df_display['Aumento_Pct'].apply(lambda x: f"+{x:.1f}%" if x > 0 else "-")
-        df_display['Margen_Pct'] = df_display['Margen_Pct'].apply(lambda x: f"{x:.1f}%")
-        df_display['Margen_Nuevo_Pct'] = df_display['Margen_Nuevo_Pct'].apply(lambda x: f"{x:.1f}%")
-        df_display['Impacto_Ganancia'] = df_display['Impacto_Ganancia'].apply(lambda x: f"${x:,.0f}")
+        df_display['Precio_Actual'] = formato.moneda(df_display['Precio_Actual'])
+        df_display['Precio_Nuevo'] = formato.moneda(df_display['Precio_Nuevo'])
+        sin_aumento = ~(df_display['Aumento_Pct'] > 0)
+        df_display['Aumento_Pct'] = formato.numero_texto(df_display['Aumento_Pct'], decimales=1, prefijo='+', sufijo='%')
+        df_display.loc[sin_aumento, 'Aumento_Pct'] = "-"
+        df_display['Margen_Pct'] = formato.porcentaje(df_display['Margen_Pct'])
+        df_display['Margen_Nuevo_Pct'] = formato.porcentaje(df_display['Margen_Nuevo_Pct'])
+        df_display['Impacto_Ganancia'] = formato.numero_texto(df_display['Impacto_Ganancia'], sep_miles=',', prefijo='$')
         
         st.dataframe(
             df_display[[
@@ -4110,7 +3663,7 @@ elif pagina == "💰 Simulador Pricing":
                 plot_bgcolor='rgba(0,0,0,0)',
                 paper_bgcolor='rgba(0,0,0,0)'
             )
-            st.plotly_chart(fig_dist, use_container_width=True)
+            plotly_chart(fig_dist, use_container_width=True)
         
         with col2:
             # Gráfico de margen antes vs después
@@ -4137,7 +3690,7 @@ elif pagina == "💰 Simulador Pricing":
                 paper_bgcolor='rgba(0,0,0,0)',
                 showlegend=False
             )
-            st.plotly_chart(fig_comp, use_container_width=True)
+            plotly_chart(fig_comp, use_container_width=True)
         
         # Gráfico de impacto por rango de margen
         st.markdown("#### Impacto por Rango de Margen Actual")
@@ -4169,7 +3722,7 @@ elif pagina == "💰 Simulador Pricing":
             plot_bgcolor='rgba(0,0,0,0)',
             paper_bgcolor='rgba(0,0,0,0)'
         )
-        st.plotly_chart(fig_rango, use_container_width=True)
+        plotly_chart(fig_rango, use_container_width=True)
     
     with tab3:
         st.markdown("### Análisis por Proveedor")
@@ -4301,7 +3854,7 @@ elif pagina == "📋 Reportes Personalizados":
     with col1:
         tipo_reporte = st.radio(
             "Fuente de datos",
-            options=["Solo Ventas", "Todos los Movimientos"],
+            options=reportes.TIPOS_REPORTE,
             help="Solo Ventas = df_filtrado | Todos = Ventas + Recepciones + Transferencias + Ajustes",
             key="tipo_reporte"
         )
@@ -4332,41 +3885,8 @@ elif pagina == "📋 Reportes Personalizados":
     # ========================================================================
     st.markdown("### 2️⃣ Selecciona las Columnas")
 
-    # Columnas base (comunes)
-    columnas_base = {
-        'Fecha': 'Fecha',
-        'Tienda': 'Tienda',
-        'Codigo': 'Código',
-        'Descripcion': 'Descripción',
-        'Proveedor': 'Proveedor',
-        'Cantidad': 'Cantidad'
-    }
-    
-    # Columnas adicionales según tipo
-    if tipo_reporte == "Solo Ventas":
-        columnas_disponibles = {
-            **columnas_base,
-            'Venta_Total': 'Ventas $',
-            'Costo_Total': 'Costo $',
-            'Margen': 'Margen $',
-            'Margen_Pct': 'Margen %',
-            'Precio_Venta': 'Precio Venta Unit.'
-        }
-        columnas_default = ['Fecha', 'Tienda', 'Codigo', 'Descripcion', 'Venta_Total', 'Margen']
-    else:
-        columnas_disponibles = {
-            **columnas_base,
-            'Tipo_Movimiento': 'Tipo de Movimiento',
-            'Tienda_Origen': 'Tienda Origen',
-            'Tienda_Destino': 'Tienda Destino',
-            'Venta_Total': 'Ventas $',
-            'Costo_Total': 'Costo $',
-            'Costo': 'Costo Unitario',
-            'Margen': 'Margen $',
-            'Numero_Documento': 'Nro. Documento',
-            'Precio_Venta': 'Precio Venta Unit.'
-        }
-        columnas_default = ['Fecha', 'Tipo_Movimiento', 'Tienda', 'Codigo', 'Descripcion', 'Cantidad']
+    # Columnas disponibles ({columna: nombre amigable}) y por defecto según tipo
+    columnas_disponibles, columnas_default = reportes.columnas_reporte(tipo_reporte)
 
     columnas_seleccionadas = st.multiselect(
         "Columnas a incluir en el reporte",
@@ -4429,7 +3949,7 @@ elif pagina == "📋 Reportes Personalizados":
         col1, col2 = st.columns(2)
         
         # Columnas que NO se pueden agrupar (son métricas)
-        columnas_metricas = ['Cantidad', 'Venta_Total', 'Costo_Total', 'Margen', 'Margen_Pct', 'Precio_Venta', 'Costo']
+        columnas_metricas = reportes.COLUMNAS_METRICAS
         
         with col1:
             columnas_agrupar = st.multiselect(
@@ -4462,62 +3982,30 @@ elif pagina == "📋 Reportes Personalizados":
             # PASO 1: SELECCIONAR FUENTE DE DATOS
             # ================================================================
             if tipo_reporte == "Solo Ventas":
-                df_reporte = df_filtrado.copy()
+                df_reporte = df_filtrado.copy(deep=False)
             else:
                 # Filtrar por tipos de movimiento seleccionados
-                df_reporte = df_todos_filtrado[df_todos_filtrado['Tipo_Movimiento'].isin(tipos_seleccionados)].copy()
+                df_reporte = df_todos_filtrado[df_todos_filtrado['Tipo_Movimiento'].isin(tipos_seleccionados)]
             
             # ================================================================
-            # PASO 2: APLICAR FILTROS
+            # PASO 2-4: FILTROS, AGRUPACIÓN Y COLUMNAS FINALES
             # ================================================================
-            
-            # Filtro de proveedores
-            if len(proveedores_reporte) > 0:
-                df_reporte = df_reporte[df_reporte['Proveedor'].isin(proveedores_reporte)]
-            
-            # Filtro de tiendas
-            if len(tiendas_reporte) > 0:
-                df_reporte = df_reporte[df_reporte['Tienda'].isin(tiendas_reporte)]
-            
-            # Filtro de búsqueda
-            if busqueda_reporte:
-                busqueda_lower = busqueda_reporte.lower()
-                mask = (
-                    df_reporte['Codigo'].astype(str).str.lower().str.contains(busqueda_lower, na=False) |
-                    df_reporte['Descripcion'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-                )
-                df_reporte = df_reporte[mask]
-            
-            if df_reporte.empty:
+            df_reporte_final = construir_reporte(
+                df_reporte,
+                columnas_seleccionadas,
+                columnas_disponibles,
+                proveedores=proveedores_reporte,
+                tiendas=tiendas_reporte,
+                busqueda=busqueda_reporte,
+                indice=indice_productos,
+                agrupar_por=columnas_agrupar if agrupar_datos else None,
+                sumar=columnas_sumar if agrupar_datos else None
+            )
+
+            if len(df_reporte_final) == 0:
                 st.warning("⚠️ No hay datos que cumplan con los filtros seleccionados")
                 st.stop()
             
-            # ================================================================
-            # PASO 3: AGRUPACIÓN (SI ESTÁ ACTIVADA)
-            # ================================================================
-            if agrupar_datos and len(columnas_agrupar) > 0 and len(columnas_sumar) > 0:
-                # Crear diccionario de agregación
-                agg_dict = {}
-                for col in columnas_sumar:
-                    if col in df_reporte.columns:
-                        agg_dict[col] = 'sum'
-                
-                if agg_dict:
-                    df_reporte = df_reporte.groupby(columnas_agrupar, observed=True).agg(agg_dict).reset_index()
-                    
-                    # Recalcular Margen % si está seleccionado
-                    if 'Margen_Pct' in columnas_seleccionadas and 'Venta_Total' in df_reporte.columns and 'Margen' in df_reporte.columns:
-                        df_reporte['Margen_Pct'] = (df_reporte['Margen'] / df_reporte['Venta_Total'] * 100).fillna(0)
-
-            # ================================================================
-            # PASO 4: SELECCIONAR COLUMNAS FINALES
-            # ================================================================
-            columnas_finales = [c for c in columnas_seleccionadas if c in df_reporte.columns]
-            df_reporte_final = df_reporte[columnas_finales].copy()
-            
-            # Renombrar columnas a nombres amigables
-            df_reporte_final.columns = [columnas_disponibles.get(c, c) for c in df_reporte_final.columns]
-            
             # ================================================================
             # MOSTRAR RESULTADOS
             # ================================================================
@@ -4613,11 +4101,13 @@ elif pagina == "📋 Reportes Personalizados":
                         plot_bgcolor='rgba(0,0,0,0)',
                         paper_bgcolor='rgba(0,0,0,0)'
                     )
-                    st.plotly_chart(fig, use_container_width=True)
+                    plotly_chart(fig, use_container_width=True)
 
 st.markdown(f"""
 <div style='text-align:center; color:#64748b; padding:2rem 0; font-size:0.9rem;'>
-    YUNTA Intelligence v2.3 - {datetime.now().strftime('%d/%m/%Y %H:%M')} | {len(df_filtrado):,} registros de ventas cargados
+    YUNTA Intelligence v2.3 - {datetime.now().strftime('%d/%m/%Y %H:%M')} | {registros_ventas:,} registros de ventas cargados
 </div>
 """, unsafe_allow_html=True)
-st.write("ESTO ES UNA PRUEBA - SI VES ESTO EN LA APP, LOS CAMBIOS LLEGARON - 2026")
\ No newline at end of file
+st.write("ESTO ES UNA PRUEBA - SI VES ESTO EN LA APP, LOS CAMBIOS LLEGARON - 2026")
+
+perfil.terminar_corrida()
\ No newline at end of file
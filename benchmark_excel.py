@@ -0,0 +1,84 @@
+import subprocess
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from yunta.exportar import escribir_excel
+
+# Uso: python benchmark_excel.py [filas ...]
+# Compara tiempo y pico de memoria (tracemalloc) de la exportación anterior
+# con pd.ExcelWriter(openpyxl) contra el escritor en streaming.
+
+
+def to_excel_anterior(df):
+    """to_excel de Appgeneralv2 antes del escritor en streaming"""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        max_rows = 1048576
+        total_rows = len(df)
+        if total_rows <= max_rows:
+            df.to_excel(writer, index=False, sheet_name='Reporte')
+        else:
+            chunks = (total_rows // max_rows) + 1
+            for i in range(chunks):
+                start = i * max_rows
+                end = min((i + 1) * max_rows, total_rows)
+                df.iloc[start:end].to_excel(writer, index=False, sheet_name=f"Reporte_{i+1}")
+    output.seek(0)
+    return output
+
+
+def datos_reporte(filas, semilla=0):
+    """DataFrame con la forma de un export de Reportes Personalizados"""
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'Fecha': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, filas), unit='D'),
+        'Tienda': rng.choice(['Centro', 'Norte', 'Sur', 'Oeste'], filas),
+        'Codigo': rng.integers(1000, 9999, filas).astype(str),
+        'Descripcion': rng.choice([f"Producto {i}" for i in range(500)], filas),
+        'Proveedor': rng.choice([f"Proveedor {i}" for i in range(40)], filas),
+        'Cantidad': rng.integers(1, 20, filas).astype(float),
+        'Venta_Total': rng.uniform(100, 50_000, filas).round(2),
+        'Margen': rng.uniform(-1_000, 10_000, filas).round(2),
+    })
+
+
+def medir(funcion, df):
+    """(segundos, pico de memoria, bytes del archivo); tracemalloc en una corrida aparte porque la frena"""
+    inicio = time.perf_counter()
+    salida = funcion(df)
+    segundos = time.perf_counter() - inicio
+    tamano = len(salida.getbuffer())
+    del salida
+
+    tracemalloc.start()
+    funcion(df)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico, tamano
+
+
+METODOS = {"anterior": to_excel_anterior, "streaming": escribir_excel}
+
+if len(sys.argv) == 4 and sys.argv[1] == "--medir":
+    # Una sola medición en un proceso limpio (lo que deja un método no afecta al otro)
+    segundos, pico, tamano = medir(METODOS[sys.argv[2]], datos_reporte(int(sys.argv[3])))
+    print(segundos, pico, tamano)
+    sys.exit(0)
+
+tamanos = [int(n) for n in sys.argv[1:]] or [10_000, 100_000, 300_000]
+
+print(f"{'Filas':>10} | {'Método':<10} | {'Tiempo':>8} | {'Pico memoria':>12} | {'Archivo':>9}")
+print("-" * 62)
+for filas in tamanos:
+    for nombre in METODOS:
+        salida = subprocess.run(
+            [sys.executable, __file__, "--medir", nombre, str(filas)],
+            capture_output=True, text=True, check=True
+        ).stdout.split()
+        segundos, pico, tamano = float(salida[0]), int(salida[1]), int(salida[2])
+        print(f"{filas:>10,} | {nombre:<10} | {segundos:>7.1f}s | {pico / 1024**2:>9.0f} MB | {tamano / 1024**2:>6.1f} MB")
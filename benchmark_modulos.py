@@ -0,0 +1,471 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import resource
+except ImportError:  # Windows: se mide con tracemalloc (solo memoria de Python)
+    resource = None
+
+# Uso: python benchmark_modulos.py [--filas N] [--escalas 1 10 100] [--tiendas N]
+#                                  [--skus N] [--modulos nombre ...] [--datos carpeta]
+#
+# Genera parquets sintéticos con el esquema real (movimientos para
+# Appgeneralv2 y el consolidado de pedidos para seguimiento) a filas × escala
+# y corre cada módulo sin navegador con AppTest de Streamlit o con las
+# funciones de yunta. Cada medición va en un proceso aparte: el tiempo de la
+# primera corrida del módulo (caches frías), el de un rerun (caches llenas) y
+# el pico de memoria residente (todo el proceso y lo que sumó el módulo).
+# El consolidado de pedidos tiene filas / 20 filas.
+
+BASE_DIR = Path(__file__).resolve().parent
+APP = BASE_DIR / "Appgeneralv2.py"
+SEGUIMIENTO = BASE_DIR / "pages" / "seguimiento.py"
+PARQUET_MOVIMIENTOS = "MOVIMIENTOS_STOCK_PowerBI.parquet"
+PARQUET_CONSOLIDADO = "CONSOLIDADO_COMPLETO.parquet"
+
+FECHA_FIN = pd.Timestamp("2025-12-31")
+FILAS_POR_LOTE = 1_000_000
+TIMEOUT_APPTEST = 3600
+
+# ============================================================================
+# DATOS SINTÉTICOS
+# ============================================================================
+_PRODUCTOS = ["ACEITE", "AZÚCAR", "YERBA", "FIDEOS", "ARROZ", "GALLETITAS", "MAYONESA", "CAFÉ",
+              "LECHE", "JABÓN", "DETERGENTE", "PANQUEQUERA ELÉCTRICA", "LICUADORA", "PAVA", "TÉ"]
+_MARCAS = ["NATURA", "LEDESMA", "TARAGÜÍ", "MATARAZZO", "GALLO", "ATMA", "LA SERENÍSIMA",
+           "DOVE", "ALA", "PHILIPS", "LIDHERMA", "CBSÉ"]
+_UNIDADES = ["G", "KG", "ML", "L", "UN", "W"]
+
+TIPOS_MOVIMIENTO = ["Venta", "Recepción", "Transferencia_Entrada", "Transferencia_Salida"]
+_PROB_TIPOS = [0.85, 0.08, 0.035, 0.035]
+
+
+def _catalogo(skus, rng):
+    """Codigos, descripciones, proveedor, costo, markup y popularidad por SKU"""
+    n_prov = max(5, skus // 50)
+    descripciones = [
+        f"{rng.choice(_PRODUCTOS)} {rng.choice(_MARCAS)} {rng.integers(1, 2000)}{rng.choice(_UNIDADES)}"
+        for _ in range(skus)
+    ]
+    popularidad = rng.pareto(1.2, skus) + 1
+    return {
+        'codigo': np.array([str(7790000000000 + i) for i in range(skus)], dtype=object),
+        'descripcion': np.array(descripciones, dtype=object),
+        'proveedor': np.array([f"PROVEEDOR {i:03d} S.A." for i in range(n_prov)], dtype=object)[
+            rng.integers(0, n_prov, skus)
+        ],
+        'costo': rng.lognormal(6, 1, skus).round(2),
+        # Algunos productos venden por debajo del costo (alertas de Pricing)
+        'markup': rng.uniform(0.9, 1.7, skus),
+        'probabilidad': popularidad / popularidad.sum(),
+    }
+
+
+def generar_movimientos(ruta, filas, tiendas=10, skus=2000, dias=730, semilla=0):
+    """Parquet de movimientos (ventas, recepciones y transferencias) escrito por lotes"""
+    rng = np.random.default_rng(semilla)
+    cat = _catalogo(skus, rng)
+    nombres_tiendas = np.array([f"SUCURSAL {i:02d}" for i in range(tiendas)], dtype=object)
+    writer = None
+    escritas = 0
+    try:
+        while escritas < filas:
+            n = min(FILAS_POR_LOTE, filas - escritas)
+            sku = rng.choice(skus, n, p=cat['probabilidad'])
+            tipo = rng.choice(len(TIPOS_MOVIMIENTO), n, p=_PROB_TIPOS)
+            tienda = rng.integers(0, tiendas, n)
+            segundos = rng.integers(0, dias * 86_400, n)
+            fecha = (FECHA_FIN - pd.Timedelta(days=dias)).to_datetime64() + segundos.astype('timedelta64[s]')
+
+            cantidad = rng.integers(1, 12, n).astype(float)
+            sale = (tipo == 0) | (tipo == 3)
+            cantidad[sale] *= -1
+            costo = (cat['costo'][sku] * rng.uniform(0.95, 1.05, n)).round(2)
+            precio_venta = np.where(
+                tipo == 0,
+                (np.abs(cantidad) * costo * cat['markup'][sku] * rng.uniform(0.97, 1.03, n)).round(2),
+                np.nan
+            )
+            es_transferencia = tipo >= 2
+            origen = np.where(es_transferencia, nombres_tiendas[rng.integers(0, tiendas, n)],
+                              np.where(tipo == 1, "CENTRO DE DISTRIBUCIÓN", None))
+            destino = np.where(tipo >= 1, nombres_tiendas[tienda], None)
+            documento = np.char.add("DOC-", (escritas + np.arange(n)).astype(str)).astype(object)
+
+            tabla = pa.table({
+                'Fecha': pa.array(fecha.astype('datetime64[us]')),
+                'Tienda': pa.array(nombres_tiendas[tienda]),
+                'Codigo': pa.array(cat['codigo'][sku]),
+                'Descripcion': pa.array(cat['descripcion'][sku]),
+                'Proveedor': pa.array(cat['proveedor'][sku]),
+                'Tipo_Movimiento': pa.array(np.array(TIPOS_MOVIMIENTO, dtype=object)[tipo]),
+                'Cantidad': pa.array(cantidad),
+                'Costo': pa.array(costo),
+                'Precio_Venta': pa.array(precio_venta, from_pandas=True),
+                'Tienda_Origen': pa.array(origen, type=pa.string()),
+                'Tienda_Destino': pa.array(destino, type=pa.string()),
+                'Numero_Documento': pa.array(documento),
+            })
+            if writer is None:
+                writer = pq.ParquetWriter(ruta, tabla.schema, compression='zstd')
+            writer.write_table(tabla)
+            escritas += n
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+_ESTADOS_SOLICITUD = ["PENDIENTE RECEPCIÓN", "RECEPCIONADO COMPLETO", "SIN PEDIDO", "RECEPCIONADO PARCIAL"]
+_ESTADOS_TRANSFERENCIA = ["PENDIENTE RECEPCIÓN", "TRANSFERIDO COMPLETO", "PENDIENTE TRANSFERENCIA",
+                          "TRANSFERIDO PARCIAL"]
+
+
+def generar_consolidado(ruta, filas, tiendas=10, skus=2000, semilla=0):
+    """Parquet de seguimiento de pedidos con las columnas de CONSOLIDADO_COMPLETO"""
+    rng = np.random.default_rng(semilla + 1)
+    cat = _catalogo(skus, rng)
+    sku = rng.choice(skus, filas, p=cat['probabilidad'])
+    n_pedidos = max(1, filas // 100)
+    pedido = rng.integers(0, n_pedidos, filas)
+
+    def fechas(dias_despues, nulos):
+        base = (FECHA_FIN - pd.Timedelta(days=365)).to_datetime64()
+        dias_pedido = (pedido * 365 // n_pedidos).astype('timedelta64[D]')
+        valores = base + dias_pedido + dias_despues.astype('timedelta64[m]')
+        return pd.Series(np.where(rng.random(filas) < nulos, np.datetime64('NaT'), valores),
+                         dtype='datetime64[ns]')
+
+    solicitada = rng.integers(1, 50, filas).astype(float)
+    reasignada = np.floor(solicitada * rng.uniform(0, 1, filas))
+    transferida = np.floor(reasignada * rng.uniform(0.5, 1, filas))
+    precio = cat['costo'][sku] * 1.3
+    precio_real = np.where(transferida > 0, precio * rng.uniform(0.9, 1.1, filas), 0).round(2)
+    estado_sol = rng.choice(len(_ESTADOS_SOLICITUD), filas, p=[0.55, 0.38, 0.05, 0.02])
+    estado_tr = np.where(estado_sol == 0, 0, rng.choice([1, 2, 3], filas, p=[0.65, 0.3, 0.05]))
+    dias_transferencia = rng.integers(0, 20, filas).astype(float)
+
+    df = pd.DataFrame({
+        'SKU': cat['codigo'][sku],
+        'Tienda': np.array([f"SUCURSAL {i:02d}" for i in range(tiendas)], dtype=object)[
+            rng.integers(0, tiendas, filas)
+        ],
+        'ID_Pedido': np.char.add("PED", (pedido + 100000).astype(str)).astype(object),
+        'Proveedor': cat['proveedor'][sku],
+        'Descripcion': cat['descripcion'][sku],
+        'Fecha_Pedido': fechas(np.zeros(filas), 0.07),
+        'Fecha_Recepcion': fechas(rng.integers(1, 20, filas) * 1440, 0.55),
+        'Fecha_Recepcion_Proveedor': fechas(rng.integers(1, 20, filas) * 1440, 0.55),
+        'Fecha_Primera_Transferencia': fechas(dias_transferencia * 1440 + rng.integers(0, 1440, filas), 0.65),
+        'Fecha_Ultima_Transferencia': fechas(dias_transferencia * 1440 + rng.integers(1440, 4320, filas), 0.65),
+        'Cantidad_Solicitada': solicitada,
+        'Cantidad_Reasignada': reasignada,
+        'Cantidad_Recibida_Total_Centro': reasignada,
+        'Cantidad_Transferida_Entrada': transferida,
+        'Numero_Transferencias': rng.integers(0, 4, filas).astype(float),
+        'Precio_Unitario': precio.round(2),
+        'Precio_Real': precio_real,
+        'Costo_Unitario_Transferencia': precio_real,
+        'Porcentaje_Cumplimiento_Transferencia': np.where(reasignada > 0, transferida / np.maximum(reasignada, 1), 0),
+        'Porcentaje_Reasignacion': reasignada / solicitada,
+    })
+    df['Suma de Porcentaje_Reasignacion'] = df['Porcentaje_Reasignacion']
+    df['Diferencia_Precio_Unitario'] = df['Precio_Real'] - df['Precio_Unitario']
+    df['Diferencia_Reasignado_Transferido'] = df['Cantidad_Transferida_Entrada'] - df['Cantidad_Reasignada']
+    df['Precio_Total_Solicitado'] = df['Cantidad_Solicitada'] * df['Precio_Unitario']
+    df['Precio_Total_Reasignado'] = df['Cantidad_Reasignada'] * df['Precio_Unitario']
+    df['Precio_Total_Transferido'] = df['Cantidad_Transferida_Entrada'] * df['Precio_Real']
+    df['Diferencia_Precio_Total'] = df['Precio_Total_Transferido'] - df['Precio_Total_Reasignado']
+    df['Diferencia_Solicitud_Reasignacion'] = df['Cantidad_Reasignada'] - df['Cantidad_Solicitada']
+    df['Dias_Hasta_Primera_Transferencia'] = dias_transferencia
+    for columna in ['Diferencia_Precio_Total', 'Diferencia_Precio_Unitario', 'Diferencia_Reasignado_Transferido',
+                    'Diferencia_Solicitud_Reasignacion', 'Precio_Total_Solicitado', 'Precio_Total_Reasignado',
+                    'Precio_Total_Transferido', 'Dias_Hasta_Primera_Transferencia']:
+        df[f'Suma de {columna}'] = df[columna]
+    df['Estado_Solicitud'] = np.array(_ESTADOS_SOLICITUD, dtype=object)[estado_sol]
+    df['Estado_Transferencia'] = np.array(_ESTADOS_TRANSFERENCIA, dtype=object)[estado_tr]
+    df.to_parquet(ruta, index=False, compression='zstd')
+
+
+def preparar_datos(carpeta, filas, tiendas, skus, semilla=0):
+    """Genera los parquets de una escala si todavía no existen (se reusan entre corridas)"""
+    carpeta = Path(carpeta) / f"f{filas}_t{tiendas}_s{skus}_r{semilla}"
+    carpeta.mkdir(parents=True, exist_ok=True)
+    movimientos = carpeta / PARQUET_MOVIMIENTOS
+    consolidado = carpeta / PARQUET_CONSOLIDADO
+    if not movimientos.exists():
+        temporal = movimientos.with_suffix('.tmp')
+        generar_movimientos(temporal, filas, tiendas, skus, semilla=semilla)
+        os.replace(temporal, movimientos)
+    if not consolidado.exists():
+        temporal = consolidado.with_suffix('.tmp')
+        generar_consolidado(temporal, max(1_000, filas // 20), tiendas, skus, semilla=semilla)
+        os.replace(temporal, consolidado)
+    return carpeta
+
+
+# ============================================================================
+# MÓDULOS
+# ============================================================================
+# Cada módulo recibe la carpeta de datos y devuelve dos funciones: la primera
+# corrida y el rerun. Los de AppTest arrancan la app antes de medir (conexión,
+# cubo y metadatos quedan en el módulo "Arranque").
+
+def _app_logueada():
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(str(APP), default_timeout=TIMEOUT_APPTEST)
+    at.session_state['logged_in'] = True
+    at.session_state['user_data'] = {
+        "usuario": "benchmark", "nombre": "Benchmark", "tiendas": ["TODAS"], "pantallas": ["TODAS"]
+    }
+    return at
+
+
+def _pagina(nombre, preparar=None):
+    """Módulo que navega a una página de Appgeneralv2 (preparar fija sus widgets)"""
+    def modulo(carpeta):
+        at = _app_logueada()
+        at.run()
+
+        def correr():
+            # Los botones valen un solo run: el rerun vuelve a preparar
+            if preparar is not None:
+                preparar(at)
+            return at.run()
+
+        def primera():
+            at.sidebar.radio[0].set_value(nombre)
+            if preparar is not None:
+                at.run()
+            return correr()
+
+        return primera, correr
+    return modulo
+
+
+def _arranque(carpeta):
+    at = _app_logueada()
+    return at.run, at.run
+
+
+def _ventas_360(carpeta):
+    at = _app_logueada()
+    at.run()
+    pestanas = ["📊 Resumen", "🚨 Alertas", "🧾 Productos", "🏪 Tiendas", "🏭 Proveedores", "📥 Exportar"]
+
+    def todas():
+        for pestana in pestanas:
+            at.session_state['tabs_ventas_360'] = pestana
+            at.run()
+        return at
+
+    return todas, todas
+
+
+def _presupuestos(at):
+    at.button[[b.label for b in at.button].index("🚀 GENERAR PRESUPUESTO")].click()
+
+
+def _gondola(at):
+    selector = at.selectbox(key="proveedor_gondola")
+    selector.set_value(selector.options[2])
+
+
+def _reportes(at):
+    at.checkbox(key="agrupar_datos").check()
+    at.run()
+    at.button[[b.label for b in at.button].index("🚀 Generar Reporte")].click()
+
+
+def _exportar_excel(carpeta):
+    """Reportes: .xlsx de las filas de venta de los últimos 180 días (lo que exporta el botón)"""
+    import duckdb
+    from yunta.exportar import escribir_excel
+
+    def exportar():
+        con = duckdb.connect()
+        reader = con.execute(f"""
+            SELECT CAST(Fecha AS TIMESTAMP) AS Fecha, Tienda, Codigo, Descripcion, Proveedor,
+                   Cantidad, Precio_Venta AS Venta_Total, Precio_Venta - Cantidad * Costo AS Margen
+            FROM read_parquet('{(Path(carpeta) / PARQUET_MOVIMIENTOS).as_posix()}')
+            WHERE Tipo_Movimiento = 'Venta'
+              AND Fecha >= TIMESTAMP '{FECHA_FIN - pd.Timedelta(days=180)}'
+        """).fetch_record_batch()
+        return escribir_excel(reader)
+
+    return exportar, exportar
+
+
+def _seguimiento(carpeta):
+    from streamlit.testing.v1 import AppTest
+    os.environ["YUNTA_CONSOLIDADO"] = str(Path(carpeta) / PARQUET_CONSOLIDADO)
+    at = AppTest.from_file(str(SEGUIMIENTO), default_timeout=TIMEOUT_APPTEST)
+    at.session_state['logged_in'] = True
+    return at.run, at.run
+
+
+MODULOS = {
+    "Arranque": _arranque,
+    "Ventas 360": _ventas_360,
+    "Presupuestos": _pagina("💰 Presupuestos", _presupuestos),
+    "Góndola": _pagina("🛒 Optimizador Góndola", _gondola),
+    "Pricing": _pagina("💰 Simulador Pricing"),
+    "Reportes": _pagina("📋 Reportes Personalizados", _reportes),
+    "Exportar Excel": _exportar_excel,
+    "Seguimiento": _seguimiento,
+}
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+def _proc_status(campo):
+    """Valor en bytes de un campo de /proc/self/status (Linux), o None"""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith(campo + ":"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def memoria_actual():
+    """Memoria residente actual del proceso en bytes (None fuera de Linux)"""
+    return _proc_status("VmRSS")
+
+
+def reiniciar_pico():
+    """Pone el pico de memoria residente en el valor actual (Linux)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def pico_memoria():
+    """
+    Pico de memoria residente en bytes. En Linux VmHWM (se reinicia con
+    reiniciar_pico); si no, ru_maxrss, que hereda el pico del proceso padre.
+    """
+    pico = _proc_status("VmHWM")
+    if pico is not None or resource is None:
+        return pico
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def _errores(resultado):
+    excepciones = getattr(resultado, 'exception', None)
+    return [e.message for e in excepciones] if excepciones else []
+
+
+def medir(nombre, carpeta):
+    """Mide un módulo en este proceso y devuelve el resultado como dict"""
+    os.environ["YUNTA_DATOS_DIR"] = str(carpeta)
+    os.environ["YUNTA_PERFIL_ARCHIVO"] = ""
+    os.environ.pop("YUNTA_CACHE_DIR", None)
+
+    primera, rerun = MODULOS[nombre](carpeta)
+    reiniciar_pico()
+    inicial = memoria_actual() or pico_memoria()
+    if inicial is None:
+        tracemalloc.start()
+
+    inicio = time.perf_counter()
+    resultado = primera()
+    segundos = time.perf_counter() - inicio
+    errores = _errores(resultado)
+
+    inicio = time.perf_counter()
+    rerun()
+    segundos_rerun = time.perf_counter() - inicio
+
+    if inicial is None:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pico_total, pico_modulo = None, pico
+    else:
+        pico_total = pico_memoria()
+        pico_modulo = max(0, pico_total - inicial)
+    return {
+        'segundos': segundos,
+        'rerun': segundos_rerun,
+        'pico_total': pico_total,
+        'pico_modulo': pico_modulo,
+        'error': errores[0] if errores else None,
+    }
+
+
+def _opciones(argumentos):
+    opciones = {'filas': 50_000, 'escalas': [1, 10, 100], 'tiendas': 10, 'skus': 2_000,
+                'modulos': list(MODULOS), 'datos': Path(tempfile.gettempdir()) / "yunta_benchmark"}
+    clave = None
+    for arg in argumentos:
+        if arg.startswith("--"):
+            clave = arg[2:]
+            if clave in ('escalas', 'modulos'):
+                opciones[clave] = []
+        elif clave in ('escalas', 'modulos'):
+            opciones[clave].append(int(arg) if clave == 'escalas' else arg)
+        elif clave == 'datos':
+            opciones[clave] = Path(arg)
+        elif clave is not None:
+            opciones[clave] = int(arg)
+    return opciones
+
+
+def _mb(valor):
+    return "-" if valor is None else f"{valor / 1024**2:,.0f}"
+
+
+if len(sys.argv) == 4 and sys.argv[1] == "--medir":
+    # Una sola medición en un proceso limpio
+    sys.path.insert(0, str(BASE_DIR))
+    print(json.dumps(medir(sys.argv[2], sys.argv[3])))
+    sys.exit(0)
+
+opciones = _opciones(sys.argv[1:])
+desconocidos = [m for m in opciones['modulos'] if m not in MODULOS]
+if desconocidos:
+    print(f"❌ Módulos desconocidos: {', '.join(desconocidos)} (disponibles: {', '.join(MODULOS)})")
+    sys.exit(1)
+
+print(f"Datos sintéticos en {opciones['datos']}")
+carpetas = {}
+for escala in opciones['escalas']:
+    filas = opciones['filas'] * escala
+    inicio = time.perf_counter()
+    carpetas[escala] = preparar_datos(opciones['datos'], filas, opciones['tiendas'], opciones['skus'])
+    print(f"  {escala:>4}x: {filas:>12,} movimientos ({time.perf_counter() - inicio:.1f}s)")
+
+print()
+print(f"{'Módulo':<16} | {'Escala':>6} | {'Filas':>12} | {'Primera':>8} | {'Rerun':>8} | "
+      f"{'Pico MB':>8} | {'+MB':>7} | Error")
+print("-" * 96)
+for nombre in opciones['modulos']:
+    for escala in opciones['escalas']:
+        salida = subprocess.run(
+            [sys.executable, __file__, "--medir", nombre, str(carpetas[escala])],
+            capture_output=True, text=True, cwd=BASE_DIR
+        )
+        filas = opciones['filas'] * escala
+        if salida.returncode != 0:
+            ultima = (salida.stderr.strip().splitlines() or ["sin salida"])[-1]
+            print(f"{nombre:<16} | {escala:>5}x | {filas:>12,} | {'-':>8} | {'-':>8} | {'-':>8} | {'-':>7} | {ultima}")
+            continue
+        r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{nombre:<16} | {escala:>5}x | {filas:>12,} | {r['segundos']:>7.2f}s | {r['rerun']:>7.2f}s | "
+              f"{_mb(r['pico_total']):>8} | {_mb(r['pico_modulo']):>7} | {r['error'] or ''}")
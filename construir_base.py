@@ -0,0 +1,27 @@
+import sys
+import time
+from pathlib import Path
+
+from yunta.base import ARCHIVO_BASE, construir_base
+from yunta.ingesta import DIRECTORIO_DELTAS, archivos_delta, ingerir_deltas, rango_archivo
+
+# Uso: python construir_base.py [ruta_parquet] [ruta_base] [--forzar]
+BASE_DIR = Path(__file__).resolve().parent
+argumentos = [a for a in sys.argv[1:] if a != "--forzar"]
+ruta_parquet = Path(argumentos[0]) if len(argumentos) > 0 else BASE_DIR / "MOVIMIENTOS_STOCK_PowerBI.parquet"
+ruta_base = Path(argumentos[1]) if len(argumentos) > 1 else BASE_DIR / ARCHIVO_BASE
+
+print(f"Parquet: {ruta_parquet}")
+print(f"Base:    {ruta_base}")
+
+inicio = time.perf_counter()
+if construir_base(ruta_parquet, ruta_base, forzar="--forzar" in sys.argv):
+    print(f"✅ Base construida en {time.perf_counter() - inicio:.1f}s")
+    # Los deltas posteriores al parquet se vuelven a aplicar sobre la base nueva
+    nuevas = ingerir_deltas(
+        ruta_base, archivos_delta(BASE_DIR / DIRECTORIO_DELTAS), rango_archivo(ruta_parquet)[1]
+    )
+    if nuevas:
+        print(f"✅ {len(nuevas)} deltas aplicados ({nuevas[0][1]} a {nuevas[-1][2]})")
+else:
+    print("✅ La base ya estaba al día, no hizo falta reconstruir")
@@ -1,23 +1,22 @@
-import pandas as pd
+import sys
+import time
+from pathlib import Path
 
-# Cargar el archivo grande
-print("Cargando archivo...")
-df = pd.read_parquet(r"C:\Users\German\DASHBOARDYUNTA\YUNTA DASHBOARD INTELIGENTE\MOVIMIENTOS_STOCK_PowerBI.parquet")
+from yunta.particiones import DIRECTORIO_PARTICIONES, MANIFIESTO, particionar_parquet
 
-print(f"Total filas: {len(df):,}")
-print(f"Columnas: {list(df.columns)}")
+# Uso: python dividir_parquet.py [ruta_parquet] [directorio_destino]
+# Parte el parquet grande por anio/mes/Tienda (leyéndolo por lotes) en vez de
+# cortarlo en 3 partes iguales: una consulta de 30 días solo lee 1 o 2 meses.
+BASE_DIR = Path(__file__).resolve().parent
+ruta_parquet = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR / "MOVIMIENTOS_STOCK_PowerBI.parquet"
+destino = Path(sys.argv[2]) if len(sys.argv) > 2 else BASE_DIR / DIRECTORIO_PARTICIONES
 
-# Partir en 3 archivos
-n_partes = 3
-filas_por_parte = len(df) // n_partes
+print(f"Parquet: {ruta_parquet}")
+print(f"Destino: {destino}")
 
-for i in range(n_partes):
-    inicio = i * filas_por_parte
-    fin = (i + 1) * filas_por_parte if i < n_partes - 1 else len(df)
-    
-    df_parte = df.iloc[inicio:fin]
-    nombre = f"MOVIMIENTOS_PARTE_{i+1}.parquet"
-    df_parte.to_parquet(nombre, index=False)
-    print(f"✅ {nombre}: {len(df_parte):,} filas guardadas")
+inicio = time.perf_counter()
+archivos = particionar_parquet(ruta_parquet, destino)
+meses = {Path(a).parts[:2] for a in archivos}
 
-print("\n🎉 Listo! Ahora subí los 3 archivos a Google Drive")
\ No newline at end of file
+print(f"✅ {len(archivos):,} archivos en {len(meses):,} meses ({time.perf_counter() - inicio:.1f}s)")
+print(f"\n🎉 Listo! Ahora subí la carpeta {destino.name} (con {MANIFIESTO}) a GitHub")
@@ -0,0 +1,31 @@
+import sys
+import time
+from pathlib import Path
+
+from yunta.base import ARCHIVO_BASE, base_actual, base_vigente
+from yunta.ingesta import DIRECTORIO_DELTAS, archivos_delta, ingerir_deltas, rango_archivo
+
+# Uso: python ingerir_deltas.py [carpeta_deltas] [ruta_parquet] [ruta_base]
+# Agrega los días nuevos (parquets chicos en MOVIMIENTOS_DELTAS/) a la base
+# persistente y recalcula el cubo solo para esos días.
+BASE_DIR = Path(__file__).resolve().parent
+carpeta = Path(sys.argv[1]) if len(sys.argv) > 1 else BASE_DIR / DIRECTORIO_DELTAS
+ruta_parquet = Path(sys.argv[2]) if len(sys.argv) > 2 else BASE_DIR / "MOVIMIENTOS_STOCK_PowerBI.parquet"
+ruta_base = Path(sys.argv[3]) if len(sys.argv) > 3 else BASE_DIR / ARCHIVO_BASE
+
+if not base_vigente(ruta_base, ruta_parquet):
+    print("❌ La base no existe o no corresponde al parquet: corré primero python construir_base.py")
+    sys.exit(1)
+
+archivos = archivos_delta(carpeta)
+print(f"Deltas:  {carpeta} ({len(archivos)} archivos)")
+print(f"Base:    {base_actual(ruta_base)}")
+
+inicio = time.perf_counter()
+nuevas = ingerir_deltas(ruta_base, archivos, rango_archivo(ruta_parquet)[1])
+for id_ingesta, desde, hasta in nuevas:
+    print(f"✅ Ingesta {id_ingesta[:12]}: {desde} a {hasta}")
+if nuevas:
+    print(f"\n🎉 {len(nuevas)} deltas ingeridos en {time.perf_counter() - inicio:.1f}s")
+else:
+    print("✅ No había deltas nuevos")
@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
+import os
 from datetime import datetime, date
-from io import BytesIO
 from pathlib import Path
-import requests
+
+from yunta import formato
+from yunta.busqueda import IndiceProductos
+from yunta.descarga import DIRECTORIO_DESCARGAS, descargar, url_google_drive
+from yunta.exportar import excel_diferido
+from yunta.seguimiento import TIPOS_FECHA, catalogo_consolidado, conectar_consolidado, kpis_consolidado, leer_pedidos
 
 # ============================================================================
 # VERIFICAR LOGIN
@@ -29,105 +33,102 @@ st.set_page_config(
 # ============================================================================
 # FUNCIONES DE FORMATO
 # ============================================================================
-def format_number(value):
-    """Formato argentino para números: 1.234"""
-    if pd.isna(value) or value == 0:
-        return "0"
-    if value == int(value):
-        return f"{int(value):,}".replace(",", ".")
-    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
 def format_currency(value):
     """Formato moneda argentina: $ 1.234,56"""
     if pd.isna(value):
         return "$ 0,00"
     try:
         value = float(value)
-        entero = int(abs(value))
-        decimal = int((abs(value) - entero) * 100)
+        # Redondeado al centavo: las sumas de DuckDB pueden quedar en ,2799999
+        entero, decimal = divmod(round(abs(value) * 100), 100)
         entero_fmt = f"{entero:,}".replace(",", ".")
         sign = "-" if value < 0 else ""
         return f"{sign}$ {entero_fmt},{decimal:02d}"
     except:
         return "$ 0,00"
 
-def clean_currency_to_float(value):
-    """Limpia valores monetarios para cálculos numéricos"""
-    if pd.isna(value):
-        return 0.0
-    try:
-        str_val = str(value).strip()
-        str_val = str_val.replace('$', '').replace(' ', '').replace('.', '').replace(',', '.')
-        return float(str_val)
-    except:
-        return 0.0
-
 def to_excel(df):
-    """Genera archivo Excel descargable"""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Pedidos')
-    output.seek(0)
-    return output
+    """
+    Función que arma el .xlsx (streaming, openpyxl write_only) recién cuando
+    se hace clic en st.download_button; df puede ser también una función que
+    devuelve el DataFrame
+    """
+    return excel_diferido(df, hoja='Pedidos')
 
 # ============================================================================
-# CARGAR DATOS DESDE GOOGLE DRIVE
+# CONSOLIDADO LOCAL O DESCARGADO DE GOOGLE DRIVE
 # ============================================================================
+# Se busca primero el parquet en la carpeta de datos (YUNTA_DATOS_DIR, o la
+# ruta completa en YUNTA_CONSOLIDADO); si no está, se usa la copia de Drive
+# en el cache de descargas (yunta.descarga), que solo vuelve a bajar el
+# archivo si cambió. En los dos casos los filtros y la búsqueda se resuelven
+# en DuckDB sobre la vista consolidado del archivo en disco: solo se leen
+# las líneas que cumplen y los KPIs se suman en SQL.
 CONSOLIDADO_ID = "1UPEGAtLPslu9nmcZjJc3UjmyWWKtiS9A"
+DATOS_DIR = Path(os.environ.get("YUNTA_DATOS_DIR", Path(__file__).resolve().parent.parent))
+RUTA_CONSOLIDADO = Path(os.environ.get("YUNTA_CONSOLIDADO", DATOS_DIR / "CONSOLIDADO_COMPLETO.parquet"))
 
-@st.cache_data(ttl=3600)
-def cargar_parquet_desde_drive(file_id):
-    """Descarga un archivo parquet desde Google Drive"""
-    url = f"https://drive.google.com/uc?export=download&id={file_id}"
-    session = requests.Session()
-    response = session.get(url, stream=True)
-    
-    for key, value in response.cookies.items():
-        if key.startswith('download_warning'):
-            url = f"https://drive.google.com/uc?export=download&confirm={value}&id={file_id}"
-            response = session.get(url, stream=True)
-            break
-    
-    content = BytesIO(response.content)
-    df = pd.read_parquet(content)
-    return df
-
-@st.cache_data(ttl=3600)
-def load_data():
-    """Carga datos desde local o Google Drive"""
-    ruta_local = Path(r"C:\Users\German\DASHBOARDYUNTA\YUNTA DASHBOARD INTELIGENTE\CONSOLIDADO_COMPLETO.parquet")
-    
+# Columnas del consolidado que lee la página: las de la tabla y los KPIs
+# (leer_pedidos agrega las de filtros y fechas); el resto no se lee
+COLUMNAS_PAGINA = [
+    'ID_Pedido', 'Tienda', 'SKU', 'Descripcion', 'Proveedor',
+    'Fecha_Pedido', 'Fecha_Recepcion_Proveedor', 'Fecha_Primera_Transferencia',
+    'Cantidad_Solicitada', 'Cantidad_Reasignada', 'Cantidad_Transferida_Entrada',
+    'Precio_Unitario', 'Costo_Unitario_Transferencia',
+    'Precio_Total_Solicitado', 'Precio_Total_Transferido', 'Diferencia_Precio_Total',
+    'DIF. EN UNIDADES', 'Dif. Unidades Valorizada', 'Dif. Precios (solo líneas dif.)',
+]
+
+@st.cache_data(ttl=3600, show_spinner="📥 Verificando el consolidado...")
+def ruta_consolidado():
+    """Parquet local del consolidado: RUTA_CONSOLIDADO o la copia de Drive"""
+    if RUTA_CONSOLIDADO.exists():
+        return RUTA_CONSOLIDADO
+    return descargar(url_google_drive(CONSOLIDADO_ID), DATOS_DIR / DIRECTORIO_DESCARGAS)
+
+def version_consolidado():
+    """
+    (ruta, fecha de modificación) del consolidado, o None si no se pudo
+    obtener. Invalida los caches cuando cambia el archivo.
+    """
     try:
-        if ruta_local.exists():
-            # LOCAL: cargar desde archivo
-            df = pd.read_parquet(ruta_local)
-        else:
-            # NUBE: descargar de Google Drive
-            df = cargar_parquet_desde_drive(CONSOLIDADO_ID)
-        
-        # Procesar fechas
-        date_cols = ['Fecha_Pedido', 'Fecha_Recepcion', 'Fecha_Recepcion_Proveedor',
-                     'Fecha_Primera_Transferencia', 'Fecha_Ultima_Transferencia']
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        
-        # Procesar numéricos
-        numeric_cols = ['Cantidad_Solicitada', 'Cantidad_Transferida_Entrada', 'Cantidad_Reasignada',
-                        'Precio_Unitario', 'Precio_Real', 'Costo_Unitario_Transferencia',
-                        'Precio_Total_Solicitado', 'Precio_Total_Transferido', 'Diferencia_Precio_Total']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        if 'Diferencia_Precio_Total' in df.columns:
-            if df['Diferencia_Precio_Total'].dtype == 'object':
-                df['Diferencia_Precio_Total'] = df['Diferencia_Precio_Total'].apply(clean_currency_to_float)
-        
-        return df
+        ruta = ruta_consolidado()
+        if not ruta.exists():
+            ruta_consolidado.clear()
+            ruta = ruta_consolidado()
+        return str(ruta), ruta.stat().st_mtime
     except Exception as e:
         st.error(f"Error al cargar datos: {e}")
-        return pd.DataFrame()
+        return None
+
+@st.cache_resource(max_entries=1)
+def get_con_consolidado(version):
+    """Conexión DuckDB con la vista consolidado, una por proceso para todas las sesiones"""
+    return conectar_consolidado(version[0])
+
+@st.cache_data(ttl=3600, max_entries=1)
+def get_catalogo(version):
+    """Valores de los filtros (fechas, proveedores, pedidos, tiendas, estados, SKUs)"""
+    return catalogo_consolidado(get_con_consolidado(version))
+
+# Una entrada por combinación de filtros: max_entries acota la memoria cuando
+# muchas sesiones prueban filtros distintos dentro de la hora del ttl
+@st.cache_data(ttl=3600, max_entries=32)
+def leer_filtrado(version, tipo_fecha, fecha_desde, fecha_hasta, proveedores, ids, tiendas, estados, skus):
+    """Líneas del consolidado que cumplen los filtros y la búsqueda (skus)"""
+    return leer_pedidos(get_con_consolidado(version), tipo_fecha, fecha_desde, fecha_hasta,
+                        proveedores, ids, tiendas, estados, skus, columnas=COLUMNAS_PAGINA)
+
+@st.cache_data(ttl=3600, max_entries=256)
+def get_kpis(version, tipo_fecha, fecha_desde, fecha_hasta, proveedores, ids, tiendas, estados, skus):
+    """KPIs de las líneas que cumplen los filtros, sumados en DuckDB"""
+    return kpis_consolidado(get_con_consolidado(version), tipo_fecha, fecha_desde, fecha_hasta,
+                            proveedores, ids, tiendas, estados, skus)
+
+@st.cache_resource(ttl=3600, max_entries=1)
+def get_indice_skus(version):
+    """Índice de búsqueda sobre los (SKU, Descripcion) distintos de los pedidos"""
+    return IndiceProductos.desde_dataframe(get_catalogo(version)['productos'], codigo='SKU')
 
 # ============================================================================
 # ESTILOS CSS - Light / Dark (MAGENTA THEME)
@@ -323,8 +324,13 @@ else:
 # ============================================================================
 # CARGAR DATOS
 # ============================================================================
-df = load_data()
-if df.empty:
+version = version_consolidado()
+try:
+    catalogo = None if version is None else get_catalogo(version)
+except Exception as e:
+    st.error(f"Error al cargar datos: {e}")
+    catalogo = None
+if catalogo is None:
     st.error("❌ No se pudo cargar el archivo parquet")
     st.stop()
 
@@ -347,21 +353,13 @@ st.sidebar.markdown("---")
 st.sidebar.markdown("### 📅 Rango de Fechas")
 tipo_fecha = st.sidebar.radio(
     "Filtrar por:",
-    options=["Cualquier Fecha", "Fecha Pedido", "Fecha Recepción", "Fecha Transferencia"],
+    options=TIPOS_FECHA,
     index=0
 )
 
-if 'Fecha_Pedido' in df.columns:
-    fechas_todas = []
-    for col in ['Fecha_Pedido', 'Fecha_Recepcion', 'Fecha_Recepcion_Proveedor', 'Fecha_Primera_Transferencia']:
-        if col in df.columns:
-            fechas_todas.extend(df[col].dropna().tolist())
-    if fechas_todas:
-        fecha_min = min(fechas_todas).date()
-        fecha_max = max(fechas_todas).date()
-    else:
-        fecha_min = date(2025, 1, 1)
-        fecha_max = date.today()
+if catalogo['fecha_min'] is not None:
+    fecha_min = catalogo['fecha_min'].date()
+    fecha_max = catalogo['fecha_max'].date()
 else:
     fecha_min = date(2025, 1, 1)
     fecha_max = date.today()
@@ -374,25 +372,25 @@ with col2:
 
 # Proveedor
 st.sidebar.markdown("### 🏢 Proveedor")
-proveedores = sorted(df['Proveedor'].dropna().unique())
+proveedores = catalogo['proveedores']
 proveedores_sel = st.sidebar.multiselect("Seleccionar Proveedores", options=proveedores, default=[])
 
 # ID Pedido
 ids_sel = []
 if proveedores_sel:
     st.sidebar.markdown("### 📋 ID Pedido")
-    df_prov = df[df['Proveedor'].isin(proveedores_sel)]
-    ids_disponibles = sorted(df_prov['ID_Pedido'].dropna().unique())
+    pedidos = catalogo['pedidos']
+    ids_disponibles = sorted(pedidos.loc[pedidos['Proveedor'].isin(proveedores_sel), 'ID_Pedido'].dropna().unique())
     ids_sel = st.sidebar.multiselect("Seleccionar IDs", options=ids_disponibles, default=ids_disponibles)
 
 # Tiendas
 st.sidebar.markdown("### 🏪 Tiendas")
-tiendas = sorted(df['Tienda'].dropna().unique())
+tiendas = catalogo['tiendas']
 tiendas_sel = st.sidebar.multiselect("Seleccionar Tiendas", options=tiendas, default=[])
 
 # Estado
 st.sidebar.markdown("### 📊 Estado Solicitud")
-estados_sol = sorted(df['Estado_Solicitud'].dropna().unique())
+estados_sol = catalogo['estados']
 estados_sol_sel = st.sidebar.multiselect("Seleccionar Estados", options=estados_sol, default=[])
 
 # Búsqueda
@@ -402,36 +400,10 @@ busqueda = st.sidebar.text_input("SKU o Descripción", "")
 # ============================================================================
 # APLICAR FILTROS
 # ============================================================================
-df_f = df.copy()
-
-if 'Fecha_Pedido' in df_f.columns:
-    if tipo_fecha == "Fecha Pedido":
-        df_f = df_f[(df_f['Fecha_Pedido'].dt.date >= fecha_desde) & (df_f['Fecha_Pedido'].dt.date <= fecha_hasta)]
-    elif tipo_fecha == "Fecha Recepción":
-        df_f = df_f[(df_f['Fecha_Recepcion_Proveedor'].dt.date >= fecha_desde) & (df_f['Fecha_Recepcion_Proveedor'].dt.date <= fecha_hasta)]
-    elif tipo_fecha == "Fecha Transferencia":
-        df_f = df_f[(df_f['Fecha_Primera_Transferencia'].dt.date >= fecha_desde) & (df_f['Fecha_Primera_Transferencia'].dt.date <= fecha_hasta)]
-    else:
-        mask_fecha = (
-            ((df_f['Fecha_Pedido'].notna()) & (df_f['Fecha_Pedido'].dt.date >= fecha_desde) & (df_f['Fecha_Pedido'].dt.date <= fecha_hasta)) |
-            ((df_f['Fecha_Recepcion'].notna()) & (df_f['Fecha_Recepcion'].dt.date >= fecha_desde) & (df_f['Fecha_Recepcion'].dt.date <= fecha_hasta)) |
-            ((df_f['Fecha_Recepcion_Proveedor'].notna()) & (df_f['Fecha_Recepcion_Proveedor'].dt.date >= fecha_desde) & (df_f['Fecha_Recepcion_Proveedor'].dt.date <= fecha_hasta)) |
-            ((df_f['Fecha_Primera_Transferencia'].notna()) & (df_f['Fecha_Primera_Transferencia'].dt.date >= fecha_desde) & (df_f['Fecha_Primera_Transferencia'].dt.date <= fecha_hasta))
-        )
-        df_f = df_f[mask_fecha]
-
-if proveedores_sel:
-    df_f = df_f[df_f['Proveedor'].isin(proveedores_sel)]
-if ids_sel:
-    df_f = df_f[df_f['ID_Pedido'].isin(ids_sel)]
-if tiendas_sel:
-    df_f = df_f[df_f['Tienda'].isin(tiendas_sel)]
-if estados_sol_sel:
-    df_f = df_f[df_f['Estado_Solicitud'].isin(estados_sol_sel)]
-if busqueda:
-    mask = (df_f['SKU'].astype(str).str.contains(busqueda, case=False, na=False) |
-            df_f['Descripcion'].astype(str).str.contains(busqueda, case=False, na=False))
-    df_f = df_f[mask]
+# La búsqueda se resuelve en el índice a los SKUs que coinciden y se filtra en SQL
+skus = tuple(get_indice_skus(version).buscar(busqueda)) if busqueda else None
+filtros = (version, tipo_fecha, fecha_desde, fecha_hasta, proveedores_sel, ids_sel, tiendas_sel, estados_sol_sel, skus)
+df_f = leer_filtrado(*filtros)
 
 # ============================================================================
 # TÍTULO PRINCIPAL
@@ -446,56 +418,30 @@ st.markdown(
 
 st.markdown("---")
 
-# ============================================================================
-# RECÁLCULO DE MÉTRICAS
-# ============================================================================
-df_f['Fecha_Recepcion_Proveedor'] = pd.to_datetime(df_f['Fecha_Recepcion_Proveedor'], errors='coerce')
-df_f['Fecha_Pedido'] = pd.to_datetime(df_f['Fecha_Pedido'], errors='coerce')
-df_f['Fecha_Primera_Transferencia'] = pd.to_datetime(df_f['Fecha_Primera_Transferencia'], errors='coerce')
-df_f['Base_Fecha_Calculo'] = df_f['Fecha_Recepcion_Proveedor'].combine_first(df_f['Fecha_Pedido'])
-df_f['Dias_Hasta_Primera_Transferencia'] = df_f.apply(
-    lambda row: 0 if pd.isna(row['Fecha_Primera_Transferencia']) or pd.isna(row['Base_Fecha_Calculo'])
-                else max(0, (row['Fecha_Primera_Transferencia'] - row['Base_Fecha_Calculo']).days),
-    axis=1
-)
-df_f['Porcentaje_Cumplimiento_Transferencia'] = np.where(
-    (df_f['Cantidad_Reasignada'] > 0) & (df_f['Cantidad_Transferida_Entrada'].notna()),
-    (df_f['Cantidad_Transferida_Entrada'] / df_f['Cantidad_Reasignada'] * 100).round(2),
-    0
-)
-
 # ============================================================================
 # KPIs
 # ============================================================================
 st.markdown("### 📊 KPIs Principales")
 
-if 'Cantidad_Reasignada' in df_f.columns and 'Cantidad_Transferida_Entrada' in df_f.columns:
-    df_f['Dif_Unidades'] = df_f['Cantidad_Reasignada'].fillna(0) - df_f['Cantidad_Transferida_Entrada'].fillna(0)
-else:
-    df_f['Dif_Unidades'] = 0
-
-if 'Costo_Unitario_Transferencia' in df_f.columns:
-    df_f['Dif_Unidades_Valorizada'] = df_f['Dif_Unidades'] * df_f['Costo_Unitario_Transferencia'].fillna(0)
-else:
-    df_f['Dif_Unidades_Valorizada'] = 0
+kpis = get_kpis(*filtros)
 
 col1, col2, col3 = st.columns(3)
 
-total_transferido = (df_f['Cantidad_Transferida_Entrada'].fillna(0) * df_f['Costo_Unitario_Transferencia'].fillna(0)).sum()
+total_transferido = kpis['total_transferido']
 col1.markdown(
     f'<div class="card"><div class="metric-label">TOTAL TRANSFERIDO</div>'
     f'<div class="metric-value">{format_currency(total_transferido)}</div></div>',
     unsafe_allow_html=True
 )
 
-total_pedido = (df_f['Cantidad_Reasignada'].fillna(0) * df_f['Precio_Unitario'].fillna(0)).sum()
+total_pedido = kpis['total_pedido']
 col2.markdown(
     f'<div class="card"><div class="metric-label">TOTAL PEDIDO</div>'
     f'<div class="metric-value">{format_currency(total_pedido)}</div></div>',
     unsafe_allow_html=True
 )
 
-cumplimiento_promedio = df_f['Porcentaje_Cumplimiento_Transferencia'].mean()
+cumplimiento_promedio = kpis['cumplimiento_promedio']
 col3.markdown(
     f'<div class="card"><div class="metric-label">% DE CUMPLIMIENTO</div>'
     f'<div class="metric-value">{cumplimiento_promedio:.1f}%</div></div>',
@@ -504,7 +450,7 @@ col3.markdown(
 
 col4, col5, col6 = st.columns(3)
 
-dif_unidades_val = df_f['Dif_Unidades_Valorizada'].sum()
+dif_unidades_val = kpis['dif_unidades_valorizada']
 color_dif_unidades = "#ef4444" if dif_unidades_val < 0 else "#10b981" if dif_unidades_val > 0 else "#ffffff"
 col4.markdown(
     f'<div class="card"><div class="metric-label">DIF. UNIDADES VALORIZADA</div>'
@@ -512,11 +458,7 @@ col4.markdown(
     unsafe_allow_html=True
 )
 
-dif_precio_solo = 0
-if all(col in df_f.columns for col in ['Precio_Unitario', 'Costo_Unitario_Transferencia', 'Cantidad_Reasignada']):
-    mask_dif = df_f['Precio_Unitario'] != df_f['Costo_Unitario_Transferencia']
-    dif_precio_solo = (df_f.loc[mask_dif, 'Precio_Unitario'].fillna(0) - df_f.loc[mask_dif, 'Costo_Unitario_Transferencia'].fillna(0)) * df_f.loc[mask_dif, 'Cantidad_Reasignada'].fillna(0)
-    dif_precio_solo = dif_precio_solo.sum()
+dif_precio_solo = kpis['dif_precios_lineas']
 color_dif_precio_solo = "#ef4444" if dif_precio_solo < 0 else "#10b981" if dif_precio_solo > 0 else "#ffffff"
 col5.markdown(
     f'<div class="card"><div class="metric-label">DIF. PRECIOS (solo líneas)</div>'
@@ -524,7 +466,7 @@ col5.markdown(
     unsafe_allow_html=True
 )
 
-dif_precio_total = df_f['Diferencia_Precio_Total'].sum() if 'Diferencia_Precio_Total' in df_f.columns else 0
+dif_precio_total = kpis['dif_precio_total']
 color_dif_precio_total = "#ef4444" if dif_precio_total < 0 else "#10b981" if dif_precio_total > 0 else "#ffffff"
 col6.markdown(
     f'<div class="card"><div class="metric-label">DIF. PRECIO TOTAL</div>'
@@ -553,20 +495,22 @@ orden_deseado = [
 cols_existentes = [col for col in orden_deseado if col in df_f.columns]
 df_show = df_f[cols_existentes].copy()
 
+dif_unidades = None
 if 'Cantidad_Reasignada' in df_show.columns and 'Cantidad_Transferida_Entrada' in df_show.columns:
     if 'DIF. EN UNIDADES' not in df_show.columns:
-        df_show['DIF. EN UNIDADES'] = df_show['Cantidad_Reasignada'].fillna(0) - df_show['Cantidad_Transferida_Entrada'].fillna(0)
-        df_show['DIF. EN UNIDADES'] = df_show['DIF. EN UNIDADES'].apply(lambda x: format_number(x) if x != 0 else "0")
+        dif_unidades = df_show['Cantidad_Reasignada'].fillna(0) - df_show['Cantidad_Transferida_Entrada'].fillna(0)
+        df_show['DIF. EN UNIDADES'] = formato.cantidad(dif_unidades)
 
 if 'DIF. EN UNIDADES' in df_show.columns and 'Costo_Unitario_Transferencia' in df_show.columns:
     if 'Dif. Unidades Valorizada' not in df_show.columns:
-        df_show['Dif_Unidades_Num'] = pd.to_numeric(
-            df_show['DIF. EN UNIDADES'].astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
-            errors='coerce'
-        ).fillna(0)
-        df_show['Dif. Unidades Valorizada'] = df_show['Dif_Unidades_Num'] * df_show['Costo_Unitario_Transferencia'].fillna(0)
-        df_show['Dif. Unidades Valorizada'] = df_show['Dif. Unidades Valorizada'].apply(format_currency)
-        df_show = df_show.drop(columns=['Dif_Unidades_Num'])
+        if dif_unidades is None:
+            dif_unidades = pd.to_numeric(
+                df_show['DIF. EN UNIDADES'].astype(str).str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
+                errors='coerce'
+            ).fillna(0)
+        df_show['Dif. Unidades Valorizada'] = formato.moneda(
+            dif_unidades * df_show['Costo_Unitario_Transferencia'].fillna(0)
+        )
 
 if all(col in df_show.columns for col in ['Precio_Unitario', 'Costo_Unitario_Transferencia', 'Cantidad_Reasignada']):
     if 'Dif. Precios (solo líneas dif.)' not in df_show.columns:
@@ -576,17 +520,18 @@ if all(col in df_show.columns for col in ['Precio_Unitario', 'Costo_Unitario_Tra
             (df_show.loc[mask_dif, 'Precio_Unitario'].fillna(0) - df_show.loc[mask_dif, 'Costo_Unitario_Transferencia'].fillna(0)) *
             df_show.loc[mask_dif, 'Cantidad_Reasignada'].fillna(0)
         )
-        df_show['Dif. Precios (solo líneas dif.)'] = df_show['Dif. Precios (solo líneas dif.)'].apply(format_currency)
+        df_show['Dif. Precios (solo líneas dif.)'] = formato.moneda(df_show['Dif. Precios (solo líneas dif.)'])
 
+# Formato por columna entera (yunta.formato)
 money_cols = ['Precio_Unitario', 'Costo_Unitario_Transferencia', 'Precio_Total_Solicitado', 'Precio_Total_Transferido', 'Diferencia_Precio_Total']
 for col in money_cols:
     if col in df_show.columns:
-        df_show[col] = df_show[col].apply(format_currency)
+        df_show[col] = formato.moneda(df_show[col])
 
 qty_cols = ['Cantidad_Solicitada', 'Cantidad_Reasignada', 'Cantidad_Transferida_Entrada']
 for col in qty_cols:
     if col in df_show.columns:
-        df_show[col] = df_show[col].apply(format_number)
+        df_show[col] = formato.cantidad(df_show[col])
 
 orden_final_existentes = [col for col in orden_deseado if col in df_show.columns]
 df_show = df_show[orden_final_existentes]
@@ -601,9 +546,7 @@ st.sidebar.markdown("---")
 st.sidebar.markdown("### 📥 Exportar")
 
 if 'df_show' in locals() and not df_show.empty:
-    export_df = df_show.copy()
-    if 'Línea' in export_df.columns:
-        export_df = export_df.drop(columns=['Línea'])
+    export_df = df_show.drop(columns=['Línea'], errors='ignore')
 
     excel_data = to_excel(export_df)
 
@@ -620,6 +563,6 @@ else:
 st.sidebar.markdown("---")
 st.sidebar.markdown("### ℹ️ Información")
 st.sidebar.info(f"""
-**Total registros:** {len(df):,}
+**Total registros:** {catalogo['filas']:,}
 **Mostrados:** {len(df_f):,}
 """)
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from yunta import gondola, pricing, ventas360
+from yunta.base import ARCHIVO_BASE
+from yunta.consultas import movimientos_stock, ventas_diarias
+from yunta.cubo import agregar_ventas
+from yunta.exportar import escribir_excel
+from yunta.ingesta import DIRECTORIO_DELTAS, conectar_movimientos
+from yunta.presupuesto import calcular_presupuesto
+from yunta.rotacion import VENTANA_DIAS_DEFAULT, rotacion_por_codigo
+from yunta.seguimiento import conectar_consolidado, kpis_consolidado, leer_pedidos
+
+# Uso: python reportes_batch.py [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+#                               [--tiendas T ...] [--proveedores P ...]
+#                               [--modulos ventas360 gondola pricing presupuesto seguimiento]
+#                               [--formato xlsx|parquet] [--salida carpeta]
+#                               [--datos carpeta] [--consolidado ruta] [--margen-objetivo N]
+#
+# Arma sin Streamlit las tablas de los módulos con las mismas funciones de
+# yunta que usa Appgeneralv2 y las escribe una por archivo en la carpeta de
+# salida ({modulo}_{tabla}.xlsx o .parquet). Los datos son los de la app
+# (parquet de movimientos, base persistente y deltas de --datos); sin fechas
+# se toma todo el rango y sin tiendas / proveedores, todos. Góndola y
+# presupuesto usan los valores por defecto de la app.
+
+BASE_DIR = Path(__file__).resolve().parent
+MODULOS = ['ventas360', 'gondola', 'pricing', 'presupuesto', 'seguimiento']
+FORMATOS = ['xlsx', 'parquet']
+CLAVES_PRODUCTO = ['Codigo', 'Descripcion', 'Proveedor']
+
+# Valores por defecto de los sliders de Presupuestos y Simulador Pricing
+PESOS_PRESUPUESTO = {'peso_promedio': 0.5, 'peso_tendencia': 0.3, 'peso_rotacion': 0.2,
+                     'factor_conservadurismo': 0.95}
+ESTRATEGIA_PRICING = "Inteligente"
+AUMENTO_MARGEN_OBJETIVO = 2
+
+
+def _opciones(argumentos):
+    opciones = {'desde': None, 'hasta': None, 'tiendas': [], 'proveedores': [],
+                'modulos': list(MODULOS), 'formato': 'xlsx', 'salida': BASE_DIR / "reportes",
+                'datos': Path(os.environ.get("YUNTA_DATOS_DIR", BASE_DIR)),
+                'consolidado': Path(os.environ.get("YUNTA_CONSOLIDADO", BASE_DIR / "CONSOLIDADO_COMPLETO.parquet")),
+                'margen-objetivo': None}
+    listas = ('tiendas', 'proveedores', 'modulos')
+    clave = None
+    for arg in argumentos:
+        if arg.startswith("--"):
+            clave = arg[2:]
+            if clave in listas:
+                opciones[clave] = []
+        elif clave in listas:
+            opciones[clave].append(arg)
+        elif clave in ('salida', 'datos', 'consolidado'):
+            opciones[clave] = Path(arg)
+        elif clave == 'margen-objetivo':
+            opciones[clave] = float(arg)
+        elif clave is not None:
+            opciones[clave] = arg
+    return opciones
+
+
+def escribir(tablas, modulo, salida, formato):
+    """Una tabla por archivo: {modulo}_{tabla}.{formato}"""
+    for tabla, df in tablas.items():
+        ruta = salida / f"{modulo}_{tabla}.{formato}"
+        if formato == 'parquet':
+            df.to_parquet(ruta, index=False)
+        else:
+            ruta.write_bytes(escribir_excel(df, hoja=tabla).getvalue())
+        print(f"  {ruta.name}: {len(df):,} filas")
+
+
+# ============================================================================
+# TABLAS POR MÓDULO
+# ============================================================================
+def tablas_gondola(ventas, stock):
+    """Métricas y clasificación de góndola de todos los productos"""
+    productos = gondola.metricas_gondola(
+        agregar_ventas(ventas, CLAVES_PRODUCTO, fechas=True),
+        gondola.abastecimiento(stock),
+        ventas=ventas,
+        dias=VENTANA_DIAS_DEFAULT,
+        ahora=datetime.now()
+    )
+    return {'Productos': gondola.clasificar_productos(productos)}
+
+
+def tablas_pricing(ventas, margen_objetivo=None):
+    """Rentabilidad por producto, margen negativo y simulación sin protegidos"""
+    precios = pricing.metricas_precios(agregar_ventas(ventas, CLAVES_PRODUCTO))
+    _, _, _, margen_pct = pricing.rentabilidad(precios)
+    if margen_objetivo is None:
+        margen_objetivo = int(margen_pct) + AUMENTO_MARGEN_OBJETIVO
+    return {
+        'Precios': precios,
+        'Margen_Negativo': precios[precios['Margen_Pct'] < 0].sort_values('Margen_Total'),
+        'Simulacion': pricing.simular_precios(precios, ESTRATEGIA_PRICING, margen_objetivo - margen_pct, []),
+    }
+
+
+def tablas_presupuesto(ventas, stock):
+    """Presupuesto por producto con la rotación post-recepción"""
+    recepciones = stock[stock['Tipo_Movimiento'] == 'Recepción']
+    df = calcular_presupuesto(
+        ventas,
+        rotacion=rotacion_por_codigo(recepciones, ventas, dias=VENTANA_DIAS_DEFAULT),
+        ahora=datetime.now(),
+        **PESOS_PRESUPUESTO
+    )
+    return {'Presupuesto': df.sort_values('Score', ascending=False)}
+
+
+def tablas_seguimiento(ruta, fecha_desde, fecha_hasta, proveedores=None, tiendas=None):
+    """Líneas de pedido por Fecha Pedido con sus métricas y los KPIs (conexión propia al consolidado)"""
+    con = conectar_consolidado(ruta)
+    try:
+        filtros = ("Fecha Pedido", fecha_desde, fecha_hasta, proveedores, None, tiendas)
+        return {'Pedidos': leer_pedidos(con, *filtros), 'KPIs': pd.DataFrame([kpis_consolidado(con, *filtros)])}
+    finally:
+        con.close()
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+opciones = _opciones(sys.argv[1:])
+desconocidos = [m for m in opciones['modulos'] if m not in MODULOS]
+if desconocidos:
+    print(f"❌ Módulos desconocidos: {', '.join(desconocidos)} (disponibles: {', '.join(MODULOS)})")
+    sys.exit(1)
+if opciones['formato'] not in FORMATOS:
+    print(f"❌ Formato desconocido: {opciones['formato']} (disponibles: {', '.join(FORMATOS)})")
+    sys.exit(1)
+
+datos = opciones['datos']
+con, _ = conectar_movimientos(
+    datos / "MOVIMIENTOS_STOCK_PowerBI.parquet", datos / ARCHIVO_BASE, datos / DIRECTORIO_DELTAS
+)
+fecha_min, fecha_max = con.execute("SELECT MIN(Fecha), MAX(Fecha) FROM movimientos").fetchone()
+fecha_desde = pd.Timestamp(opciones['desde'] or fecha_min).date()
+fecha_hasta = pd.Timestamp(opciones['hasta'] or fecha_max).date()
+tiendas = opciones['tiendas'] or [
+    t for (t,) in con.execute("SELECT DISTINCT CAST(Tienda AS VARCHAR) AS Tienda FROM movimientos WHERE Tienda IS NOT NULL ORDER BY Tienda").fetchall()
+]
+proveedores = opciones['proveedores'] or None
+columnas = con.execute("DESCRIBE SELECT * FROM movimientos").df()["column_name"].tolist()
+
+salida = opciones['salida']
+salida.mkdir(parents=True, exist_ok=True)
+print(f"Datos:   {datos}")
+print(f"Período: {fecha_desde} a {fecha_hasta} | {len(tiendas)} tiendas"
+      + (f" | {len(proveedores)} proveedores" if proveedores else ""))
+print(f"Salida:  {salida} ({opciones['formato']})")
+
+# Filas compartidas por góndola, pricing y presupuesto
+ventas = stock = None
+if any(m in opciones['modulos'] for m in ('gondola', 'pricing', 'presupuesto')):
+    ventas = ventas_diarias(con, fecha_desde, fecha_hasta, tiendas)
+    if proveedores:
+        ventas = ventas[ventas['Proveedor'].isin(proveedores)]
+if any(m in opciones['modulos'] for m in ('gondola', 'presupuesto')):
+    stock = movimientos_stock(con, fecha_desde, fecha_hasta, tiendas, columnas)
+    if proveedores:
+        stock = stock[stock['Proveedor'].isin(proveedores)]
+
+inicio_total = time.perf_counter()
+for modulo in opciones['modulos']:
+    inicio = time.perf_counter()
+    print(f"\n{modulo}")
+    if modulo == 'ventas360':
+        tablas = ventas360.tablas_ventas_360(con, (fecha_desde, fecha_hasta, tiendas, proveedores, None))
+    elif modulo == 'seguimiento':
+        if not opciones['consolidado'].exists():
+            print(f"  ⚠️ No se encontró el consolidado de pedidos: {opciones['consolidado']}")
+            continue
+        tablas = tablas_seguimiento(
+            opciones['consolidado'], fecha_desde, fecha_hasta,
+            proveedores=proveedores, tiendas=opciones['tiendas'] or None
+        )
+    elif ventas.empty:
+        tablas = {}
+    elif modulo == 'gondola':
+        tablas = tablas_gondola(ventas, stock)
+    elif modulo == 'pricing':
+        tablas = tablas_pricing(ventas, opciones['margen-objetivo'])
+    else:
+        tablas = tablas_presupuesto(ventas, stock)
+
+    if not tablas:
+        print("  ⚠️ Sin ventas para los filtros")
+        continue
+    escribir(tablas, modulo, salida, opciones['formato'])
+    print(f"  ✅ {time.perf_counter() - inicio:.1f}s")
+
+print(f"\n🎉 Reportes generados en {time.perf_counter() - inicio_total:.1f}s")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Los tests importan el paquete yunta desde la raíz del repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from yunta.cache import CacheResultados
+from yunta.sentencias import tipos_categoricos
+
+# ============================================================================
+# NIVEL EN DISCO DE LA CACHE DE RESULTADOS
+# ============================================================================
+# Un resultado leído del parquet tiene que volver con los CategoricalDtype
+# compartidos, igual que el que se guardó en memoria.
+
+
+def _cache(directorio, categorias):
+    cache = CacheResultados(directorio=directorio)
+    cache.fijar_huella('huella')
+    cache.fijar_categorias(categorias)
+    return cache
+
+
+def test_disco_recupera_categorias_compartidas(tmp_path):
+    categorias = tipos_categoricos({'Tienda': ['Centro', 'Norte', 'Sur'], 'Proveedor': ['A', 'B']})
+    df = pd.DataFrame({
+        'Tienda': pd.Categorical(['Sur', None, 'Centro'], dtype=categorias['Tienda']),
+        'Proveedor': pd.Categorical(['B', 'B', 'A'], dtype=categorias['Proveedor']),
+        'Venta': [1.0, 2.0, 3.0],
+    })
+    _cache(tmp_path, categorias).guardar('clave', df)
+
+    # Otro proceso: la memoria está vacía y se lee el parquet
+    leido = _cache(tmp_path, categorias).obtener('clave')
+    pd.testing.assert_frame_equal(leido, df)
+    assert leido['Tienda'].dtype is categorias['Tienda']
+    assert leido['Proveedor'].dtype is categorias['Proveedor']
+
+
+def test_disco_con_categorias_nuevas(tmp_path):
+    anteriores = tipos_categoricos({'Tienda': ['Centro', 'Sur']})
+    df = pd.DataFrame({'Tienda': pd.Categorical(['Sur', 'Centro'], dtype=anteriores['Tienda'])})
+    _cache(tmp_path, anteriores).guardar('clave', df)
+
+    # Las categorías crecieron (otra tienda): los códigos se reubican
+    actuales = tipos_categoricos({'Tienda': ['Centro', 'Este', 'Sur']})
+    leido = _cache(tmp_path, actuales).obtener('clave')
+    assert leido['Tienda'].dtype is actuales['Tienda']
+    assert list(leido['Tienda']) == ['Sur', 'Centro']
+
+    # Un valor que ya no está entre las categorías: queda como se leyó
+    otras = tipos_categoricos({'Tienda': ['Centro']})
+    leido = _cache(tmp_path, otras).obtener('clave')
+    assert list(leido['Tienda']) == ['Sur', 'Centro']
+    assert leido['Tienda'].dtype is not otras['Tienda']
@@ -0,0 +1,170 @@
+import functools
+import hashlib
+import http.server
+import random
+import threading
+from pathlib import Path
+
+import pytest
+import requests
+
+from yunta.descarga import INDICE, descargar
+
+# ============================================================================
+# DESCARGA CON CACHE CONTRA UN SERVIDOR LOCAL
+# ============================================================================
+# ServidorEtag responde como Google Drive: ETag fuerte, 304 con
+# If-None-Match y 206 con Range / If-Range. cortar_en hace que la próxima
+# respuesta se corte después de esa cantidad de bytes. Para el caso sin ETag
+# se usa SimpleHTTPRequestHandler (solo Last-Modified y Content-Length).
+
+
+class ServidorEtag(http.server.BaseHTTPRequestHandler):
+    contenido = b''
+    cortar_en = None
+    pedidos = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        datos = type(self).contenido
+        etag = f'"{hashlib.md5(datos).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            type(self).pedidos.append(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        inicio = 0
+        rango = self.headers.get('Range')
+        if rango and self.headers.get('If-Range') == etag:
+            inicio = int(rango.split('=')[1].rstrip('-'))
+            type(self).pedidos.append(206)
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {inicio}-{len(datos) - 1}/{len(datos)}")
+        else:
+            type(self).pedidos.append(200)
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(datos) - inicio))
+        self.end_headers()
+
+        cuerpo = datos[inicio:]
+        if type(self).cortar_en is not None:
+            cuerpo = cuerpo[:type(self).cortar_en]
+            type(self).cortar_en = None
+            self.close_connection = True
+        self.wfile.write(cuerpo)
+
+
+def _bytes(n, semilla):
+    return random.Random(semilla).randbytes(n)
+
+
+def _iniciar(manejador):
+    servidor = http.server.ThreadingHTTPServer(('127.0.0.1', 0), manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+@pytest.fixture
+def servidor_etag():
+    manejador = type('Manejador', (ServidorEtag,), {'contenido': _bytes(3_000_000, 1), 'pedidos': []})
+    servidor = _iniciar(manejador)
+    yield manejador, f"http://127.0.0.1:{servidor.server_address[1]}/uc?export=download&id=x"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _archivos(directorio):
+    return sorted(p.name for p in Path(directorio).iterdir())
+
+
+def test_descarga_y_304(servidor_etag, tmp_path):
+    manejador, url = servidor_etag
+    ruta = descargar(url, tmp_path, bloque=65536)
+
+    assert ruta.read_bytes() == manejador.contenido
+    assert ruta.name == hashlib.sha256(manejador.contenido).hexdigest() + '.parquet'
+    assert _archivos(tmp_path) == sorted([INDICE, ruta.name])
+
+    # Sin cambios el servidor responde 304 y no se vuelve a escribir
+    mtime = ruta.stat().st_mtime_ns
+    assert descargar(url, tmp_path) == ruta
+    assert manejador.pedidos == [200, 304]
+    assert ruta.stat().st_mtime_ns == mtime
+
+
+def test_descarga_cortada_se_retoma(servidor_etag, tmp_path):
+    manejador, url = servidor_etag
+    anterior = descargar(url, tmp_path)
+
+    # Cambia el contenido y la descarga se corta: se sirve la copia anterior
+    # y lo recibido queda en el .part
+    manejador.contenido = _bytes(2_500_000, 2)
+    manejador.cortar_en = 1_000_000
+    assert descargar(url, tmp_path, bloque=65536) == anterior
+    assert any(nombre.endswith('.part') for nombre in _archivos(tmp_path))
+
+    # El siguiente intento pide solo el resto (206) y borra la versión anterior
+    ruta = descargar(url, tmp_path, bloque=65536)
+    assert ruta.read_bytes() == manejador.contenido
+    assert manejador.pedidos == [200, 200, 200, 206]
+    assert _archivos(tmp_path) == sorted([INDICE, ruta.name])
+
+
+def test_sin_conexion_usa_la_copia(servidor_etag, tmp_path):
+    _, url = servidor_etag
+    ruta = descargar(url, tmp_path)
+    puerto = url.split(':')[2].split('/')[0]
+    caida = url.replace(puerto, '1')
+
+    # Otra URL sin copia guardada: el error se propaga
+    with pytest.raises(requests.RequestException):
+        descargar(caida, tmp_path)
+
+    # La misma URL con el servidor caído devuelve lo guardado
+    class SesionCaida(requests.Session):
+        def get(self, *args, **kwargs):
+            raise requests.ConnectionError("sin red")
+
+    assert descargar(url, tmp_path, sesion=SesionCaida()) == ruta
+
+
+def test_archivo_anterior_bloqueado(servidor_etag, tmp_path, monkeypatch):
+    manejador, url = servidor_etag
+    anterior = descargar(url, tmp_path)
+    manejador.contenido = _bytes(1_000_000, 3)
+
+    # Windows no deja borrar un archivo abierto por otro proceso
+    unlink = Path.unlink
+
+    def unlink_bloqueado(self, missing_ok=False):
+        if self == anterior:
+            raise PermissionError(13, "en uso", str(self))
+        return unlink(self, missing_ok=missing_ok)
+
+    monkeypatch.setattr(Path, 'unlink', unlink_bloqueado)
+    ruta = descargar(url, tmp_path)
+    assert ruta.read_bytes() == manejador.contenido
+    assert anterior.exists()
+
+
+def test_servidor_sin_etag(tmp_path):
+    publico = tmp_path / 'publico'
+    publico.mkdir()
+    (publico / 'datos.parquet').write_bytes(_bytes(500_000, 4))
+    servidor = _iniciar(functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(publico)))
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/datos.parquet"
+    try:
+        ruta = descargar(url, tmp_path / 'cache')
+        mtime = ruta.stat().st_mtime_ns
+        # Mismo tamaño y Last-Modified: no se vuelve a escribir
+        assert descargar(url, tmp_path / 'cache') == ruta
+        assert ruta.stat().st_mtime_ns == mtime
+        assert ruta.read_bytes() == (publico / 'datos.parquet').read_bytes()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from yunta import formato
+
+# ============================================================================
+# FORMATO VECTORIZADO CONTRA EL F-STRING
+# ============================================================================
+# El redondeo tiene que ser el del f-string de Python (el que usaban las
+# tablas antes); los vacíos se muestran como 0 y los infinitos como 'inf'.
+
+
+def _f_string(valor, decimales, sep_miles, sep_decimal):
+    """Formato de referencia celda por celda (signo solo si queda algún dígito)"""
+    texto = f"{abs(valor):,.{decimales}f}" if sep_miles else f"{abs(valor):.{decimales}f}"
+    texto = texto.replace(',', '_').replace('.', sep_decimal).replace('_', sep_miles)
+    negativo = valor < 0 and texto.strip('0.,') != ''
+    return ('-' if negativo else '') + texto
+
+
+def test_infinitos():
+    valores = pd.Series([np.inf, -np.inf, 12.34, 0.0])
+    assert list(formato.porcentaje(valores)) == ['inf%', '-inf%', '12.3%', '0.0%']
+    assert list(formato.moneda(valores)) == ['$ inf', '-$ inf', '$ 12,34', '$ 0,00']
+    assert list(formato.numero(valores)) == ['inf', '-inf', '12', '0']
+    assert list(formato.porcentaje([-np.inf])) == ['-inf%']
+
+
+def test_margen_pct_con_ventas_cero():
+    # Margen_Pct de Góndola: (Margen / Ventas * 100).fillna(0) con Ventas == 0
+    df = pd.DataFrame({'Margen': [50.0, -20.0, 0.0, 30.0], 'Ventas': [200.0, 0.0, 0.0, 0.0]})
+    margen_pct = (df['Margen'] / df['Ventas'] * 100).fillna(0)
+    assert list(formato.porcentaje(margen_pct)) == ['25.0%', '-inf%', '0.0%', 'inf%']
+
+
+def test_nan_como_cero():
+    valores = [np.nan, None, 'x', 5]
+    assert list(formato.moneda(valores)) == ['$ 0,00', '$ 0,00', '$ 0,00', '$ 5,00']
+    assert list(formato.porcentaje([np.nan])) == ['0.0%']
+    assert list(formato.cantidad([np.nan, 2, 2.5])) == ['0', '2', '2,50']
+
+
+def test_negativos():
+    valores = [-1234567.891, -0.5, -0.04, -0.0]
+    assert list(formato.moneda(valores)) == ['-$ 1.234.567,89', '-$ 0,50', '-$ 0,04', '$ 0,00']
+    # Un negativo que redondea a cero no lleva signo
+    assert list(formato.porcentaje([-0.04, -0.05, -0.06])) == ['0.0%', '-0.1%', '-0.1%']
+
+
+def test_redondeo_en_la_mitad():
+    # Empates reales y aparentes (0.35 es 0.34999... en binario)
+    assert list(formato.porcentaje([0.25, 0.35, 0.45, 2.675 * 10])) == ['0.2%', '0.3%', '0.5%', '26.8%']
+    assert list(formato.numero([0.5, 1.5, 2.5, -2.5])) == ['0', '2', '2', '-2']
+    assert list(formato.moneda([1.005, 2.675, 123456.785])) == ['$ 1,00', '$ 2,67', '$ 123.456,79']
+
+
+def test_valores_grandes():
+    valores = [1e20, -9.5e18, 2.0 ** 63, 123.0]
+    assert list(formato.moneda(valores)) == [
+        '$ 100.000.000.000.000.000.000,00',
+        '-$ 9.500.000.000.000.000.000,00',
+        '$ 9.223.372.036.854.775.808,00',
+        '$ 123,00',
+    ]
+    assert list(formato.numero_texto([1e20], decimales=0)) == ['100000000000000000000']
+
+
+@pytest.mark.parametrize('decimales, sep_miles, sep_decimal', [(0, '.', ','), (1, '', '.'), (2, '.', ',')])
+def test_igual_al_f_string(decimales, sep_miles, sep_decimal):
+    azar = random.Random(3)
+    valores = (
+        [round(azar.uniform(-1e7, 1e7), azar.randint(0, 4)) for _ in range(20_000)]
+        + [k / 1000 for k in range(-3000, 3000)]
+        + [k / 200 for k in range(-4000, 4000)]
+    )
+    resultado = formato.numero_texto(valores, decimales, sep_miles, sep_decimal)
+    esperado = [_f_string(v, decimales, sep_miles, sep_decimal) for v in valores]
+    assert list(resultado) == esperado
+
+
+def test_vacio():
+    assert list(formato.moneda([])) == []
+    assert list(formato.miles([])) == []
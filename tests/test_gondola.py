@@ -0,0 +1,144 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from yunta.gondola import DIAS_SIN_DATO, ORDEN_ACCION, clasificar_productos, metricas_gondola
+
+# ============================================================================
+# EQUIVALENCIA CON LA CLASIFICACIÓN FILA POR FILA
+# ============================================================================
+# clasificar_gondola es la función que la página aplicaba con
+# df.apply(axis=1) antes de las reglas vectorizadas. clasificar_productos
+# tiene que dar la misma acción, motivo, color, frentes y orden, también con
+# productos sin ventas (Ventas == 0), sin costo o sin abastecimiento.
+
+AHORA = datetime(2024, 7, 15)
+
+# Con Margen_Pct inf y -inf el margen promedio es NaN (en los dos cálculos)
+pytestmark = pytest.mark.filterwarnings('ignore:invalid value encountered:RuntimeWarning')
+
+
+def clasificar_gondola(row, total_productos, margen_promedio, rotacion_promedio):
+    dias_sin_venta = row['Dias_Sin_Venta'] if pd.notna(row['Dias_Sin_Venta']) else DIAS_SIN_DATO
+    dias_sin_recep = row['Dias_Sin_Recepcion'] if pd.notna(row['Dias_Sin_Recepcion']) else DIAS_SIN_DATO
+    unidades_vendidas = row['Unidades_Vendidas'] if pd.notna(row['Unidades_Vendidas']) else 0
+    unidades_recibidas = row['Unidades_Recibidas'] if pd.notna(row['Unidades_Recibidas']) else 0
+    rotacion = row['Rotacion'] if pd.notna(row['Rotacion']) else 0
+    ranking = row['Ranking_Ventas']
+    margen = row['Margen_Pct']
+    ventas = row['Ventas']
+
+    es_buen_vendedor = ventas > 50000
+    es_rentable = margen >= 25
+    es_top_20 = ranking <= (total_productos * 0.2)
+
+    if ranking <= 5 and margen >= margen_promedio:
+        return ('⭐ DESTACAR', 'Top 5 ventas + buen margen', '#10b981', 4)
+    if es_top_20 and margen > 0:
+        return ('⬆️ AMPLIAR', 'Top 20% en ventas', '#22d3ee', 3)
+    if ventas > 100000 and margen > 0:
+        return ('⬆️ AMPLIAR', 'Ventas altas', '#22d3ee', 3)
+    if margen >= 30 and ventas > 30000:
+        return ('⬆️ AMPLIAR', 'Margen excelente', '#22d3ee', 3)
+    if es_buen_vendedor or es_rentable:
+        return ('✅ MANTENER', 'Buen rendimiento', '#6b7280', 2)
+    if unidades_recibidas > 30 and unidades_vendidas < 5 and dias_sin_recep < 60:
+        return ('❌ SACAR', 'Recibió stock pero no vende', '#ef4444', 0)
+    if dias_sin_venta > 45 and unidades_vendidas < 10 and ventas < 10000:
+        return ('❌ SACAR', f'Sin ventas hace {int(dias_sin_venta)} días', '#ef4444', 0)
+    if ventas < 5000 and margen < 0:
+        return ('❌ SACAR', 'Ventas mínimas + margen negativo', '#ef4444', 0)
+    if ventas < 20000 and rotacion < (rotacion_promedio * 0.3):
+        return ('⬇️ REDUCIR', 'Ventas bajas + rotación baja', '#f97316', 1)
+    if ventas < 15000 and margen < 10 and unidades_vendidas < 30:
+        return ('⬇️ REDUCIR', 'Bajo rendimiento general', '#f97316', 1)
+    return ('✅ MANTENER', 'Rendimiento normal', '#6b7280', 2)
+
+
+def clasificar_apply(df_productos):
+    total_productos = len(df_productos)
+    rotacion_promedio = df_productos['Rotacion'].mean()
+    margen_promedio = df_productos['Margen_Pct'].mean()
+    clasificaciones = df_productos.apply(
+        clasificar_gondola, axis=1,
+        args=(total_productos, margen_promedio, rotacion_promedio)
+    )
+    df_productos = df_productos.copy(deep=False)
+    df_productos['Accion'] = [c[0] for c in clasificaciones]
+    df_productos['Motivo'] = [c[1] for c in clasificaciones]
+    df_productos['Color'] = [c[2] for c in clasificaciones]
+    df_productos['Frentes_Sugeridos'] = [c[3] for c in clasificaciones]
+    df_productos['Orden'] = df_productos['Accion'].map(ORDEN_ACCION)
+    return df_productos.sort_values(['Orden', 'Ventas'], ascending=[True, False])
+
+
+def _ventas_producto(n, semilla):
+    """Ventas agregadas por producto como las devuelve agregar_ventas(fechas=True)"""
+    azar = np.random.default_rng(semilla)
+    ventas = np.round(azar.lognormal(9.5, 1.8, n), 2)
+    costo = np.round(ventas * azar.uniform(0.5, 1.3, n), 2)
+    cantidad = azar.integers(0, 80, n).astype(float)
+    ultima = pd.Timestamp(AHORA) - pd.to_timedelta(azar.integers(0, 200, n), unit='D')
+    df = pd.DataFrame({
+        'Codigo': [f'P{i:04d}' for i in range(n)],
+        'Descripcion': [f'Producto {i}' for i in range(n)],
+        'Proveedor': azar.choice(['A', 'B', 'C'], n),
+        'Venta_Total': ventas,
+        'Costo_Total': costo,
+        'Cantidad': cantidad,
+        'Primera_Venta': ultima - pd.Timedelta(days=90),
+        'Ultima_Venta': ultima,
+        'Transacciones': azar.integers(1, 50, n),
+    })
+    # Sin ventas (margen positivo, negativo y nulo), sin costo y sin fecha
+    df.loc[0:2, 'Venta_Total'] = 0.0
+    df.loc[0, 'Costo_Total'] = -50.0
+    df.loc[1, 'Costo_Total'] = 80.0
+    df.loc[2, 'Costo_Total'] = 0.0
+    df.loc[3:5, 'Costo_Total'] = np.nan
+    df.loc[6, 'Ultima_Venta'] = pd.NaT
+    df.loc[7, 'Cantidad'] = np.nan
+    df['Margen'] = df['Venta_Total'] - df['Costo_Total']
+    return df
+
+
+def _abastecimiento(ventas_producto, semilla):
+    """Recepciones para algunos productos (el resto queda sin abastecimiento)"""
+    azar = np.random.default_rng(semilla)
+    codigos = ventas_producto['Codigo'].sample(frac=0.6, random_state=semilla).repeat(2).to_numpy()
+    return pd.DataFrame({
+        'Codigo': codigos,
+        'Fecha': pd.Timestamp(AHORA) - pd.to_timedelta(azar.integers(0, 120, len(codigos)), unit='D'),
+        'Cantidad': azar.integers(1, 60, len(codigos)).astype(float),
+    })
+
+
+@pytest.mark.parametrize('semilla', [1, 2, 3])
+@pytest.mark.parametrize('con_infinitos', [True, False])
+def test_igual_a_la_clasificacion_fila_por_fila(semilla, con_infinitos):
+    ventas_producto = _ventas_producto(400, semilla)
+    if not con_infinitos:
+        # Sin los Margen_Pct ±inf el margen promedio es finito y hay DESTACAR
+        ventas_producto = ventas_producto.drop(index=[0, 1])
+    df_productos = metricas_gondola(ventas_producto, _abastecimiento(ventas_producto, semilla), ahora=AHORA)
+    assert np.isinf(df_productos['Margen_Pct']).any() == con_infinitos
+
+    resultado = clasificar_productos(df_productos)
+    esperado = clasificar_apply(df_productos)
+    columnas = ['Codigo', 'Accion', 'Motivo', 'Color', 'Frentes_Sugeridos', 'Orden']
+    pd.testing.assert_frame_equal(
+        resultado[columnas].reset_index(drop=True), esperado[columnas].reset_index(drop=True)
+    )
+
+
+def test_sin_abastecimiento():
+    ventas_producto = _ventas_producto(60, 4)
+    df_productos = metricas_gondola(ventas_producto, pd.DataFrame(columns=['Codigo', 'Fecha', 'Cantidad']),
+                                    ahora=AHORA)
+    columnas = ['Codigo', 'Accion', 'Motivo', 'Frentes_Sugeridos']
+    pd.testing.assert_frame_equal(
+        clasificar_productos(df_productos)[columnas].reset_index(drop=True),
+        clasificar_apply(df_productos)[columnas].reset_index(drop=True),
+    )
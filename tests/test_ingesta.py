@@ -0,0 +1,99 @@
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+from yunta.base import base_actual, construir_base, hash_archivo
+from yunta.ingesta import conectar_movimientos, ingerir_deltas, ingestas, rango_archivo
+
+# ============================================================================
+# INGESTA DE DELTAS SOBRE LA BASE PERSISTENTE
+# ============================================================================
+# Parquets chicos con las columnas del parquet principal: el principal hasta
+# el 2024-01-10 y dos deltas con los días siguientes.
+
+
+def _movimientos(fechas, tienda='Centro'):
+    return pd.DataFrame({
+        'Fecha': pd.to_datetime(fechas),
+        'Tienda': tienda,
+        'Codigo': '100',
+        'Descripcion': 'Yerba',
+        'Tipo_Movimiento': 'Venta',
+        'Cantidad': -2.0,
+        'Costo': 10.0,
+        'Precio_Venta': 30.0,
+        'Proveedor': 'A',
+    })
+
+
+@pytest.fixture
+def datos(tmp_path):
+    parquet = tmp_path / 'MOVIMIENTOS_STOCK_PowerBI.parquet'
+    _movimientos(pd.date_range('2024-01-01', '2024-01-10')).to_parquet(parquet)
+    deltas = tmp_path / 'MOVIMIENTOS_DELTAS'
+    deltas.mkdir()
+    _movimientos(['2024-01-11', '2024-01-12']).to_parquet(deltas / '01.parquet')
+    _movimientos(['2024-01-13'], tienda='Norte').to_parquet(deltas / '02.parquet')
+    base = tmp_path / 'MOVIMIENTOS_STOCK.duckdb'
+    construir_base(parquet, base)
+    return parquet, base, sorted(deltas.glob('*.parquet'))
+
+
+def test_ids_de_ingesta_son_sha256(datos):
+    parquet, base, archivos = datos
+    nuevas = ingerir_deltas(base, archivos, rango_archivo(parquet)[1])
+    assert [i for i, _, _ in nuevas] == [hash_archivo(a) for a in archivos]
+
+    # Los mismos ids que ve la app al abrir la base
+    con, vistas = conectar_movimientos(parquet, base, archivos[0].parent)
+    try:
+        assert vistas == nuevas == ingestas(con)
+        tiendas = con.execute("SELECT DISTINCT CAST(Tienda AS VARCHAR) FROM movimientos ORDER BY 1").fetchall()
+        assert tiendas == [('Centro',), ('Norte',)]
+        assert con.execute("SELECT COUNT(*) FROM ventas_diarias").fetchone()[0] == 13
+    finally:
+        con.close()
+
+    # Sin deltas nuevos no se publica otra versión
+    actual = base_actual(base)
+    assert ingerir_deltas(base, archivos, rango_archivo(parquet)[1]) == []
+    assert base_actual(base) == actual
+
+
+def test_version_nueva_con_la_base_abierta(datos, monkeypatch):
+    parquet, base, archivos = datos
+    anterior = base_actual(base)
+
+    # La app tiene abierta la versión anterior; en Windows no se puede borrar
+    unlink = Path.unlink
+
+    def unlink_bloqueado(self, missing_ok=False):
+        if self == anterior:
+            raise PermissionError(13, "en uso", str(self))
+        return unlink(self, missing_ok=missing_ok)
+
+    monkeypatch.setattr(Path, 'unlink', unlink_bloqueado)
+    abierta = duckdb.connect(str(anterior), read_only=True)
+    try:
+        ingerir_deltas(base, archivos[:1], rango_archivo(parquet)[1])
+        # La conexión abierta sigue viendo sus datos
+        assert abierta.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0] == 10
+    finally:
+        abierta.close()
+
+    nueva = base_actual(base)
+    assert nueva != anterior and anterior.exists()
+    con, vistas = conectar_movimientos(parquet, base, archivos[0].parent)
+    try:
+        assert con.execute("SELECT COUNT(*) FROM movimientos").fetchone()[0] == 12
+        assert [i for i, _, _ in vistas] == [hash_archivo(archivos[0])]
+    finally:
+        con.close()
+
+    # La próxima publicación borra la versión que ya no está abierta
+    monkeypatch.undo()
+    ingerir_deltas(base, archivos, rango_archivo(parquet)[1])
+    assert not anterior.exists() and not nueva.exists()
+    assert base_actual(base).exists()
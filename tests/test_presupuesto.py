@@ -0,0 +1,240 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from yunta.presupuesto import COLUMNAS_PRESUPUESTO, calcular_presupuesto
+
+# ============================================================================
+# EQUIVALENCIA CON EL CÁLCULO ORIGINAL
+# ============================================================================
+# presupuesto_iterrows es el loop producto por producto que tenía la página
+# de Presupuestos antes del motor vectorizado (con la rotación ya calculada
+# por código y la fecha actual como parámetro). calcular_presupuesto tiene
+# que dar lo mismo sobre un histórico fijo.
+
+AHORA = datetime(2024, 7, 15)
+PESOS = dict(peso_promedio=0.5, peso_tendencia=0.3, peso_rotacion=0.2, factor_conservadurismo=0.9)
+
+
+def presupuesto_iterrows(df_hist, peso_promedio, peso_tendencia, peso_rotacion,
+                         factor_conservadurismo, rotacion, ahora):
+    df_hist = df_hist.copy()
+    df_hist['Mes'] = pd.to_datetime(df_hist['Fecha']).dt.to_period('M')
+
+    productos_unicos = df_hist.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
+        'Venta_Total': 'sum',
+        'Costo_Total': 'sum',
+        'Margen': 'sum',
+        'Cantidad': lambda x: abs(x).sum(),
+        'Fecha': 'max'
+    }).reset_index()
+    productos_unicos['Margen_Pct'] = (
+        productos_unicos['Margen'] / productos_unicos['Venta_Total'] * 100
+    ).fillna(0)
+    productos_unicos['Costo_Unitario'] = (
+        productos_unicos['Costo_Total'] / productos_unicos['Cantidad']
+    ).replace([np.inf, -np.inf], 0).fillna(0)
+    productos_unicos['Precio_Venta_Unitario'] = (
+        productos_unicos['Venta_Total'] / productos_unicos['Cantidad']
+    ).replace([np.inf, -np.inf], 0).fillna(0)
+
+    ventas_por_prod_mes = df_hist.groupby(['Codigo', 'Mes'], observed=True).agg({
+        'Venta_Total': 'sum',
+        'Cantidad': lambda x: abs(x).sum()
+    }).reset_index()
+
+    resultados = []
+    for _, prod in productos_unicos.iterrows():
+        codigo = prod['Codigo']
+        ventas_por_mes = ventas_por_prod_mes[ventas_por_prod_mes['Codigo'] == codigo].copy()
+        if len(ventas_por_mes) == 0:
+            continue
+        ventas_por_mes = ventas_por_mes.sort_values('Mes')
+
+        ultimos_3_meses = ventas_por_mes.tail(3)
+        promedio_3m_unidades = ultimos_3_meses['Cantidad'].mean() if len(ultimos_3_meses) > 0 else 0
+
+        if len(ventas_por_mes) >= 3:
+            x = np.arange(len(ventas_por_mes))
+            y = ventas_por_mes['Cantidad'].values
+            coef = np.polyfit(x, y, 1)
+            tendencia_slope = coef[0]
+            tendencia_unidades = max(0, coef[1] + coef[0] * len(ventas_por_mes))
+            if tendencia_slope > 0.05 * promedio_3m_unidades:
+                tendencia_icono, factor_tendencia = "↗", 1.05
+            elif tendencia_slope < -0.05 * promedio_3m_unidades:
+                tendencia_icono, factor_tendencia = "↘", 0.95
+            else:
+                tendencia_icono, factor_tendencia = "→", 1.0
+        else:
+            tendencia_unidades = promedio_3m_unidades
+            tendencia_icono, factor_tendencia = "→", 1.0
+
+        cv = ventas_por_mes['Cantidad'].std() / ventas_por_mes['Cantidad'].mean() if ventas_por_mes['Cantidad'].mean() > 0 else 0
+
+        rotacion_promedio = rotacion.get(codigo, 0.5)
+
+        ultima_venta = prod['Fecha']
+        dias_sin_venta = (ahora - ultima_venta).days if pd.notna(ultima_venta) else 999
+
+        unidades_sugeridas = (
+            peso_promedio * promedio_3m_unidades +
+            peso_tendencia * tendencia_unidades +
+            peso_rotacion * promedio_3m_unidades * (rotacion_promedio / 0.65)
+        )
+        unidades_sugeridas *= factor_tendencia
+        if cv > 0.7:
+            unidades_sugeridas *= 0.9
+        if rotacion_promedio > 0.8:
+            unidades_sugeridas *= 1.1
+        elif rotacion_promedio < 0.3:
+            unidades_sugeridas *= 0.8
+        unidades_finales = max(0, round(unidades_sugeridas * factor_conservadurismo))
+
+        costo_unitario = prod['Costo_Unitario']
+        precio_venta_unitario = prod['Precio_Venta_Unitario']
+        pesos_a_comprar = unidades_finales * costo_unitario
+        pesos_a_vender = unidades_finales * precio_venta_unitario
+        margen_total = pesos_a_vender - pesos_a_comprar
+        margen_pct_proyectado = (margen_total / pesos_a_vender * 100) if pesos_a_vender > 0 else 0
+
+        venta_total = prod['Venta_Total']
+        margen_pct = prod['Margen_Pct']
+        max_venta = productos_unicos['Venta_Total'].max()
+        score_venta = min(venta_total / max_venta, 1) if max_venta > 0 else 0
+        score_margen = min(margen_pct / 40, 1) if margen_pct > 0 else 0
+        score_rotacion = min(rotacion_promedio, 1)
+        score_estabilidad = max(0, 1 - min(cv, 1))
+        score = 40 * score_venta + 30 * score_margen + 20 * score_rotacion + 10 * score_estabilidad
+
+        if score > 75:
+            categoria, accion = "⭐", "Aumentar +10%"
+        elif score > 50:
+            categoria, accion = "✅", "Mantener"
+        elif score > 25:
+            categoria, accion = "⚠️", "Revisar"
+        else:
+            categoria = "❌"
+            accion = "Descontinuar" if dias_sin_venta > 60 else "Evaluar descarte"
+
+        resultados.append({
+            'Categoria': categoria,
+            'Codigo': codigo,
+            'Descripcion': prod['Descripcion'],
+            'Proveedor': prod['Proveedor'],
+            'Prom_3M_Unidades': promedio_3m_unidades,
+            'Tendencia': tendencia_icono,
+            'Rotacion': rotacion_promedio,
+            'Margen_Pct': margen_pct,
+            'Costo_Unitario': costo_unitario,
+            'Precio_Venta_Unitario': precio_venta_unitario,
+            'Score': score,
+            'Unidades_A_Comprar': unidades_finales,
+            'Pesos_A_Comprar': pesos_a_comprar,
+            'Unidades_A_Vender': unidades_finales,
+            'Pesos_A_Vender': pesos_a_vender,
+            'Margen_Unitario': precio_venta_unitario - costo_unitario,
+            'Margen_Total': margen_total,
+            'Margen_Pct_Proyectado': margen_pct_proyectado,
+            'Accion': accion,
+            'Dias_Sin_Venta': dias_sin_venta,
+            'CV': cv
+        })
+    return pd.DataFrame(resultados)
+
+
+def _ventas(codigo, meses, cantidades, precio=100.0, costo=60.0, proveedor='PROV A'):
+    """Una venta por mes (el día 10) con las cantidades dadas"""
+    filas = []
+    for mes, cantidad in zip(meses, cantidades):
+        filas.append({
+            'Codigo': codigo,
+            'Descripcion': f"PRODUCTO {codigo}",
+            'Proveedor': proveedor,
+            'Fecha': pd.Timestamp(f"{mes}-10"),
+            'Cantidad': cantidad,
+            'Venta_Total': abs(cantidad) * precio,
+            'Costo_Total': abs(cantidad) * costo,
+            'Margen': abs(cantidad) * (precio - costo),
+        })
+    return filas
+
+
+def historico_fijo():
+    meses_6 = ['2024-01', '2024-02', '2024-03', '2024-04', '2024-05', '2024-06']
+    filas = []
+    filas += _ventas('A', meses_6, [10, 12, 15, 18, 20, 25])                         # sube
+    filas += _ventas('B', ['2024-06'], [7])                                          # un solo mes: CV NaN
+    filas += _ventas('C', meses_6, [40, 35, 30, 20, 12, 5], precio=50, costo=45)     # baja
+    filas += _ventas('D', ['2024-02', '2024-03', '2024-04'], [0, 0, 0])              # sin unidades
+    filas += _ventas('E', ['2024-01', '2024-02'], [3, -2], precio=20, costo=25)      # margen negativo
+    filas += _ventas('F', ['2024-01', '2024-02', '2024-03'], [5, 50, 1])             # CV alto, viejo
+    filas += _ventas('G', meses_6, [8, 8, 8, 8, 8, 8], proveedor='PROV B')           # estable
+
+    # Productos al azar (semilla fija) para cubrir más combinaciones
+    rng = np.random.default_rng(7)
+    for i in range(40):
+        n = int(rng.integers(1, 7))
+        meses = [f"2024-{m:02d}" for m in sorted(rng.choice(range(1, 7), n, replace=False))]
+        cantidades = rng.integers(-3, 60, n).tolist()
+        filas += _ventas(f"R{i:02d}", meses, cantidades,
+                         precio=float(rng.integers(10, 200)), costo=float(rng.integers(5, 150)),
+                         proveedor=f"PROV {'ABC'[i % 3]}")
+    # Dos ventas en el mismo mes de un producto ya existente
+    filas += _ventas('A', ['2024-06'], [4])
+    return pd.DataFrame(filas)
+
+
+ROTACION = {'A': 0.9, 'C': 0.2, 'F': 1.4, 'R03': 0.75, 'R10': 0.1}
+
+
+def _comparar(resultado, esperado):
+    resultado = resultado.sort_values('Codigo').reset_index(drop=True)
+    esperado = esperado.sort_values('Codigo').reset_index(drop=True)[COLUMNAS_PRESUPUESTO]
+    pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize('categorias', [False, True])
+def test_igual_al_calculo_por_producto(categorias):
+    df_hist = historico_fijo()
+    if categorias:
+        df_hist = df_hist.astype({'Codigo': 'category', 'Descripcion': 'category', 'Proveedor': 'category'})
+    rotacion = pd.Series(ROTACION, dtype=float)
+
+    resultado = calcular_presupuesto(df_hist, rotacion=rotacion, ahora=AHORA, **PESOS)
+    esperado = presupuesto_iterrows(df_hist, rotacion=ROTACION, ahora=AHORA, **PESOS)
+
+    assert len(resultado) == df_hist['Codigo'].nunique()
+    _comparar(resultado.astype({'Codigo': str, 'Descripcion': str, 'Proveedor': str}),
+              esperado.astype({'Codigo': str, 'Descripcion': str, 'Proveedor': str}))
+
+
+def test_sin_rotacion_usa_el_default():
+    df_hist = historico_fijo()
+    resultado = calcular_presupuesto(df_hist, ahora=AHORA, **PESOS)
+    esperado = presupuesto_iterrows(df_hist, rotacion={}, ahora=AHORA, **PESOS)
+    _comparar(resultado, esperado)
+
+
+def test_un_solo_mes_cv_nan():
+    df_hist = pd.DataFrame(_ventas('B', ['2024-06'], [7]))
+    resultado = calcular_presupuesto(df_hist, ahora=AHORA, **PESOS)
+    esperado = presupuesto_iterrows(df_hist, rotacion={}, ahora=AHORA, **PESOS)
+
+    fila = resultado.iloc[0]
+    assert np.isnan(fila['CV'])
+    assert fila['Tendencia'] == "→"
+    assert fila['Prom_3M_Unidades'] == 7
+    # Venta máxima (40) + margen del 40% (30) + rotación default (10); el CV
+    # NaN no suma estabilidad, como max(0, 1 - min(nan, 1)) = 0 en el loop
+    assert fila['Score'] == pytest.approx(80)
+    _comparar(resultado, esperado)
+
+
+def test_historico_vacio():
+    vacio = historico_fijo().iloc[0:0]
+    resultado = calcular_presupuesto(vacio, ahora=AHORA, **PESOS)
+    assert resultado.empty
+    assert list(resultado.columns) == COLUMNAS_PRESUPUESTO
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from yunta.pricing import (
+    MARGEN_MINIMO, metricas_precios, rentabilidad, resolver_diferencia_margen, resumen_simulacion,
+    simular_precios,
+)
+
+# ============================================================================
+# EQUIVALENCIA CON EL CÁLCULO POR FILA Y BÚSQUEDA DEL MARGEN OBJETIVO
+# ============================================================================
+# calcular_aumento_fila es la versión que simular_precios aplicaba con
+# df.apply(axis=1) antes del cálculo sobre arrays. La simulación tiene que
+# dar lo mismo para cada estrategia, con protegidos, precios o costos en
+# cero o vacíos y márgenes negativos.
+
+ESTRATEGIAS = [
+    "🎯 Inteligente (más a productos con bajo margen y alta rotación)",
+    "📊 Uniforme (mismo % a todos los productos)",
+    "🏭 Por Proveedor (seleccionar proveedores específicos)",
+]
+
+
+def calcular_aumento_fila(row, estrategia, diferencia_margen, factor_ajuste=1):
+    if row['Precio_Actual'] <= 0 or pd.isna(row['Precio_Actual']):
+        return 0
+    if row['Costo_Promedio'] <= 0 or pd.isna(row['Costo_Promedio']):
+        return 0
+    if row['Protegido']:
+        return 0
+    if row['Margen_Pct'] < 0:
+        precio_minimo = row['Costo_Promedio'] * (1 + MARGEN_MINIMO)
+        if row['Precio_Actual'] > 0:
+            aumento = ((precio_minimo / row['Precio_Actual']) - 1) * 100
+            return max(aumento, 0)
+        else:
+            return 0
+    if "Inteligente" in estrategia:
+        factor_margen = max(0, (30 - row['Margen_Pct']) / 30)
+        factor_rotacion = min(row['Rotacion_Pct'] / 1, 1)
+        aumento_base = diferencia_margen * 1.5
+        aumento = aumento_base * (0.5 + factor_margen * 0.5) * (0.8 + factor_rotacion * 0.4)
+        return max(0.5, min(10, aumento))
+    elif "Uniforme" in estrategia:
+        return diferencia_margen * factor_ajuste
+    else:
+        return diferencia_margen
+
+
+def simular_precios_apply(df_productos_precio, estrategia, diferencia_margen, protegidos):
+    df_simulacion = df_productos_precio.copy()
+    df_simulacion['Protegido'] = df_simulacion['Descripcion'].isin(protegidos)
+    productos_no_protegidos = int((~df_simulacion['Protegido']).sum())
+    factor_ajuste = len(df_simulacion) / productos_no_protegidos if productos_no_protegidos > 0 else 1
+    df_simulacion['Aumento_Pct'] = df_simulacion.apply(
+        lambda row: calcular_aumento_fila(row, estrategia, diferencia_margen, factor_ajuste),
+        axis=1
+    )
+    df_simulacion['Precio_Nuevo'] = df_simulacion['Precio_Actual'] * (1 + df_simulacion['Aumento_Pct'] / 100)
+    costo_sim_safe = df_simulacion['Costo_Promedio'].replace(0, pd.NA)
+    df_simulacion['Margen_Nuevo_Pct'] = (
+        (df_simulacion['Precio_Nuevo'] - df_simulacion['Costo_Promedio']) /
+        costo_sim_safe * 100
+    ).fillna(0)
+    df_simulacion['Margen_Nuevo_Total'] = (
+        (df_simulacion['Precio_Nuevo'] - df_simulacion['Costo_Promedio']) *
+        df_simulacion['Unidades_Vendidas']
+    )
+    df_simulacion['Impacto_Ganancia'] = df_simulacion['Margen_Nuevo_Total'] - df_simulacion['Margen_Total']
+    return df_simulacion.sort_values('Impacto_Ganancia', ascending=False)
+
+
+def _productos(n=300, semilla=1):
+    """metricas_precios sobre ventas agregadas por producto, con casos borde al principio"""
+    azar = np.random.default_rng(semilla)
+    cantidad = azar.integers(1, 500, n).astype(float)
+    costo = np.round(azar.uniform(50, 2000, n), 2)
+    precio = np.round(costo * azar.uniform(0.8, 1.6, n), 2)
+    ventas = pd.DataFrame({
+        'Codigo': [f'P{i:04d}' for i in range(n)],
+        'Descripcion': [f'Producto {i}' for i in range(n)],
+        'Proveedor': azar.choice(['A', 'B', 'C'], n),
+        'Cantidad': cantidad,
+        'Costo': costo,
+        'Precio_Unitario': precio,
+    })
+    # Sin precio, sin costo, costo vacío y precio vacío
+    ventas.loc[0, 'Precio_Unitario'] = 0.0
+    ventas.loc[1, 'Costo'] = 0.0
+    ventas.loc[2, 'Costo'] = np.nan
+    ventas.loc[3, 'Precio_Unitario'] = np.nan
+    ventas['Venta_Total'] = ventas['Precio_Unitario'] * ventas['Cantidad']
+    ventas['Costo_Total'] = ventas['Costo'] * ventas['Cantidad']
+    ventas['Margen'] = ventas['Venta_Total'] - ventas['Costo_Total']
+    return metricas_precios(ventas)
+
+
+@pytest.mark.parametrize('estrategia', ESTRATEGIAS)
+@pytest.mark.parametrize('diferencia_margen', [0.0, 3.5, 25.0])
+def test_igual_al_calculo_por_fila(estrategia, diferencia_margen):
+    df = _productos()
+    assert (df['Margen_Pct'] < 0).any()
+    protegidos = list(df['Descripcion'].iloc[[4, 10, 50]])
+
+    resultado = simular_precios(df, estrategia, diferencia_margen, protegidos)
+    esperado = simular_precios_apply(df, estrategia, diferencia_margen, protegidos)
+    pd.testing.assert_frame_equal(resultado, esperado)
+
+
+def _margen_simulado(df, estrategia, diferencia, protegidos):
+    _, costo_total, margen_total, _ = rentabilidad(df)
+    simulacion = simular_precios(df, estrategia, diferencia, protegidos)
+    return resumen_simulacion(simulacion, costo_total, margen_total)[1]
+
+
+@pytest.mark.parametrize('estrategia', ESTRATEGIAS)
+def test_resolver_llega_al_objetivo(estrategia):
+    df = _productos(semilla=2)
+    protegidos = list(df['Descripcion'].iloc[:5])
+    _, costo_total, _, _ = rentabilidad(df)
+    # Sobre el margen que ya da la estrategia con diferencia 0 (margen
+    # negativo llevado al mínimo; Inteligente sube al menos 0.5%)
+    objetivo = _margen_simulado(df, estrategia, 0.0, protegidos) + 4
+
+    diferencia = resolver_diferencia_margen(df, estrategia, objetivo, protegidos, costo_total)
+    assert diferencia > 0
+    assert _margen_simulado(df, estrategia, diferencia, protegidos) == pytest.approx(objetivo, abs=1e-4)
+
+
+def test_resolver_sin_aumento_o_inalcanzable():
+    df = _productos(semilla=3)
+    _, costo_total, _, margen_actual = rentabilidad(df)
+
+    # Con diferencia 0 solo suben los de margen negativo: si ya alcanza, 0
+    margen_base = _margen_simulado(df, ESTRATEGIAS[1], 0.0, [])
+    assert resolver_diferencia_margen(df, ESTRATEGIAS[1], margen_base - 1, [], costo_total) == 0.0
+    assert resolver_diferencia_margen(df, ESTRATEGIAS[1], margen_actual, [], costo_total) == 0.0
+
+    # Inteligente sube como mucho 10% por producto
+    assert resolver_diferencia_margen(df, ESTRATEGIAS[0], margen_actual + 50, [], costo_total) is None
+    # Todo protegido: ninguna diferencia mueve el margen
+    todos = list(df['Descripcion'])
+    assert resolver_diferencia_margen(df, ESTRATEGIAS[1], margen_base + 5, todos, costo_total) is None
+    # Sin costo no hay margen sobre costo
+    assert resolver_diferencia_margen(df, ESTRATEGIAS[1], 30, [], 0) is None
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from yunta.rotacion import rotacion_por_codigo, ventas_post_recepcion
+
+# ============================================================================
+# RANGE JOIN CONTRA EL LOOP POR RECEPCIÓN
+# ============================================================================
+# rotacion_loop es el cálculo que hacía la página de Presupuestos: para cada
+# recepción de cada código, las ventas entre la fecha y `dias` después. Las
+# fechas vacías (NaT) de ventas o recepciones no pueden romper las claves.
+
+
+def rotacion_loop(recepciones, ventas, dias):
+    rotaciones_por_codigo = {}
+    for codigo, recepciones_prod in recepciones.groupby('Codigo', observed=True):
+        ventas_producto = ventas[ventas['Codigo'] == codigo]
+        rotaciones = []
+        for fecha_recep, cantidad in zip(recepciones_prod['Fecha'], recepciones_prod['Cantidad']):
+            fecha_fin = fecha_recep + timedelta(days=dias)
+            ventas_ventana = ventas_producto[
+                (ventas_producto['Fecha'] >= fecha_recep) &
+                (ventas_producto['Fecha'] <= fecha_fin)
+            ]['Cantidad'].abs().sum()
+            if abs(cantidad) > 0:
+                rotaciones.append(ventas_ventana / abs(cantidad))
+        if rotaciones:
+            rotaciones_por_codigo[codigo] = np.mean(rotaciones)
+    return pd.Series(rotaciones_por_codigo, dtype=float)
+
+
+def _movimientos(n, semilla, con_nat):
+    azar = np.random.default_rng(semilla)
+    fechas = pd.Timestamp('2024-01-01') + pd.to_timedelta(azar.integers(0, 90 * 24, n), unit='h')
+    df = pd.DataFrame({
+        'Codigo': azar.choice([f'P{i}' for i in range(30)], n),
+        'Fecha': fechas,
+        'Cantidad': -azar.integers(0, 20, n).astype(float),
+    })
+    if con_nat:
+        df.loc[azar.choice(n, n // 10, replace=False), 'Fecha'] = pd.NaT
+    return df
+
+
+@pytest.mark.parametrize('con_nat', [False, True])
+@pytest.mark.parametrize('dias', [0, 7, 30])
+def test_igual_al_loop(con_nat, dias):
+    ventas = _movimientos(3000, 1, con_nat)
+    recepciones = _movimientos(200, 2, con_nat).assign(Cantidad=lambda d: d['Cantidad'].abs())
+
+    resultado = rotacion_por_codigo(recepciones, ventas, dias=dias)
+    esperado = rotacion_loop(recepciones, ventas, dias)
+    pd.testing.assert_series_equal(
+        resultado.sort_index(), esperado.sort_index(), check_names=False, check_index_type=False
+    )
+
+
+def test_fechas_vacias():
+    ventas = pd.DataFrame({
+        'Codigo': ['A', 'A', 'A'],
+        'Fecha': pd.to_datetime(['2024-01-02', None, '2024-01-03']),
+        'Cantidad': [-2.0, -100.0, -3.0],
+    })
+    recepciones = pd.DataFrame({
+        'Codigo': ['A', 'A'],
+        'Fecha': pd.to_datetime(['2024-01-01', None]),
+        'Cantidad': [10.0, 10.0],
+    })
+    detalle = ventas_post_recepcion(recepciones, ventas, dias=7)
+    assert list(detalle['Ventas_Ventana']) == [5.0, 0.0]
+    assert list(detalle['Rotacion']) == [0.5, 0.0]
+
+    # Todo sin fecha
+    detalle = ventas_post_recepcion(recepciones.assign(Fecha=pd.NaT), ventas.assign(Fecha=pd.NaT))
+    assert list(detalle['Ventas_Ventana']) == [0.0, 0.0]
@@ -0,0 +1 @@
+"""Cálculos reutilizables de YUNTA Intelligence (sin dependencias de Streamlit)."""
@@ -0,0 +1,232 @@
+import glob
+import hashlib
+import os
+from pathlib import Path
+
+import duckdb
+
+from yunta.cubo import crear_cubo_ventas
+
+# ============================================================================
+# BASE DUCKDB PERSISTENTE
+# ============================================================================
+# Copia de MOVIMIENTOS_STOCK_PowerBI.parquet en un archivo .duckdb:
+# - filas ordenadas por (Fecha, Tienda, Codigo) para que los filtros de
+#   fecha descarten row groups completos por sus zone maps (min/max)
+# - Tienda, Proveedor y Tipo_Movimiento guardados como ENUM; la vista
+#   "movimientos" las expone tal cual y la tabla _enums guarda el tipo de
+#   cada una. Los filtros comparan contra valores convertidos a ese ENUM
+#   (ver literal_enum): comparar con texto haría que DuckDB pase la columna
+#   a VARCHAR fila por fila y no descarte row groups
+# - el cubo ventas_diarias ya materializado (la app la abre solo lectura)
+# Solo se reconstruye si cambia el contenido del parquet (mtime/tamaño y,
+# si eso difiere, el SHA-256). La reconstrucción es completa: los días nuevos
+# se agregan sin rehacerla con yunta.ingesta (deltas).
+#
+# Windows no deja reemplazar ni borrar un archivo que otro proceso tiene
+# abierto, y la app mantiene la base abierta mientras corre. Por eso cada
+# reconstrucción o ingesta publica una versión nueva al lado
+# (MOVIMIENTOS_STOCK.1.duckdb, MOVIMIENTOS_STOCK.2.duckdb...) y quien abre la
+# base toma la más nueva (base_actual). Las versiones anteriores se borran si
+# se puede; la que la app todavía tiene abierta se borra en la próxima.
+
+ARCHIVO_BASE = "MOVIMIENTOS_STOCK.duckdb"
+
+COLUMNAS_ENUM = ['Tienda', 'Proveedor', 'Tipo_Movimiento']
+TABLA_ENUMS = "_enums"
+
+_BLOQUE_HASH = 8 * 1024 * 1024
+
+
+def _texto_sql(valor):
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def hash_archivo(ruta):
+    """SHA-256 del archivo leído por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(_BLOQUE_HASH), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _versiones(ruta_base):
+    """[(número, archivo)] de la base que existen, ordenadas (0 = ruta_base)"""
+    ruta_base = Path(ruta_base)
+    versiones = [(0, ruta_base)] if ruta_base.exists() else []
+    prefijo = ruta_base.stem + "."
+    for archivo in ruta_base.parent.glob(f"{glob.escape(prefijo)}*{ruta_base.suffix}"):
+        numero = archivo.name[len(prefijo):len(archivo.name) - len(ruta_base.suffix)]
+        if numero.isdigit():
+            versiones.append((int(numero), archivo))
+    return sorted(versiones)
+
+
+def base_actual(ruta_base):
+    """Versión más nueva de la base (ruta_base si todavía no hay ninguna)"""
+    versiones = _versiones(ruta_base)
+    return versiones[-1][1] if versiones else Path(ruta_base)
+
+
+def publicar_version(temporal, ruta_base):
+    """
+    Publica el archivo temporal como la versión más nueva de la base y borra
+    las anteriores que no estén abiertas. Devuelve la ruta publicada.
+    """
+    ruta_base = Path(ruta_base)
+    versiones = _versiones(ruta_base)
+    numero = versiones[-1][0] + 1 if versiones else 1
+    nueva = ruta_base.with_name(f"{ruta_base.stem}.{numero}{ruta_base.suffix}")
+    os.replace(temporal, nueva)
+    for _, anterior in versiones:
+        try:
+            anterior.unlink()
+        except OSError:
+            # Abierta por la app (Windows): queda hasta la próxima publicación
+            pass
+    return nueva
+
+
+def tipos_enum(con):
+    """
+    {columna: tipo ENUM} de las columnas ENUM de la vista movimientos ({} si
+    la conexión no es la base persistente)
+    """
+    try:
+        return dict(con.execute(f"SELECT columna, tipo FROM {TABLA_ENUMS}").fetchall())
+    except duckdb.Error:
+        return {}
+
+
+def literal_enum(valor, tipo):
+    """
+    Valor SQL comparable con una columna del tipo dado: con un ENUM se
+    convierte (NULL si no es uno de sus valores) y la comparación no pasa
+    la columna a texto. valor es un literal SQL o un placeholder "?".
+    """
+    return f"TRY_CAST({valor} AS {tipo})" if tipo else valor
+
+
+def huella_parquet(ruta_parquet):
+    """(mtime_ns, tamaño) del parquet"""
+    stat = Path(ruta_parquet).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def leer_huella(ruta_base):
+    """Huella guardada en la versión actual de la base: (mtime_ns, tamaño, sha256) o None"""
+    ruta_base = base_actual(ruta_base)
+    if not ruta_base.exists():
+        return None
+    try:
+        con = duckdb.connect(str(ruta_base), read_only=True)
+    except duckdb.Error:
+        return None
+    try:
+        return con.execute("SELECT mtime_ns, tamano, sha256 FROM _huella").fetchone()
+    except duckdb.Error:
+        return None
+    finally:
+        con.close()
+
+
+def base_vigente(ruta_base, ruta_parquet):
+    """True si la base corresponde al contenido actual del parquet"""
+    guardada = leer_huella(ruta_base)
+    if guardada is None:
+        return False
+    if tuple(guardada[:2]) == huella_parquet(ruta_parquet):
+        return True
+    # El archivo se tocó: solo es otra versión si cambió el contenido
+    return guardada[2] == hash_archivo(ruta_parquet)
+
+
+def huella_contenido(ruta_parquet, ruta_base=None):
+    """
+    SHA-256 del parquet. Si la base persistente guarda la huella del mismo
+    (mtime, tamaño) se reutiliza su hash en vez de recalcularlo.
+    """
+    if ruta_base is not None:
+        guardada = leer_huella(ruta_base)
+        if guardada is not None and tuple(guardada[:2]) == huella_parquet(ruta_parquet):
+            return guardada[2]
+    return hash_archivo(ruta_parquet)
+
+
+def _expresiones_columnas(con, origen):
+    """SELECT de la tabla base: ENUM para las columnas de texto repetidas, Fecha como TIMESTAMP"""
+    tipos = {fila[0]: fila[1] for fila in con.execute(f"DESCRIBE SELECT * FROM {origen}").fetchall()}
+    expresiones = []
+    for columna, tipo in tipos.items():
+        if columna in COLUMNAS_ENUM and tipo == 'VARCHAR':
+            con.execute(f"""
+                CREATE TYPE enum_{columna.lower()} AS ENUM (
+                    SELECT DISTINCT {columna} FROM {origen}
+                    WHERE {columna} IS NOT NULL ORDER BY 1
+                )
+            """)
+            expresiones.append(f"CAST({columna} AS enum_{columna.lower()}) AS {columna}")
+        elif columna == 'Fecha' and tipo == 'VARCHAR':
+            expresiones.append("CAST(Fecha AS TIMESTAMP) AS Fecha")
+        else:
+            expresiones.append(columna)
+    return expresiones, [c for c in COLUMNAS_ENUM if c in tipos and tipos[c] == 'VARCHAR']
+
+
+def construir_base(ruta_parquet, ruta_base, forzar=False):
+    """
+    Construye (o actualiza) la base persistente desde el parquet.
+
+    Devuelve True si se reconstruyó y False si ya estaba vigente. Se arma en
+    un archivo temporal que al final se publica como versión nueva, así
+    nunca queda una base a medio escribir.
+    """
+    ruta_base = Path(ruta_base)
+    mtime_ns, tamano = huella_parquet(ruta_parquet)
+    guardada = leer_huella(ruta_base)
+
+    if not forzar and guardada is not None:
+        if tuple(guardada[:2]) == (mtime_ns, tamano):
+            return False
+        sha = hash_archivo(ruta_parquet)
+        if guardada[2] == sha:
+            # Mismo contenido con otra fecha de modificación: solo se actualiza la
+            # huella (si la app la tiene abierta se reintenta en la próxima corrida)
+            try:
+                con = duckdb.connect(str(base_actual(ruta_base)))
+                con.execute("UPDATE _huella SET mtime_ns = ?, tamano = ?", [mtime_ns, tamano])
+                con.close()
+            except duckdb.Error:
+                pass
+            return False
+    else:
+        sha = hash_archivo(ruta_parquet)
+
+    temporal = ruta_base.with_name(ruta_base.name + ".tmp")
+    if temporal.exists():
+        temporal.unlink()
+
+    origen = f"read_parquet({_texto_sql(Path(ruta_parquet).as_posix())})"
+    con = duckdb.connect(str(temporal))
+    try:
+        expresiones, enums = _expresiones_columnas(con, origen)
+        con.execute(f"""
+            CREATE TABLE movimientos_base AS
+            SELECT {', '.join(expresiones)}
+            FROM {origen}
+            ORDER BY Fecha, Tienda, Codigo
+        """)
+        con.execute(f"CREATE TABLE {TABLA_ENUMS} (columna VARCHAR, tipo VARCHAR)")
+        for columna in enums:
+            con.execute(f"INSERT INTO {TABLA_ENUMS} VALUES (?, ?)", [columna, f"enum_{columna.lower()}"])
+        con.execute("CREATE VIEW movimientos AS SELECT * FROM movimientos_base")
+        crear_cubo_ventas(con)
+        con.execute("CREATE TABLE _huella (mtime_ns BIGINT, tamano BIGINT, sha256 VARCHAR)")
+        con.execute("INSERT INTO _huella VALUES (?, ?, ?)", [mtime_ns, tamano, sha])
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+
+    publicar_version(temporal, ruta_base)
+    return True
@@ -0,0 +1,119 @@
+import functools
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# ============================================================================
+# ÍNDICE DE BÚSQUEDA DE PRODUCTOS
+# ============================================================================
+# Las cajas "Código o Descripción" filtraban con str.contains sobre cada fila
+# del DataFrame filtrado (millones de strings por tecla). El índice se arma
+# una vez sobre el catálogo de productos distintos (Codigo, Descripcion):
+# - el texto de cada producto es "codigo descripcion" en minúsculas y sin
+#   acentos ("Azúcar" se encuentra con "azucar" y al revés)
+# - cada trigrama apunta a los productos que lo contienen; una consulta
+#   intersecta las listas de sus trigramas y confirma la subcadena solo en
+#   esos candidatos
+# - consultas de 1 o 2 caracteres recorren el catálogo (no las filas)
+#
+# El resultado es el conjunto de Codigos; los módulos filtran con isin.
+
+MAX_CONSULTAS_MEMO = 256
+
+# Separa código y descripción: ninguna consulta lo contiene, así que no hay
+# coincidencias que crucen de un campo al otro
+_SEPARADOR = "\x1f"
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los espacios seguidos colapsados en uno"""
+    texto = unicodedata.normalize('NFKD', str(texto).casefold())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _ESPACIOS.sub(" ", texto)
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceProductos:
+    """
+    Índice de trigramas sobre el catálogo (Codigo, Descripcion).
+
+    Un Codigo con varias descripciones aparece una vez por descripción;
+    buscar() devuelve cada código una sola vez.
+    """
+
+    def __init__(self, codigos, descripciones):
+        codigos = pd.Series(codigos, dtype=object).reset_index(drop=True)
+        descripciones = pd.Series(descripciones, dtype=object).reset_index(drop=True)
+        validos = codigos.notna().to_numpy()
+        self.codigos = codigos[validos].astype(str).to_numpy(dtype=object)
+        textos = [
+            normalizar(c) + _SEPARADOR + ("" if pd.isna(d) else normalizar(d))
+            for c, d in zip(self.codigos, descripciones[validos])
+        ]
+        self._textos = pa.array(textos, type=pa.string())
+
+        postings = defaultdict(list)
+        for i, texto in enumerate(textos):
+            for trigrama in _trigramas(texto):
+                postings[trigrama].append(i)
+        self._postings = {t: np.asarray(ids, dtype=np.int32) for t, ids in postings.items()}
+
+        self.buscar = functools.lru_cache(maxsize=MAX_CONSULTAS_MEMO)(self._buscar)
+
+    @classmethod
+    def desde_dataframe(cls, df, codigo='Codigo', descripcion='Descripcion'):
+        catalogo = df[[codigo, descripcion]].drop_duplicates()
+        return cls(catalogo[codigo], catalogo[descripcion])
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def _buscar(self, consulta):
+        """Codigos (array de str, sin repetir) de los productos que contienen la consulta"""
+        consulta = normalizar(consulta)
+        if not consulta:
+            return np.unique(self.codigos)
+
+        trigramas = _trigramas(consulta)
+        if trigramas:
+            listas = sorted((self._postings.get(t) for t in trigramas),
+                            key=lambda ids: -1 if ids is None else len(ids))
+            if listas[0] is None:
+                return np.array([], dtype=object)
+            candidatos = listas[0]
+            for ids in listas[1:]:
+                candidatos = np.intersect1d(candidatos, ids, assume_unique=True)
+                if len(candidatos) == 0:
+                    return np.array([], dtype=object)
+        else:
+            candidatos = np.arange(len(self.codigos), dtype=np.int32)
+
+        # Los trigramas no garantizan el orden: se confirma la subcadena
+        coincide = pc.match_substring(self._textos.take(candidatos), consulta)
+        encontrados = candidatos[coincide.to_numpy(zero_copy_only=False)]
+        return np.unique(self.codigos[encontrados])
+
+    def mascara(self, serie, consulta):
+        """
+        Máscara booleana de las filas cuyo Codigo coincide con la consulta.
+        Con una columna categórica se resuelve sobre las categorías.
+        """
+        codigos = self.buscar(consulta)
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            en_categorias = serie.cat.categories.astype(str).isin(codigos)
+            idx = serie.cat.codes.to_numpy()
+            return pd.Series((idx >= 0) & en_categorias[idx], index=serie.index)
+        return serie.astype(str).isin(codigos)
+
+    def filtrar(self, df, consulta, columna='Codigo'):
+        """Filas del DataFrame con productos que coinciden con la consulta"""
+        return df[self.mascara(df[columna], consulta)]
@@ -0,0 +1,355 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# CACHE DE RESULTADOS COMPARTIDA ENTRE SESIONES
+# ============================================================================
+# Reemplaza a @st.cache_data(ttl=3600) para las consultas que devuelven
+# DataFrames:
+# - la clave es (función, argumentos) dentro de la huella del parquet, así
+#   nada vence por tiempo y todo se descarta junto cuando cambian los datos
+# - en memoria se cuentan los bytes de cada DataFrame y, al pasar el límite,
+#   se desalojan los menos usados (LRU)
+# - opcionalmente cada resultado se guarda también como Parquet en disco
+#   (directorio/huella/clave.generacion.parquet) y sobrevive a reinicios
+# - las ingestas incrementales (yunta.ingesta) no cambian la huella: cada
+#   ingesta se identifica por el sha256 de su delta y cada resultado recuerda
+#   el conjunto de ingestas que vio (generación: huella corta del conjunto,
+#   en disco en _generaciones.json). Solo se descarta si una ingesta que no
+#   vio se superpone con su rango de fechas (los que no tienen rango se
+#   descartan con cualquier ingesta nueva) o si falta una que sí vio
+#
+# Los DataFrames se devuelven como copia superficial: con copy-on-write
+# (siempre activo desde pandas 3, por eso requirements.txt pide pandas>=3)
+# modificar el resultado no toca lo guardado.
+#
+# Parquet guarda las columnas Categorical pero al leerlas cada una trae su
+# propio CategoricalDtype: con fijar_categorias los resultados que vienen del
+# disco recuperan los dtypes compartidos de yunta.sentencias.tipos_categoricos.
+
+MAX_BYTES_DEFAULT = 512 * 1024 * 1024
+MAX_BYTES_DISCO_DEFAULT = 2 * 1024 * 1024 * 1024
+GENERACIONES = "_generaciones.json"
+
+
+def bytes_dataframe(df):
+    """Memoria ocupada por el DataFrame (incluye el contenido de los strings)"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _rangos_superpuestos(rango, desde, hasta):
+    return rango[0] <= hasta and desde <= rango[1]
+
+
+def restaurar_categorias(df, categorias):
+    """
+    Reemplaza el CategoricalDtype de las columnas categóricas por el
+    compartido de categorias (si todas sus categorías están en él).
+    """
+    for columna, tipo in categorias.items():
+        if columna not in df.columns or not isinstance(df[columna].dtype, pd.CategoricalDtype):
+            continue
+        actual = df[columna].array
+        if actual.dtype is tipo:
+            continue
+        posiciones = tipo.categories.get_indexer(actual.categories)
+        if (posiciones < 0).any():
+            continue
+        codigos = np.where(actual.codes >= 0, posiciones[actual.codes], -1)
+        df[columna] = pd.Categorical.from_codes(codigos, dtype=tipo)
+    return df
+
+
+def clave_llamada(nombre, args, kwargs):
+    """Clave estable de una llamada (mismo valor entre procesos)"""
+    texto = repr((nombre, args, sorted(kwargs.items())))
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+class CacheResultados:
+    """
+    Cache LRU de DataFrames con límite en bytes y nivel en disco opcional.
+
+    Se crea una sola vez por proceso (st.cache_resource) y la comparten
+    todas las sesiones.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES_DEFAULT, directorio=None,
+                 max_bytes_disco=MAX_BYTES_DISCO_DEFAULT):
+        self.max_bytes = max_bytes
+        self.max_bytes_disco = max_bytes_disco
+        self.directorio = Path(directorio) if directorio is not None else None
+        self.huella = None
+        self.categorias = {}
+        self.bytes_usados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()  # clave -> (DataFrame, bytes, generación, rango)
+        self._ingestas = []  # (id, 'YYYY-MM-DD', 'YYYY-MM-DD')
+        self._generaciones = {'0': frozenset()}  # generación -> ids de ingesta vistos
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Huella de los datos
+    # ------------------------------------------------------------------
+    def fijar_huella(self, huella):
+        """
+        Cambia la versión de los datos. Si es otra, se vacía la memoria y se
+        borran del disco los resultados de huellas anteriores.
+        """
+        huella = str(huella)
+        with self._lock:
+            if huella == self.huella:
+                return
+            self.huella = huella
+            self._entradas.clear()
+            self.bytes_usados = 0
+            self._ingestas = []
+            self._generaciones = {'0': frozenset()}
+            if self.directorio is not None and self.directorio.exists():
+                for viejo in self.directorio.iterdir():
+                    if viejo.is_dir() and viejo.name != huella:
+                        shutil.rmtree(viejo, ignore_errors=True)
+
+    def fijar_categorias(self, categorias):
+        """
+        {columna: CategoricalDtype} compartidos que se vuelven a aplicar a
+        los resultados leídos del disco.
+        """
+        self.categorias = dict(categorias or {})
+
+    def registrar_ingestas(self, ingestas):
+        """
+        Informa las ingestas aplicadas a los datos, como (id, fecha_desde,
+        fecha_hasta); id es estable (el sha256 del delta), no una posición.
+        Las nuevas desalojan de memoria solo los resultados cuyo rango de
+        fechas se superpone.
+        """
+        ingestas = sorted((str(i), str(d)[:10], str(h)[:10]) for i, d, h in ingestas)
+        with self._lock:
+            if ingestas == self._ingestas:
+                return
+            self._ingestas = ingestas
+            self._generaciones[self.generacion] = frozenset(i for i, _, _ in ingestas)
+            for clave, (_, tamano, generacion, rango) in list(self._entradas.items()):
+                if not self._vigente(generacion, rango):
+                    del self._entradas[clave]
+                    self.bytes_usados -= tamano
+
+    @property
+    def generacion(self):
+        """Huella corta del conjunto de ingestas actual ('0' sin ingestas)"""
+        if not self._ingestas:
+            return '0'
+        return hashlib.sha1(",".join(i for i, _, _ in self._ingestas).encode('utf-8')).hexdigest()[:16]
+
+    def _vigente(self, generacion, rango):
+        """
+        False si alguna ingesta que la generación no vio toca el rango, si
+        falta alguna que vio o si la generación es desconocida.
+        """
+        vistas = self._generaciones.get(generacion)
+        if vistas is None:
+            vistas = self._leer_generaciones().get(generacion)
+            if vistas is None:
+                return False
+            self._generaciones[generacion] = vistas
+        actuales = {id_ingesta for id_ingesta, _, _ in self._ingestas}
+        if not vistas <= actuales:
+            return False
+        for id_ingesta, desde, hasta in self._ingestas:
+            if id_ingesta in vistas:
+                continue
+            if rango is None or _rangos_superpuestos(rango, desde, hasta):
+                return False
+        return True
+
+    def _leer_generaciones(self):
+        """{generación: ids vistos} guardado en disco para la huella actual"""
+        if self.directorio is None or self.huella is None:
+            return {}
+        try:
+            datos = json.loads((self.directorio / self.huella / GENERACIONES).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        return {generacion: frozenset(ids) for generacion, ids in datos.items()}
+
+    def _registrar_generacion(self, generacion):
+        """Agrega la generación a _generaciones.json (para leer el disco después de reiniciar)"""
+        ruta = self.directorio / self.huella / GENERACIONES
+        guardadas = self._leer_generaciones()
+        if generacion in guardadas:
+            return
+        guardadas[generacion] = self._generaciones[generacion]
+        temporal = ruta.with_suffix('.tmp')
+        temporal.write_text(
+            json.dumps({g: sorted(ids) for g, ids in guardadas.items()}), encoding='utf-8'
+        )
+        os.replace(temporal, ruta)
+
+    def _archivo(self, clave, generacion):
+        return self.directorio / self.huella / f"{clave}.{generacion}.parquet"
+
+    # ------------------------------------------------------------------
+    # Lectura / escritura
+    # ------------------------------------------------------------------
+    def obtener(self, clave, rango=None):
+        """
+        DataFrame guardado para la clave, o None. rango = (desde, hasta)
+        'YYYY-MM-DD' de los datos que usa el resultado (None = todos).
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[0].copy(deep=False)
+
+        leido = self._leer_disco(clave, rango)
+        with self._lock:
+            if leido is None:
+                self.fallos += 1
+                return None
+            df, generacion = leido
+            self.aciertos += 1
+            self._guardar_memoria(clave, df, generacion, rango)
+            return df.copy(deep=False)
+
+    def guardar(self, clave, df, rango=None):
+        """Guarda el DataFrame en memoria (y en disco si está habilitado)"""
+        with self._lock:
+            generacion = self.generacion
+            self._guardar_memoria(clave, df, generacion, rango)
+        self._escribir_disco(clave, df, generacion)
+
+    def _guardar_memoria(self, clave, df, generacion, rango):
+        tamano = bytes_dataframe(df)
+        anterior = self._entradas.pop(clave, None)
+        if anterior is not None:
+            self.bytes_usados -= anterior[1]
+        if tamano > self.max_bytes:
+            return
+        self._entradas[clave] = (df, tamano, generacion, rango)
+        self.bytes_usados += tamano
+        while self.bytes_usados > self.max_bytes:
+            _, (_, liberado, _, _) = self._entradas.popitem(last=False)
+            self.bytes_usados -= liberado
+
+    def _leer_disco(self, clave, rango):
+        """(DataFrame, generación) desde disco si sigue vigente, o None"""
+        if self.directorio is None or self.huella is None:
+            return None
+        for archivo in (self.directorio / self.huella).glob(f"{clave}.*.parquet"):
+            generacion = archivo.name.split('.')[1]
+            if not self._vigente(generacion, rango):
+                archivo.unlink(missing_ok=True)
+                continue
+            try:
+                df = pd.read_parquet(archivo)
+            except (OSError, ValueError):
+                return None
+            restaurar_categorias(df, self.categorias)
+            # El mtime marca el último uso para el desalojo en disco
+            try:
+                os.utime(archivo)
+            except OSError:
+                pass
+            return df, generacion
+        return None
+
+    def _escribir_disco(self, clave, df, generacion):
+        if self.directorio is None or self.huella is None:
+            return
+        archivo = self._archivo(clave, generacion)
+        temporal = archivo.with_suffix('.tmp')
+        try:
+            archivo.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self._registrar_generacion(generacion)
+            df.to_parquet(temporal)
+            os.replace(temporal, archivo)
+        except (OSError, ValueError, TypeError):
+            # Tipos que no entran en Parquet: queda solo en memoria
+            temporal.unlink(missing_ok=True)
+            return
+        for anterior in archivo.parent.glob(f"{clave}.*.parquet"):
+            if anterior != archivo:
+                anterior.unlink(missing_ok=True)
+        self._podar_disco()
+
+    def _podar_disco(self):
+        """Borra los archivos usados hace más tiempo hasta entrar en max_bytes_disco"""
+        carpeta = self.directorio / self.huella
+        archivos = []
+        for archivo in carpeta.glob('*.parquet'):
+            try:
+                stat = archivo.stat()
+            except OSError:
+                continue
+            archivos.append((stat.st_mtime_ns, stat.st_size, archivo))
+        total = sum(tamano for _, tamano, _ in archivos)
+        for _, tamano, archivo in sorted(archivos, key=lambda a: a[0]):
+            if total <= self.max_bytes_disco:
+                break
+            archivo.unlink(missing_ok=True)
+            total -= tamano
+
+    def limpiar(self):
+        """Vacía la memoria (el disco de la huella actual se conserva)"""
+        with self._lock:
+            self._entradas.clear()
+            self.bytes_usados = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self.bytes_usados,
+                'max_bytes': self.max_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+            }
+
+    # ------------------------------------------------------------------
+    # Decorador
+    # ------------------------------------------------------------------
+    def cacheado(self, funcion=None, *, desde='fecha_desde_str', hasta='fecha_hasta_str'):
+        """
+        Decorador: guarda el DataFrame que devuelve la función por argumentos.
+        Los argumentos tienen que tener un repr estable (str, números, tuplas).
+
+        Si la función tiene parámetros llamados como desde/hasta, sus valores
+        son el rango de fechas del resultado (para invalidar por ingestas).
+        """
+        if funcion is None:
+            return functools.partial(self.cacheado, desde=desde, hasta=hasta)
+
+        nombre = funcion.__qualname__
+        firma = inspect.signature(funcion)
+        con_rango = desde in firma.parameters and hasta in firma.parameters
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            clave = clave_llamada(nombre, args, kwargs)
+            rango = None
+            if con_rango:
+                valores = firma.bind(*args, **kwargs).arguments
+                rango = (str(valores[desde])[:10], str(valores[hasta])[:10])
+            df = self.obtener(clave, rango)
+            if df is None:
+                df = funcion(*args, **kwargs)
+                self.guardar(clave, df, rango)
+                df = df.copy(deep=False)
+            return df
+
+        return envoltura
@@ -0,0 +1,225 @@
+from yunta.base import literal_enum, tipos_enum
+from yunta.cubo import TABLA_CUBO
+from yunta.particiones import filtro_particion
+from yunta.sentencias import consultar
+
+# ============================================================================
+# CONSULTAS AGREGADAS SOBRE EL CUBO DIARIO
+# ============================================================================
+# Cada consulta agrupa ventas_diarias en DuckDB y devuelve solo el resultado
+# chico (una fila por grupo). Los filtros viajan como parámetros de una
+# sentencia preparada (ver yunta.sentencias), nunca concatenados en el SQL.
+
+AGRUPACIONES = {
+    'total': [],
+    'fecha': ['Fecha'],
+    'mes': ['Año', 'Mes'],
+    'tienda': ['Tienda'],
+    'proveedor': ['Proveedor'],
+    'producto': ['Codigo', 'Descripcion', 'Proveedor'],
+    'producto_tienda': ['Codigo', 'Descripcion', 'Tienda'],
+}
+
+_EXPRESIONES_CLAVE = {
+    'Año': 'CAST(EXTRACT(year FROM Fecha) AS INTEGER)',
+    'Mes': 'CAST(EXTRACT(month FROM Fecha) AS INTEGER)',
+}
+
+_MEDIDAS = """
+    COALESCE(SUM(Venta_Total), 0) AS Venta_Total,
+    COALESCE(SUM(Costo_Total), 0) AS Costo_Total,
+    COALESCE(SUM(Margen), 0) AS Margen,
+    COALESCE(SUM(Cantidad), 0) AS Cantidad,
+    CAST(COALESCE(SUM(Transacciones), 0) AS BIGINT) AS Transacciones,
+    SUM(Suma_Costo) / NULLIF(SUM(N_Costo), 0) AS Costo,
+    SUM(Venta_Total) / NULLIF(SUM(N_Precio_Venta), 0) AS Precio_Venta,
+    SUM(Suma_Precio_Unitario) / NULLIF(SUM(N_Precio_Unitario), 0) AS Precio_Unitario,
+    MIN(Fecha) AS Primera_Venta,
+    MAX(Fecha) AS Ultima_Venta
+"""
+
+# Columnas por las que se puede ordenar el resultado
+_ORDENES = {'Venta_Total', 'Costo_Total', 'Margen', 'Cantidad', 'Transacciones'}
+
+
+def _en_lista(columna):
+    """
+    columna dentro de la lista VARCHAR[] del parámetro: semi-join contra los
+    valores desanidados, sin convertir la columna (Tienda, Proveedor y Codigo
+    ya son VARCHAR en el cubo)
+    """
+    return f"{columna} IN (SELECT unnest(CAST(? AS VARCHAR[])))"
+
+
+def filtro_ventas(fecha_desde, fecha_hasta, tiendas=None, proveedores=None, codigos=None):
+    """
+    WHERE parametrizado para el cubo: (sql, parámetros).
+
+    None = sin filtro; una lista vacía no deja pasar ninguna fila.
+    """
+    condiciones = ["Fecha >= CAST(? AS DATE)", "Fecha <= CAST(? AS DATE)"]
+    parametros = [str(fecha_desde), str(fecha_hasta)]
+    for columna, valores in (('Tienda', tiendas), ('Proveedor', proveedores), ('Codigo', codigos)):
+        if valores is not None:
+            condiciones.append(_en_lista(columna))
+            parametros.append([str(v) for v in valores])
+    return " AND ".join(condiciones), parametros
+
+
+def agregar_cubo(con, agrupacion, fecha_desde, fecha_hasta, tiendas=None, proveedores=None,
+                 codigos=None, orden=None, limite=None):
+    """
+    Agrupa el cubo diario según AGRUPACIONES[agrupacion].
+
+    Devuelve las claves más Venta_Total, Costo_Total, Margen, Cantidad
+    (unidades absolutas), Transacciones, los promedios por venta Costo,
+    Precio_Venta y Precio_Unitario, y Primera_Venta / Ultima_Venta.
+    Los grupos con clave nula se descartan (igual que groupby de pandas).
+    """
+    claves = AGRUPACIONES[agrupacion]
+    where, parametros = filtro_ventas(fecha_desde, fecha_hasta, tiendas, proveedores, codigos)
+
+    select_claves = [f"{_EXPRESIONES_CLAVE.get(c, c)} AS {c}" for c in claves]
+    condiciones = [where] + [
+        f"{c} IS NOT NULL" for c in claves if c not in _EXPRESIONES_CLAVE
+    ]
+    sql = f"""
+        SELECT {', '.join(select_claves + [_MEDIDAS])}
+        FROM {TABLA_CUBO}
+        WHERE {' AND '.join(condiciones)}
+    """
+    if claves:
+        sql += " GROUP BY ALL"
+    if orden is not None:
+        if orden not in _ORDENES:
+            raise ValueError(f"Orden no soportado: {orden}")
+        sql += f" ORDER BY {orden} DESC"
+    elif claves:
+        sql += f" ORDER BY {', '.join(claves)}"
+    if limite is not None:
+        sql += " LIMIT ?"
+        parametros.append(int(limite))
+
+    return consultar(con, sql, parametros)
+
+
+# ============================================================================
+# FILAS DE MOVIMIENTOS POR PERÍODO Y TIENDAS
+# ============================================================================
+# Las mismas lecturas que usan los módulos de la app y reportes_batch.py.
+# tiendas es una secuencia de nombres; categorias, los dtypes de
+# tipos_categoricos para las columnas de dimensión (opcional).
+#
+# En la base persistente Tienda, Proveedor y Tipo_Movimiento son ENUM: los
+# filtros comparan contra valores convertidos a ese ENUM (así DuckDB filtra
+# sobre los códigos y descarta row groups) y el SELECT las devuelve como
+# VARCHAR, igual que desde el parquet.
+
+_SQL_VENTAS = """
+    SELECT
+        CAST(Fecha AS TIMESTAMP) AS Fecha,
+        CAST(Tienda AS VARCHAR) AS Tienda,
+        CAST(Codigo AS VARCHAR) AS Codigo,
+        Descripcion,
+        CAST(Tipo_Movimiento AS VARCHAR) AS Tipo_Movimiento,
+        Cantidad,
+        Costo,
+        Precio_Venta,
+        CAST(Proveedor AS VARCHAR) AS Proveedor,
+        Precio_Venta AS Venta_Total,
+        (Cantidad * Costo) AS Costo_Total,
+        (Precio_Venta - (Cantidad * Costo)) AS Margen,
+        CASE
+            WHEN Precio_Venta IS NULL OR Precio_Venta = 0 THEN 0
+            ELSE ((Precio_Venta - (Cantidad * Costo)) / Precio_Venta) * 100
+        END AS Margen_Pct
+    FROM movimientos
+    WHERE Tipo_Movimiento = {venta}
+      AND Fecha >= ? AND Fecha <= ?
+      AND {tiendas}
+      AND {meses}
+"""
+
+_SQL_VENTAS_DIARIAS = f"""
+    SELECT *
+    FROM {TABLA_CUBO}
+    WHERE Fecha >= ? AND Fecha <= ?
+      AND {_en_lista('Tienda')}
+"""
+
+# Columnas opcionales de los movimientos de stock (no todos los parquets las traen)
+COLUMNAS_OPCIONALES_STOCK = ['Tienda_Origen', 'Tienda_Destino', 'Numero_Documento']
+
+TIPOS_STOCK = ('Transferencia_Entrada', 'Transferencia_Salida', 'Recepción')
+
+
+def _filtro_tiendas(enums):
+    """Tienda dentro de la lista del parámetro (semi-join contra el ENUM en la base persistente)"""
+    if enums.get('Tienda'):
+        return f"Tienda IN (SELECT {literal_enum('unnest(?)', enums['Tienda'])})"
+    return _en_lista('Tienda')
+
+
+def _filtro_meses(fecha_desde, fecha_hasta, particionado):
+    """Condición sobre las columnas anio/mes de una vista particionada (y sus parámetros)"""
+    if not particionado:
+        return "TRUE", ()
+    return filtro_particion(str(fecha_desde), str(fecha_hasta))
+
+
+def ventas_filtradas(con, fecha_desde, fecha_hasta, tiendas, categorias=None, particionado=False):
+    """
+    Filas de venta con Venta_Total, Costo_Total, Margen y Margen_Pct por fila.
+
+    particionado=True agrega el filtro por anio/mes (vista hive de
+    yunta.particiones) para no abrir los archivos de otros meses.
+    """
+    enums = tipos_enum(con)
+    meses, parametros_meses = _filtro_meses(fecha_desde, fecha_hasta, particionado)
+    sql = _SQL_VENTAS.format(
+        venta=literal_enum("'Venta'", enums.get('Tipo_Movimiento')),
+        tiendas=_filtro_tiendas(enums),
+        meses=meses
+    )
+    parametros = (str(fecha_desde), str(fecha_hasta), tuple(tiendas)) + tuple(parametros_meses)
+    return consultar(con, sql, parametros, categorias)
+
+
+def ventas_diarias(con, fecha_desde, fecha_hasta, tiendas, categorias=None):
+    """Filas del cubo diario (ventas_diarias) para el período y tiendas"""
+    return consultar(con, _SQL_VENTAS_DIARIAS, (str(fecha_desde), str(fecha_hasta), tuple(tiendas)), categorias)
+
+
+def movimientos_stock(con, fecha_desde, fecha_hasta, tiendas, columnas, categorias=None,
+                      particionado=False):
+    """
+    Recepciones y transferencias con Costo_Total. columnas es la lista de
+    columnas de la vista movimientos: las de COLUMNAS_OPCIONALES_STOCK se
+    incluyen solo si existen. particionado como en ventas_filtradas.
+    """
+    enums = tipos_enum(con)
+    cols = [
+        "CAST(Fecha AS TIMESTAMP) AS Fecha",
+        "CAST(Tienda AS VARCHAR) AS Tienda",
+        "CAST(Codigo AS VARCHAR) AS Codigo",
+        "Descripcion",
+        "CAST(Tipo_Movimiento AS VARCHAR) AS Tipo_Movimiento",
+        "Cantidad",
+        "Costo",
+        "CAST(Proveedor AS VARCHAR) AS Proveedor"
+    ] + [c for c in COLUMNAS_OPCIONALES_STOCK if c in columnas]
+    cols_sql = ",\n ".join(cols)
+    tipos = ",".join(literal_enum(f"'{t}'", enums.get('Tipo_Movimiento')) for t in TIPOS_STOCK)
+    meses, parametros_meses = _filtro_meses(fecha_desde, fecha_hasta, particionado)
+    sql = f"""
+        SELECT
+            {cols_sql},
+            (Cantidad * Costo) AS Costo_Total
+        FROM movimientos
+        WHERE Fecha >= ? AND Fecha <= ?
+          AND {_filtro_tiendas(enums)}
+          AND {meses}
+          AND Tipo_Movimiento IN ({tipos})
+    """
+    parametros = (str(fecha_desde), str(fecha_hasta), tuple(tiendas)) + tuple(parametros_meses)
+    return consultar(con, sql, parametros, categorias)
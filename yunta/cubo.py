@@ -0,0 +1,132 @@
+import numpy as np
+
+# ============================================================================
+# CUBO DIARIO DE VENTAS
+# ============================================================================
+# Tabla materializada en DuckDB con una fila por Fecha × Tienda × Codigo ×
+# Descripcion × Proveedor. Cantidad guarda la suma de unidades en valor
+# absoluto (como la usan todos los módulos) y las columnas Suma_*/N_*
+# permiten reconstruir promedios por fila (Costo, Precio_Venta,
+# Precio_Unitario) sin volver a las filas crudas. Tienda y Proveedor quedan
+# como VARCHAR aunque la base persistente los guarde como ENUM (una ingesta
+# que amplía el ENUM no toca el cubo).
+
+TABLA_CUBO = "ventas_diarias"
+
+_SELECT_CUBO = """
+    SELECT
+        CAST(Fecha AS DATE) AS Fecha,
+        CAST(Tienda AS VARCHAR) AS Tienda,
+        CAST(Codigo AS VARCHAR) AS Codigo,
+        Descripcion,
+        CAST(Proveedor AS VARCHAR) AS Proveedor,
+        SUM(ABS(Cantidad)) AS Cantidad,
+        SUM(Precio_Venta) AS Venta_Total,
+        SUM(Cantidad * Costo) AS Costo_Total,
+        SUM(Precio_Venta - (Cantidad * Costo)) AS Margen,
+        COUNT(*) AS Transacciones,
+        SUM(Costo) AS Suma_Costo,
+        COUNT(Costo) AS N_Costo,
+        COUNT(Precio_Venta) AS N_Precio_Venta,
+        SUM(CASE WHEN Cantidad <> 0 THEN Precio_Venta / ABS(Cantidad) END) AS Suma_Precio_Unitario,
+        COUNT(CASE WHEN Cantidad <> 0 THEN Precio_Venta / ABS(Cantidad) END) AS N_Precio_Unitario
+    FROM movimientos
+    WHERE Tipo_Movimiento = 'Venta'{filtro}
+    GROUP BY ALL
+    ORDER BY Fecha, Tienda, Codigo
+"""
+
+SQL_CUBO_VENTAS = f"CREATE OR REPLACE TABLE {TABLA_CUBO} AS" + _SELECT_CUBO.format(filtro="")
+
+COLUMNAS_SUMA = [
+    'Cantidad', 'Venta_Total', 'Costo_Total', 'Margen', 'Transacciones',
+    'Suma_Costo', 'N_Costo', 'N_Precio_Venta', 'Suma_Precio_Unitario', 'N_Precio_Unitario'
+]
+
+
+def crear_cubo_ventas(con):
+    """Materializa el cubo diario dentro de la conexión DuckDB"""
+    con.execute(SQL_CUBO_VENTAS)
+
+
+def actualizar_cubo_ventas(con, fecha_desde, fecha_hasta):
+    """
+    Recalcula solo los días [fecha_desde, fecha_hasta] del cubo (después de
+    agregar movimientos de esas fechas) sin rehacer el resto.
+    """
+    parametros = [str(fecha_desde), str(fecha_hasta)]
+    con.execute(
+        f"DELETE FROM {TABLA_CUBO} WHERE Fecha BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)",
+        parametros
+    )
+    con.execute(
+        f"INSERT INTO {TABLA_CUBO}" + _SELECT_CUBO.format(
+            filtro="\n      AND CAST(Fecha AS DATE) BETWEEN CAST(? AS DATE) AND CAST(? AS DATE)"
+        ),
+        parametros
+    )
+
+
+def _promedio(suma, n):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n > 0, suma / n, np.nan)
+
+
+def agregar_ventas(df_diario, claves, fechas=False):
+    """
+    Reagrupa el cubo por las claves dadas.
+
+    Devuelve las sumas (Cantidad en unidades absolutas, Venta_Total,
+    Costo_Total, Margen, Transacciones) y los promedios por fila Costo,
+    Precio_Venta y Precio_Unitario. Con fechas=True agrega Primera_Venta y
+    Ultima_Venta.
+    """
+    grupos = df_diario.groupby(claves, observed=True)
+    df = grupos[COLUMNAS_SUMA].sum()
+    if fechas:
+        df['Primera_Venta'] = grupos['Fecha'].min()
+        df['Ultima_Venta'] = grupos['Fecha'].max()
+    df = df.reset_index()
+
+    df['Costo'] = _promedio(df['Suma_Costo'].to_numpy(dtype=float), df['N_Costo'].to_numpy())
+    df['Precio_Venta'] = _promedio(df['Venta_Total'].to_numpy(dtype=float), df['N_Precio_Venta'].to_numpy())
+    df['Precio_Unitario'] = _promedio(
+        df['Suma_Precio_Unitario'].to_numpy(dtype=float), df['N_Precio_Unitario'].to_numpy()
+    )
+    return df.drop(columns=['Suma_Costo', 'N_Costo', 'N_Precio_Venta', 'Suma_Precio_Unitario', 'N_Precio_Unitario'])
+
+
+def agregar_movimientos(df_ventas, claves, fechas=False):
+    """
+    Como agregar_ventas pero desde las filas de venta (Appgeneralv1 y
+    prueba.py no tienen cubo): mismas columnas, con Transacciones = filas.
+    Precio_Unitario promedia Precio_Venta / |Cantidad| de las filas con
+    cantidad distinta de cero.
+    """
+    cantidad = df_ventas['Cantidad'].abs()
+    filas = df_ventas[claves].assign(
+        Cantidad=cantidad,
+        Venta_Total=df_ventas['Venta_Total'],
+        Costo_Total=df_ventas['Costo_Total'],
+        Margen=df_ventas['Margen'],
+        Costo=df_ventas['Costo'],
+        Precio_Venta=df_ventas['Precio_Venta'],
+        Precio_Unitario=df_ventas['Precio_Venta'] / cantidad.where(cantidad != 0),
+    )
+    medidas = {
+        'Cantidad': ('Cantidad', 'sum'),
+        'Venta_Total': ('Venta_Total', 'sum'),
+        'Costo_Total': ('Costo_Total', 'sum'),
+        'Margen': ('Margen', 'sum'),
+        'Transacciones': ('Cantidad', 'size'),
+    }
+    if fechas:
+        filas['Fecha'] = df_ventas['Fecha']
+        medidas['Primera_Venta'] = ('Fecha', 'min')
+        medidas['Ultima_Venta'] = ('Fecha', 'max')
+    medidas.update({
+        'Costo': ('Costo', 'mean'),
+        'Precio_Venta': ('Precio_Venta', 'mean'),
+        'Precio_Unitario': ('Precio_Unitario', 'mean'),
+    })
+    return filas.groupby(claves, observed=True).agg(**medidas).reset_index()
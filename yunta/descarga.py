@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import requests
+
+# ============================================================================
+# DESCARGA CON CACHE EN DISCO
+# ============================================================================
+# Reemplaza requests.get(...).content + BytesIO para los parquet de Drive:
+# - cada archivo se guarda en el directorio de descargas con el SHA-256 de su
+#   contenido como nombre ({sha256}.parquet) y un índice JSON recuerda por URL
+#   el archivo, su ETag, tamaño y Last-Modified
+# - la verificación pide la URL con If-None-Match: un 304, o el mismo ETag /
+#   tamaño que lo guardado, cierra la respuesta sin leer el cuerpo, así que
+#   un reinicio o el vencimiento del cache de Streamlit cuestan una consulta
+#   de metadatos y no una descarga
+# - si cambió, el cuerpo se escribe a disco por bloques ({clave}.part)
+#   mientras se calcula el hash (nunca completo en memoria); una descarga
+#   cortada se retoma con Range / If-Range si el servidor da un ETag fuerte
+# - el archivo final se mueve con os.replace: nunca queda uno a medias
+# - si la consulta falla (sin red, timeout, error del servidor) y hay una
+#   copia guardada, se usa esa aunque pueda estar desactualizada
+#
+# Sin ETag, tamaño ni Last-Modified en la respuesta no hay cómo validar y se
+# descarga de nuevo (el contenido igual termina en el mismo archivo).
+
+DIRECTORIO_DESCARGAS = ".descargas"
+INDICE = "_indice.json"
+BLOQUE_BYTES = 1024 * 1024
+TIMEOUT = 60
+
+_lock = threading.Lock()
+
+
+def url_google_drive(file_id):
+    """URL de descarga directa de un archivo de Google Drive"""
+    return f"https://drive.google.com/uc?export=download&id={file_id}"
+
+
+def _clave(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _leer_json(ruta):
+    try:
+        return json.loads(Path(ruta).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _escribir_json(ruta, datos):
+    temporal = Path(f"{ruta}.tmp")
+    temporal.write_text(json.dumps(datos, indent=1, ensure_ascii=False), encoding='utf-8')
+    os.replace(temporal, ruta)
+
+
+def _pedir(sesion, url, encabezados=None):
+    """
+    GET en modo stream. Google Drive pide confirmar los archivos grandes con
+    una cookie download_warning: si aparece se repite con confirm=.
+    """
+    respuesta = sesion.get(url, headers=encabezados, stream=True, timeout=TIMEOUT)
+    for key, value in respuesta.cookies.items():
+        if key.startswith('download_warning'):
+            respuesta.close()
+            separador = '&' if '?' in url else '?'
+            respuesta = sesion.get(f"{url}{separador}confirm={value}", headers=encabezados,
+                                   stream=True, timeout=TIMEOUT)
+            break
+    return respuesta
+
+
+def _huella(respuesta):
+    """ETag, tamaño (si no viene comprimido) y Last-Modified de la respuesta"""
+    encabezados = respuesta.headers
+    tamano = encabezados.get('Content-Length')
+    return {
+        'etag': encabezados.get('ETag'),
+        'tamano': int(tamano) if tamano and not encabezados.get('Content-Encoding') else None,
+        'modificado': encabezados.get('Last-Modified'),
+    }
+
+
+def _vigente(entrada, huella):
+    """True si la huella de la respuesta coincide con la de lo guardado"""
+    if huella['etag']:
+        return huella['etag'] == entrada.get('etag') and huella['tamano'] in (None, entrada.get('tamano'))
+    if huella['tamano'] is not None and huella['modificado']:
+        return (huella['tamano'], huella['modificado']) == (entrada.get('tamano'), entrada.get('modificado'))
+    return False
+
+
+def _escribir(respuesta, parcial, inicio, bloque):
+    """Agrega el cuerpo a parcial desde el byte inicio; devuelve (sha256, bytes totales)"""
+    sha = hashlib.sha256()
+    if inicio:
+        with open(parcial, 'rb') as f:
+            for trozo in iter(lambda: f.read(bloque), b''):
+                sha.update(trozo)
+    total = inicio
+    with open(parcial, 'ab' if inicio else 'wb') as f:
+        for trozo in respuesta.iter_content(chunk_size=bloque):
+            f.write(trozo)
+            sha.update(trozo)
+            total += len(trozo)
+    return sha.hexdigest(), total
+
+
+def descargar(url, directorio=DIRECTORIO_DESCARGAS, extension='.parquet', sesion=None, bloque=BLOQUE_BYTES):
+    """
+    Ruta local del contenido de url, descargándolo solo si cambió desde la
+    última vez (ver el encabezado del módulo).
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    sesion = sesion or requests.Session()
+    clave = _clave(url)
+    parcial = directorio / f"{clave}.part"
+    huella_parcial = directorio / f"{clave}.part.json"
+
+    with _lock:
+        indice = _leer_json(directorio / INDICE)
+        entrada = indice.get(clave, {})
+        guardado = directorio / entrada['archivo'] if entrada.get('archivo') else None
+        if guardado is not None and not guardado.exists():
+            guardado = None
+
+        encabezados = {'If-None-Match': entrada['etag']} if guardado is not None and entrada.get('etag') else {}
+        respuesta = None
+        try:
+            respuesta = _pedir(sesion, url, encabezados)
+            if guardado is not None and (respuesta.status_code == 304 or _vigente(entrada, _huella(respuesta))):
+                return guardado
+            respuesta.raise_for_status()
+            huella = _huella(respuesta)
+
+            # Retomar lo que quedó de una descarga cortada del mismo contenido
+            inicio = 0
+            etag = huella['etag']
+            if (parcial.exists() and etag and not etag.startswith('W/')
+                    and _leer_json(huella_parcial).get('etag') == etag):
+                inicio = parcial.stat().st_size
+            if inicio:
+                respuesta.close()
+                respuesta = _pedir(sesion, url, {'Range': f"bytes={inicio}-", 'If-Range': etag})
+                respuesta.raise_for_status()
+                if respuesta.status_code != 206:
+                    inicio = 0
+            _escribir_json(huella_parcial, huella)
+            sha, total = _escribir(respuesta, parcial, inicio, bloque)
+        except requests.RequestException:
+            # Lo ya escrito en .part queda para retomar en el próximo intento
+            if guardado is None:
+                raise
+            return guardado
+        finally:
+            if respuesta is not None:
+                respuesta.close()
+
+        if huella['tamano'] is not None and total != huella['tamano']:
+            raise IOError(f"Descarga incompleta de {url}: {total:,} de {huella['tamano']:,} bytes")
+
+        archivo = f"{sha}{extension}"
+        os.replace(parcial, directorio / archivo)
+        huella_parcial.unlink(missing_ok=True)
+        anterior = entrada.get('archivo')
+        indice[clave] = {'url': url, 'archivo': archivo, 'bytes': total, **huella}
+        _escribir_json(directorio / INDICE, indice)
+
+        # El archivo anterior se borra si ninguna otra URL lo usa
+        if anterior and anterior != archivo and all(e.get('archivo') != anterior for e in indice.values()):
+            try:
+                (directorio / anterior).unlink(missing_ok=True)
+            except OSError:
+                # En Windows no se puede borrar si otro proceso lo tiene abierto:
+                # queda huérfano hasta que lo reemplace otra descarga
+                pass
+        return directorio / archivo
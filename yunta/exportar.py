@@ -0,0 +1,170 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+from openpyxl import Workbook
+
+from yunta.perfil import tramo
+
+# ============================================================================
+# EXPORTACIÓN A EXCEL EN STREAMING
+# ============================================================================
+# openpyxl en modo write_only escribe cada fila directo al XML de la hoja
+# (en un archivo temporal) en vez de armar el árbol de celdas completo en
+# memoria como pd.ExcelWriter. Las filas llegan por lotes de Arrow, así que
+# la fuente puede ser un DataFrame, una tabla Arrow o un RecordBatchReader
+# de DuckDB (con.execute(sql).fetch_record_batch()) sin pasar por pandas.
+#
+# Si los datos no entran en una hoja se reparten en Reporte_1, Reporte_2...
+# como hacía to_excel.
+
+MAX_FILAS_EXCEL = 1_048_576
+FILAS_POR_LOTE = 50_000
+
+# Últimos archivos generados por excel_diferido (hash del contenido -> bytes)
+MAX_ARCHIVOS_MEMO = 16
+_ARCHIVOS = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def _tabla_arrow(df):
+    """
+    Tabla Arrow del DataFrame. Las columnas object con tipos mezclados
+    (ej. [1, 'x', None]) no se pueden convertir y se pasan a texto,
+    conservando los vacíos.
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    df = df.copy()
+    for columna in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[columna], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[columna] = df[columna].astype(str)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _lotes(fuente, filas_por_lote):
+    """Lotes Arrow de un DataFrame, tabla Arrow o RecordBatchReader"""
+    if isinstance(fuente, pd.DataFrame):
+        for inicio in range(0, len(fuente), filas_por_lote):
+            parte = fuente.iloc[inicio:inicio + filas_por_lote]
+            yield from _tabla_arrow(parte).to_batches()
+    elif isinstance(fuente, pa.Table):
+        yield from fuente.to_batches(max_chunksize=filas_por_lote)
+    else:
+        yield from fuente
+
+
+def _columnas(fuente):
+    if isinstance(fuente, pd.DataFrame):
+        return [str(c) for c in fuente.columns]
+    return list(fuente.schema.names)
+
+
+def _valores(columna):
+    """Valores Python de una columna Arrow (fechas sin zona: Excel no las admite)"""
+    if pa.types.is_timestamp(columna.type) and columna.type.tz is not None:
+        columna = columna.cast(pa.timestamp(columna.type.unit))
+    elif pa.types.is_dictionary(columna.type):
+        columna = columna.dictionary_decode()
+    return columna.to_pylist()
+
+
+def _filas(lote):
+    return zip(*(_valores(columna) for columna in lote.columns))
+
+
+def escribir_excel(fuente, hoja='Reporte', filas_por_lote=FILAS_POR_LOTE,
+                   max_filas_hoja=MAX_FILAS_EXCEL):
+    """
+    Escribe la fuente en un .xlsx y devuelve un BytesIO posicionado al inicio.
+
+    Cada hoja lleva la fila de encabezados; si los datos superan
+    max_filas_hoja se reparten en hojas {hoja}_1, {hoja}_2...
+    """
+    filas_datos = max_filas_hoja - 1
+    wb = Workbook(write_only=True)
+    encabezados = None if fuente is None else _columnas(fuente)
+
+    if fuente is None or (isinstance(fuente, (pd.DataFrame, pa.Table)) and len(fuente) == 0):
+        wb.create_sheet(hoja).append(["Sin datos"])
+    else:
+        # Se cuenta el total cuando se conoce para saber si hace falta partir
+        total = len(fuente) if isinstance(fuente, (pd.DataFrame, pa.Table)) else None
+        partir = total is None or total > filas_datos
+        ws = None
+        en_hoja = 0
+        numero = 0
+        for lote in _lotes(fuente, filas_por_lote):
+            for fila in _filas(lote):
+                if ws is None or en_hoja == filas_datos:
+                    numero += 1
+                    ws = wb.create_sheet(f"{hoja}_{numero}" if partir else hoja)
+                    ws.append(encabezados)
+                    en_hoja = 0
+                ws.append(fila)
+                en_hoja += 1
+        if ws is None:
+            wb.create_sheet(hoja).append(["Sin datos"])
+        elif partir and numero == 1:
+            # Un reader que resultó entrar en una sola hoja
+            ws.title = hoja
+
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+# ============================================================================
+# DESCARGAS DIFERIDAS
+# ============================================================================
+# st.download_button acepta una función sin argumentos como data: Streamlit
+# la llama recién cuando se hace clic, en otro hilo. excel_diferido arma esa
+# función, así los reruns no serializan libros que nadie pidió, y guarda los
+# últimos archivos por hash del contenido para no regenerar el mismo dos
+# veces (también entre sesiones).
+
+
+def hash_contenido(df):
+    """Hash de columnas, tipos y valores del DataFrame (None si no se puede calcular)"""
+    try:
+        valores = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except TypeError:
+        return None
+    h = hashlib.sha1(valores.tobytes())
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode('utf-8'))
+    return h.hexdigest()
+
+
+def excel_diferido(fuente, hoja='Reporte'):
+    """
+    Función para st.download_button(data=...) que genera el .xlsx al hacer
+    clic. fuente es un DataFrame o una función que lo devuelve (para diferir
+    también la consulta).
+    """
+    def generar():
+        df = fuente() if callable(fuente) else fuente
+        clave = hash_contenido(df) if isinstance(df, pd.DataFrame) else None
+        if clave is not None:
+            clave = (clave, hoja)
+            with _LOCK:
+                if clave in _ARCHIVOS:
+                    _ARCHIVOS.move_to_end(clave)
+                    return _ARCHIVOS[clave]
+        with tramo(f"Excel {hoja}", None if df is None else len(df)) as t:
+            contenido = t.resultado(escribir_excel(df, hoja=hoja).getvalue())
+        if clave is not None:
+            with _LOCK:
+                _ARCHIVOS[clave] = contenido
+                while len(_ARCHIVOS) > MAX_ARCHIVOS_MEMO:
+                    _ARCHIVOS.popitem(last=False)
+        return contenido
+
+    return generar
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# FORMATO PARA MOSTRAR
+# ============================================================================
+# Columnas enteras a texto con operaciones de strings de NumPy, en lugar de
+# format_currency / format_number / f-strings celda por celda con .apply.
+# Convención argentina: punto de miles y coma decimal ($ 1.234,56). Los
+# valores vacíos (NaN) se muestran como 0; ±inf como 'inf' / '-inf' (igual
+# que el f-string de antes, ej. un Margen_Pct con ventas 0).
+#
+# Los valores que no entran en int64 una vez escalados, los infinitos y los
+# que quedan justo en la mitad al redondear (donde el escalado en float
+# puede correr el empate) se formatean uno por uno con el f-string, así el
+# redondeo es siempre el de Python.
+
+# Tope del valor escalado por 10 ** decimales para pasar por int64
+_MAX_ESCALADO = 2.0 ** 62
+
+
+def _valores(serie):
+    """Array float de la serie / lista con NaN -> 0 (los infinitos se mantienen)"""
+    valores = np.asarray(pd.to_numeric(serie, errors='coerce'), dtype=float)
+    return np.where(np.isnan(valores), 0.0, valores)
+
+
+def _digitos(redondeados, decimales=0, sep_miles='', sep_decimal='.'):
+    """
+    Enteros no negativos (el valor por 10 ** decimales, redondeado) como
+    texto con separador de miles y decimal: 123456, 2 -> '1.234,56'.
+
+    Los dígitos se rellenan con ceros a una matriz de caracteres
+    (filas x ancho) donde cada grupo de miles y los decimales son columnas
+    fijas; los separadores se insertan como columnas y la matriz se vuelve
+    a leer como un string por fila.
+    """
+    redondeados = np.asarray(redondeados, dtype=np.int64)
+    if redondeados.size == 0:
+        return redondeados.astype(str)
+    filas = len(redondeados)
+    largo_entero = max(len(str(redondeados.max() // 10 ** decimales)), 1)
+    ancho_entero = -(-largo_entero // 3) * 3 if sep_miles else largo_entero
+    ancho = ancho_entero + decimales
+    digitos = np.char.zfill(redondeados.astype(str), ancho).view('U1').reshape(filas, ancho)
+
+    partes = []
+    for inicio in range(0, ancho_entero, 3 if sep_miles else ancho_entero):
+        if sep_miles and inicio:
+            partes.append(np.full((filas, 1), sep_miles, dtype='U1'))
+        partes.append(digitos[:, inicio:inicio + (3 if sep_miles else ancho_entero)])
+    if decimales:
+        partes += [np.full((filas, 1), sep_decimal, dtype='U1'), digitos[:, ancho_entero:]]
+    matriz = np.ascontiguousarray(np.concatenate(partes, axis=1))
+    texto = matriz.view(f'U{matriz.shape[1]}').ravel()
+
+    # Sin ceros ni separadores a la izquierda, dejando el 0 de las unidades
+    texto = np.char.lstrip(texto, '0' + sep_miles)
+    return np.where(redondeados < 10 ** decimales, np.char.add('0', texto), texto)
+
+
+def miles(enteros, separador='.'):
+    """Enteros no negativos como texto con separador de miles: 1234567 -> '1.234.567'"""
+    return _digitos(enteros, sep_miles=separador)
+
+
+def numero_texto(serie, decimales=0, sep_miles='', sep_decimal='.', prefijo='', sufijo=''):
+    """
+    Números como texto con los decimales y separadores dados, redondeados.
+    Los negativos llevan el signo antes del prefijo: -$ 1.234,56.
+    """
+    valores = _valores(serie)
+    escalados = np.abs(valores) * 10 ** decimales
+    with np.errstate(invalid='ignore'):
+        uno_a_uno = (
+            ~np.isfinite(escalados) | (escalados >= _MAX_ESCALADO)
+            | (np.abs(escalados % 1 - 0.5) < 1e-6)
+        )
+    redondeados = np.round(np.where(uno_a_uno, 0, escalados)).astype(np.int64)
+    texto = _digitos(redondeados, decimales, sep_miles, sep_decimal)
+    con_valor = redondeados > 0
+
+    if uno_a_uno.any():
+        texto = texto.astype(object)
+        for i in np.flatnonzero(uno_a_uno):
+            crudo = f"{abs(valores[i]):,.{decimales}f}"
+            texto[i] = crudo.replace(',', '_').replace('.', sep_decimal).replace('_', sep_miles)
+            con_valor[i] = crudo.strip('0.,') != ''
+        texto = texto.astype(str)
+
+    signo = np.where((valores < 0) & con_valor, '-', '')
+    return np.char.add(np.char.add(np.char.add(signo, prefijo), texto), sufijo)
+
+
+def moneda(serie):
+    """$ 1.234,56"""
+    return numero_texto(serie, decimales=2, sep_miles='.', sep_decimal=',', prefijo='$ ')
+
+
+def numero(serie, decimales=0):
+    """1.234 (o 1.234,56 con decimales)"""
+    return numero_texto(serie, decimales=decimales, sep_miles='.', sep_decimal=',')
+
+
+def porcentaje(serie, decimales=1):
+    """12.3% (punto decimal, como las tablas de la app)"""
+    return numero_texto(serie, decimales=decimales, sufijo='%')
+
+
+def cantidad(serie):
+    """1.234 si es entera, 1.234,56 si tiene decimales"""
+    valores = _valores(serie)
+    return np.where(valores == np.round(valores), numero(valores), numero(valores, decimales=2))
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from yunta.rotacion import VENTANA_DIAS_DEFAULT, rotacion_por_codigo
+
+# ============================================================================
+# OPTIMIZADOR DE GÓNDOLA
+# ============================================================================
+# Métricas por producto (ventas, margen, abastecimiento y rotación) y la
+# clasificación en DESTACAR / AMPLIAR / MANTENER / REDUCIR / SACAR con los
+# frentes sugeridos. Las ventas llegan agregadas por (Codigo, Descripcion,
+# Proveedor) con agregar_ventas (cubo) o agregar_movimientos (filas), con
+# fechas=True.
+
+TIPOS_ABASTECIMIENTO = ['Recepción', 'Transferencia_Entrada']
+
+ORDEN_ACCION = {'⭐ DESTACAR': 0, '⬆️ AMPLIAR': 1, '✅ MANTENER': 2, '⬇️ REDUCIR': 3, '❌ SACAR': 4}
+
+# Días que se asumen sin venta / sin recepción cuando no hay fecha
+DIAS_SIN_DATO = 999
+
+
+def abastecimiento(df_movimientos, tienda=None, proveedor=None):
+    """Recepciones y transferencias de entrada de la tienda (como origen o destino) y proveedor"""
+    df = df_movimientos[df_movimientos['Tipo_Movimiento'].isin(TIPOS_ABASTECIMIENTO)]
+    if tienda is not None:
+        df = df[(df['Tienda'] == tienda) | (df['Tienda_Destino'] == tienda)]
+    if proveedor is not None:
+        df = df[df['Proveedor'] == proveedor]
+    return df
+
+
+def metricas_gondola(ventas_producto, df_abastecimiento, ventas=None,
+                     dias=VENTANA_DIAS_DEFAULT, ahora=None):
+    """
+    Una fila por producto con Ventas, Costo, Margen, Unidades_Vendidas,
+    Margen_Pct, Dias_Sin_Venta, abastecimiento (Ultima_Recepcion,
+    Unidades_Recibidas, Dias_Sin_Recepcion), Rotacion, Participacion_Pct y
+    Ranking_Ventas.
+
+    ventas: filas o cubo de ventas de los productos; si se pasa se agrega
+    Rotacion_Post_Recepcion (ventana de `dias` tras cada ingreso).
+    """
+    if ahora is None:
+        ahora = datetime.now()
+
+    df_productos = ventas_producto[[
+        'Codigo', 'Descripcion', 'Proveedor',
+        'Venta_Total', 'Costo_Total', 'Margen', 'Cantidad',
+        'Primera_Venta', 'Ultima_Venta', 'Transacciones'
+    ]]
+    df_productos.columns = [
+        'Codigo', 'Descripcion', 'Proveedor',
+        'Ventas', 'Costo', 'Margen', 'Unidades_Vendidas',
+        'Primera_Venta', 'Ultima_Venta', 'Transacciones'
+    ]
+
+    # Métricas derivadas
+    df_productos['Margen_Pct'] = (df_productos['Margen'] / df_productos['Ventas'] * 100).fillna(0)
+    df_productos['Dias_Sin_Venta'] = (ahora - pd.to_datetime(df_productos['Ultima_Venta'])).dt.days
+
+    # Abastecimiento por producto
+    if not df_abastecimiento.empty:
+        abast_por_prod = df_abastecimiento.groupby('Codigo', observed=True).agg({
+            'Fecha': 'max',
+            'Cantidad': lambda x: abs(x).sum()
+        }).reset_index()
+        abast_por_prod.columns = ['Codigo', 'Ultima_Recepcion', 'Unidades_Recibidas']
+
+        df_productos = df_productos.merge(abast_por_prod, on='Codigo', how='left')
+        df_productos['Dias_Sin_Recepcion'] = (
+            ahora - pd.to_datetime(df_productos['Ultima_Recepcion'])
+        ).dt.days.fillna(DIAS_SIN_DATO)
+        df_productos['Unidades_Recibidas'] = df_productos['Unidades_Recibidas'].fillna(0)
+    else:
+        df_productos['Ultima_Recepcion'] = None
+        df_productos['Unidades_Recibidas'] = 0
+        df_productos['Dias_Sin_Recepcion'] = DIAS_SIN_DATO
+
+    # Rotación = Vendido / Recibido
+    df_productos['Rotacion'] = (
+        df_productos['Unidades_Vendidas'] / df_productos['Unidades_Recibidas'].replace(0, 1)
+    ).fillna(0)
+
+    # Rotación post-recepción: vendido en los días siguientes a cada ingreso / recibido
+    if ventas is not None:
+        df_productos['Rotacion_Post_Recepcion'] = df_productos['Codigo'].map(
+            rotacion_por_codigo(df_abastecimiento, ventas, dias=dias)
+        ).fillna(0)
+
+    # Participación en ventas
+    total_ventas = df_productos['Ventas'].sum()
+    df_productos['Participacion_Pct'] = (df_productos['Ventas'] / total_ventas * 100).fillna(0)
+
+    # Ranking por ventas
+    df_productos['Ranking_Ventas'] = df_productos['Ventas'].rank(ascending=False, method='min')
+    return df_productos
+
+
+# Umbrales de las reglas de clasificación (clasificar_productos acepta otros)
+UMBRALES_GONDOLA = {
+    # ⭐ DESTACAR: entre los primeros del ranking con margen sobre el promedio
+    'ranking_destacar': 5,
+    # ⬆️ AMPLIAR: porción superior del ranking, ventas altas o margen excelente
+    'porcion_top': 0.2,
+    'ventas_altas': 100000,
+    'margen_excelente': 30,
+    'ventas_margen_excelente': 30000,
+    # ✅ MANTENER (protegidos): buen vendedor o rentable
+    'ventas_buen_vendedor': 50000,
+    'margen_rentable': 25,
+    # ❌ SACAR: recibió mucho stock pero casi no vendió
+    'recibidas_sin_rotar': 30,
+    'vendidas_sin_rotar': 5,
+    'dias_recepcion_sin_rotar': 60,
+    # ❌ SACAR: sin ventas hace mucho y vendió muy poco
+    'dias_sin_venta': 45,
+    'vendidas_sin_venta': 10,
+    'ventas_sin_venta': 10000,
+    # ❌ SACAR: ventas mínimas y margen negativo
+    'ventas_minimas': 5000,
+    # ⬇️ REDUCIR: ventas bajas y rotación baja (fracción del promedio)
+    'ventas_rotacion_baja': 20000,
+    'factor_rotacion_baja': 0.3,
+    # ⬇️ REDUCIR: bajo rendimiento general
+    'ventas_bajo_rendimiento': 15000,
+    'margen_bajo_rendimiento': 10,
+    'vendidas_bajo_rendimiento': 30,
+}
+
+# Color y frentes sugeridos de cada acción
+COLOR_ACCION = {'⭐ DESTACAR': '#10b981', '⬆️ AMPLIAR': '#22d3ee', '✅ MANTENER': '#6b7280',
+                '⬇️ REDUCIR': '#f97316', '❌ SACAR': '#ef4444'}
+FRENTES_ACCION = {'⭐ DESTACAR': 4, '⬆️ AMPLIAR': 3, '✅ MANTENER': 2, '⬇️ REDUCIR': 1, '❌ SACAR': 0}
+
+
+def reglas_gondola(df_productos, umbrales=UMBRALES_GONDOLA):
+    """
+    Reglas de clasificación en orden de prioridad: lista de (máscara,
+    acción, motivo). Gana la primera que se cumple; sin ninguna, MANTENER
+    por rendimiento normal.
+    """
+    u = umbrales
+    total_productos = len(df_productos)
+    rotacion_promedio = df_productos['Rotacion'].mean()
+    margen_promedio = df_productos['Margen_Pct'].mean()
+
+    dias_sin_venta = df_productos['Dias_Sin_Venta'].fillna(DIAS_SIN_DATO).to_numpy(dtype=float)
+    dias_sin_recep = df_productos['Dias_Sin_Recepcion'].fillna(DIAS_SIN_DATO).to_numpy(dtype=float)
+    unidades_vendidas = df_productos['Unidades_Vendidas'].fillna(0).to_numpy(dtype=float)
+    unidades_recibidas = df_productos['Unidades_Recibidas'].fillna(0).to_numpy(dtype=float)
+    rotacion = df_productos['Rotacion'].fillna(0).to_numpy(dtype=float)
+    ranking = df_productos['Ranking_Ventas'].to_numpy(dtype=float)
+    margen = df_productos['Margen_Pct'].to_numpy(dtype=float)
+    ventas = df_productos['Ventas'].to_numpy(dtype=float)
+
+    # Protegidos: buenas ventas o buen margen
+    es_buen_vendedor = ventas > u['ventas_buen_vendedor']
+    es_rentable = margen >= u['margen_rentable']
+    es_top = ranking <= (total_productos * u['porcion_top'])
+
+    sin_venta = (
+        (dias_sin_venta > u['dias_sin_venta']) &
+        (unidades_vendidas < u['vendidas_sin_venta']) &
+        (ventas < u['ventas_sin_venta'])
+    )
+    motivo_sin_venta = np.full(total_productos, '', dtype=object)
+    motivo_sin_venta[sin_venta] = [
+        f'Sin ventas hace {d} días' for d in dias_sin_venta[sin_venta].astype(np.int64)
+    ]
+
+    return [
+        ((ranking <= u['ranking_destacar']) & (margen >= margen_promedio),
+         '⭐ DESTACAR', f"Top {u['ranking_destacar']} ventas + buen margen"),
+        (es_top & (margen > 0), '⬆️ AMPLIAR', f"Top {u['porcion_top']:.0%} en ventas"),
+        ((ventas > u['ventas_altas']) & (margen > 0), '⬆️ AMPLIAR', 'Ventas altas'),
+        ((margen >= u['margen_excelente']) & (ventas > u['ventas_margen_excelente']),
+         '⬆️ AMPLIAR', 'Margen excelente'),
+        (es_buen_vendedor | es_rentable, '✅ MANTENER', 'Buen rendimiento'),
+        ((unidades_recibidas > u['recibidas_sin_rotar']) & (unidades_vendidas < u['vendidas_sin_rotar']) &
+         (dias_sin_recep < u['dias_recepcion_sin_rotar']),
+         '❌ SACAR', 'Recibió stock pero no vende'),
+        (sin_venta, '❌ SACAR', motivo_sin_venta),
+        ((ventas < u['ventas_minimas']) & (margen < 0), '❌ SACAR', 'Ventas mínimas + margen negativo'),
+        ((ventas < u['ventas_rotacion_baja']) & (rotacion < (rotacion_promedio * u['factor_rotacion_baja'])),
+         '⬇️ REDUCIR', 'Ventas bajas + rotación baja'),
+        ((ventas < u['ventas_bajo_rendimiento']) & (margen < u['margen_bajo_rendimiento']) &
+         (unidades_vendidas < u['vendidas_bajo_rendimiento']),
+         '⬇️ REDUCIR', 'Bajo rendimiento general'),
+    ]
+
+
+def clasificar_productos(df_productos, umbrales=None):
+    """
+    Agrega Accion, Motivo, Color, Frentes_Sugeridos y Orden a las métricas
+    de metricas_gondola y ordena por acción y ventas.
+
+    umbrales: los de UMBRALES_GONDOLA a reemplazar.
+    """
+    reglas = reglas_gondola(df_productos, {**UMBRALES_GONDOLA, **(umbrales or {})})
+    condiciones = [mascara for mascara, _, _ in reglas]
+    accion = np.select(condiciones, [a for _, a, _ in reglas], default='✅ MANTENER')
+    motivo = np.select(condiciones, [m for _, _, m in reglas], default='Rendimiento normal')
+
+    df_productos = df_productos.copy(deep=False)
+    df_productos['Accion'] = accion.tolist()
+    df_productos['Motivo'] = motivo.tolist()
+    df_productos['Color'] = df_productos['Accion'].map(COLOR_ACCION)
+    df_productos['Frentes_Sugeridos'] = df_productos['Accion'].map(FRENTES_ACCION)
+
+    # Ordenar por acción y ventas
+    df_productos['Orden'] = df_productos['Accion'].map(ORDEN_ACCION)
+    return df_productos.sort_values(['Orden', 'Ventas'], ascending=[True, False])
@@ -0,0 +1,241 @@
+import hashlib
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import duckdb
+
+from yunta.base import COLUMNAS_ENUM, TABLA_ENUMS, base_actual, base_vigente, hash_archivo, publicar_version
+from yunta.cubo import actualizar_cubo_ventas, crear_cubo_ventas
+
+# ============================================================================
+# INGESTA INCREMENTAL DE DELTAS
+# ============================================================================
+# Los días nuevos llegan como archivos Parquet chicos (mismas columnas que el
+# parquet principal) en MOVIMIENTOS_DELTAS/. En vez de regenerar todo:
+# - con base persistente, cada delta se inserta en movimientos_base y solo
+#   se recalculan sus días en el cubo; la tabla _ingestas registra archivo,
+#   hash y rango de fechas de cada una
+# - sin base, la app suma los deltas a la vista movimientos
+#
+# Un delta cuyas fechas ya están cubiertas por el parquet principal se
+# considera consolidado y se ignora (al regenerar el parquet completo los
+# deltas viejos pueden quedar en la carpeta sin duplicar ventas). De un
+# delta que se superpone con el final del parquet solo se leen los días
+# posteriores (filtro_delta).
+#
+# La app abre la base en solo lectura, así que la ingesta trabaja sobre una
+# copia de la versión actual y la publica como versión nueva al final (igual
+# que construir_base, ver yunta.base.publicar_version).
+
+DIRECTORIO_DELTAS = "MOVIMIENTOS_DELTAS"
+TABLA_INGESTAS = "_ingestas"
+
+
+def _texto_sql(valor):
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def archivos_delta(directorio):
+    """Parquets de la carpeta de deltas, en orden de nombre"""
+    directorio = Path(directorio)
+    if not directorio.is_dir():
+        return []
+    return sorted(directorio.glob('*.parquet'))
+
+
+def version_deltas(archivos):
+    """Texto corto que cambia si se agrega, quita o modifica un delta"""
+    h = hashlib.sha1()
+    for archivo in archivos:
+        stat = Path(archivo).stat()
+        h.update(f"{Path(archivo).name}:{stat.st_mtime_ns}:{stat.st_size};".encode('utf-8'))
+    return h.hexdigest()[:12]
+
+
+def rango_archivo(ruta):
+    """(fecha_desde, fecha_hasta, filas) del parquet, leído de sus estadísticas"""
+    fila = duckdb.execute(f"""
+        SELECT CAST(MIN(Fecha) AS DATE), CAST(MAX(Fecha) AS DATE), COUNT(*)
+        FROM read_parquet({_texto_sql(Path(ruta).as_posix())})
+    """).fetchone()
+    return fila[0], fila[1], fila[2]
+
+
+def deltas_pendientes(archivos, fecha_consolidada):
+    """
+    Deltas con días posteriores a fecha_consolidada (la última fecha del
+    parquet principal): lista de (archivo, fecha_desde, fecha_hasta, filas).
+    fecha_desde es el primer día que se toma del delta (los anteriores ya
+    están consolidados).
+    """
+    pendientes = []
+    for archivo in archivos:
+        desde, hasta, filas = rango_archivo(archivo)
+        if filas == 0 or hasta is None:
+            continue
+        if fecha_consolidada is not None:
+            if hasta <= fecha_consolidada:
+                continue
+            desde = max(desde, fecha_consolidada + timedelta(days=1))
+        pendientes.append((Path(archivo), desde, hasta, filas))
+    return pendientes
+
+
+def filtro_delta(fecha_consolidada):
+    """WHERE que deja solo los días de un delta posteriores a fecha_consolidada"""
+    if fecha_consolidada is None:
+        return "TRUE"
+    return f"CAST(Fecha AS DATE) > DATE '{fecha_consolidada.isoformat()}'"
+
+
+def ingestas(con):
+    """
+    Ingestas registradas en la base: lista de (id, fecha_desde, fecha_hasta)
+    con el sha256 del delta como id, igual que sin base.
+    """
+    try:
+        return con.execute(
+            f"SELECT sha256, fecha_desde, fecha_hasta FROM {TABLA_INGESTAS} ORDER BY id"
+        ).fetchall()
+    except duckdb.Error:
+        return []
+
+
+def conectar_movimientos(ruta_parquet, ruta_base, directorio_deltas):
+    """
+    Conexión DuckDB con la vista movimientos y el cubo diario, y la lista de
+    ingestas (id, fecha_desde, fecha_hasta) que incluye. El id es el sha256
+    del delta: no cambia si aparece otro delta que ordena antes.
+
+    Si la base persistente está al día se abre en solo lectura; si no, la
+    vista lee el parquet más los deltas posteriores y el cubo se materializa
+    en memoria.
+    """
+    ruta_base = base_actual(ruta_base)
+    if base_vigente(ruta_base, ruta_parquet):
+        con = duckdb.connect(database=str(ruta_base), read_only=True)
+        return con, ingestas(con)
+    fecha_consolidada = rango_archivo(ruta_parquet)[1]
+    pendientes = deltas_pendientes(archivos_delta(directorio_deltas), fecha_consolidada)
+    sql = f"SELECT * FROM read_parquet({_texto_sql(ruta_parquet)})"
+    if pendientes:
+        lista = ", ".join(_texto_sql(archivo) for archivo, _, _, _ in pendientes)
+        sql += f"""
+            UNION ALL BY NAME
+            SELECT * FROM read_parquet([{lista}], union_by_name = true)
+            WHERE {filtro_delta(fecha_consolidada)}
+        """
+    con = duckdb.connect(database=":memory:")
+    con.execute(f"CREATE VIEW movimientos AS {sql}")
+    crear_cubo_ventas(con)
+    return con, [(hash_archivo(archivo), desde, hasta) for archivo, desde, hasta, _ in pendientes]
+
+
+def _crear_tabla_ingestas(con):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_INGESTAS} (
+            id INTEGER,
+            archivo VARCHAR,
+            sha256 VARCHAR,
+            filas BIGINT,
+            fecha_desde DATE,
+            fecha_hasta DATE,
+            ingestado TIMESTAMP
+        )
+    """)
+
+
+def _ampliar_enums(con, origen, id_ingesta):
+    """
+    Si el delta trae valores nuevos para una columna ENUM (una tienda o
+    proveedor nuevo), la columna pasa a un ENUM ampliado.
+    """
+    tipos = dict(con.execute(
+        "SELECT column_name, data_type FROM duckdb_columns() WHERE table_name = 'movimientos_base'"
+    ).fetchall())
+    columnas_delta = {f[0] for f in con.execute(f"DESCRIBE SELECT * FROM {origen}").fetchall()}
+    for columna in COLUMNAS_ENUM:
+        if not tipos.get(columna, '').startswith('ENUM') or columna not in columnas_delta:
+            continue
+        actuales = con.execute(
+            f"SELECT enum_range({columna}) FROM movimientos_base LIMIT 1"
+        ).fetchone()[0]
+        nuevos = [v for (v,) in con.execute(f"""
+            SELECT DISTINCT CAST({columna} AS VARCHAR) FROM {origen}
+            WHERE {columna} IS NOT NULL
+              AND NOT list_contains(?, CAST({columna} AS VARCHAR))
+            ORDER BY 1
+        """, [actuales]).fetchall()]
+        if not nuevos:
+            continue
+        valores = ", ".join(_texto_sql(v) for v in actuales + nuevos)
+        tipo = f"enum_{columna.lower()}_{id_ingesta}"
+        con.execute(f"CREATE TYPE {tipo} AS ENUM ({valores})")
+        con.execute(f"ALTER TABLE movimientos_base ALTER {columna} TYPE {tipo}")
+        con.execute(f"CREATE TABLE IF NOT EXISTS {TABLA_ENUMS} (columna VARCHAR, tipo VARCHAR)")
+        con.execute(f"DELETE FROM {TABLA_ENUMS} WHERE columna = ?", [columna])
+        con.execute(f"INSERT INTO {TABLA_ENUMS} VALUES (?, ?)", [columna, tipo])
+
+
+def ingerir_deltas(ruta_base, archivos, fecha_consolidada=None):
+    """
+    Agrega a la base persistente los deltas pendientes que todavía no se
+    ingirieron (por hash) y actualiza el cubo solo en sus días.
+
+    Devuelve la lista de (id, fecha_desde, fecha_hasta) ingeridos, con el
+    sha256 del delta como id (igual que ingestas y conectar_movimientos).
+    """
+    ruta_base = Path(ruta_base)
+    actual = base_actual(ruta_base)
+    lectura = duckdb.connect(str(actual), read_only=True)
+    try:
+        hechas = {sha for (sha,) in lectura.execute(f"SELECT sha256 FROM {TABLA_INGESTAS}").fetchall()}
+    except duckdb.Error:
+        hechas = set()
+    finally:
+        lectura.close()
+    pendientes = [
+        (archivo, desde, hasta, filas, hash_archivo(archivo))
+        for archivo, desde, hasta, filas in deltas_pendientes(archivos, fecha_consolidada)
+    ]
+    pendientes = [p for p in pendientes if p[4] not in hechas]
+    if not pendientes:
+        return []
+
+    temporal = ruta_base.with_name(ruta_base.name + ".tmp")
+    shutil.copyfile(actual, temporal)
+    con = duckdb.connect(str(temporal))
+    nuevas = []
+    try:
+        _crear_tabla_ingestas(con)
+        siguiente = con.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {TABLA_INGESTAS}").fetchone()[0]
+        columnas_base = [f[0] for f in con.execute("DESCRIBE movimientos_base").fetchall()]
+
+        for archivo, desde, hasta, filas, sha in pendientes:
+            origen = f"read_parquet({_texto_sql(archivo.as_posix())})"
+            columnas_delta = {f[0] for f in con.execute(f"DESCRIBE SELECT * FROM {origen}").fetchall()}
+            _ampliar_enums(con, origen, siguiente)
+            seleccion = ", ".join(
+                "CAST(Fecha AS TIMESTAMP) AS Fecha" if c == 'Fecha' else c
+                for c in columnas_base if c in columnas_delta
+            )
+            con.execute(f"""
+                INSERT INTO movimientos_base BY NAME
+                SELECT {seleccion} FROM {origen}
+                WHERE {filtro_delta(fecha_consolidada)}
+                ORDER BY Fecha, Tienda, Codigo
+            """)
+            actualizar_cubo_ventas(con, desde, hasta)
+            con.execute(
+                f"INSERT INTO {TABLA_INGESTAS} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [siguiente, archivo.name, sha, filas, desde, hasta, datetime.now()]
+            )
+            nuevas.append((sha, desde, hasta))
+            siguiente += 1
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+
+    publicar_version(temporal, ruta_base)
+    return nuevas
@@ -0,0 +1,137 @@
+import json
+from pathlib import Path
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# ============================================================================
+# PARQUET PARTICIONADO POR FECHA Y TIENDA
+# ============================================================================
+# Reemplaza el corte en 3 partes iguales de dividir_parquet.py por un layout
+# hive anio=/mes=/Tienda=. La fuente se lee por lotes (nunca completa en
+# memoria), cada archivo tiene row groups de tamaño fijo con estadísticas
+# min/max, y un manifiesto JSON lista los archivos para poder leerlos por
+# HTTP (donde no se puede listar un directorio).
+#
+# La clave de tienda es la propia columna Tienda (DuckDB no distingue
+# mayúsculas, así que una clave "tienda" aparte chocaría con ella): el valor
+# queda solo en la ruta y los filtros por Tienda también podan archivos.
+
+DIRECTORIO_PARTICIONES = "MOVIMIENTOS_PARTICIONADO"
+MANIFIESTO = "_manifiesto.json"
+
+COLUMNAS_PARTICION = ['anio', 'mes', 'Tienda']
+
+FILAS_POR_LOTE = 250_000
+FILAS_POR_GRUPO = 122_880
+
+_ESQUEMA_PARTICION = pa.schema([
+    ('anio', pa.int16()),
+    ('mes', pa.int8()),
+    ('Tienda', pa.string()),
+])
+
+
+def _lotes_con_particion(archivo, filas_por_lote):
+    """Lotes del parquet fuente con las columnas anio y mes agregadas"""
+    for lote in archivo.iter_batches(batch_size=filas_por_lote):
+        fecha = lote.column('Fecha')
+        if pa.types.is_string(fecha.type) or pa.types.is_large_string(fecha.type):
+            fecha = pc.cast(fecha, pa.timestamp('us'))
+        columnas = dict(zip(lote.schema.names, lote.columns))
+        columnas['Tienda'] = pc.cast(columnas['Tienda'], pa.string())
+        columnas['anio'] = pc.cast(pc.year(fecha), pa.int16())
+        columnas['mes'] = pc.cast(pc.month(fecha), pa.int8())
+        yield pa.RecordBatch.from_pydict(columnas, schema=_esquema_salida(lote.schema))
+
+
+def _esquema_salida(esquema):
+    """Esquema fuente con Tienda como texto y las columnas anio y mes al final"""
+    esquema = esquema.set(esquema.get_field_index('Tienda'), pa.field('Tienda', pa.string()))
+    return esquema.append(_ESQUEMA_PARTICION.field('anio')).append(_ESQUEMA_PARTICION.field('mes'))
+
+
+def particionar_parquet(origen, destino, filas_por_lote=FILAS_POR_LOTE, filas_por_grupo=FILAS_POR_GRUPO):
+    """
+    Escribe origen como dataset hive anio=/mes=/Tienda= en destino.
+
+    Devuelve la lista de archivos escritos (relativos a destino), que también
+    queda guardada en el manifiesto.
+    """
+    destino = Path(destino)
+    archivo = pq.ParquetFile(origen)
+    esquema = _esquema_salida(archivo.schema_arrow)
+
+    escritos = []
+    ds.write_dataset(
+        _lotes_con_particion(archivo, filas_por_lote),
+        destino,
+        schema=esquema,
+        format='parquet',
+        partitioning=ds.partitioning(_ESQUEMA_PARTICION, flavor='hive'),
+        basename_template='parte-{i}.parquet',
+        existing_data_behavior='delete_matching',
+        max_rows_per_group=filas_por_grupo,
+        min_rows_per_group=min(filas_por_grupo, filas_por_lote),
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        file_visitor=lambda escrito: escritos.append(
+            Path(escrito.path).relative_to(destino).as_posix()
+        ),
+    )
+
+    escritos.sort()
+    with open(destino / MANIFIESTO, 'w', encoding='utf-8') as f:
+        json.dump({'archivos': escritos}, f, ensure_ascii=False, indent=2)
+    return escritos
+
+
+def _es_url(ruta):
+    return str(ruta).startswith(('http://', 'https://'))
+
+
+def archivos_particionados(manifiesto, base):
+    """
+    Rutas o URLs de todos los archivos del manifiesto bajo base.
+
+    Los directorios guardan el valor de Tienda codificado (%20, %27...); en
+    una URL ese "%" se vuelve a codificar para pedir el archivo literal.
+    """
+    base = str(base).rstrip('/')
+    if _es_url(base):
+        return [f"{base}/{quote(ruta, safe='/=')}" for ruta in manifiesto['archivos']]
+    return [f"{base}/{ruta}" for ruta in manifiesto['archivos']]
+
+
+def sql_vista_particionada(archivos, nombre_vista='movimientos'):
+    """
+    CREATE VIEW sobre el dataset particionado.
+
+    La vista expone anio y mes (columnas de partición) para poder podar
+    archivos con filtro_particion; Tienda vuelve desde la ruta (en URLs,
+    decodificada una vez más por la doble codificación de arriba).
+    """
+    lista = ", ".join("'" + a.replace("'", "''") + "'" for a in archivos)
+    seleccion = "* REPLACE (url_decode(Tienda) AS Tienda)" if any(map(_es_url, archivos)) else "*"
+    return f"""
+        CREATE VIEW {nombre_vista} AS
+        SELECT {seleccion}
+        FROM read_parquet(
+            [{lista}],
+            hive_partitioning = true,
+            hive_types = {{'anio': INTEGER, 'mes': INTEGER, 'Tienda': VARCHAR}}
+        )
+    """
+
+
+def filtro_particion(fecha_desde_str, fecha_hasta_str):
+    """
+    Condición SQL y parámetros sobre (anio, mes) equivalente a un rango de
+    fechas 'YYYY-MM-DD'. DuckDB la evalúa contra las rutas hive y no abre los
+    archivos de otros meses.
+    """
+    desde = int(fecha_desde_str[:4]) * 100 + int(fecha_desde_str[5:7])
+    hasta = int(fecha_hasta_str[:4]) * 100 + int(fecha_hasta_str[5:7])
+    return "anio * 100 + mes BETWEEN ? AND ?", (desde, hasta)
@@ -0,0 +1,372 @@
+import functools
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+# ============================================================================
+# PERFIL DE TIEMPOS POR CORRIDA
+# ============================================================================
+# Cada rerun de la app es una corrida; dentro de ella se registran tramos con
+# nombre: tiempo de reloj, filas que entran y salen y bytes materializados.
+# - medido(nombre) envuelve funciones (consultas, gráficos, st.data_editor)
+# - tramo(nombre) mide un bloque con with
+# - seccion(nombre) parte la corrida en secciones seguidas sin indentar el
+#   código de la app (cada una termina donde empieza la siguiente)
+#
+# La corrida activa es la del hilo que ejecuta el script de la sesión. Un
+# tramo fuera de toda corrida (por ejemplo el .xlsx que Streamlit genera en
+# otro hilo al hacer clic) queda como corrida aislada de un solo tramo.
+#
+# Las últimas corridas quedan en memoria para el panel de administración y,
+# si se configura un archivo, los tramos se agregan a un JSONL o a una tabla
+# SQLite (según la extensión) al cerrar cada corrida.
+
+MAX_CORRIDAS_DEFAULT = 50
+
+_EXTENSIONES_SQLITE = {'.sqlite', '.sqlite3', '.db'}
+
+
+def _filas(valor):
+    if isinstance(valor, (pd.DataFrame, pd.Series, pa.Table)):
+        return len(valor)
+    return None
+
+
+def _bytes(valor):
+    """Bytes del resultado (sin recorrer strings de Python: deep=False)"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=False).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True, deep=False))
+    if isinstance(valor, pa.Table):
+        return valor.nbytes
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, BytesIO):
+        return len(valor.getbuffer())
+    return None
+
+
+class Tramo:
+    """Un bloque medido dentro de una corrida"""
+
+    def __init__(self, nombre, padre=None, nivel=0, filas_entrada=None):
+        self.nombre = nombre
+        self.padre = padre
+        self.nivel = nivel
+        self.inicio = time.time()
+        self._reloj = time.perf_counter()
+        self.segundos = None
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+        self.bytes = None
+
+    def resultado(self, valor):
+        """Anota filas y bytes de lo que produjo el tramo"""
+        self.filas_salida = _filas(valor)
+        self.bytes = _bytes(valor)
+        return valor
+
+    def cerrar(self):
+        if self.segundos is None:
+            self.segundos = time.perf_counter() - self._reloj
+
+    @property
+    def fin(self):
+        return self.inicio + (self.segundos or 0.0)
+
+
+class Corrida:
+    """Los tramos de un rerun de una sesión"""
+
+    def __init__(self, sesion=None, usuario=None, etiqueta=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.sesion = sesion
+        self.usuario = usuario
+        self.etiqueta = etiqueta
+        self.inicio = time.time()
+        self.fin = None
+        self.tramos = []
+        self._pila = []
+        self._seccion = None
+
+    @property
+    def abierta(self):
+        return self.fin is None
+
+    @property
+    def segundos(self):
+        fin = self.fin
+        if fin is None:
+            fin = max([self.inicio] + [t.fin for t in self.tramos if t.segundos is not None])
+        return fin - self.inicio
+
+    def abrir_tramo(self, nombre, filas_entrada=None):
+        padre = self._pila[-1] if self._pila else self._seccion
+        nivel = len(self._pila) + (1 if self._seccion is not None else 0)
+        tramo = Tramo(nombre, padre.nombre if padre else None, nivel, filas_entrada)
+        self.tramos.append(tramo)
+        self._pila.append(tramo)
+        return tramo
+
+    def cerrar_tramo(self, tramo):
+        tramo.cerrar()
+        if tramo in self._pila:
+            self._pila.remove(tramo)
+
+    def seccion(self, nombre):
+        """Cierra la sección anterior y abre otra"""
+        if self._seccion is not None:
+            self._seccion.cerrar()
+        self._seccion = Tramo(nombre)
+        self.tramos.append(self._seccion)
+
+    def cerrar(self, fin=None):
+        """Cierra tramos y secciones que quedaron abiertos (st.stop, excepciones)"""
+        if not self.abierta:
+            return
+        ultimo = max([self.inicio] + [t.fin for t in self.tramos if t.segundos is not None])
+        for tramo in self.tramos:
+            if tramo.segundos is None:
+                tramo.segundos = (fin if fin is not None else ultimo) - tramo.inicio
+        self._pila = []
+        self.fin = fin if fin is not None else ultimo
+
+    def filas(self):
+        """Un dict por tramo (para el panel y los archivos de registro)"""
+        return [{
+            'corrida': self.id,
+            'sesion': self.sesion,
+            'usuario': self.usuario,
+            'etiqueta': self.etiqueta,
+            'tramo': t.nombre,
+            'padre': t.padre,
+            'nivel': t.nivel,
+            'inicio': datetime.fromtimestamp(t.inicio).isoformat(timespec='milliseconds'),
+            'segundos': t.segundos,
+            'filas_entrada': t.filas_entrada,
+            'filas_salida': t.filas_salida,
+            'bytes': t.bytes,
+        } for t in self.tramos]
+
+    def resumen(self):
+        return {
+            'corrida': self.id,
+            'inicio': datetime.fromtimestamp(self.inicio),
+            'usuario': self.usuario,
+            'etiqueta': self.etiqueta,
+            'segundos': self.segundos,
+            'tramos': len(self.tramos),
+            'abierta': self.abierta,
+        }
+
+
+# ============================================================================
+# REGISTRO EN ARCHIVO
+# ============================================================================
+_COLUMNAS = ['corrida', 'sesion', 'usuario', 'etiqueta', 'tramo', 'padre', 'nivel',
+             'inicio', 'segundos', 'filas_entrada', 'filas_salida', 'bytes']
+
+
+class RegistroTramos:
+    """Agrega tramos a un .jsonl (una línea por tramo) o a la tabla tramos de un SQLite"""
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self.sqlite = self.ruta.suffix.lower() in _EXTENSIONES_SQLITE
+        self._lock = threading.Lock()
+
+    def escribir(self, filas):
+        if not filas:
+            return
+        with self._lock:
+            try:
+                self.ruta.parent.mkdir(parents=True, exist_ok=True)
+                if self.sqlite:
+                    self._escribir_sqlite(filas)
+                else:
+                    with open(self.ruta, 'a', encoding='utf-8') as f:
+                        for fila in filas:
+                            f.write(json.dumps(fila, ensure_ascii=False) + "\n")
+            except (OSError, sqlite3.Error):
+                # El perfil nunca corta la app
+                pass
+
+    def _escribir_sqlite(self, filas):
+        con = sqlite3.connect(self.ruta)
+        try:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS tramos (
+                    corrida TEXT, sesion TEXT, usuario TEXT, etiqueta TEXT,
+                    tramo TEXT, padre TEXT, nivel INTEGER, inicio TEXT,
+                    segundos REAL, filas_entrada INTEGER, filas_salida INTEGER, bytes INTEGER
+                )
+            """)
+            con.executemany(
+                f"INSERT INTO tramos VALUES ({', '.join('?' for _ in _COLUMNAS)})",
+                [tuple(fila[c] for c in _COLUMNAS) for fila in filas]
+            )
+            con.commit()
+        finally:
+            con.close()
+
+
+# ============================================================================
+# PERFILADOR
+# ============================================================================
+class Perfilador:
+    """
+    Guarda las últimas corridas del proceso (todas las sesiones) y escribe
+    sus tramos en el registro si hay uno.
+    """
+
+    def __init__(self, max_corridas=MAX_CORRIDAS_DEFAULT, registro=None):
+        self.registro = registro
+        self._corridas = deque(maxlen=max_corridas)
+        self._abiertas = {}  # sesión -> corrida sin cerrar
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def configurar(self, max_corridas=None, archivo=None):
+        """Cambia el tamaño del historial y el archivo de registro (None = sin archivo)"""
+        with self._lock:
+            if max_corridas is not None and max_corridas != self._corridas.maxlen:
+                self._corridas = deque(self._corridas, maxlen=max_corridas)
+            if archivo is None:
+                self.registro = None
+            elif self.registro is None or self.registro.ruta != Path(archivo):
+                self.registro = RegistroTramos(archivo)
+
+    # ------------------------------------------------------------------
+    # Corridas
+    # ------------------------------------------------------------------
+    def iniciar_corrida(self, sesion=None, usuario=None, etiqueta=None):
+        """
+        Empieza la corrida del hilo actual. Si la sesión dejó una corrida
+        abierta (st.stop antes de terminar_corrida) se cierra primero.
+        """
+        anterior = getattr(self._local, 'corrida', None)
+        with self._lock:
+            pendiente = self._abiertas.pop(sesion, None) if sesion is not None else None
+        for corrida in {id(c): c for c in (anterior, pendiente) if c is not None}.values():
+            self._cerrar(corrida)
+        corrida = Corrida(sesion, usuario, etiqueta)
+        self._local.corrida = corrida
+        with self._lock:
+            self._corridas.append(corrida)
+            if sesion is not None:
+                self._abiertas[sesion] = corrida
+        return corrida
+
+    def corrida_actual(self):
+        return getattr(self._local, 'corrida', None)
+
+    def etiquetar(self, etiqueta):
+        corrida = self.corrida_actual()
+        if corrida is not None:
+            corrida.etiqueta = etiqueta
+
+    def seccion(self, nombre):
+        corrida = self.corrida_actual()
+        if corrida is not None:
+            corrida.seccion(nombre)
+
+    def terminar_corrida(self):
+        corrida = self.corrida_actual()
+        if corrida is None:
+            return
+        self._local.corrida = None
+        with self._lock:
+            if self._abiertas.get(corrida.sesion) is corrida:
+                del self._abiertas[corrida.sesion]
+        self._cerrar(corrida, time.time())
+
+    def _cerrar(self, corrida, fin=None):
+        if not corrida.abierta:
+            return
+        corrida.cerrar(fin)
+        if self.registro is not None:
+            self.registro.escribir(corrida.filas())
+
+    # ------------------------------------------------------------------
+    # Tramos
+    # ------------------------------------------------------------------
+    @contextmanager
+    def tramo(self, nombre, filas_entrada=None):
+        """
+        with perfil.tramo("Consulta") as t: ... t.resultado(df)
+
+        Sin corrida activa el tramo forma su propia corrida aislada.
+        """
+        corrida = self.corrida_actual()
+        aislada = corrida is None
+        if aislada:
+            corrida = Corrida(etiqueta=nombre)
+            with self._lock:
+                self._corridas.append(corrida)
+        tramo = corrida.abrir_tramo(nombre, filas_entrada)
+        try:
+            yield tramo
+        finally:
+            corrida.cerrar_tramo(tramo)
+            if aislada:
+                self._cerrar(corrida, time.time())
+
+    def medido(self, nombre=None):
+        """
+        Decorador: cada llamada es un tramo. Las filas de entrada son las del
+        primer DataFrame de los argumentos; filas y bytes de salida, las del
+        resultado.
+        """
+        def decorador(funcion):
+            etiqueta = nombre or funcion.__name__
+
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                entrada = next((_filas(a) for a in list(args) + list(kwargs.values())
+                                if _filas(a) is not None), None)
+                with self.tramo(etiqueta, entrada) as t:
+                    return t.resultado(funcion(*args, **kwargs))
+
+            return envoltura
+
+        if callable(nombre):
+            funcion, nombre = nombre, None
+            return decorador(funcion)
+        return decorador
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def corridas(self, n=None, excluir=None):
+        """Resúmenes de las últimas n corridas, la más reciente primero"""
+        with self._lock:
+            lista = [c for c in reversed(self._corridas) if c is not excluir]
+        if n is not None:
+            lista = lista[:n]
+        return pd.DataFrame([c.resumen() for c in lista],
+                            columns=['corrida', 'inicio', 'usuario', 'etiqueta', 'segundos', 'tramos', 'abierta'])
+
+    def tramos(self, id_corrida):
+        """Tramos de una corrida del historial"""
+        with self._lock:
+            corrida = next((c for c in self._corridas if c.id == id_corrida), None)
+        if corrida is None:
+            return pd.DataFrame(columns=_COLUMNAS)
+        return pd.DataFrame(corrida.filas(), columns=_COLUMNAS)
+
+
+# Perfilador del proceso: lo usan la app y los módulos de yunta
+PERFIL = Perfilador()
+tramo = PERFIL.tramo
+medido = PERFIL.medido
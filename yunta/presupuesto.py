@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# ============================================================================
+# MOTOR DE PRESUPUESTO VECTORIZADO
+# ============================================================================
+# Calcula en una sola pasada agrupada las mismas métricas que antes se
+# obtenían producto por producto con iterrows (promedio 3 meses, tendencia,
+# CV, días sin venta, unidades sugeridas, pesos y score).
+
+ROTACION_DEFAULT = 0.5
+
+COLUMNAS_PRESUPUESTO = [
+    'Categoria', 'Codigo', 'Descripcion', 'Proveedor', 'Prom_3M_Unidades',
+    'Tendencia', 'Rotacion', 'Margen_Pct', 'Costo_Unitario',
+    'Precio_Venta_Unitario', 'Score', 'Unidades_A_Comprar', 'Pesos_A_Comprar',
+    'Unidades_A_Vender', 'Pesos_A_Vender', 'Margen_Unitario', 'Margen_Total',
+    'Margen_Pct_Proyectado', 'Accion', 'Dias_Sin_Venta', 'CV'
+]
+
+
+def resumen_por_producto(df_hist):
+    """Totales por (Codigo, Descripcion, Proveedor) con costo y precio unitario"""
+    df = df_hist.assign(Cantidad=df_hist['Cantidad'].abs())
+    productos = df.groupby(['Codigo', 'Descripcion', 'Proveedor'], observed=True).agg({
+        'Venta_Total': 'sum',
+        'Costo_Total': 'sum',
+        'Margen': 'sum',
+        'Cantidad': 'sum',
+        'Fecha': 'max'
+    }).reset_index()
+
+    productos['Margen_Pct'] = (productos['Margen'] / productos['Venta_Total'] * 100).fillna(0)
+    productos['Costo_Unitario'] = (
+        productos['Costo_Total'] / productos['Cantidad']
+    ).replace([np.inf, -np.inf], 0).fillna(0)
+    productos['Precio_Venta_Unitario'] = (
+        productos['Venta_Total'] / productos['Cantidad']
+    ).replace([np.inf, -np.inf], 0).fillna(0)
+    return productos
+
+
+def metricas_mensuales(df_hist):
+    """Promedio 3 meses, tendencia lineal y CV por Codigo sobre la serie mensual de unidades"""
+    df = pd.DataFrame({
+        'Codigo': df_hist['Codigo'],
+        'Mes': pd.to_datetime(df_hist['Fecha']).dt.to_period('M'),
+        'Cantidad': df_hist['Cantidad'].abs()
+    })
+    mensual = (
+        df.groupby(['Codigo', 'Mes'], observed=True)['Cantidad'].sum()
+        .reset_index()
+        .sort_values(['Codigo', 'Mes'], kind='stable')
+    )
+
+    grupos = mensual.groupby('Codigo', observed=True, sort=False)
+    n = grupos['Cantidad'].transform('size').to_numpy(dtype=float)
+    x = grupos.cumcount().to_numpy(dtype=float)
+    y = mensual['Cantidad'].to_numpy(dtype=float)
+    desde_el_final = grupos.cumcount(ascending=False).to_numpy()
+
+    # Regresión lineal por grupo en forma cerrada: x = 0..n-1
+    x_media = (n - 1) / 2
+    mensual['_xy'] = (x - x_media) * y
+    mensual['_ult3'] = np.where(desde_el_final < 3, y, np.nan)
+
+    metricas = grupos.agg(
+        Meses=('Cantidad', 'size'),
+        Media=('Cantidad', 'mean'),
+        Desvio=('Cantidad', 'std'),
+        Prom_3M_Unidades=('_ult3', 'mean'),
+        Sxy=('_xy', 'sum'),
+    )
+    meses = metricas['Meses'].to_numpy(dtype=float)
+    sxx = meses * (meses ** 2 - 1) / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pendiente = np.where(sxx > 0, metricas['Sxy'].to_numpy() / sxx, 0.0)
+    metricas['Pendiente'] = pendiente
+    metricas['Ordenada'] = metricas['Media'] - pendiente * (meses - 1) / 2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metricas['CV'] = np.where(
+            metricas['Media'] > 0, metricas['Desvio'] / metricas['Media'], 0.0
+        )
+    return metricas.drop(columns=['Sxy'])
+
+
+def calcular_presupuesto(df_hist, peso_promedio, peso_tendencia, peso_rotacion,
+                         factor_conservadurismo, rotacion=None, ahora=None):
+    """
+    Presupuesto por producto a partir de las ventas históricas filtradas.
+
+    rotacion: Serie indexada por Codigo con la rotación post-recepción promedio;
+    los códigos sin dato usan ROTACION_DEFAULT.
+    """
+    if df_hist.empty:
+        return pd.DataFrame(columns=COLUMNAS_PRESUPUESTO)
+    if ahora is None:
+        ahora = datetime.now()
+
+    productos = resumen_por_producto(df_hist)
+    metricas = metricas_mensuales(df_hist)
+    df = productos.merge(metricas, left_on='Codigo', right_index=True, how='left')
+
+    prom_3m = df['Prom_3M_Unidades'].to_numpy(dtype=float)
+
+    # Tendencia (solo con 3 o más meses)
+    con_tendencia = df['Meses'].to_numpy() >= 3
+    pendiente = df['Pendiente'].to_numpy(dtype=float)
+    proyeccion = df['Ordenada'].to_numpy(dtype=float) + pendiente * df['Meses'].to_numpy(dtype=float)
+    tendencia_unidades = np.where(con_tendencia, np.maximum(0, proyeccion), prom_3m)
+    sube = con_tendencia & (pendiente > 0.05 * prom_3m)
+    baja = con_tendencia & ~sube & (pendiente < -0.05 * prom_3m)
+    tendencia_icono = np.select([sube, baja], ["↗", "↘"], default="→")
+    factor_tendencia = np.select([sube, baja], [1.05, 0.95], default=1.0)
+
+    cv = df['CV'].to_numpy(dtype=float)
+
+    if rotacion is None:
+        rot = np.full(len(df), ROTACION_DEFAULT)
+    else:
+        rot = df['Codigo'].map(rotacion).fillna(ROTACION_DEFAULT).to_numpy(dtype=float)
+
+    ultima_venta = pd.to_datetime(df['Fecha'])
+    dias_sin_venta = (pd.Timestamp(ahora) - ultima_venta).dt.days.fillna(999).astype(int)
+
+    # Unidades sugeridas (ponderado + ajustes)
+    comp_rotacion = prom_3m * (rot / 0.65)
+    unidades = (
+        peso_promedio * prom_3m +
+        peso_tendencia * tendencia_unidades +
+        peso_rotacion * comp_rotacion
+    )
+    unidades = unidades * factor_tendencia
+    unidades = np.where(cv > 0.7, unidades * 0.9, unidades)
+    unidades = np.select([rot > 0.8, rot < 0.3], [unidades * 1.1, unidades * 0.8], default=unidades)
+    unidades_finales = np.maximum(0, np.round(unidades * factor_conservadurismo)).astype(np.int64)
+
+    costo_unitario = df['Costo_Unitario'].to_numpy(dtype=float)
+    precio_venta_unitario = df['Precio_Venta_Unitario'].to_numpy(dtype=float)
+    pesos_a_comprar = unidades_finales * costo_unitario
+    pesos_a_vender = unidades_finales * precio_venta_unitario
+    margen_total = pesos_a_vender - pesos_a_comprar
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margen_pct_proyectado = np.where(pesos_a_vender > 0, margen_total / pesos_a_vender * 100, 0)
+
+    # Score
+    venta_total = df['Venta_Total'].to_numpy(dtype=float)
+    margen_pct = df['Margen_Pct'].to_numpy(dtype=float)
+    max_venta = venta_total.max()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score_venta = np.minimum(venta_total / max_venta, 1) if max_venta > 0 else np.zeros(len(df))
+        score_margen = np.where(margen_pct > 0, np.minimum(margen_pct / 40, 1), 0)
+    score_rotacion = np.minimum(rot, 1)
+    score_estabilidad = np.where(np.isnan(cv), 0, np.maximum(0, 1 - np.minimum(cv, 1)))
+    score = 40 * score_venta + 30 * score_margen + 20 * score_rotacion + 10 * score_estabilidad
+
+    categoria = np.select([score > 75, score > 50, score > 25], ["⭐", "✅", "⚠️"], default="❌")
+    accion = np.select(
+        [score > 75, score > 50, score > 25, dias_sin_venta.to_numpy() > 60],
+        ["Aumentar +10%", "Mantener", "Revisar", "Descontinuar"],
+        default="Evaluar descarte"
+    )
+
+    return pd.DataFrame({
+        'Categoria': categoria,
+        'Codigo': df['Codigo'].to_numpy(),
+        'Descripcion': df['Descripcion'].to_numpy(),
+        'Proveedor': df['Proveedor'].to_numpy(),
+        'Prom_3M_Unidades': prom_3m,
+        'Tendencia': tendencia_icono,
+        'Rotacion': rot,
+        'Margen_Pct': margen_pct,
+        'Costo_Unitario': costo_unitario,
+        'Precio_Venta_Unitario': precio_venta_unitario,
+        'Score': score,
+        'Unidades_A_Comprar': unidades_finales,
+        'Pesos_A_Comprar': pesos_a_comprar,
+        'Unidades_A_Vender': unidades_finales,
+        'Pesos_A_Vender': pesos_a_vender,
+        'Margen_Unitario': precio_venta_unitario - costo_unitario,
+        'Margen_Total': margen_total,
+        'Margen_Pct_Proyectado': margen_pct_proyectado,
+        'Accion': accion,
+        'Dias_Sin_Venta': dias_sin_venta.to_numpy(),
+        'CV': cv,
+    }, columns=COLUMNAS_PRESUPUESTO)
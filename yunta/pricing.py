@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# SIMULADOR DE PRICING
+# ============================================================================
+# Rentabilidad por producto (margen sobre COSTO, markup) y simulación del
+# aumento de precios según la estrategia elegida, sin tocar los productos
+# protegidos (anclas). Las ventas llegan agregadas por (Codigo, Descripcion,
+# Proveedor) con agregar_ventas (cubo) o agregar_movimientos (filas).
+
+# Palabras de productos ancla que se sugieren proteger
+PALABRAS_ANCLA = ['leche', 'pan ', 'coca', 'pepsi', 'yerba', 'azucar', 'aceite', 'harina', 'arroz', 'fideos']
+
+# Margen mínimo sobre costo al que se llevan los productos con margen negativo
+MARGEN_MINIMO = 0.15
+
+# Diferencia de margen máxima que prueba resolver_diferencia_margen
+DIFERENCIA_MAXIMA = 1000
+
+
+def metricas_precios(ventas_producto):
+    """
+    Una fila por producto con Unidades_Vendidas, Costo_Promedio,
+    Precio_Actual, totales, Margen_Pct (sobre costo), Margen_Unitario y
+    Rotacion_Pct (participación en unidades), ordenada por Venta_Total.
+    """
+    df_productos_precio = ventas_producto[[
+        'Codigo', 'Descripcion', 'Proveedor',
+        'Cantidad', 'Costo', 'Precio_Unitario', 'Venta_Total', 'Costo_Total', 'Margen'
+    ]]
+    df_productos_precio.columns = [
+        'Codigo', 'Descripcion', 'Proveedor',
+        'Unidades_Vendidas', 'Costo_Promedio', 'Precio_Actual',
+        'Venta_Total', 'Costo_Total', 'Margen_Total'
+    ]
+
+    # Margen sobre COSTO (markup)
+    costo_safe = df_productos_precio['Costo_Promedio'].replace(0, pd.NA)
+    df_productos_precio['Margen_Pct'] = (
+        (df_productos_precio['Precio_Actual'] - df_productos_precio['Costo_Promedio']) /
+        costo_safe * 100
+    ).fillna(0)
+
+    df_productos_precio['Margen_Unitario'] = (
+        df_productos_precio['Precio_Actual'] - df_productos_precio['Costo_Promedio']
+    )
+
+    # Rotación (participación en unidades vendidas)
+    total_unidades = df_productos_precio['Unidades_Vendidas'].sum()
+    df_productos_precio['Rotacion_Pct'] = (
+        df_productos_precio['Unidades_Vendidas'] / total_unidades * 100
+    ).fillna(0)
+
+    return df_productos_precio.sort_values('Venta_Total', ascending=False)
+
+
+def rentabilidad(df_productos_precio):
+    """(venta_total, costo_total, margen_total, margen_pct sobre costo)"""
+    venta_total = df_productos_precio['Venta_Total'].sum()
+    costo_total = df_productos_precio['Costo_Total'].sum()
+    margen_total = df_productos_precio['Margen_Total'].sum()
+    margen_pct = (margen_total / costo_total * 100) if costo_total > 0 else 0
+    return venta_total, costo_total, margen_total, margen_pct
+
+
+def sugerir_anclas(df_productos_precio, palabras=PALABRAS_ANCLA, limite=20):
+    """Productos cuya descripción contiene alguna palabra ancla (los de más venta primero)"""
+    return df_productos_precio[
+        df_productos_precio['Descripcion'].str.lower().str.contains('|'.join(palabras), na=False)
+    ].head(limite)
+
+
+def calcular_aumento(precio, costo, margen_pct, rotacion_pct, protegido, estrategia, diferencia_margen,
+                     factor_ajuste=1):
+    """
+    % de aumento por producto sobre arrays de NumPy (uno por columna).
+
+    factor_ajuste: total de productos / no protegidos (estrategia Uniforme).
+    """
+    if "Inteligente" in estrategia:
+        # Más aumento a productos con bajo margen y alta rotación
+        factor_margen = np.maximum(0, (30 - margen_pct) / 30)  # Más bajo el margen, más aumento
+        factor_rotacion = np.minimum(rotacion_pct / 1, 1)  # Alta rotación aguanta más
+
+        # Calcular aumento base
+        aumento_base = diferencia_margen * 1.5  # Factor para compensar protegidos
+
+        # Ajustar según factores; mínimo 0.5%, máximo 10%
+        aumento = np.clip(aumento_base * (0.5 + factor_margen * 0.5) * (0.8 + factor_rotacion * 0.4), 0.5, 10)
+
+    elif "Uniforme" in estrategia:
+        # Mismo % a todos (ajustado por protegidos)
+        aumento = np.full(len(precio), diferencia_margen * factor_ajuste, dtype=float)
+
+    else:
+        aumento = np.full(len(precio), diferencia_margen, dtype=float)
+
+    # Margen negativo: llevar a 15% mínimo sobre costo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aumento_minimo = np.maximum(((costo * (1 + MARGEN_MINIMO) / precio) - 1) * 100, 0)
+    aumento = np.where(margen_pct < 0, aumento_minimo, aumento)
+
+    # Sin precio o costo (evita división por cero) y protegidos: no se tocan
+    return np.where((precio > 0) & (costo > 0) & ~protegido, aumento, 0.0)
+
+
+def _entradas_aumento(df_productos_precio, protegidos):
+    """Arrays de calcular_aumento y el factor_ajuste de la estrategia Uniforme"""
+    protegido = df_productos_precio['Descripcion'].isin(protegidos).to_numpy(dtype=bool)
+    productos_no_protegidos = int((~protegido).sum())
+    factor_ajuste = len(protegido) / productos_no_protegidos if productos_no_protegidos > 0 else 1
+    entradas = {
+        'precio': df_productos_precio['Precio_Actual'].to_numpy(dtype=float),
+        'costo': df_productos_precio['Costo_Promedio'].to_numpy(dtype=float),
+        'margen_pct': df_productos_precio['Margen_Pct'].to_numpy(dtype=float),
+        'rotacion_pct': df_productos_precio['Rotacion_Pct'].to_numpy(dtype=float),
+        'protegido': protegido,
+    }
+    return entradas, factor_ajuste
+
+
+def simular_precios(df_productos_precio, estrategia, diferencia_margen, protegidos):
+    """
+    Precios nuevos por producto: Protegido, Aumento_Pct, Precio_Nuevo,
+    Margen_Nuevo_Pct (sobre costo), Margen_Nuevo_Total e Impacto_Ganancia,
+    ordenados por impacto.
+    """
+    df_simulacion = df_productos_precio.copy()
+
+    entradas, factor_ajuste = _entradas_aumento(df_simulacion, protegidos)
+    df_simulacion['Protegido'] = entradas['protegido']
+    df_simulacion['Aumento_Pct'] = calcular_aumento(**entradas, estrategia=estrategia,
+                                                    diferencia_margen=diferencia_margen,
+                                                    factor_ajuste=factor_ajuste)
+
+    # Nuevos precios
+    df_simulacion['Precio_Nuevo'] = df_simulacion['Precio_Actual'] * (1 + df_simulacion['Aumento_Pct'] / 100)
+
+    # Nuevo margen sobre COSTO
+    costo_sim_safe = df_simulacion['Costo_Promedio'].replace(0, pd.NA)
+    df_simulacion['Margen_Nuevo_Pct'] = (
+        (df_simulacion['Precio_Nuevo'] - df_simulacion['Costo_Promedio']) /
+        costo_sim_safe * 100
+    ).fillna(0)
+
+    # Impacto en ganancia
+    df_simulacion['Margen_Nuevo_Total'] = (
+        (df_simulacion['Precio_Nuevo'] - df_simulacion['Costo_Promedio']) *
+        df_simulacion['Unidades_Vendidas']
+    )
+    df_simulacion['Impacto_Ganancia'] = df_simulacion['Margen_Nuevo_Total'] - df_simulacion['Margen_Total']
+
+    return df_simulacion.sort_values('Impacto_Ganancia', ascending=False)
+
+
+def resolver_diferencia_margen(df_productos_precio, estrategia, margen_objetivo, protegidos, costo_total,
+                               tolerancia=1e-6, max_iteraciones=200):
+    """
+    Diferencia de margen (la de simular_precios) con la que el margen nuevo
+    sobre costo de resumen_simulacion llega a margen_objetivo. Bisección
+    sobre calcular_aumento: el margen nuevo crece con la diferencia.
+
+    Devuelve 0 si el margen ya llega sin aumentar y None si la estrategia no
+    lo alcanza (Inteligente tiene un tope de 10% por producto).
+    """
+    if costo_total <= 0:
+        return None
+    entradas, factor_ajuste = _entradas_aumento(df_productos_precio, protegidos)
+    precio, costo = entradas['precio'], entradas['costo']
+    unidades = df_productos_precio['Unidades_Vendidas'].to_numpy(dtype=float)
+
+    def margen_nuevo_pct(diferencia_margen):
+        aumento = calcular_aumento(**entradas, estrategia=estrategia,
+                                   diferencia_margen=diferencia_margen, factor_ajuste=factor_ajuste)
+        return np.nansum((precio * (1 + aumento / 100) - costo) * unidades) / costo_total * 100
+
+    if margen_nuevo_pct(0) >= margen_objetivo:
+        return 0.0
+
+    # Acotar por arriba duplicando hasta superar el objetivo
+    bajo, alto = 0.0, max(float(margen_objetivo), 1.0)
+    while margen_nuevo_pct(alto) < margen_objetivo:
+        if alto > DIFERENCIA_MAXIMA:
+            return None
+        bajo, alto = alto, alto * 2
+
+    for _ in range(max_iteraciones):
+        medio = (bajo + alto) / 2
+        margen = margen_nuevo_pct(medio)
+        if abs(margen - margen_objetivo) <= tolerancia:
+            return medio
+        if margen < margen_objetivo:
+            bajo = medio
+        else:
+            alto = medio
+    return alto
+
+
+def resumen_simulacion(df_simulacion, costo_total, margen_total):
+    """
+    (margen_nuevo_total, margen_nuevo_pct, ganancia_adicional,
+    productos_afectados, aumento_promedio) de una simulación.
+    """
+    margen_nuevo_total = df_simulacion['Margen_Nuevo_Total'].sum()
+    margen_nuevo_pct = (margen_nuevo_total / costo_total * 100) if costo_total > 0 else 0
+    ganancia_adicional = margen_nuevo_total - margen_total
+    con_aumento = df_simulacion[df_simulacion['Aumento_Pct'] > 0]
+    return margen_nuevo_total, margen_nuevo_pct, ganancia_adicional, len(con_aumento), con_aumento['Aumento_Pct'].mean()
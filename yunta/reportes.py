@@ -0,0 +1,80 @@
+# ============================================================================
+# REPORTES PERSONALIZADOS
+# ============================================================================
+# Columnas disponibles por tipo de reporte y el armado del reporte: filtros,
+# agrupación opcional con suma de métricas y columnas finales con nombres
+# amigables.
+
+TIPOS_REPORTE = ["Solo Ventas", "Todos los Movimientos"]
+
+COLUMNAS_BASE = {
+    'Fecha': 'Fecha',
+    'Tienda': 'Tienda',
+    'Codigo': 'Código',
+    'Descripcion': 'Descripción',
+    'Proveedor': 'Proveedor',
+    'Cantidad': 'Cantidad'
+}
+
+COLUMNAS_VENTAS = {
+    **COLUMNAS_BASE,
+    'Venta_Total': 'Ventas $',
+    'Costo_Total': 'Costo $',
+    'Margen': 'Margen $',
+    'Margen_Pct': 'Margen %',
+    'Precio_Venta': 'Precio Venta Unit.'
+}
+
+COLUMNAS_MOVIMIENTOS = {
+    **COLUMNAS_BASE,
+    'Tipo_Movimiento': 'Tipo de Movimiento',
+    'Tienda_Origen': 'Tienda Origen',
+    'Tienda_Destino': 'Tienda Destino',
+    'Venta_Total': 'Ventas $',
+    'Costo_Total': 'Costo $',
+    'Costo': 'Costo Unitario',
+    'Margen': 'Margen $',
+    'Numero_Documento': 'Nro. Documento',
+    'Precio_Venta': 'Precio Venta Unit.'
+}
+
+# Columnas que NO se pueden agrupar (son métricas)
+COLUMNAS_METRICAS = ['Cantidad', 'Venta_Total', 'Costo_Total', 'Margen', 'Margen_Pct', 'Precio_Venta', 'Costo']
+
+
+def columnas_reporte(tipo_reporte):
+    """(columnas disponibles {columna: nombre amigable}, columnas por defecto) del tipo de reporte"""
+    if tipo_reporte == "Solo Ventas":
+        return COLUMNAS_VENTAS, ['Fecha', 'Tienda', 'Codigo', 'Descripcion', 'Venta_Total', 'Margen']
+    return COLUMNAS_MOVIMIENTOS, ['Fecha', 'Tipo_Movimiento', 'Tienda', 'Codigo', 'Descripcion', 'Cantidad']
+
+
+def construir_reporte(df, columnas, nombres, proveedores=None, tiendas=None,
+                      busqueda=None, indice=None, agrupar_por=None, sumar=None):
+    """
+    Reporte con las columnas pedidas (renombradas según nombres).
+
+    Filtra por proveedores, tiendas y la búsqueda "Código o Descripción"
+    (con el IndiceProductos dado). Con agrupar_por y sumar agrupa sumando
+    esas métricas y recalcula Margen_Pct si está entre las columnas.
+    """
+    if proveedores:
+        df = df[df['Proveedor'].isin(proveedores)]
+    if tiendas:
+        df = df[df['Tienda'].isin(tiendas)]
+    if busqueda:
+        df = indice.filtrar(df, busqueda)
+
+    if agrupar_por and sumar and not df.empty:
+        agg_dict = {col: 'sum' for col in sumar if col in df.columns}
+        if agg_dict:
+            df = df.groupby(agrupar_por, observed=True).agg(agg_dict).reset_index()
+
+            # Recalcular Margen % si está seleccionado
+            if 'Margen_Pct' in columnas and 'Venta_Total' in df.columns and 'Margen' in df.columns:
+                df['Margen_Pct'] = (df['Margen'] / df['Venta_Total'] * 100).fillna(0)
+
+    columnas_finales = [c for c in columnas if c in df.columns]
+    df_reporte = df[columnas_finales].copy()
+    df_reporte.columns = [nombres.get(c, c) for c in df_reporte.columns]
+    return df_reporte
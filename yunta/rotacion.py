@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# ROTACIÓN POST-RECEPCIÓN (RANGE JOIN)
+# ============================================================================
+# Para cada recepción suma las unidades vendidas del mismo Codigo entre la
+# fecha de recepción y N días después (ambos extremos incluidos), usando
+# sumas acumuladas sobre las ventas ordenadas y búsqueda binaria.
+#
+# Las filas sin fecha (NaT) quedan fuera de las claves: como int64 NaT es el
+# mínimo del tipo y la clave se desbordaría. Una venta sin fecha no cae en
+# ninguna ventana y una recepción sin fecha no suma ventas (como el loop
+# original, donde las comparaciones con NaT dan False).
+
+VENTANA_DIAS_DEFAULT = 7
+
+# Claves compuestas (codigo, milisegundos) en un único int64
+_BITS_TIEMPO = 40
+_MS_POR_DIA = 86_400_000
+
+
+def _claves(codigos, fechas, categorias, origen):
+    """Codifica (Codigo, Fecha) como enteros ordenables"""
+    idx = pd.Categorical(codigos, categories=categorias).codes.astype(np.int64)
+    ms = (pd.to_datetime(fechas).to_numpy(dtype='datetime64[ms]') - origen).astype(np.int64)
+    return idx, (idx << _BITS_TIEMPO) + ms
+
+
+def ventas_post_recepcion(recepciones, ventas, dias=VENTANA_DIAS_DEFAULT):
+    """
+    Devuelve las recepciones con Ventas_Ventana (unidades vendidas en la ventana)
+    y Rotacion (Ventas_Ventana / |Cantidad recibida|, NaN si la cantidad es 0).
+    """
+    resultado = recepciones[['Codigo', 'Fecha', 'Cantidad']].reset_index(drop=True)
+    if resultado.empty:
+        return resultado.assign(Ventas_Ventana=pd.Series(dtype=float), Rotacion=pd.Series(dtype=float))
+
+    fechas_v = pd.to_datetime(ventas['Fecha'])
+    ventas = ventas[fechas_v.notna().to_numpy()]
+    fechas_v = fechas_v[fechas_v.notna()]
+    fechas_r = pd.to_datetime(resultado['Fecha'])
+    con_fecha = fechas_r.notna().to_numpy()
+    recepciones_con_fecha = resultado[con_fecha]
+
+    ventas_ventana = np.zeros(len(resultado))
+    if con_fecha.any():
+        categorias = pd.Index(pd.unique(np.concatenate([
+            np.asarray(ventas['Codigo'], dtype=object),
+            np.asarray(recepciones_con_fecha['Codigo'], dtype=object)
+        ])))
+        fechas_todas = pd.concat([fechas_v, fechas_r[con_fecha]])
+        origen = fechas_todas.min().to_datetime64().astype('datetime64[ms]')
+
+        _, clave_v = _claves(ventas['Codigo'], fechas_v, categorias, origen)
+        orden = np.argsort(clave_v, kind='stable')
+        clave_v = clave_v[orden]
+        acumulado = np.concatenate([[0.0], np.cumsum(ventas['Cantidad'].abs().to_numpy(dtype=float)[orden])])
+
+        _, clave_r = _claves(recepciones_con_fecha['Codigo'], fechas_r[con_fecha], categorias, origen)
+        desde = np.searchsorted(clave_v, clave_r, side='left')
+        hasta = np.searchsorted(clave_v, clave_r + dias * _MS_POR_DIA, side='right')
+        ventas_ventana[con_fecha] = acumulado[hasta] - acumulado[desde]
+
+    cantidad = resultado['Cantidad'].abs().to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rotacion = np.where(cantidad > 0, ventas_ventana / cantidad, np.nan)
+
+    return resultado.assign(Ventas_Ventana=ventas_ventana, Rotacion=rotacion)
+
+
+def rotacion_por_codigo(recepciones, ventas, dias=VENTANA_DIAS_DEFAULT):
+    """Rotación post-recepción promedio por Codigo (solo recepciones con cantidad)"""
+    detalle = ventas_post_recepcion(recepciones, ventas, dias)
+    detalle = detalle[detalle['Rotacion'].notna()]
+    return detalle.groupby('Codigo', observed=True)['Rotacion'].mean()
@@ -0,0 +1,365 @@
+import duckdb
+import numpy as np
+import pandas as pd
+
+from yunta.sentencias import consultar
+
+# ============================================================================
+# SEGUIMIENTO DE PEDIDOS
+# ============================================================================
+# Filtros, métricas por línea y KPIs sobre el consolidado de pedidos
+# (CONSOLIDADO_COMPLETO.parquet) que usa pages/seguimiento.py.
+#
+# Los rangos de fechas se comparan como datetime64 contra [desde, hasta + 1
+# día): incluye todo el día hasta sin crear un objeto date por fila.
+
+TIPOS_FECHA = ["Cualquier Fecha", "Fecha Pedido", "Fecha Recepción", "Fecha Transferencia"]
+
+# Columna de fecha de cada tipo de filtro
+COLUMNA_TIPO_FECHA = {
+    "Fecha Pedido": 'Fecha_Pedido',
+    "Fecha Recepción": 'Fecha_Recepcion_Proveedor',
+    "Fecha Transferencia": 'Fecha_Primera_Transferencia',
+}
+
+# "Cualquier Fecha": alguna de estas fechas cae en el rango
+COLUMNAS_CUALQUIER_FECHA = ['Fecha_Pedido', 'Fecha_Recepcion', 'Fecha_Recepcion_Proveedor', 'Fecha_Primera_Transferencia']
+
+COLUMNAS_FECHA = ['Fecha_Pedido', 'Fecha_Recepcion', 'Fecha_Recepcion_Proveedor',
+                  'Fecha_Primera_Transferencia', 'Fecha_Ultima_Transferencia']
+
+# Columnas con selector de valores en la página
+COLUMNAS_FILTRO = {'Proveedor': 'proveedores', 'ID_Pedido': 'ids', 'Tienda': 'tiendas', 'Estado_Solicitud': 'estados'}
+
+COLUMNAS_NUMERICAS = ['Cantidad_Solicitada', 'Cantidad_Transferida_Entrada', 'Cantidad_Reasignada',
+                      'Precio_Unitario', 'Precio_Real', 'Costo_Unitario_Transferencia',
+                      'Precio_Total_Solicitado', 'Precio_Total_Transferido', 'Diferencia_Precio_Total']
+
+
+def moneda_a_float(valor):
+    """Limpia valores monetarios para cálculos numéricos"""
+    if pd.isna(valor):
+        return 0.0
+    try:
+        texto = str(valor).strip()
+        texto = texto.replace('$', '').replace(' ', '').replace('.', '').replace(',', '.')
+        return float(texto)
+    except:
+        return 0.0
+
+
+def preparar_pedidos(df):
+    """
+    Fechas a datetime y cantidades / precios a número en el consolidado
+    leído, con las métricas de recalcular_metricas ya calculadas: se hace
+    una vez al cargar y cada rerun solo filtra y suma.
+    """
+    # Las columnas que ya vienen con tipo (parquet leído con DuckDB) no se convierten
+    for col in COLUMNAS_FECHA:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    for col in COLUMNAS_NUMERICAS:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    if 'Diferencia_Precio_Total' in df.columns:
+        if df['Diferencia_Precio_Total'].dtype == 'object':
+            df['Diferencia_Precio_Total'] = df['Diferencia_Precio_Total'].apply(moneda_a_float)
+    return recalcular_metricas(df)
+
+
+def limites_fecha(fecha_desde, fecha_hasta):
+    """[desde, hasta + 1 día) como Timestamps a medianoche"""
+    return (pd.Timestamp(fecha_desde).normalize(),
+            pd.Timestamp(fecha_hasta).normalize() + pd.Timedelta(days=1))
+
+
+def columnas_tipo_fecha(tipo_fecha):
+    """Columnas de fecha del tipo de filtro (todas las de COLUMNAS_CUALQUIER_FECHA si no es uno puntual)"""
+    if tipo_fecha in COLUMNA_TIPO_FECHA:
+        return [COLUMNA_TIPO_FECHA[tipo_fecha]]
+    return COLUMNAS_CUALQUIER_FECHA
+
+
+def filtrar_pedidos(df, tipo_fecha, fecha_desde, fecha_hasta, proveedores=None, ids=None,
+                    tiendas=None, estados=None):
+    """
+    Líneas de pedido en el rango de fechas (según tipo_fecha) y con los
+    valores elegidos.
+    """
+    if 'Fecha_Pedido' in df.columns:
+        desde, hasta = limites_fecha(fecha_desde, fecha_hasta)
+        mascara = np.zeros(len(df), dtype=bool)
+        for col in columnas_tipo_fecha(tipo_fecha):
+            mascara |= ((df[col] >= desde) & (df[col] < hasta)).to_numpy()
+        df = df[mascara]
+
+    if proveedores:
+        df = df[df['Proveedor'].isin(proveedores)]
+    if ids:
+        df = df[df['ID_Pedido'].isin(ids)]
+    if tiendas:
+        df = df[df['Tienda'].isin(tiendas)]
+    if estados:
+        df = df[df['Estado_Solicitud'].isin(estados)]
+    return df
+
+
+def _catalogo(filas, minimos, maximos, valores, pedidos, productos):
+    fecha_min = pd.Series(minimos, dtype='datetime64[ns]').min()
+    fecha_max = pd.Series(maximos, dtype='datetime64[ns]').max()
+    return {
+        'filas': filas,
+        'fecha_min': None if pd.isna(fecha_min) else fecha_min,
+        'fecha_max': None if pd.isna(fecha_max) else fecha_max,
+        'proveedores': sorted(valores['Proveedor']),
+        'tiendas': sorted(valores['Tienda']),
+        'estados': sorted(valores['Estado_Solicitud']),
+        'pedidos': pedidos.reset_index(drop=True),
+        'productos': productos.reset_index(drop=True),
+    }
+
+
+def recalcular_metricas(df):
+    """
+    Agrega Base_Fecha_Calculo, Dias_Hasta_Primera_Transferencia,
+    Porcentaje_Cumplimiento_Transferencia, Dif_Unidades y
+    Dif_Unidades_Valorizada a las líneas de pedido.
+    """
+    df = df.copy(deep=False)
+    df['Fecha_Recepcion_Proveedor'] = pd.to_datetime(df['Fecha_Recepcion_Proveedor'], errors='coerce')
+    df['Fecha_Pedido'] = pd.to_datetime(df['Fecha_Pedido'], errors='coerce')
+    df['Fecha_Primera_Transferencia'] = pd.to_datetime(df['Fecha_Primera_Transferencia'], errors='coerce')
+    df['Base_Fecha_Calculo'] = df['Fecha_Recepcion_Proveedor'].combine_first(df['Fecha_Pedido'])
+    # Días enteros (piso) entre la base y la primera transferencia, 0 sin alguna de las fechas
+    dias = (df['Fecha_Primera_Transferencia'] - df['Base_Fecha_Calculo']).dt.days
+    df['Dias_Hasta_Primera_Transferencia'] = dias.clip(lower=0).fillna(0).astype('int64')
+    df['Porcentaje_Cumplimiento_Transferencia'] = np.where(
+        (df['Cantidad_Reasignada'] > 0) & (df['Cantidad_Transferida_Entrada'].notna()),
+        (df['Cantidad_Transferida_Entrada'] / df['Cantidad_Reasignada'] * 100).round(2),
+        0
+    )
+
+    if 'Cantidad_Reasignada' in df.columns and 'Cantidad_Transferida_Entrada' in df.columns:
+        df['Dif_Unidades'] = df['Cantidad_Reasignada'].fillna(0) - df['Cantidad_Transferida_Entrada'].fillna(0)
+    else:
+        df['Dif_Unidades'] = 0
+
+    if 'Costo_Unitario_Transferencia' in df.columns:
+        df['Dif_Unidades_Valorizada'] = df['Dif_Unidades'] * df['Costo_Unitario_Transferencia'].fillna(0)
+    else:
+        df['Dif_Unidades_Valorizada'] = 0
+    return df
+
+
+def kpis_pedidos(df):
+    """
+    KPIs de las líneas (de preparar_pedidos): total_transferido,
+    total_pedido, cumplimiento_promedio, dif_unidades_valorizada,
+    dif_precios_lineas (solo líneas con precio distinto al costo de
+    transferencia) y dif_precio_total.
+    """
+    dif_precio_solo = 0
+    if all(col in df.columns for col in ['Precio_Unitario', 'Costo_Unitario_Transferencia', 'Cantidad_Reasignada']):
+        mask_dif = df['Precio_Unitario'] != df['Costo_Unitario_Transferencia']
+        dif_precio_solo = (
+            (df.loc[mask_dif, 'Precio_Unitario'].fillna(0) - df.loc[mask_dif, 'Costo_Unitario_Transferencia'].fillna(0)) *
+            df.loc[mask_dif, 'Cantidad_Reasignada'].fillna(0)
+        ).sum()
+
+    return {
+        'total_transferido': (
+            df['Cantidad_Transferida_Entrada'].fillna(0) * df['Costo_Unitario_Transferencia'].fillna(0)
+        ).sum(),
+        'total_pedido': (df['Cantidad_Reasignada'].fillna(0) * df['Precio_Unitario'].fillna(0)).sum(),
+        'cumplimiento_promedio': df['Porcentaje_Cumplimiento_Transferencia'].mean(),
+        'dif_unidades_valorizada': df['Dif_Unidades_Valorizada'].sum(),
+        'dif_precios_lineas': dif_precio_solo,
+        'dif_precio_total': df['Diferencia_Precio_Total'].sum() if 'Diferencia_Precio_Total' in df.columns else 0,
+    }
+
+
+# ============================================================================
+# CONSULTAS EN DUCKDB SOBRE LA VISTA consolidado
+# ============================================================================
+# Con el consolidado en disco, una conexión DuckDB con la vista consolidado
+# (conectar_consolidado) resuelve los filtros de filtrar_pedidos y la
+# búsqueda por SKU sobre el parquet (con poda de row groups por
+# estadísticas): a pandas llegan solo las líneas que cumplen, y los KPIs se
+# suman en SQL sin traer líneas. Las consultas pasan por
+# yunta.sentencias.consultar, así una misma conexión la pueden compartir
+# todas las sesiones.
+#
+# Las fechas guardadas como texto no se filtran en SQL: filtrar_pedidos
+# termina el filtro sobre el resultado y los KPIs se calculan en pandas.
+
+VISTA_CONSOLIDADO = "consolidado"
+
+_TIPOS_FECHA_SQL = ('DATE', 'TIMESTAMP')
+
+
+def conectar_consolidado(ruta):
+    """
+    Conexión DuckDB nueva en memoria con la vista consolidado sobre el
+    parquet de ruta. La vista no es TEMP: los cursores por hilo de
+    yunta.sentencias no ven las vistas temporales.
+    """
+    con = duckdb.connect()
+    ruta = str(ruta).replace("'", "''")
+    con.execute(f"CREATE OR REPLACE VIEW {VISTA_CONSOLIDADO} AS SELECT * FROM read_parquet('{ruta}')")
+    return con
+
+
+def _columnas_consolidado(con):
+    """{columna: tipo DuckDB} de la vista consolidado, en el orden del parquet"""
+    tipos = consultar(con, f"""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_name = '{VISTA_CONSOLIDADO}' ORDER BY ordinal_position
+    """)
+    return dict(zip(tipos['column_name'], tipos['data_type']))
+
+
+def _fechas_en_sql(columnas, tipo_fecha):
+    """True si el filtro de fechas del tipo se puede resolver en SQL (columnas DATE / TIMESTAMP)"""
+    if 'Fecha_Pedido' not in columnas:
+        return True
+    return all(columnas.get(c, '').startswith(_TIPOS_FECHA_SQL) for c in columnas_tipo_fecha(tipo_fecha))
+
+
+def _en_lista(columna, tipo):
+    """
+    columna IN (valores de un parámetro VARCHAR[]) como semi-join: cuesta
+    filas + valores y no filas × valores como list_contains. Las columnas de
+    texto se comparan sin CAST para que las estadísticas podan row groups.
+    """
+    valor = f'"{columna}"' if tipo == 'VARCHAR' else f'CAST("{columna}" AS VARCHAR)'
+    return f"{valor} IN (SELECT unnest(CAST(? AS VARCHAR[])))"
+
+
+def filtro_pedidos_sql(columnas, tipo_fecha, fecha_desde, fecha_hasta, proveedores=None, ids=None,
+                       tiendas=None, estados=None, skus=None):
+    """
+    WHERE parametrizado con los filtros de filtrar_pedidos: (sql, parámetros).
+    columnas: {columna: tipo DuckDB} del parquet. skus: SKUs de la búsqueda
+    (None sin búsqueda; una lista vacía no deja ninguna línea).
+    """
+    condiciones, parametros = [], []
+    if 'Fecha_Pedido' in columnas and _fechas_en_sql(columnas, tipo_fecha):
+        columnas_fecha = columnas_tipo_fecha(tipo_fecha)
+        desde, hasta = limites_fecha(fecha_desde, fecha_hasta)
+        condiciones.append("(" + " OR ".join(f'("{c}" >= ? AND "{c}" < ?)' for c in columnas_fecha) + ")")
+        for _ in columnas_fecha:
+            parametros += [desde.to_pydatetime(), hasta.to_pydatetime()]
+
+    seleccion = {'proveedores': proveedores, 'ids': ids, 'tiendas': tiendas, 'estados': estados}
+    for columna, filtro in COLUMNAS_FILTRO.items():
+        if seleccion[filtro]:
+            condiciones.append(_en_lista(columna, columnas.get(columna)))
+            parametros.append([str(v) for v in seleccion[filtro]])
+    if skus is not None:
+        condiciones.append(_en_lista('SKU', columnas.get('SKU')))
+        parametros.append([str(v) for v in skus])
+    return " AND ".join(condiciones) or "TRUE", parametros
+
+
+def leer_pedidos(con, tipo_fecha, fecha_desde, fecha_hasta, proveedores=None, ids=None,
+                 tiendas=None, estados=None, skus=None, columnas=None):
+    """
+    Las líneas de la vista consolidado que devolvería filtrar_pedidos (y la
+    búsqueda por skus), ya con preparar_pedidos, leyendo solo las que
+    cumplen los filtros.
+
+    Con columnas se leen solo esas (las que existan, en el orden del
+    parquet) más las de los filtros: el resto del archivo no se lee.
+    """
+    tipos = _columnas_consolidado(con)
+    where, parametros = filtro_pedidos_sql(
+        tipos, tipo_fecha, fecha_desde, fecha_hasta, proveedores, ids, tiendas, estados, skus
+    )
+    seleccion = "*"
+    if columnas is not None:
+        leidas = set(columnas) | set(COLUMNAS_FILTRO) | set(COLUMNAS_CUALQUIER_FECHA)
+        seleccion = ", ".join(f'"{c}"' for c in tipos if c in leidas)
+    df = preparar_pedidos(consultar(con, f"SELECT {seleccion} FROM {VISTA_CONSOLIDADO} WHERE {where}", parametros))
+    if _fechas_en_sql(tipos, tipo_fecha):
+        return df
+    # Fechas de texto: el rango se filtra acá (los valores ya se filtraron en SQL)
+    return filtrar_pedidos(df, tipo_fecha, fecha_desde, fecha_hasta)
+
+
+def kpis_consolidado(con, tipo_fecha, fecha_desde, fecha_hasta, proveedores=None, ids=None,
+                     tiendas=None, estados=None, skus=None):
+    """
+    kpis_pedidos de las líneas que cumplen los filtros, sumados en DuckDB
+    sin traer las líneas (con fechas de texto, kpis_pedidos sobre
+    leer_pedidos).
+    """
+    tipos = _columnas_consolidado(con)
+    filtros = (tipo_fecha, fecha_desde, fecha_hasta, proveedores, ids, tiendas, estados, skus)
+    if not _fechas_en_sql(tipos, tipo_fecha):
+        return kpis_pedidos(leer_pedidos(con, *filtros))
+    where, parametros = filtro_pedidos_sql(tipos, *filtros)
+
+    def valor(col):
+        return f'TRY_CAST("{col}" AS DOUBLE)' if col in tipos else 'NULL'
+
+    def cero(col):
+        return f"COALESCE({valor(col)}, 0)"
+
+    # El porcentaje de cada línea se redondea como Series.round(2): escala por 100 y mitad al par
+    reasignada, transferida = valor('Cantidad_Reasignada'), valor('Cantidad_Transferida_Entrada')
+    dif_precios = "0"
+    if all(col in tipos for col in ['Precio_Unitario', 'Costo_Unitario_Transferencia', 'Cantidad_Reasignada']):
+        dif_precios = (
+            f"CASE WHEN {valor('Precio_Unitario')} IS DISTINCT FROM {valor('Costo_Unitario_Transferencia')} "
+            f"THEN ({cero('Precio_Unitario')} - {cero('Costo_Unitario_Transferencia')}) * {cero('Cantidad_Reasignada')} "
+            f"ELSE 0 END"
+        )
+    fila = consultar(con, f"""
+        SELECT
+            SUM({cero('Cantidad_Transferida_Entrada')} * {cero('Costo_Unitario_Transferencia')}) AS total_transferido,
+            SUM({cero('Cantidad_Reasignada')} * {cero('Precio_Unitario')}) AS total_pedido,
+            AVG(CASE WHEN {reasignada} > 0 AND {transferida} IS NOT NULL
+                     THEN ROUND_EVEN({transferida} / {reasignada} * 100 * 100, 0) / 100 ELSE 0 END)
+                AS cumplimiento_promedio,
+            SUM(({cero('Cantidad_Reasignada')} - {cero('Cantidad_Transferida_Entrada')})
+                * {cero('Costo_Unitario_Transferencia')}) AS dif_unidades_valorizada,
+            SUM({dif_precios}) AS dif_precios_lineas,
+            SUM({cero('Diferencia_Precio_Total')}) AS dif_precio_total
+        FROM {VISTA_CONSOLIDADO}
+        WHERE {where}
+    """, parametros).iloc[0]
+
+    # Sin líneas: sumas en 0 y promedio NaN, como kpis_pedidos
+    kpis = {clave: (0.0 if pd.isna(v) else float(v)) for clave, v in fila.items()}
+    kpis['cumplimiento_promedio'] = float(fila['cumplimiento_promedio'])
+    return kpis
+
+
+def catalogo_consolidado(con):
+    """
+    Total de líneas (filas) y valores para los filtros de la página, con
+    consultas de valores distintos en DuckDB: fecha_min / fecha_max (entre
+    las fechas de COLUMNAS_CUALQUIER_FECHA, None sin fechas), proveedores,
+    tiendas y estados ordenados, y los pares distintos (Proveedor,
+    ID_Pedido) y (SKU, Descripcion).
+    """
+    columnas = _columnas_consolidado(con)
+    minimos, maximos = [], []
+    if 'Fecha_Pedido' in columnas:
+        fechas = [c for c in COLUMNAS_CUALQUIER_FECHA if c in columnas]
+        limites = consultar(con, "SELECT " + ", ".join(
+            f'MIN("{c}") AS "min_{c}", MAX("{c}") AS "max_{c}"' for c in fechas
+        ) + f" FROM {VISTA_CONSOLIDADO}").iloc[0]
+        minimos = [pd.to_datetime(limites[f"min_{c}"], errors='coerce') for c in fechas]
+        maximos = [pd.to_datetime(limites[f"max_{c}"], errors='coerce') for c in fechas]
+
+    def distintos(*cols):
+        lista = ", ".join(f'"{c}"' for c in cols)
+        return consultar(con, f"SELECT DISTINCT {lista} FROM {VISTA_CONSOLIDADO}")
+
+    valores = {col: distintos(col)[col].dropna().tolist() for col in ('Proveedor', 'Tienda', 'Estado_Solicitud')}
+    filas = int(consultar(con, f"SELECT COUNT(*) AS filas FROM {VISTA_CONSOLIDADO}")['filas'].iloc[0])
+    return _catalogo(filas, minimos, maximos, valores,
+                     distintos('Proveedor', 'ID_Pedido'), distintos('SKU', 'Descripcion'))
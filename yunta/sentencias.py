@@ -0,0 +1,151 @@
+import math
+import threading
+import weakref
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# ============================================================================
+# SENTENCIAS PARSEADAS POR FORMA DE CONSULTA Y UN CURSOR POR HILO
+# ============================================================================
+# Cada texto SQL con placeholders "?" se parsea una sola vez
+# (extract_statements) y después solo se ejecuta con los valores enlazados
+# como parámetros reales: nunca se arma SQL con los valores. La lista de
+# tiendas viaja como un único parámetro de tipo lista, así el texto de la
+# consulta no cambia con la cantidad de tiendas.
+#
+# Una conexión de DuckDB no se puede usar desde dos hilos a la vez, pero sus
+# cursores sí (comparten la base y sus vistas, no las vistas TEMP). Cada hilo
+# de Streamlit ejecuta con su propio cursor de la conexión, así las sesiones
+# consultan en paralelo. El lock solo protege el registro de sentencias.
+#
+# El resultado sale de DuckDB como tabla Arrow (sin pasar por .df()) y se
+# convierte a pandas una sola vez: fechas como datetime64, texto como
+# strings respaldados por Arrow y decimales como float. Las columnas de
+# dimensión (Tienda, Proveedor...) pueden salir como Categorical con un
+# CategoricalDtype compartido: todas las sesiones usan el mismo diccionario
+# y los filtros y groupbys trabajan sobre los códigos enteros.
+
+_SENTENCIAS = {}  # sql -> sentencia parseada
+_LOCK = threading.Lock()
+_HILO = threading.local()  # cursores del hilo: conexión -> cursor
+
+
+def _parametro(valor):
+    """
+    Valor listo para enlazar como parámetro. Los escalares de numpy pasan a
+    tipos de Python; NaN, pd.NA y NaT (también dentro de listas) pasan como
+    NULL.
+    """
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return [_parametro(v) for v in valor]
+    if valor is None or valor is pd.NA or valor is pd.NaT:
+        return None
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return valor
+
+
+def _sentencia(sql):
+    """Sentencia parseada para este SQL (la parsea si hace falta)"""
+    with _LOCK:
+        sentencia = _SENTENCIAS.get(sql)
+        if sentencia is None:
+            sentencia = _SENTENCIAS[sql] = duckdb.extract_statements(sql)[0]
+        return sentencia
+
+
+def _cursor(con):
+    """Cursor de este hilo sobre la conexión (se cierra junto con ella)"""
+    cursores = getattr(_HILO, 'cursores', None)
+    if cursores is None:
+        cursores = _HILO.cursores = weakref.WeakKeyDictionary()
+    cursor = cursores.get(con)
+    if cursor is None:
+        cursor = cursores[con] = con.cursor()
+    return cursor
+
+
+def _tipo_texto():
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        # pandas < 2.3
+        return pd.StringDtype('pyarrow')
+
+
+_TEXTO = _tipo_texto()
+
+
+def _tipo_pandas(tipo):
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo) or pa.types.is_string_view(tipo):
+        return _TEXTO
+    return None
+
+
+def tipos_categoricos(valores_por_columna):
+    """{columna: CategoricalDtype} con los valores posibles de cada columna"""
+    return {
+        columna: pd.CategoricalDtype(pd.Index(sorted({v for v in valores if pd.notna(v)}), dtype=_TEXTO))
+        for columna, valores in valores_por_columna.items()
+    }
+
+
+def _categorica(columna, tipo):
+    """
+    Categorical con el dtype compartido desde una columna Arrow de texto, o
+    None si trae valores que no están entre las categorías.
+    """
+    codigos = pc.index_in(columna, value_set=pa.array(tipo.categories.to_numpy(), type=pa.string()))
+    if codigos.null_count > columna.null_count:
+        return None
+    return pd.Categorical.from_codes(codigos.fill_null(-1).to_numpy(), dtype=tipo)
+
+
+def tabla_a_pandas(tabla, categorias=None):
+    """
+    DataFrame desde una tabla Arrow: DATE pasa a timestamp, los decimales
+    (sumas de enteros en DuckDB) a float y el texto queda en Arrow.
+
+    categorias = {columna: CategoricalDtype} convierte esas columnas a
+    Categorical con ese dtype (si algún valor no está, queda como texto).
+    """
+    for i, campo in enumerate(tabla.schema):
+        if pa.types.is_date(campo.type):
+            tabla = tabla.set_column(i, campo.name, tabla.column(i).cast(pa.timestamp('us')))
+        elif pa.types.is_decimal(campo.type):
+            tabla = tabla.set_column(i, campo.name, tabla.column(i).cast(pa.float64()))
+
+    convertidas = {}
+    for columna, tipo in (categorias or {}).items():
+        if columna in tabla.column_names and pa.types.is_string(tabla.schema.field(columna).type):
+            categorica = _categorica(tabla.column(columna), tipo)
+            if categorica is not None:
+                convertidas[columna] = categorica
+
+    df = tabla.drop_columns(list(convertidas)).to_pandas(types_mapper=_tipo_pandas)
+    for columna, categorica in convertidas.items():
+        df.insert(tabla.column_names.index(columna), columna, categorica)
+    return df
+
+
+def _tabla_arrow(resultado):
+    if hasattr(resultado, 'to_arrow_table'):
+        return resultado.to_arrow_table()
+    return resultado.fetch_arrow_table()
+
+
+def consultar_arrow(con, sql, parametros=()):
+    """Ejecuta el SQL con los parámetros enlazados y devuelve una tabla Arrow"""
+    argumentos = [_parametro(p) for p in parametros]
+    return _tabla_arrow(_cursor(con).execute(_sentencia(sql), argumentos))
+
+
+def consultar(con, sql, parametros=(), categorias=None):
+    """Ejecuta el SQL con los parámetros enlazados y devuelve un DataFrame"""
+    return tabla_a_pandas(consultar_arrow(con, sql, parametros), categorias)
@@ -0,0 +1,125 @@
+import pandas as pd
+
+from yunta.consultas import agregar_cubo
+
+# ============================================================================
+# VENTAS 360
+# ============================================================================
+# Métricas de la vista ejecutiva sobre los agregados del cubo
+# (yunta.consultas.agregar_cubo). Los filtros de la vista son una tupla
+# (desde, hasta, tiendas, proveedores, codigos) en el orden de agregar_cubo;
+# None = sin filtro.
+
+
+def kpis(resumen):
+    """(venta_total, costo_total, margen_total, margen_pct sobre costo, unidades) de la fila 'total'"""
+    venta_total = resumen['Venta_Total']
+    costo_total = resumen['Costo_Total']
+    margen_total = resumen['Margen']
+    margen_pct = (margen_total / costo_total * 100) if costo_total > 0 else 0
+    return venta_total, costo_total, margen_total, margen_pct, resumen['Cantidad']
+
+
+def evolucion_diaria(df_dia):
+    """Ventas por día con Margen_Pct sobre costo"""
+    df_dia = df_dia[['Fecha', 'Venta_Total', 'Margen', 'Costo_Total']]
+    df_dia['Margen_Pct'] = (df_dia['Margen'] / df_dia['Costo_Total'] * 100).replace([pd.NA, pd.NaT], 0).fillna(0)
+    return df_dia
+
+
+def margen_sobre_costo(df, columnas):
+    """Las columnas pedidas más Margen_Pct = Margen / Costo_Total (0 si no hay costo)"""
+    df = df[columnas]
+    df['Margen_Pct'] = (df['Margen'] / df['Costo_Total'].replace(0, pd.NA) * 100).fillna(0)
+    return df
+
+
+def comparacion_interanual(df_mes, metrica, anio):
+    """Pivot Mes × (anio - 1, anio) de la métrica con Var_% entre ambos años"""
+    df_piv = df_mes[df_mes['Año'].isin([anio, anio - 1])].pivot_table(
+        index='Mes',
+        columns='Año',
+        values=metrica,
+        aggfunc='sum'
+    ).reset_index()
+    df_piv['Var_%'] = (
+        (df_piv[anio] - df_piv[anio - 1]) / df_piv[anio - 1].replace(0, pd.NA) * 100
+    ).fillna(0)
+    return df_piv
+
+
+def pareto_perdidas(df_productos):
+    """
+    Productos con margen negativo (precio promedio bajo el costo promedio)
+    ordenados por pérdida, con Perdida, Perdida_Acum y Perdida_Acum_Pct.
+    """
+    df_productos = df_productos[[
+        'Codigo', 'Descripcion', 'Proveedor',
+        'Cantidad', 'Costo', 'Precio_Venta', 'Venta_Total', 'Costo_Total', 'Margen'
+    ]]
+    df_productos['Margen_Pct'] = (
+        (df_productos['Precio_Venta'] - df_productos['Costo']) /
+        df_productos['Costo'].replace(0, pd.NA) * 100
+    ).fillna(0)
+
+    df_neg = df_productos[df_productos['Margen_Pct'] < 0].copy()
+    df_neg = df_neg.sort_values('Margen', ascending=True)
+    df_neg['Perdida'] = df_neg['Margen'].abs()
+    df_neg['Perdida_Acum'] = df_neg['Perdida'].cumsum()
+    total_perdida = df_neg['Perdida'].sum()
+    df_neg['Perdida_Acum_Pct'] = (df_neg['Perdida_Acum'] / total_perdida * 100).fillna(0)
+    return df_neg
+
+
+def ranking_productos(df_prod):
+    """Productos con Unidades, Rotacion_Pct, Precio_Unitario (venta / unidades) y Margen_Pct sobre costo"""
+    df_prod = df_prod[[
+        'Codigo', 'Descripcion', 'Proveedor',
+        'Cantidad', 'Costo_Total', 'Costo', 'Venta_Total', 'Margen'
+    ]]
+    df_prod['Unidades'] = df_prod['Cantidad']
+    unidades_totales = df_prod['Unidades'].sum()
+    df_prod['Rotacion_Pct'] = (df_prod['Unidades'] / unidades_totales * 100).fillna(0)
+    df_prod['Precio_Unitario'] = (
+        df_prod['Venta_Total'] / df_prod['Unidades'].replace(0, pd.NA)
+    ).fillna(0)
+    df_prod['Margen_Pct'] = (
+        df_prod['Margen'] / df_prod['Costo_Total'].replace(0, pd.NA) * 100
+    ).fillna(0)
+    return df_prod
+
+
+def detalle(df, clave):
+    """Detalle por tienda o proveedor con Margen_Pct, ordenado por ventas"""
+    df = margen_sobre_costo(df, [clave, 'Venta_Total', 'Costo_Total', 'Margen', 'Cantidad'])
+    return df.sort_values('Venta_Total', ascending=False)
+
+
+def tablas_ventas_360(con, filtros, top_n=20):
+    """
+    Las tablas de la vista para los filtros dados, por nombre de hoja:
+    Resumen, Diario, Mensual, Productos, Perdidas, Tiendas, Proveedores y
+    Top_Productos (top_n por ventas). Sin ventas devuelve {}.
+    """
+    resumen = agregar_cubo(con, 'total', *filtros)
+    if resumen['Transacciones'].iloc[0] == 0:
+        return {}
+    venta_total, costo_total, margen_total, margen_pct, unidades = kpis(resumen.iloc[0])
+    productos = agregar_cubo(con, 'producto', *filtros)
+    return {
+        'Resumen': pd.DataFrame({
+            'Venta_Total': [venta_total], 'Costo_Total': [costo_total], 'Margen': [margen_total],
+            'Margen_Pct': [margen_pct], 'Unidades': [unidades],
+        }),
+        'Diario': evolucion_diaria(agregar_cubo(con, 'fecha', *filtros)),
+        'Mensual': margen_sobre_costo(
+            agregar_cubo(con, 'mes', *filtros), ['Año', 'Mes', 'Venta_Total', 'Margen', 'Costo_Total']
+        ),
+        'Productos': ranking_productos(productos),
+        'Perdidas': pareto_perdidas(productos),
+        'Tiendas': detalle(agregar_cubo(con, 'tienda', *filtros), 'Tienda'),
+        'Proveedores': detalle(agregar_cubo(con, 'proveedor', *filtros), 'Proveedor'),
+        'Top_Productos': agregar_cubo(con, 'producto', *filtros, orden='Venta_Total', limite=top_n)[
+            ['Codigo', 'Descripcion', 'Proveedor', 'Venta_Total', 'Cantidad', 'Margen']
+        ],
+    }